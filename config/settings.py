@@ -135,6 +135,32 @@ DATABASES = {
 }
 
 
+# Cache
+# Defaults to per-process local memory. Point CACHE_BACKEND at a shared backend
+# (docker-compose.prod.yml uses django.core.cache.backends.redis.RedisCache)
+# and give every process the same CACHE_* settings, so gunicorn workers and
+# the background services share cached data and version keys such as the
+# section permission, request matcher and SLA policy versions.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'hotel-default'),
+    }
+}
+
+# Seconds a resolved section permission matrix stays in the cache. Edits bump
+# a version counter, so this only bounds how long orphaned entries linger.
+SECTION_PERMISSION_CACHE_TIMEOUT = int(os.environ.get('SECTION_PERMISSION_CACHE_TIMEOUT', 3600))
+
+# Analytics ranges of at least this many days read the DailyTicketStats rollup
+# instead of scanning service_request.
+TICKET_STATS_ROLLUP_MIN_DAYS = int(os.environ.get('TICKET_STATS_ROLLUP_MIN_DAYS', 90))
+
+# Ticket saves feed the SLA deadline scheduler (manage.py run_sla_scheduler).
+# Only enable where the scheduler runs, otherwise the feed table just grows.
+SLA_SCHEDULER_ENABLED = os.environ.get('SLA_SCHEDULER_ENABLED', 'False') == 'True'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -202,10 +228,98 @@ TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
 TWILIO_WHATSAPP_FROM = os.environ.get('TWILIO_WHATSAPP_FROM', '')
 TWILIO_TEST_TO_NUMBER = os.environ.get('TWILIO_TEST_TO_NUMBER', '')
+# Pooled REST transport for outbound WhatsApp, see hotel_app/twilio_service.py
+TWILIO_API_BASE_URL = os.environ.get('TWILIO_API_BASE_URL', 'https://api.twilio.com')
+TWILIO_REQUEST_TIMEOUT = float(os.environ.get('TWILIO_REQUEST_TIMEOUT', '10'))
+# Keep-alive connections kept per process
+TWILIO_POOL_SIZE = int(os.environ.get('TWILIO_POOL_SIZE', '10'))
+# Threads sending one batch; keep at or below TWILIO_POOL_SIZE
+TWILIO_MAX_WORKERS = int(os.environ.get('TWILIO_MAX_WORKERS', '8'))
+
+# WhatsApp webhook, see hotel_app/whatsapp_inbound.py. In fast-ack mode the
+# webhook stores the payload and answers Twilio at once; a thread pool of
+# WHATSAPP_WEBHOOK_WORKERS per process handles it (0 runs it inline).
+# Opt-in: only turn it on where `manage.py process_whatsapp_inbound` runs
+# (docker-compose.prod.yml), otherwise rows left pending or processing by a
+# restarted worker are never picked up.
+WHATSAPP_WEBHOOK_FAST_ACK = os.environ.get('WHATSAPP_WEBHOOK_FAST_ACK', 'False') == 'True'
+WHATSAPP_WEBHOOK_WORKERS = int(os.environ.get('WHATSAPP_WEBHOOK_WORKERS', '4'))
+# Check X-Twilio-Signature (needs SECURE_PROXY_SSL_HEADER behind nginx)
+WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE = os.environ.get('WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE', 'False') == 'True'
+# Pending rows older than this are picked up by process_whatsapp_inbound
+WHATSAPP_INBOUND_STALE_SECONDS = int(os.environ.get('WHATSAPP_INBOUND_STALE_SECONDS', '120'))
+
+# Semantic intent engine for the TwiML webhook, see hotel_app/intent_engine.py.
+# Loaded lazily; INTENT_ENGINE_PRELOAD loads it when config/wsgi.py is
+# imported (once in the master under gunicorn --preload).
+INTENT_MODEL_NAME = os.environ.get('INTENT_MODEL_NAME', 'all-MiniLM-L6-v2')
+INTENT_ENGINE_PRELOAD = os.environ.get('INTENT_ENGINE_PRELOAD', 'False') == 'True'
+# Request type embeddings kept across restarts; empty disables the cache
+INTENT_ENGINE_CACHE_DIR = os.environ.get('INTENT_ENGINE_CACHE_DIR', str(BASE_DIR / 'intent_cache'))
+# Normalized messages whose embeddings are kept per process (0 disables)
+INTENT_MESSAGE_CACHE_SIZE = int(os.environ.get('INTENT_MESSAGE_CACHE_SIZE', '2048'))
+# While an encode is running, concurrent messages wait this long to share the next one
+INTENT_BATCH_WINDOW_MS = float(os.environ.get('INTENT_BATCH_WINDOW_MS', '5'))
+INTENT_BATCH_MAX_SIZE = int(os.environ.get('INTENT_BATCH_MAX_SIZE', '32'))
+# Inference backend: 'torch' (float32), 'int8' (dynamically quantized Linear
+# layers) or 'onnx' (needs optimum[onnxruntime]). Compare them with
+# manage.py benchmark_intent_backends before switching.
+INTENT_ENGINE_BACKEND = os.environ.get('INTENT_ENGINE_BACKEND', 'torch')
+# ONNX file in the model repository, e.g. onnx/model_qint8_avx512.onnx; empty uses onnx/model.onnx
+INTENT_ONNX_FILE_NAME = os.environ.get('INTENT_ONNX_FILE_NAME', '')
 
 # Firebase Configuration
 FIREBASE_VAPID_KEY = os.environ.get('FIREBASE_VAPID_KEY', '')
 
+# Firebase Cloud Messaging (HTTP v1) push client, see hotel_app/fcm_utils.py
+FCM_PROJECT_ID = os.environ.get('FCM_PROJECT_ID', 'guestconnect2-341a2')
+FCM_API_BASE_URL = os.environ.get('FCM_API_BASE_URL', 'https://fcm.googleapis.com')
+FCM_SERVICE_ACCOUNT_FILE = os.environ.get(
+    'FCM_SERVICE_ACCOUNT_FILE', str(BASE_DIR / 'firebase-service-account.json')
+)
+# Refresh the cached OAuth access token this many seconds before it expires
+FCM_TOKEN_REFRESH_MARGIN = int(os.environ.get('FCM_TOKEN_REFRESH_MARGIN', '300'))
+FCM_REQUEST_TIMEOUT = float(os.environ.get('FCM_REQUEST_TIMEOUT', '10'))
+# Keep-alive connections kept open to the FCM endpoint
+FCM_POOL_SIZE = int(os.environ.get('FCM_POOL_SIZE', '10'))
+# Threads sending one broadcast; keep at or below FCM_POOL_SIZE
+FCM_MAX_WORKERS = int(os.environ.get('FCM_MAX_WORKERS', '8'))
+
+# Outbound notification queue, drained by `manage.py run_outbox_worker`
+# (hotel_app/outbox.py). When off, pushes/WhatsApp/email are sent inline.
+# Opt-in: only turn it on where the worker runs (docker-compose.prod.yml),
+# otherwise queued messages are never sent.
+NOTIFICATION_OUTBOX_ENABLED = os.environ.get('NOTIFICATION_OUTBOX_ENABLED', 'False') == 'True'
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', '6'))
+NOTIFICATION_OUTBOX_BACKOFF_SECONDS = int(os.environ.get('NOTIFICATION_OUTBOX_BACKOFF_SECONDS', '30'))
+NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS = int(os.environ.get('NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS', '3600'))
+# Sends per second per channel (push: per recipient)
+NOTIFICATION_OUTBOX_RATE_LIMITS = {
+    'fcm': float(os.environ.get('OUTBOX_FCM_RATE', '100')),
+    'whatsapp': float(os.environ.get('OUTBOX_WHATSAPP_RATE', '10')),
+    'email': float(os.environ.get('OUTBOX_EMAIL_RATE', '5')),
+}
+# Pushes queued within the same window are sent as at most one push per
+# recipient and notification type (0 sends each push on its own)
+NOTIFICATION_PUSH_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_PUSH_COALESCE_SECONDS', '15'))
+
+# Server-sent notification stream under ASGI (hotel_app/notification_stream.py)
+NOTIFICATION_STREAM_POLL_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_POLL_SECONDS', '2'))
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+# Streams are closed after this long; the browser reconnects from its last event id
+NOTIFICATION_STREAM_MAX_AGE_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_MAX_AGE_SECONDS', '3600'))
+
+# Notification retention, `manage.py prune_notifications` (hotel_app/notification_retention.py)
+NOTIFICATION_RETENTION_READ_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_READ_DAYS', '30'))
+NOTIFICATION_RETENTION_UNREAD_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_UNREAD_DAYS', '90'))
+# Copy removed rows to notification_archive instead of only deleting them
+NOTIFICATION_RETENTION_ARCHIVE = os.environ.get('NOTIFICATION_RETENTION_ARCHIVE', 'True') == 'True'
+# Rows per transaction, and the pause between transactions
+NOTIFICATION_RETENTION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_RETENTION_BATCH_SIZE', '1000'))
+NOTIFICATION_RETENTION_PAUSE_SECONDS = float(os.environ.get('NOTIFICATION_RETENTION_PAUSE_SECONDS', '0.1'))
+# Removed rows are reported to delta sync this long; older sync cursors must resync
+NOTIFICATION_RETENTION_TOMBSTONE_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_TOMBSTONE_DAYS', '30'))
+
 
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
@@ -14,4 +14,19 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 # Get the Django WSGI application
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Optional warm-up of the WhatsApp intent model (hotel_app/intent_engine.py)
+from django.conf import settings
+
+if settings.INTENT_ENGINE_PRELOAD:
+    from hotel_app.intent_engine import preload_intent_engine
+
+    preload_intent_engine()
+
+# Importing the app already queries the database (TwilioService reads
+# TwilioSettings), so close the connection: under gunicorn --preload the
+# forked workers would otherwise share the master's socket
+from django.db import connections
+
+connections.close_all()
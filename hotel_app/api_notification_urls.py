@@ -8,6 +8,8 @@ urlpatterns = [
     path('notifications/<int:notification_id>/read/', api_views.mark_notification_as_read, name='mark-notification-as-read'),
     path('notifications/read-all/', api_views.mark_all_notifications_as_read, name='mark-all-notifications-as-read'),
     path('notifications/<int:notification_id>/delete/', api_views.delete_notification, name='delete-notification'),
+    path('broadcasts/<int:broadcast_id>/read/', api_views.mark_broadcast_as_read, name='mark-broadcast-as-read'),
+    path('broadcasts/<int:broadcast_id>/delete/', api_views.delete_broadcast, name='delete-broadcast'),
     
     # FCM Token Management
     path('save-fcm-token/', api_views.save_fcm_token, name='save-fcm-token'),
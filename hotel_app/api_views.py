@@ -3,8 +3,9 @@ from rest_framework.decorators import api_view, permission_classes, authenticati
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.utils import timezone
 from .models import Notification, FCMToken
-from .serializers import NotificationSerializer
 from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 from django.contrib.auth import get_user_model
 
@@ -29,29 +30,59 @@ def current_user(request):
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
     """
-    Get unread notifications for the current user
+    Get unread notifications for the current user, including broadcasts
+    addressed to them
     """
-    notifications = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).order_by('-created_at')
-    
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    from .notification_services import unread_notifications
+
+    return Response(unread_notifications(request.user))
 
 @api_view(['GET'])
 @authentication_classes([SessionAuthentication, TokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_all_notifications(request):
     """
-    Get all notifications for the current user
+    Get the current user's notifications, a page at a time.
+
+    - `?cursor=<next_cursor>&limit=<n>` pages through history, newest first.
+      The first page also returns `sync_cursor`.
+    - `?since=<sync_cursor>` returns only rows created or changed since then,
+      and the ids of rows `removed` since, with a new `sync_cursor` (repeat
+      while `has_more`). Rows may be returned again; replace them by id. A
+      410 with `resync` means the cursor is too old: start from the first page.
+
+    Broadcasts addressed to the user are included in both, as in the unread list.
+
+    Both include the current `unread_count`.
     """
-    notifications = Notification.objects.filter(
-        recipient=request.user
-    ).order_by('-created_at')
-    
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    from .notification_services import (
+        MAX_PAGE_SIZE, SyncExpired, notification_changes, notification_page, page_size, serialize_notifications,
+        sync_cursor, unread_count,
+    )
+
+    since = request.query_params.get('since')
+    cursor = request.query_params.get('cursor')
+    try:
+        if since:
+            notifications, removed, new_cursor, has_more = notification_changes(
+                request.user, since, page_size(request.query_params.get('limit'), MAX_PAGE_SIZE)
+            )
+            data = {'sync_cursor': new_cursor, 'has_more': has_more, 'removed': removed}
+        else:
+            # Taken before reading the page so no change in between is missed
+            data = {} if cursor else {'sync_cursor': sync_cursor(request.user)}
+            notifications, next_cursor = notification_page(
+                request.user, cursor, page_size(request.query_params.get('limit'))
+            )
+            data['next_cursor'] = next_cursor
+    except SyncExpired:
+        return Response({'error': 'Sync cursor expired', 'resync': True}, status=status.HTTP_410_GONE)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+    data['results'] = serialize_notifications(notifications)
+    data['unread_count'] = unread_count(request.user)
+    return Response(data)
 
 @api_view(['POST'])
 @authentication_classes([SessionAuthentication, TokenAuthentication])
@@ -76,10 +107,13 @@ def mark_all_notifications_as_read(request):
     """
     Mark all notifications as read for the current user
     """
+    from .notification_services import mark_broadcasts_read
+
+    mark_broadcasts_read(request.user)
     Notification.objects.filter(
         recipient=request.user,
         is_read=False
-    ).update(is_read=True)
+    ).update(is_read=True, updated_at=timezone.now())
     
     return Response({'status': 'success'})
 
@@ -90,13 +124,43 @@ def delete_notification(request, notification_id):
     """
     Delete a specific notification
     """
+    from .notification_services import tombstone_notifications
+
     notification = get_object_or_404(
         Notification,
         id=notification_id,
         recipient=request.user
     )
     
-    notification.delete()
+    with transaction.atomic():
+        tombstone_notifications([notification])
+        notification.delete()
+    return Response({'status': 'success'})
+
+@api_view(['POST'])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def mark_broadcast_as_read(request, broadcast_id):
+    """
+    Mark a broadcast notification as read for the current user
+    """
+    from .notification_services import mark_broadcasts_read, visible_broadcasts
+
+    get_object_or_404(visible_broadcasts(request.user), pk=broadcast_id)
+    mark_broadcasts_read(request.user, [broadcast_id])
+    return Response({'status': 'success'})
+
+@api_view(['DELETE'])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def delete_broadcast(request, broadcast_id):
+    """
+    Dismiss a broadcast notification for the current user only
+    """
+    from .notification_services import mark_broadcasts_read, visible_broadcasts
+
+    get_object_or_404(visible_broadcasts(request.user), pk=broadcast_id)
+    mark_broadcasts_read(request.user, [broadcast_id], dismiss=True)
     return Response({'status': 'success'})
 
 
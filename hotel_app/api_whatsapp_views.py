@@ -3,7 +3,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from twilio.twiml.messaging_response import MessagingResponse
 
-from .whatsapp_workflow import workflow_handler
+from .models import InboundMessage
+from .whatsapp_inbound import dispatch, fast_ack_enabled, process_inbound, record_inbound, valid_signature
 
 
 @csrf_exempt
@@ -12,24 +13,30 @@ def whatsapp_webhook(request):
     """
     Twilio WhatsApp webhook endpoint.
 
-    Twilio sends POST requests containing form-encoded data. We process the
-    message via the WhatsApp workflow handler and respond with TwiML to deliver
-    replies back to the guest.
+    Twilio sends POST requests containing form-encoded data. The payload is
+    stored first; in fast-ack mode it is processed by the worker pool after
+    this response, otherwise before it. Replies are sent through the API, so
+    the TwiML response is always empty. A retried MessageSid is only
+    acknowledged.
     """
     if request.method == "GET":
         # Health-check endpoint for debugging
         return JsonResponse({"status": "ok"})
 
+    if not valid_signature(request):
+        return HttpResponse("Invalid signature", status=403)
+
     payload = request.POST.dict()
-    messages, conversation = workflow_handler.handle_incoming_message(payload)
+    if fast_ack_enabled():
+        message, created = record_inbound(payload)
+        if created:
+            dispatch(message)
+    else:
+        message, created = record_inbound(payload, status=InboundMessage.STATUS_PROCESSING)
+        if created:
+            process_inbound(message)
 
-    # Send messages asynchronously via workflow handler instead of TwiML response
-    # This allows proper button message handling
-    if conversation:
-        workflow_handler.send_outbound_messages(conversation, messages)
-    
     # Return empty TwiML response (messages are sent via API)
     response = MessagingResponse()
     xml = str(response)
     return HttpResponse(xml, content_type="application/xml")
-
@@ -0,0 +1,54 @@
+"""
+Version keys in the shared cache.
+
+Several per-process caches are rebuilt when another process changes their
+source tables: resolved section permissions (section_permissions.py), the
+compiled request matcher (request_matcher.py), the SLA policy table
+(sla_policy.py) and the intent index (intent_engine.py). Each remembers the
+version of its key it was built under and rebuilds when `get_version()`
+returns a different one; edits call `invalidate_version()`.
+
+Versions start at a microsecond timestamp, so if a key is ever evicted the
+re-created value is still higher than any version data was built under.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _initial_version():
+    return time.time_ns() // 1000
+
+
+def get_version(key):
+    """The shared version under `key`, created if missing."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Move the shared version under `key`; cache errors are logged."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing or evicted
+        cache.add(key, _initial_version(), timeout=None)
+    except Exception as e:
+        logger.error(f'Error bumping cache version {key}: {str(e)}')
+
+
+def invalidate_version(key):
+    """
+    Bump the version under `key` now and again once the surrounding
+    transaction commits, so a process that rebuilds from uncommitted state
+    in between does not keep stale data.
+    """
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
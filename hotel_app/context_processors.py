@@ -1,6 +1,5 @@
 from django.conf import settings
-from hotel_app.section_permissions import user_has_section_permission
-from hotel_app.models import Section
+from hotel_app.section_permissions import get_section_permission_snapshot
 
 def nav_permissions(request):
     user = request.user
@@ -22,20 +21,8 @@ def nav_permissions(request):
     section_permissions = {}
     if user.is_authenticated:
         try:
-            # Get all active sections (handle case where table doesn't exist yet)
-            sections = Section.objects.filter(is_active=True)
-            for section in sections:
-                can_view = user_has_section_permission(user, section.name, 'view')
-                can_add = user_has_section_permission(user, section.name, 'add')
-                can_change = user_has_section_permission(user, section.name, 'change')
-                can_delete = user_has_section_permission(user, section.name, 'delete')
-                section_permissions[section.name] = {
-                    'view': can_view,
-                    'add': can_add,
-                    'change': can_change,
-                    'delete': can_delete,
-                    'edit': can_add or can_change or can_delete,
-                }
+            # Same snapshot the middleware and view decorators used for this request
+            section_permissions = get_section_permission_snapshot(user).as_nav_dict()
         except Exception:
             # If Section table doesn't exist or other error, return empty dict
             # This allows the app to work even if migrations haven't been run yet
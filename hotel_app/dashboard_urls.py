@@ -99,6 +99,7 @@ urlpatterns = [
     path('api/guests/search/', dashboard_views.search_guests_api, name='api_search_guests'),
     path('api/locations/search/', dashboard_views.search_locations_api, name='api_search_locations'),
     path('api/tickets/create/', dashboard_views.create_ticket_api, name='api_create_ticket'),
+    path('api/tickets/bulk-create/', dashboard_views.create_tickets_bulk_api, name='api_create_tickets_bulk'),
     path('api/tickets/<int:ticket_id>/assign/', dashboard_views.assign_ticket_api, name='api_assign_ticket'),
     # Removed claim_ticket_api as we're removing the claim functionality
     path('api/tickets/<int:ticket_id>/accept/', dashboard_views.accept_ticket_api, name='api_accept_ticket'),
@@ -62,7 +62,13 @@ from .utils import user_in_group, create_notification
 from hotel_app.whatsapp_service import WhatsAppService
 from hotel_app.whatsapp_workflow import workflow_handler
 from .rbac_services import get_accessible_sections, can_access_section
-from .section_permissions import require_section_permission, user_has_section_permission
+from . import kpi_services, ticket_stats_services
+from .sla_policy import invalidate_sla_policy
+from .section_permissions import (
+    require_section_permission,
+    user_has_section_permission,
+    invalidate_section_permission_snapshots,
+)
 
 
 def _send_ticket_acknowledgement(ticket, *, guest=None, phone_number=None, conversation=None):
@@ -119,13 +125,15 @@ def _send_ticket_acknowledgement(ticket, *, guest=None, phone_number=None, conve
 
     if destination_phone:
         from hotel_app.twilio_service import twilio_service
+        from hotel_app.outbox import queue_whatsapp
 
         try:
             if twilio_service.is_configured():
-                result = twilio_service.send_text_message(destination_phone, ack_message)
-                return bool(result and result.get("success"))
+                # Sent by the outbox worker, outside the request
+                queue_whatsapp(destination_phone, body=ack_message)
+                return True
         except Exception:
-            logger.exception("Failed to send ticket acknowledgement via Twilio.")
+            logger.exception("Failed to queue ticket acknowledgement via Twilio.")
 
     return False
 
@@ -593,6 +601,15 @@ def dashboard_view(request):
         # Redirect to My Tickets if user doesn't have dashboard permission
         return redirect('dashboard:my_tickets')
     
+    # The project now uses the new dashboard2 design as the primary dashboard.
+    # Reuse the existing dashboard2_view to render the latest dashboard template
+    # and context so we keep a single source of truth for the dashboard output.
+    # The legacy context below is only built if dashboard2_view raises.
+    try:
+        return dashboard2_view(request)
+    except Exception:
+        pass
+    
     today = timezone.localdate()
 
     # Live counts (defensive)
@@ -813,16 +830,7 @@ def dashboard_view(request):
         'occupancy_data': json.dumps(occupancy_data),
     }
 
-    # The project now uses the new dashboard2 design as the primary dashboard.
-    # Reuse the existing dashboard2_view to render the latest dashboard template
-    # and context so we keep a single source of truth for the dashboard output.
-    try:
-        # Call dashboard2_view directly and return its response. It prepares
-        # a design-oriented context. If dashboard2_view raises, fall back to
-        # rendering the legacy dashboard template.
-        return dashboard2_view(request)
-    except Exception:
-        return render(request, 'dashboard/dashboard.html', context)
+    return render(request, 'dashboard/dashboard.html', context)
 
 
 @login_required
@@ -882,67 +890,44 @@ def dashboard2_view(request):
     except Exception:
         total_locations = 0
 
+    # Grouped KPI aggregates (see kpi_services); one query per model
     try:
-        open_complaints = Complaint.objects.filter(
-            status__in=["pending", "in_progress"],
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).count()
+        complaint_stats = kpi_services.complaint_kpis(date_range_start, date_range_end)
     except Exception:
-        try:
-            open_complaints = Complaint.objects.filter(
-                created_at__gte=date_range_start,
-                created_at__lte=date_range_end
-            ).count()
-        except Exception:
-            open_complaints = 0
+        complaint_stats = {'open': 0, 'resolved': 0, 'trends': []}
+    open_complaints = complaint_stats['open']
+    resolved_complaints = complaint_stats['resolved']
+    # Complaint trends for charting (filtered by date range)
+    complaint_trends = complaint_stats['trends']
 
     try:
-        resolved_complaints = Complaint.objects.filter(
-            status="resolved",
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).count()
+        voucher_stats = kpi_services.voucher_kpis(date_range_start, date_range_end, today)
     except Exception:
-        resolved_complaints = 0
+        voucher_stats = None
 
-    # Vouchers (filtered by date range)
     try:
-        vouchers_issued = Voucher.objects.filter(
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).count()
-        vouchers_redeemed = Voucher.objects.filter(
-            redeemed=True,
-            redeemed_at__gte=date_range_start,
-            redeemed_at__lte=date_range_end
-        ).count()
-        # Treat vouchers expired if expiry_date < today
-        vouchers_expired = Voucher.objects.filter(
-            expiry_date__lt=today,
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).count()
+        ticket_stats = kpi_services.service_request_kpis(date_range_start, date_range_end, today)
     except Exception:
+        ticket_stats = None
+
+    try:
+        review_stats = kpi_services.review_kpis(date_range_start, date_range_end, today)
+    except Exception:
+        review_stats = None
+
+    # Vouchers (filtered by date range)
+    if voucher_stats:
+        vouchers_issued = voucher_stats['issued']
+        vouchers_redeemed = voucher_stats['redeemed']
+        # Treat vouchers expired if expiry_date < today
+        vouchers_expired = voucher_stats['expired']
+    else:
         vouchers_issued = vouchers_redeemed = vouchers_expired = 0
     
     # Vouchers redeemed change vs last week
-    try:
-        week_ago = today - datetime.timedelta(days=7)
-        
-        # Count vouchers redeemed in the last week
-        last_week_vouchers_redeemed = Voucher.objects.filter(
-            redeemed=True,
-            redeemed_at__date__gte=week_ago
-        ).count()
-        
-        # Count vouchers redeemed in the week before that
-        two_weeks_ago = week_ago - datetime.timedelta(days=7)
-        prev_week_vouchers_redeemed = Voucher.objects.filter(
-            redeemed=True,
-            redeemed_at__date__gte=two_weeks_ago,
-            redeemed_at__date__lt=week_ago
-        ).count()
+    if voucher_stats:
+        last_week_vouchers_redeemed = voucher_stats['redeemed_last_week']
+        prev_week_vouchers_redeemed = voucher_stats['redeemed_prev_week']
         
         # Calculate percentage change
         if prev_week_vouchers_redeemed > 0:
@@ -950,69 +935,44 @@ def dashboard2_view(request):
         else:
             vouchers_redeemed_change = 0 if last_week_vouchers_redeemed == 0 else 100  # Handle division by zero
         vouchers_redeemed_change_direction = "up" if vouchers_redeemed_change > 0 else "down" if vouchers_redeemed_change < 0 else "none"
-    except Exception:
+    else:
         vouchers_redeemed_change = 0
         vouchers_redeemed_change_direction = "none"
 
     # Reviews (filtered by date range)
+    average_review_rating = (review_stats['avg_rating'] or 0) if review_stats else 0
+
+    # Requests chart data (filtered by date range)
     try:
-        average_review_rating = Review.objects.filter(
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).aggregate(avg=Avg("rating"))["avg"] or 0
+        requests_data = kpi_services.request_type_counts(date_range_start, date_range_end)
     except Exception:
-        average_review_rating = 0
+        requests_data = {'labels': [], 'values': []}
 
-    # Complaint trends for charting (filtered by date range)
+    # Trend period for charts
+    trend_period_param = request.GET.get('trend_period', '7')
     try:
-        complaint_trends = list(Complaint.objects.filter(
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).values("status").annotate(count=Count("id")))
-    except Exception:
-        complaint_trends = []
+        trend_days = int(trend_period_param)
+        if trend_days not in [7, 30, 90]:
+            trend_days = 7
+    except ValueError:
+        trend_days = 7
 
-    # Requests chart data (filtered by date range)
+    # Daily review buckets cover both the 7-day feedback chart and the trend chart
     try:
-        request_types = list(RequestType.objects.all())
-        requests_labels = [rt.name for rt in request_types]
-        try:
-            requests_values = [ServiceRequest.objects.filter(
-                request_type=rt,
-                created_at__gte=date_range_start,
-                created_at__lte=date_range_end
-            ).count() for rt in request_types]
-        except Exception:
-            requests_values = [1 for _ in requests_labels]
+        review_days = kpi_services.daily_review_counts(max(trend_days, 7), today)
     except Exception:
-        requests_labels = []
-        requests_values = []
-
-    requests_data = {
-        'labels': requests_labels,
-        'values': requests_values,
-    }
+        review_days = None
 
     # Feedback chart data (7-day buckets using Review if possible)
-    try:
-        labels = []
-        positive = []
-        neutral = []
-        negative = []
-        for i in range(6, -1, -1):
-            day = today - datetime.timedelta(days=i)
-            labels.append(day.strftime('%a'))
-            reviews_on_day = Review.objects.filter(created_at__date=day)
-            positive.append(reviews_on_day.filter(rating__gte=4).count())
-            neutral.append(reviews_on_day.filter(rating=3).count())
-            negative.append(reviews_on_day.filter(rating__lte=2).count())
+    if review_days:
+        last_7 = review_days[-7:]
         feedback_data = {
-            'labels': labels,
-            'positive': positive,
-            'neutral': neutral,
-            'negative': negative,
+            'labels': [day.strftime('%a') for day, _ in last_7],
+            'positive': [counts['positive'] for _, counts in last_7],
+            'neutral': [counts['neutral'] for _, counts in last_7],
+            'negative': [counts['negative'] for _, counts in last_7],
         }
-    except Exception:
+    else:
         feedback_data = {
             'labels': [],
             'positive': [],
@@ -1035,124 +995,60 @@ def dashboard2_view(request):
 
     occupancy_data = {'occupied': occupancy_today, 'rate': round(occupancy_rate, 1)}
 
-    # Active tickets (Service Requests in date range)
-    try:
-        active_tickets_count = ServiceRequest.objects.filter(
-            status__in=['pending', 'accepted', 'in_progress'],
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).count()
-    except Exception:
-        active_tickets_count = 0
-    
-    # Active tickets change vs last week
-    try:
-        week_ago = today - datetime.timedelta(days=7)
-        last_week_active_tickets = ServiceRequest.objects.filter(
-            status__in=['pending', 'accepted', 'in_progress'],
-            created_at__date__lt=week_ago
-        ).count()
-        # Calculate percentage change
+    if ticket_stats:
+        # Active tickets (Service Requests in date range)
+        active_tickets_count = ticket_stats['active_tickets']
+        
+        # Active tickets change vs last week
+        last_week_active_tickets = ticket_stats['active_tickets_last_week']
         if last_week_active_tickets > 0:
             active_tickets_change = round(((active_tickets_count - last_week_active_tickets) / last_week_active_tickets * 100), 1)
         else:
             active_tickets_change = 0 if active_tickets_count == 0 else 100  # Handle division by zero
         active_tickets_change_direction = "up" if active_tickets_change > 0 else "down" if active_tickets_change < 0 else "none"
-    except Exception:
-        active_tickets_change = 0
-        active_tickets_change_direction = "none"
 
-    # SLA breaches in date range
-    try:
-        sla_breaches_24h = ServiceRequest.objects.filter(
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).filter(
-            Q(sla_breached=True) | Q(response_sla_breached=True) | Q(resolution_sla_breached=True)
-        ).count()
-    except Exception:
-        sla_breaches_24h = 0
-    
-    # SLA breaches change vs yesterday
-    try:
-        yesterday = today - datetime.timedelta(days=1)
-        yesterday_sla_breaches = ServiceRequest.objects.filter(
-            created_at__date=yesterday
-        ).filter(
-            Q(sla_breached=True) | Q(response_sla_breached=True) | Q(resolution_sla_breached=True)
-        ).count()
-        
-        today_sla_breaches = ServiceRequest.objects.filter(
-            created_at__date=today
-        ).filter(
-            Q(sla_breached=True) | Q(response_sla_breached=True) | Q(resolution_sla_breached=True)
-        ).count()
-        
-        sla_breaches_change = today_sla_breaches - yesterday_sla_breaches
+        # SLA breaches in date range, and change vs yesterday
+        sla_breaches_24h = ticket_stats['sla_breaches']
+        sla_breaches_change = ticket_stats['sla_breaches_today'] - ticket_stats['sla_breaches_yesterday']
         sla_breaches_change_direction = "up" if sla_breaches_change > 0 else "down" if sla_breaches_change < 0 else "none"
-    except Exception:
-        sla_breaches_change = 0
-        sla_breaches_change_direction = "none"
 
-    # Average response time in date range
-    try:
-        from django.db.models import F, DurationField, ExpressionWrapper
-        qs_resp = ServiceRequest.objects.filter(
-            accepted_at__isnull=False, 
-            created_at__gte=date_range_start,
-            created_at__lte=date_range_end
-        ).annotate(
-            resp_delta=ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField())
-        )
-        avg_resp = qs_resp.aggregate(avg=Avg('resp_delta'))['avg']
+        # Average response time in date range
+        avg_resp = ticket_stats['avg_response']
         if avg_resp:
             total_minutes = int(avg_resp.total_seconds() // 60)
             avg_response_display = f"{total_minutes}m" if total_minutes < 90 else f"{total_minutes // 60}h {total_minutes % 60}m"
         else:
             avg_response_display = "0%"
-    except Exception:
-        avg_response_display = "0%"
 
-    # Staff efficiency: % completed in date range that met resolution SLA
-    try:
-        completed_qs = ServiceRequest.objects.filter(
-            completed_at__gte=date_range_start,
-            completed_at__lte=date_range_end
-        )
-        total_completed = completed_qs.count()
-        met_sla = completed_qs.filter(resolution_sla_breached=False).count() if total_completed else 0
-        staff_efficiency_pct = int(round((met_sla / total_completed) * 100)) if total_completed else 0
-    except Exception:
+        # Staff efficiency: % completed in date range that met resolution SLA
+        staff_efficiency_pct = ticket_stats['staff_efficiency']
+    else:
+        active_tickets_count = 0
+        active_tickets_change = 0
+        active_tickets_change_direction = "none"
+        sla_breaches_24h = 0
+        sla_breaches_change = 0
+        sla_breaches_change_direction = "none"
+        avg_response_display = "0%"
         staff_efficiency_pct = 0
 
     # Active GYM members (status Active and not expired)
     try:
-        active_gym_members = GymMember.objects.filter(status="Active").exclude(expiry_date__lt=today).count()
+        gym_stats = kpi_services.gym_member_kpis(today)
     except Exception:
-        active_gym_members = 0
+        gym_stats = {'active': 0, 'active_last_week': 0}
+    active_gym_members = gym_stats['active']
 
     # Trend data for charts
     try:
-        trend_period_param = request.GET.get('trend_period', '7')
-        try:
-            trend_days = int(trend_period_param)
-            if trend_days not in [7, 30, 90]:
-                trend_days = 7
-        except ValueError:
-            trend_days = 7
-
-        labels = []
-        tickets_series = []
-        feedback_series = []
+        ticket_days = kpi_services.daily_ticket_counts(trend_days, today)
         
         # Determine date format based on range
         date_fmt = '%a' if trend_days <= 7 else '%d/%m'
         
-        for i in range(trend_days - 1, -1, -1):
-            day = today - datetime.timedelta(days=i)
-            labels.append(day.strftime(date_fmt))
-            tickets_series.append(ServiceRequest.objects.filter(created_at__date=day).count())
-            feedback_series.append(Review.objects.filter(created_at__date=day).count())
+        labels = [day.strftime(date_fmt) for day, _ in ticket_days]
+        tickets_series = [count for _, count in ticket_days]
+        feedback_series = [counts['total'] for _, counts in (review_days or [])[-trend_days:]]
             
         trend_labels_json = json.dumps(labels)
         tickets_data_json = json.dumps(tickets_series)
@@ -1171,12 +1067,10 @@ def dashboard2_view(request):
 
 
     # Sentiment (last 30 days)
-    try:
-        since_30d = timezone.now() - datetime.timedelta(days=30)
-        reviews_30 = Review.objects.filter(created_at__gte=since_30d)
-        pos_count = reviews_30.filter(rating__gte=4).count()
-        neu_count = reviews_30.filter(rating=3).count()
-        neg_count = reviews_30.filter(rating__lte=2).count()
+    if review_stats:
+        pos_count = review_stats['positive_30d']
+        neu_count = review_stats['neutral_30d']
+        neg_count = review_stats['negative_30d']
         total_reviews = pos_count + neu_count + neg_count
         if total_reviews > 0:
             pos_pct = int(round(pos_count / total_reviews * 100))
@@ -1185,7 +1079,7 @@ def dashboard2_view(request):
         else:
             pos_pct = neu_pct = neg_pct = 0
         overall_rating = round(average_review_rating or 0, 1)
-    except Exception:
+    else:
         pos_count = neu_count = neg_count = 0
         pos_pct = 0
         neu_pct = 0
@@ -1193,174 +1087,80 @@ def dashboard2_view(request):
         overall_rating = 0
     
     # Guest Satisfaction change (+2% this month)
-    try:
-        # Calculate date for one month ago
-        month_ago = today - datetime.timedelta(days=30)
-        
-        # Get average rating for last month
-        last_month_avg_rating = Review.objects.filter(
-            created_at__date__gte=month_ago,
-            created_at__date__lt=today
-        ).aggregate(avg=Avg("rating"))["avg"] or 0
-        
-        # Get average rating for the month before that
-        two_months_ago = month_ago - datetime.timedelta(days=30)
-        prev_month_avg_rating = Review.objects.filter(
-            created_at__date__gte=two_months_ago,
-            created_at__date__lt=month_ago
-        ).aggregate(avg=Avg("rating"))["avg"] or 0
+    if review_stats:
+        last_month_avg_rating = review_stats['avg_rating_last_month'] or 0
+        prev_month_avg_rating = review_stats['avg_rating_prev_month'] or 0
         
         # Calculate change in satisfaction percentage
         last_month_satisfaction = round(last_month_avg_rating * 20) if last_month_avg_rating else 0
         prev_month_satisfaction = round(prev_month_avg_rating * 20) if prev_month_avg_rating else 0
         guest_satisfaction_change = last_month_satisfaction - prev_month_satisfaction
         guest_satisfaction_change_direction = "up" if guest_satisfaction_change > 0 else "down" if guest_satisfaction_change < 0 else "none"
-    except Exception:
+    else:
         guest_satisfaction_change = 0
         guest_satisfaction_change_direction = "none"
     
-    # Avg Response Time change (-3m improved)
-    try:
-        # Calculate response time for last 30 days
-        since_30d = timezone.now() - datetime.timedelta(days=30)
-        qs_resp_30d = ServiceRequest.objects.filter(
-            accepted_at__isnull=False, created_at__gte=since_30d
-        ).annotate(
-            resp_delta=ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField())
-        )
-        avg_resp_30d = qs_resp_30d.aggregate(avg=Avg('resp_delta'))['avg']
+    if ticket_stats:
+        # Avg Response Time change (-3m improved)
+        avg_resp_30d = ticket_stats['avg_response_30d']
+        avg_resp_prev = ticket_stats['avg_response_prev_30d']
         current_response_time_minutes = int(avg_resp_30d.total_seconds() // 60) if avg_resp_30d else 0
-        
-        # Calculate response time for previous 30 days
-        prev_since_30d = since_30d - datetime.timedelta(days=30)
-        qs_resp_prev = ServiceRequest.objects.filter(
-            accepted_at__isnull=False, 
-            created_at__gte=prev_since_30d,
-            created_at__lt=since_30d
-        ).annotate(
-            resp_delta=ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField())
-        )
-        avg_resp_prev = qs_resp_prev.aggregate(avg=Avg('resp_delta'))['avg']
         prev_response_time_minutes = int(avg_resp_prev.total_seconds() // 60) if avg_resp_prev else 0
         
         # Calculate improvement (negative means improved)
         avg_response_time_change = prev_response_time_minutes - current_response_time_minutes
         avg_response_time_change_direction = "down" if avg_response_time_change > 0 else "up" if avg_response_time_change < 0 else "none"
-    except Exception:
+
+        # Staff Efficiency change (+5% this week)
+        staff_efficiency_change = ticket_stats['staff_efficiency_7d'] - ticket_stats['staff_efficiency_prev_7d']
+        staff_efficiency_change_direction = "up" if staff_efficiency_change > 0 else "down" if staff_efficiency_change < 0 else "none"
+    else:
         avg_response_time_change = 0
         avg_response_time_change_direction = "none"
-    
-    # Staff Efficiency change (+5% this week)
-    try:
-        # Calculate staff efficiency for last week
-        since_7d = timezone.now() - datetime.timedelta(days=7)
-        completed_qs_7d = ServiceRequest.objects.filter(completed_at__gte=since_7d)
-        total_completed_7d = completed_qs_7d.count()
-        met_sla_7d = completed_qs_7d.filter(resolution_sla_breached=False).count() if total_completed_7d else 0
-        current_staff_efficiency = int(round((met_sla_7d / total_completed_7d * 100))) if total_completed_7d else 0
-        
-        # Calculate staff efficiency for previous week
-        prev_since_7d = since_7d - datetime.timedelta(days=7)
-        completed_qs_prev = ServiceRequest.objects.filter(
-            completed_at__gte=prev_since_7d,
-            completed_at__lt=since_7d
-        )
-        total_completed_prev = completed_qs_prev.count()
-        met_sla_prev = completed_qs_prev.filter(resolution_sla_breached=False).count() if total_completed_prev else 0
-        prev_staff_efficiency = int(round((met_sla_prev / total_completed_prev * 100))) if total_completed_prev else 0
-        
-        # Calculate change
-        staff_efficiency_change = current_staff_efficiency - prev_staff_efficiency
-        staff_efficiency_change_direction = "up" if staff_efficiency_change > 0 else "down" if staff_efficiency_change < 0 else "none"
-    except Exception:
         staff_efficiency_change = 0
         staff_efficiency_change_direction = "none"
     
     # Active GYM Members change (+5% growth)
-    try:
-        # Calculate current active GYM members
-        current_gym_members = GymMember.objects.filter(status="Active").exclude(expiry_date__lt=today).count()
-        
-        # Calculate active GYM members from last week
-        week_ago = today - datetime.timedelta(days=7)
-        last_week_gym_members = GymMember.objects.filter(status="Active").exclude(expiry_date__lt=week_ago).count()
-        
-        # Calculate percentage change
-        if last_week_gym_members > 0:
-            gym_members_change = round(((current_gym_members - last_week_gym_members) / last_week_gym_members * 100), 1)
-        else:
-            gym_members_change = 0 if current_gym_members == 0 else 100  # Handle division by zero
-        gym_members_change_direction = "up" if gym_members_change > 0 else "down" if gym_members_change < 0 else "none"
-    except Exception:
-        gym_members_change = 0
-        gym_members_change_direction = "none"
+    current_gym_members = gym_stats['active']
+    last_week_gym_members = gym_stats['active_last_week']
+    if last_week_gym_members > 0:
+        gym_members_change = round(((current_gym_members - last_week_gym_members) / last_week_gym_members * 100), 1)
+    else:
+        gym_members_change = 0 if current_gym_members == 0 else 100  # Handle division by zero
+    gym_members_change_direction = "up" if gym_members_change > 0 else "down" if gym_members_change < 0 else "none"
     
     # Active Guests change (+23 check-ins)
-    try:
-    # ACTIVE guests TODAY
-        current_active_guests = Voucher.objects.filter(
-        check_in_date__lte=today,
-        check_out_date__gt=today,
-        location__isnull=False
-    ).count()
-
-    # ACTIVE guests YESTERDAY
-        yesterday_active_guests = Voucher.objects.filter(
-        check_in_date__lte=yesterday,
-        check_out_date__gt=yesterday,
-        location__isnull=False
-    ).count()
-
-    # Difference
-        active_guests_change = current_active_guests - yesterday_active_guests
-
+    if voucher_stats:
+        current_active_guests = voucher_stats['active_guests']
+        active_guests_change = current_active_guests - voucher_stats['active_guests_yesterday']
         active_guests_change_direction = (
-        "up" if active_guests_change > 0 else
-        "down" if active_guests_change < 0 else
-        "none"
-    )
-
-    except Exception as e:
-        # print("Active guest error:", e)
+            "up" if active_guests_change > 0 else
+            "down" if active_guests_change < 0 else
+            "none"
+        )
+    else:
         current_active_guests = 0
         active_guests_change = 0
         active_guests_change_direction = "none"
 
-    # print(current_active_guests, active_guests_change, active_guests_change_direction)
+    # Department chart: top 6 departments by ticket count
     try:
-    # Get all departments and count tickets per department
-        dept_qs = Department.objects.all()
-    # Build list of (dept, total_count, assigned_count, completed_count)
-        dept_stats = []
-        for d in dept_qs:
-            total = ServiceRequest.objects.filter(department=d).count()
-        # assigned/open = everything not completed/closed
-            assigned = ServiceRequest.objects.filter(department=d).exclude(status__in=['completed', 'closed']).count()
-            completed = ServiceRequest.objects.filter(department=d, status__in=['completed', 'closed']).count()
-            dept_stats.append((d.name, total, assigned, completed))
-
-            
-
-    # Sort by total ticket count (desc) and take top 6 (fallback to alphabetical if equal)
-        dept_stats_sorted = sorted(dept_stats, key=lambda x: (-x[1], x[0]))[:6]
-
+        dept_stats_sorted = kpi_services.department_ticket_counts(limit=6)
         labels = [t[0] for t in dept_stats_sorted]
         assigned_counts = [t[2] for t in dept_stats_sorted]
         completed_counts = [t[3] for t in dept_stats_sorted]
     except Exception:
-    # Fallback to empty lists to avoid breaking template when DB or model missing
+        # Fallback to empty lists to avoid breaking template when DB or model missing
         labels = []
         assigned_counts = []
         completed_counts = []
 
-# Provide JSON-encoded strings for safe use in templates
+    # Provide JSON-encoded strings for safe use in templates
     context_dept_chart = {
-    'dept_labels': json.dumps(labels),
-    'dept_assigned_counts': json.dumps(assigned_counts),
-    'dept_completed_counts': json.dumps(completed_counts),
-}
-
-
+        'dept_labels': json.dumps(labels),
+        'dept_assigned_counts': json.dumps(assigned_counts),
+        'dept_completed_counts': json.dumps(completed_counts),
+    }
 
 
     # Fetch actual critical tickets (high priority service requests)
@@ -2562,6 +2362,9 @@ def api_group_permissions_update(request, group_id):
             if permission_objects:
                 group.permissions.add(*permission_objects)
         
+        # Drop cached permission matrices in every worker now the edit is committed
+        invalidate_section_permission_snapshots()
+        
         return JsonResponse({
             'success': True,
             'message': 'Permissions updated successfully',
@@ -2619,6 +2422,9 @@ def api_bulk_permissions_update(request):
             except Group.DoesNotExist:
                 continue  # Skip non-existent groups
         
+        # Drop cached permission matrices in every worker
+        invalidate_section_permission_snapshots()
+        
         return JsonResponse({
             'success': True, 
             'message': f'Permissions updated for {len(updated_groups)} groups',
@@ -2967,30 +2773,24 @@ def tickets(request):
     location_filter = request.GET.get('location', '')
     search_query = request.GET.get('search', '')
     
-    # Get departments with active ticket counts and dynamic SLA compliance
+    # Get departments with active ticket counts and dynamic SLA compliance.
+    # One grouped query for every department instead of three counts each.
+    import urllib.parse
+    from .ticket_services import department_ticket_summary, keyset_page
+    ticket_summary = department_ticket_summary()
     departments_data = []
     departments = Department.objects.all()
     for dept in departments:
-        # Count active tickets for this department
-        active_tickets_count = ServiceRequest.objects.filter(
-            department=dept
-        ).exclude(
-            status__in=['completed', 'closed']
-        ).count()
+        counts = ticket_summary.get(dept.pk, {'active': 0, 'total': 0, 'breached': 0})
+        active_tickets_count = counts['active']
         
         # Calculate SLA compliance: (tickets that have NOT breached SLA) / (total tickets) * 100
         # If no tickets, SLA compliance is 100%
-        total_tickets = ServiceRequest.objects.filter(department=dept).count()
+        total_tickets = counts['total']
         
         if total_tickets > 0:
-            # Count tickets that have breached SLA
-            breached_tickets = ServiceRequest.objects.filter(
-                department=dept,
-                sla_breached=True
-            ).count()
-            
             # SLA compliance = (total - breached) / total * 100
-            sla_compliance = int(((total_tickets - breached_tickets) / total_tickets) * 100)
+            sla_compliance = int(((total_tickets - counts['breached']) / total_tickets) * 100)
         else:
             # If no tickets, 100% SLA compliance
             sla_compliance = 100
@@ -3002,19 +2802,10 @@ def tickets(request):
             sla_color = '#facc15'  # yellow-400
         else:
             sla_color = '#ef4444'  # red-500
-            
-        color_mapping = {
-            'Housekeeping': {'color': 'sky-600', 'icon_color': 'sky-600'},
-            'Maintenance': {'color': 'yellow-400', 'icon_color': 'sky-600'},
-            'Guest Services': {'color': 'green-500', 'icon_color': 'sky-600'},
-        }
-        
-        dept_colors = color_mapping.get(dept.name, {'color': 'blue-500', 'icon_color': 'sky-600'})
         
         # Get logo URL if available using the new method
-        import urllib.parse
         dept_name_safe = urllib.parse.quote_plus(dept.name.lower().replace(' ', '_'))
-        logo_url = dept.get_logo_url() if dept.get_logo_url() else f'/static/images/manage_users/{dept_name_safe}.svg'
+        logo_url = dept.get_logo_url() or f'/static/images/manage_users/{dept_name_safe}.svg'
         
         departments_data.append({
             'id': dept.department_id,
@@ -3027,7 +2818,7 @@ def tickets(request):
     
     # Get all service requests with filters applied
     tickets_queryset = ServiceRequest.objects.select_related(
-        'request_type', 'location', 'requester_user', 'assignee_user', 'department'
+        'request_type', 'location', 'requester_user', 'assignee_user', 'department', 'guest'
     ).all().order_by('-id')
     
     # Apply filters
@@ -3087,9 +2878,22 @@ def tickets(request):
             Q(notes__icontains=search_query)
         )
     
+    # --- Pagination Logic ---
+    # Keyset pagination on -id: only the 10 rows of the current page are read
+    # and decorated, however far back the page is. The filtered COUNT runs on
+    # the first page only; the page links carry it as `total`.
+    page_obj = keyset_page(
+        tickets_queryset,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        start=request.GET.get('start'),
+        per_page=10,
+        count=tickets_queryset.count,
+        total=request.GET.get('total'),
+    )
+    
     # Process tickets to add color attributes
-    processed_tickets = []
-    for ticket in tickets_queryset:
+    for ticket in page_obj:
         # Map priority to display values
         priority_mapping = {
             'critical': {'label': 'Critical', 'color': 'red'},
@@ -3154,13 +2958,7 @@ def tickets(request):
         ticket.sla_percentage = sla_percentage
         ticket.sla_color = sla_color
         ticket.owner_avatar = 'https://placehold.co/24x24'
-        
-        processed_tickets.append(ticket)
-    
-    # --- Pagination Logic ---
-    paginator = Paginator(processed_tickets, 10)  # Show 10 tickets per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+
     matched_reviews = TicketReview.objects.filter(
         is_matched__in=[True, 1],
         moved_to_ticket__in=[False, 0]
@@ -3388,7 +3186,7 @@ def tickets(request):
         'page_ob':page_ob,
         'tickets': page_obj,  # Pass the page_obj to the template
         'page_obj': page_obj,  # Pass it again as page_obj for clarity
-        'total_tickets': tickets_queryset.count(),
+        'total_tickets': page_obj.count,
         # Pass filter values back to template
         'department_filter': department_filter,
         'priority_filter': priority_filter,
@@ -3412,8 +3210,6 @@ def tickets(request):
 @login_required
 def export_tickets(request):
     """Export tickets to CSV file."""
-    import csv
-    from django.http import HttpResponse
     from hotel_app.models import ServiceRequest, Department, RequestType, Location
     
     # Get filter parameters (same as tickets view)
@@ -3460,21 +3256,15 @@ def export_tickets(request):
             Q(guest_name__icontains=search_query)
         )
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="tickets_export.csv"'
+    from .export_services import iter_queryset, stream_csv
     
-    writer = csv.writer(response)
-    
-    # Write header row
-    writer.writerow([
+    header = [
         'Ticket #', 'Room #', 'Guest Name', 'Department', 'Request Type',
         'Assigned To', 'Status', 'Priority', 'SLA Status', 'Created At',
         'Due At', 'Completed At', 'Notes'
-    ])
+    ]
     
-    # Write data rows
-    for ticket in tickets_queryset:
+    def ticket_row(ticket):
         # Get department name
         dept_name = ticket.department.name if ticket.department else 'Not Assigned'
         
@@ -3512,7 +3302,7 @@ def export_tickets(request):
         due_at = ticket.due_at.strftime('%Y-%m-%d %H:%M') if ticket.due_at else ''
         completed_at = ticket.completed_at.strftime('%Y-%m-%d %H:%M') if ticket.completed_at else ''
         
-        writer.writerow([
+        return [
             f'#{ticket.id}',
             room_no,
             guest_name,
@@ -3526,9 +3316,14 @@ def export_tickets(request):
             due_at,
             completed_at,
             ticket.notes or ''
-        ])
+        ]
     
-    return response
+    # Stream the CSV in chunks instead of building it in memory
+    return stream_csv(
+        'tickets_export.csv', header,
+        iter_queryset(tickets_queryset, order_field='created_at'),
+        ticket_row,
+    )
 
 
 @login_required
@@ -5014,6 +4809,9 @@ def api_bulk_permissions_update(request):
             except Group.DoesNotExist:
                 continue  # Skip non-existent groups
         
+        # Drop cached permission matrices in every worker
+        invalidate_section_permission_snapshots()
+        
         return JsonResponse({
             'success': True, 
             'message': f'Permissions updated for {len(updated_groups)} groups',
@@ -6561,14 +6359,22 @@ def analytics_dashboard(request):
         end = start + timedelta(days=1)
         return start, end
     
+    # Long ranges read the DailyTicketStats rollup instead of service_request
+    use_rollup = ticket_stats_services.use_rollup(days)
+    if use_rollup:
+        daily_ticket_stats = ticket_stats_services.daily_totals(start_date, end_date)
+    
     # Ticket volume trends (grouped by day for selected range)
     ticket_trends = []
     ticket_dates = []
     
     for i in range(days):
         current_date = start_date + timedelta(days=i)
-        day_start, day_end = get_day_range(current_date)
-        count = ServiceRequest.objects.filter(created_at__gte=day_start, created_at__lt=day_end).count()
+        if use_rollup:
+            count = daily_ticket_stats[current_date]['created']
+        else:
+            day_start, day_end = get_day_range(current_date)
+            count = ServiceRequest.objects.filter(created_at__gte=day_start, created_at__lt=day_end).count()
         ticket_trends.append(count)
         # Show fewer labels for longer date ranges
         if days <= 30 or i % max(1, (days // 30)) == 0:
@@ -6609,33 +6415,51 @@ def analytics_dashboard(request):
     departments = Department.objects.all()
     dept_performance = []
     
-    for dept in departments:
-        dept_requests = ServiceRequest.objects.filter(department=dept, created_at__gte=date_range_start)
-        avg_resolution_time = 0
-        avg_satisfaction = 0
-        
-        if dept_requests.exists():
-            # Calculate average resolution time
-            resolved_requests = dept_requests.filter(status='completed')
-            if resolved_requests.exists():
-                total_resolution_time = timedelta()
-                for req in resolved_requests:
-                    if req.completed_at and req.created_at:
-                        total_resolution_time += (req.completed_at - req.created_at)
-                avg_resolution_time = total_resolution_time.total_seconds() / 3600 / resolved_requests.count()  # in hours
-            
-            # Calculate average satisfaction
-            # Since there's no direct relationship between ServiceRequest and Review,
-            # we'll use all reviews for now. In a real implementation, you would need
-            # to establish a proper relationship between requests and reviews.
-            dept_reviews = Review.objects.filter(created_at__gte=date_range_start)
-            avg_satisfaction = dept_reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-        
-        dept_performance.append({
-            'name': dept.name,
-            'resolution_time': round(avg_resolution_time, 1),
-            'satisfaction': round(avg_satisfaction, 1)
-        })
+    if use_rollup:
+        # Same figures as below, from the rollup (tickets created since start_date)
+        dept_stats = ticket_stats_services.department_totals(start_date, max(end_date, today))
+        period_satisfaction = Review.objects.filter(created_at__gte=date_range_start).aggregate(Avg('rating'))['rating__avg'] or 0
+        for dept in departments:
+            stats = dept_stats.get(dept.pk)
+            avg_resolution_time = 0
+            avg_satisfaction = 0
+            if stats and stats['created']:
+                if stats['avg_resolution']:
+                    avg_resolution_time = stats['avg_resolution'].total_seconds() / 3600  # in hours
+                avg_satisfaction = period_satisfaction
+            dept_performance.append({
+                'name': dept.name,
+                'resolution_time': round(avg_resolution_time, 1),
+                'satisfaction': round(avg_satisfaction, 1)
+            })
+    else:
+        for dept in departments:
+            dept_requests = ServiceRequest.objects.filter(department=dept, created_at__gte=date_range_start)
+            avg_resolution_time = 0
+            avg_satisfaction = 0
+        
+            if dept_requests.exists():
+                # Calculate average resolution time
+                resolved_requests = dept_requests.filter(status='completed')
+                if resolved_requests.exists():
+                    total_resolution_time = timedelta()
+                    for req in resolved_requests:
+                        if req.completed_at and req.created_at:
+                            total_resolution_time += (req.completed_at - req.created_at)
+                    avg_resolution_time = total_resolution_time.total_seconds() / 3600 / resolved_requests.count()  # in hours
+            
+                # Calculate average satisfaction
+                # Since there's no direct relationship between ServiceRequest and Review,
+                # we'll use all reviews for now. In a real implementation, you would need
+                # to establish a proper relationship between requests and reviews.
+                dept_reviews = Review.objects.filter(created_at__gte=date_range_start)
+                avg_satisfaction = dept_reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        
+            dept_performance.append({
+                'name': dept.name,
+                'resolution_time': round(avg_resolution_time, 1),
+                'satisfaction': round(avg_satisfaction, 1)
+            })
     
     # Room type feedback distribution
     room_types = ['Standard', 'Deluxe', 'Suite', 'Executive']
@@ -6666,10 +6490,15 @@ def analytics_dashboard(request):
             })
     
     # Overall statistics for the selected period
-    total_tickets = ServiceRequest.objects.filter(created_at__gte=date_range_start).count()
+    if use_rollup:
+        ticket_totals = ticket_stats_services.ticket_totals(start_date, max(end_date, today))
+        total_tickets = ticket_totals['created']
+        completed_tickets = ticket_totals['completed']
+    else:
+        total_tickets = ServiceRequest.objects.filter(created_at__gte=date_range_start).count()
+        completed_tickets = ServiceRequest.objects.filter(status='completed', created_at__gte=date_range_start).count()
     total_reviews = Review.objects.filter(created_at__gte=date_range_start).count()
     avg_rating = Review.objects.filter(created_at__gte=date_range_start).aggregate(Avg('rating'))['rating__avg'] or 0
-    completed_tickets = ServiceRequest.objects.filter(status='completed', created_at__gte=date_range_start).count()
     completion_rate = (completed_tickets / total_tickets * 100) if total_tickets > 0 else 0
     
     # Top performing departments
@@ -6937,6 +6766,42 @@ def create_ticket_api(request):
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+@require_permission([ADMINS_GROUP, STAFF_GROUP])
+def create_tickets_bulk_api(request):
+    """
+    API endpoint to create many tickets in one call.
+
+    Body: {"tickets": [{"room_number", "department", "category", "priority",
+    "description", "guest_name", "phone_number"}, ...]}. All tickets are
+    validated together and created in one transaction; department staff get
+    one grouped notification per department.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    from .ticket_services import BulkTicketError, bulk_create_tickets
+    import json
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    try:
+        tickets = bulk_create_tickets(data.get('tickets') if isinstance(data, dict) else None, request.user)
+    except BulkTicketError as e:
+        return JsonResponse({'error': 'Invalid tickets', 'errors': e.errors}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'message': f'{len(tickets)} tickets created successfully',
+        'ticket_ids': [ticket.pk for ticket in tickets],
+    })
 # @login_required
 # @require_permission([ADMINS_GROUP, STAFF_GROUP])
 # def create_ticket_api(request):
@@ -7624,6 +7489,7 @@ def api_sla_configuration_update(request):
             if data.get('clear_all'):
                 # Delete all department SLA configurations
                 DepartmentRequestSLA.objects.all().delete()
+                invalidate_sla_policy()
                 return JsonResponse({
                     'success': True,
                     'message': 'All department SLA configurations cleared successfully'
@@ -7665,6 +7531,7 @@ def api_sla_configuration_update(request):
                             )
                         imported_count += 1
                 
+                invalidate_sla_policy()
                 return JsonResponse({
                     'success': True,
                     'message': f'Successfully imported {imported_count} SLA configurations'
@@ -7703,6 +7570,7 @@ def api_sla_configuration_update(request):
                             }
                         )
                     
+                    invalidate_sla_policy()
                     return JsonResponse({
                         'success': True,
                         'message': 'Department SLA configuration added successfully'
@@ -7733,6 +7601,7 @@ def api_sla_configuration_update(request):
                         request_type=request_type
                     ).delete()
                     
+                    invalidate_sla_policy()
                     return JsonResponse({
                         'success': True,
                         'message': 'Department SLA configuration removed successfully'
@@ -7786,6 +7655,7 @@ def api_sla_configuration_update(request):
                             }
                         )
             
+            invalidate_sla_policy()
             return JsonResponse({
                 'success': True,
                 'message': 'SLA configurations updated successfully'
@@ -9132,7 +9002,6 @@ def feedback_detail(request, feedback_id):
 @require_section_permission('feedback', 'view')
 def export_feedback(request):
     """Export feedback data as CSV."""
-    import csv
     from .models import Review, Guest
     
     # Get all reviews with related guest information
@@ -9147,16 +9016,11 @@ def export_feedback(request):
             Q(guest__room_number__icontains=search_query)
         )
     
-    # Create the HttpResponse object with CSV content type
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="feedback_export.csv"'
+    from .export_services import iter_queryset, stream_csv
     
-    writer = csv.writer(response)
-    # Write header row
-    writer.writerow(['ID', 'Date', 'Guest Name', 'Room Number', 'Rating', 'Sentiment', 'Feedback', 'Keywords','Facilities'])
+    header = ['ID', 'Date', 'Guest Name', 'Room Number', 'Rating', 'Sentiment', 'Feedback', 'Keywords','Facilities']
     
-    # Write data rows
-    for review in reviews:
+    def review_row(review):
         # Determine sentiment
         if review.rating >= 4:
             sentiment = 'Positive'
@@ -9185,7 +9049,7 @@ def export_feedback(request):
             else:
                 facilities = str(review.facilities)
 
-        writer.writerow([
+        return [
             review.id,
             review.created_at.strftime('%Y-%m-%d %H:%M'),
             review.guest.full_name if review.guest else 'Anonymous',
@@ -9195,9 +9059,14 @@ def export_feedback(request):
             review.comment or '',
             ', '.join(keywords),
             facilities
-        ])
+        ]
     
-    return response
+    # Stream the CSV in chunks instead of building it in memory
+    return stream_csv(
+        'feedback_export.csv', header,
+        iter_queryset(reviews, order_field='created_at'),
+        review_row,
+    )
 
 # ---- Ticket Workflow API Endpoints ----
 # Duplicate function removed to avoid conflict
@@ -9406,14 +9275,30 @@ def performance_dashboard(request):
     # Calculate date range for SLA trends (last 7 days regardless of selected range)
     sla_trend_start = today - datetime.timedelta(days=6)  # Last 7 days including today
     
+    # Long ranges read the DailyTicketStats rollup instead of service_request
+    use_rollup = ticket_stats_services.use_rollup(days)
+    if use_rollup:
+        period_stats = ticket_stats_services.ticket_totals(date_range_start, today)
+        prev_period_stats = ticket_stats_services.ticket_totals(
+            prev_period_start, prev_period_end - datetime.timedelta(days=1)
+        )
+    
     # Overall Completion Rate for selected date range
-    total_requests = ServiceRequest.objects.filter(created_at__date__gte=date_range_start).count()
-    completed_requests = ServiceRequest.objects.filter(status='completed', created_at__date__gte=date_range_start).count()
+    if use_rollup:
+        total_requests = period_stats['created']
+        completed_requests = period_stats['completed']
+    else:
+        total_requests = ServiceRequest.objects.filter(created_at__date__gte=date_range_start).count()
+        completed_requests = ServiceRequest.objects.filter(status='completed', created_at__date__gte=date_range_start).count()
     completion_rate = round((completed_requests / total_requests * 100), 1) if total_requests > 0 else 0
     
     # Previous period completion rate for comparison
-    prev_period_total = ServiceRequest.objects.filter(created_at__date__gte=prev_period_start, created_at__date__lt=prev_period_end).count()
-    prev_period_completed = ServiceRequest.objects.filter(status='completed', created_at__date__gte=prev_period_start, created_at__date__lt=prev_period_end).count()
+    if use_rollup:
+        prev_period_total = prev_period_stats['created']
+        prev_period_completed = prev_period_stats['completed']
+    else:
+        prev_period_total = ServiceRequest.objects.filter(created_at__date__gte=prev_period_start, created_at__date__lt=prev_period_end).count()
+        prev_period_completed = ServiceRequest.objects.filter(status='completed', created_at__date__gte=prev_period_start, created_at__date__lt=prev_period_end).count()
     prev_completion_rate = round((prev_period_completed / prev_period_total * 100), 1) if prev_period_total > 0 else 0
     
     # Calculate completion rate change
@@ -9421,14 +9306,17 @@ def performance_dashboard(request):
     completion_rate_change_direction = "up" if completion_rate_change >= 0 else "down"
     
     # SLA Breaches for selected date range
-    sla_breaches = ServiceRequest.objects.filter(
-        created_at__gte=start_dt,
-        created_at__lte=end_dt
-    ).filter(
-        Q(sla_breached=True) |
-        Q(response_sla_breached=True) |
-        Q(resolution_sla_breached=True)
-    ).count()
+    if use_rollup:
+        sla_breaches = period_stats['breached']
+    else:
+        sla_breaches = ServiceRequest.objects.filter(
+            created_at__gte=start_dt,
+            created_at__lte=end_dt
+        ).filter(
+            Q(sla_breached=True) |
+            Q(response_sla_breached=True) |
+            Q(resolution_sla_breached=True)
+        ).count()
 
     yesterday = today - datetime.timedelta(days=1)
 
@@ -9458,17 +9346,20 @@ def performance_dashboard(request):
     # ----------------------------
     # Average response time
     # ----------------------------
-    resp_qs = ServiceRequest.objects.filter(
-        accepted_at__isnull=False,
-        created_at__range=(start_dt, end_dt)
-    ).annotate(
-        resp_delta=ExpressionWrapper(
-            F('accepted_at') - F('created_at'),
-            output_field=DurationField()
+    if use_rollup:
+        avg_resp = period_stats['avg_response']
+    else:
+        resp_qs = ServiceRequest.objects.filter(
+            accepted_at__isnull=False,
+            created_at__range=(start_dt, end_dt)
+        ).annotate(
+            resp_delta=ExpressionWrapper(
+                F('accepted_at') - F('created_at'),
+                output_field=DurationField()
+            )
         )
-    )
 
-    avg_resp = resp_qs.aggregate(avg=Avg('resp_delta'))['avg']
+        avg_resp = resp_qs.aggregate(avg=Avg('resp_delta'))['avg']
 
     if avg_resp:
         avg_minutes = int(avg_resp.total_seconds() // 60)
@@ -9490,15 +9381,18 @@ def performance_dashboard(request):
         datetime.datetime.combine(start_date, datetime.time.max)
     )
 
-    prev_resp = ServiceRequest.objects.filter(
-        accepted_at__isnull=False,
-        created_at__range=(prev_start_dt, prev_end_dt)
-    ).annotate(
-        resp_delta=ExpressionWrapper(
-            F('accepted_at') - F('created_at'),
-            output_field=DurationField()
-        )
-    ).aggregate(avg=Avg('resp_delta'))['avg']
+    if use_rollup:
+        prev_resp = ticket_stats_services.ticket_totals(prev_start, start_date)['avg_response']
+    else:
+        prev_resp = ServiceRequest.objects.filter(
+            accepted_at__isnull=False,
+            created_at__range=(prev_start_dt, prev_end_dt)
+        ).annotate(
+            resp_delta=ExpressionWrapper(
+                F('accepted_at') - F('created_at'),
+                output_field=DurationField()
+            )
+        ).aggregate(avg=Avg('resp_delta'))['avg']
 
     prev_minutes = int(prev_resp.total_seconds() // 60) if prev_resp else 0
 
@@ -9523,11 +9417,18 @@ def performance_dashboard(request):
     departments = Department.objects.all()
     department_completion_data = []
     department_labels = []
+    if use_rollup:
+        dept_stats = ticket_stats_services.department_totals(date_range_start, today)
     
-    for dept in departments:
+    def dept_request_counts(dept):
+        if use_rollup:
+            stats = dept_stats.get(dept.pk, {'created': 0, 'completed': 0})
+            return stats['created'], stats['completed']
         dept_requests = ServiceRequest.objects.filter(department=dept, created_at__date__gte=date_range_start)
-        total_dept_requests = dept_requests.count()
-        completed_dept_requests = dept_requests.filter(status='completed').count()
+        return dept_requests.count(), dept_requests.filter(status='completed').count()
+    
+    for dept in departments:
+        total_dept_requests, completed_dept_requests = dept_request_counts(dept)
         dept_completion_rate = round((completed_dept_requests / total_dept_requests * 100), 1) if total_dept_requests > 0 else 0
         
         department_labels.append(dept.name)
@@ -9537,9 +9438,17 @@ def performance_dashboard(request):
     sla_breach_trends = []
     sla_breach_labels = []
 
+    if use_rollup:
+        daily_stats = ticket_stats_services.daily_totals(today - datetime.timedelta(days=days - 1), today)
+
     for i in range(days - 1, -1, -1):
         day = today - datetime.timedelta(days=i)
 
+        if use_rollup:
+            sla_breach_labels.append(day.strftime('%d %b'))
+            sla_breach_trends.append(daily_stats[day]['breached'])
+            continue
+
         start = timezone.make_aware(
         datetime.datetime.combine(day, datetime.time.min)
     )
@@ -9583,9 +9492,7 @@ def performance_dashboard(request):
     # Department Rankings for selected date range
     department_rankings = []
     for dept in departments:
-        dept_requests = ServiceRequest.objects.filter(department=dept, created_at__date__gte=date_range_start)
-        total_dept_requests = dept_requests.count()
-        completed_dept_requests = dept_requests.filter(status='completed').count()
+        total_dept_requests, completed_dept_requests = dept_request_counts(dept)
         dept_completion_rate = round((completed_dept_requests / total_dept_requests * 100), 1) if total_dept_requests > 0 else 0
         
         # Count staff in department
@@ -9743,28 +9650,36 @@ def department_analytics_api(request):
             created_at__range=(start_datetime, end_datetime)
         )
         
-        # Basic statistics
-        total_tickets = dept_tickets.count()
-        completed_tickets = dept_tickets.filter(status='completed').count()
-        
-        # SLA Breaches
-        sla_breaches = dept_tickets.filter(
-            Q(sla_breached=True) |
-            Q(response_sla_breached=True) |
-            Q(resolution_sla_breached=True)
-        ).count()
-        
-        # Average Response Time
-        tickets_with_response = dept_tickets.filter(
-            accepted_at__isnull=False
-        ).annotate(
-            resp_delta=ExpressionWrapper(
-                F('accepted_at') - F('created_at'),
-                output_field=DurationField()
+        if ticket_stats_services.use_rollup((end_date - start_date).days + 1):
+            # Long ranges: department totals from the DailyTicketStats rollup
+            dept_stats = ticket_stats_services.ticket_totals(start_date, end_date, department=department)
+            total_tickets = dept_stats['created']
+            completed_tickets = dept_stats['completed']
+            sla_breaches = dept_stats['breached']
+            avg_resp = dept_stats['avg_response']
+        else:
+            # Basic statistics
+            total_tickets = dept_tickets.count()
+            completed_tickets = dept_tickets.filter(status='completed').count()
+            
+            # SLA Breaches
+            sla_breaches = dept_tickets.filter(
+                Q(sla_breached=True) |
+                Q(response_sla_breached=True) |
+                Q(resolution_sla_breached=True)
+            ).count()
+            
+            # Average Response Time
+            tickets_with_response = dept_tickets.filter(
+                accepted_at__isnull=False
+            ).annotate(
+                resp_delta=ExpressionWrapper(
+                    F('accepted_at') - F('created_at'),
+                    output_field=DurationField()
+                )
             )
-        )
-        
-        avg_resp = tickets_with_response.aggregate(avg=Avg('resp_delta'))['avg']
+            
+            avg_resp = tickets_with_response.aggregate(avg=Avg('resp_delta'))['avg']
         avg_response_time = int(avg_resp.total_seconds() // 60) if avg_resp else 0
         
         # Staff Performance in this department
@@ -11033,15 +10948,7 @@ def lost_and_found_export(request):
     """
     Export lost and found items to CSV.
     """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="lost_and_found_report.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'Item Name', 'Type', 'Description', 'Category', 'Status', 'Priority', 
-        'Location', 'Room', 'Guest Name', 'Reported By', 'Reported At', 
-        'Assigned To', 'Resolution Notes'
-    ])
+    from .export_services import iter_queryset, stream_csv
 
     items = LostAndFound.objects.all().select_related(
         'location', 'guest', 'assigned_user', 'reported_by'
@@ -11067,8 +10974,14 @@ def lost_and_found_export(request):
             Q(room_number__icontains=search_query)
         )
 
-    for item in items:
-        writer.writerow([
+    header = [
+        'ID', 'Item Name', 'Type', 'Description', 'Category', 'Status', 'Priority', 
+        'Location', 'Room', 'Guest Name', 'Reported By', 'Reported At', 
+        'Assigned To', 'Resolution Notes'
+    ]
+
+    def item_row(item):
+        return [
             item.id,
             item.item_name,
             item.get_item_type_display(),
@@ -11083,9 +10996,14 @@ def lost_and_found_export(request):
             item.reported_at.strftime('%Y-%m-%d %H:%M:%S'),
             item.assigned_user.get_full_name() if item.assigned_user else '',
             item.resolution_notes or ''
-        ])
+        ]
 
-    return response
+    # Stream the CSV in chunks instead of building it in memory
+    return stream_csv(
+        'lost_and_found_report.csv', header,
+        iter_queryset(items, order_field='reported_at'),
+        item_row,
+    )
 
 
 @login_required
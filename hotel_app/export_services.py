@@ -0,0 +1,118 @@
+"""
+Streaming CSV / XLSX exports.
+
+The report exports used to build the whole file in memory first (an
+HttpResponse written row by row, or a pandas DataFrame for the Excel
+reports), so a year-long export held every row, and the finished file,
+in the worker at once.
+
+- `iter_queryset` reads a queryset in fixed-size keyset chunks on
+  (order field, pk). MySQLdb buffers the full result of a query client-side
+  even with .iterator(), so bounded memory needs bounded queries.
+- `stream_csv` returns a StreamingHttpResponse that writes rows as they
+  are read, so the first bytes go out before the last row is fetched.
+- `stream_xlsx` writes rows through an openpyxl write-only workbook (rows
+  are flushed to a temporary file as they are appended) and sends the
+  finished file from disk.
+
+Row callables return a list of cell values per object.
+"""
+import csv
+import datetime
+import logging
+import tempfile
+
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def iter_queryset(queryset, order_field='pk', descending=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the objects of `queryset` ordered by (order_field, pk), reading at
+    most `chunk_size` rows per query. `order_field` must be non-null.
+    """
+    prefix = '-' if descending else ''
+    compare = 'lt' if descending else 'gt'
+    if order_field == 'pk':
+        queryset = queryset.order_by(f'{prefix}pk')
+    else:
+        queryset = queryset.order_by(f'{prefix}{order_field}', f'{prefix}pk')
+
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            if order_field == 'pk':
+                chunk = chunk.filter(**{f'pk__{compare}': last.pk})
+            else:
+                value = getattr(last, order_field)
+                chunk = chunk.filter(
+                    Q(**{f'{order_field}__{compare}': value})
+                    | Q(**{order_field: value, f'pk__{compare}': last.pk})
+                )
+        objects = list(chunk[:chunk_size])
+        yield from objects
+        if len(objects) < chunk_size:
+            return
+        last = objects[-1]
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, objects, row):
+    """
+    StreamingHttpResponse with a CSV attachment: `header`, then `row(obj)`
+    for every object in `objects` (usually an iter_queryset generator).
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for obj in objects:
+            yield writer.writerow(row(obj))
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _xlsx_value(value):
+    # Excel has no time zones; keep the wall-clock value as pandas did
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def stream_xlsx(filename, header, objects, row, sheet_name='Sheet1'):
+    """
+    FileResponse with an XLSX attachment built by an openpyxl write-only
+    workbook: `header`, then `row(obj)` for every object in `objects`.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+    sheet.append(header)
+    for obj in objects:
+        sheet.append([_xlsx_value(value) for value in row(obj)])
+
+    output = tempfile.TemporaryFile()
+    try:
+        workbook.save(output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    # FileResponse closes (and so removes) the temporary file once it is sent
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -1,37 +1,181 @@
-import json
-import requests
+import datetime
 import logging
-from google.oauth2 import service_account
-import google.auth.transport.requests
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from .models import FCMToken
 
 logger = logging.getLogger(__name__)
 
-SERVICE_ACCOUNT_FILE = settings.BASE_DIR / "firebase-service-account.json"
-PROJECT_ID = "guestconnect2-341a2"
+FCM_SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
 
 
 # --------------------------------------------------
 # AUTH
 # --------------------------------------------------
-def get_access_token():
+def service_account_token_provider(session=None):
+    """
+    Token provider backed by the Firebase service account file: returns a
+    callable giving (access_token, expiry) where expiry is a naive UTC
+    datetime. The credentials are read from disk once; each call refreshes
+    them through `session`, so token requests reuse the pooled connections.
+    """
+    from google.oauth2 import service_account
+    import google.auth.transport.requests
+
     credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=["https://www.googleapis.com/auth/firebase.messaging"],
+        settings.FCM_SERVICE_ACCOUNT_FILE, scopes=FCM_SCOPES,
     )
-    request = google.auth.transport.requests.Request()
-    credentials.refresh(request)
-    return credentials.token
+    request = google.auth.transport.requests.Request(session=session)
 
+    def provide():
+        credentials.refresh(request)
+        return credentials.token, credentials.expiry
+
+    return provide
+
+
+class FCMClient:
+    """
+    FCM HTTP v1 client.
+
+    The OAuth access token is cached until `refresh_margin` seconds before
+    it expires, and every message goes through one requests.Session whose
+    keep-alive pool is shared between threads, so a broadcast costs one
+    TLS handshake per pooled connection instead of two per message.
+    `metrics()` reports send counts and timings.
+    """
+
+    def __init__(self, project_id=None, base_url=None, token_provider=None,
+                 refresh_margin=None, timeout=None, pool_size=None):
+        self.project_id = project_id or settings.FCM_PROJECT_ID
+        self.base_url = (base_url or settings.FCM_API_BASE_URL).rstrip('/')
+        self.refresh_margin = datetime.timedelta(
+            seconds=settings.FCM_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        )
+        self.timeout = settings.FCM_REQUEST_TIMEOUT if timeout is None else timeout
+
+        pool_size = pool_size or settings.FCM_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._token_provider = token_provider
+        self._access_token = None
+        self._token_expiry = None
+        self._token_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'sent': 0,
+            'failed': 0,
+            'token_refreshes': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+        }
+
+    @property
+    def send_url(self):
+        return f"{self.base_url}/v1/projects/{self.project_id}/messages:send"
+
+    # ---- token cache ----
+
+    def _token_is_fresh(self):
+        if not self._access_token:
+            return False
+        if self._token_expiry is None:
+            return True
+        return datetime.datetime.utcnow() + self.refresh_margin < self._token_expiry
+
+    def get_access_token(self, force_refresh=False):
+        """Cached access token, refreshed shortly before it expires."""
+        if not force_refresh and self._token_is_fresh():
+            return self._access_token
+
+        with self._token_lock:
+            # Another thread may have refreshed while we waited
+            if not force_refresh and self._token_is_fresh():
+                return self._access_token
+            if self._token_provider is None:
+                self._token_provider = service_account_token_provider(self.session)
+            token, expiry = self._token_provider()
+            self._access_token, self._token_expiry = token, expiry
+            self._record(token_refreshes=1)
+            return token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._access_token = None
+            self._token_expiry = None
+
+    # ---- metrics ----
+
+    def _record(self, seconds=None, **counters):
+        with self._metrics_lock:
+            for key, value in counters.items():
+                self._metrics[key] += value
+            if seconds is not None:
+                self._metrics['total_seconds'] += seconds
+                self._metrics['max_seconds'] = max(self._metrics['max_seconds'], seconds)
+
+    def metrics(self):
+        """Snapshot of send counts and timings (seconds) since the client was created."""
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        requests_made = snapshot['sent'] + snapshot['failed']
+        snapshot['avg_seconds'] = snapshot['total_seconds'] / requests_made if requests_made else 0.0
+        return snapshot
+
+    # ---- sending ----
+
+    def _post(self, message):
+        headers = {
+            "Authorization": f"Bearer {self.get_access_token()}",
+            "Content-Type": "application/json; UTF-8",
+        }
+        return self.session.post(self.send_url, headers=headers, json=message, timeout=self.timeout)
+
+    def send(self, token, title, body, device_type="web", data=None):
+        """
+        Send one message; returns the FCM JSON response (an {"error": ...}
+        dict on failure). Network errors are raised to the caller.
+        """
+        message = build_fcm_message(token, title, body, device_type=device_type, data=data)
+
+        started = time.perf_counter()
+        try:
+            response = self._post(message)
+            if response.status_code == 401:
+                # Token revoked or rotated early: refresh once and retry
+                self.invalidate_token()
+                response = self._post(message)
+        except requests.RequestException:
+            self._record(seconds=time.perf_counter() - started, failed=1)
+            raise
+        elapsed = time.perf_counter() - started
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = {"error": {"code": response.status_code, "message": response.text[:500]}}
+
+        if response.status_code != 200:
+            self._record(seconds=elapsed, failed=1)
+            logger.error(f"FCM error: {response.text}")
+            if "error" not in result:
+                result = {"error": {"code": response.status_code, "message": response.text[:500]}}
+            return result
+
+        self._record(seconds=elapsed, sent=1)
+        return result
 
-# --------------------------------------------------
-# LOW LEVEL SEND
-# --------------------------------------------------
-def send_fcm_message(token, title, body, device_type="web", data=None):
-    access_token = get_access_token()
-    url = f"https://fcm.googleapis.com/v1/projects/{PROJECT_ID}/messages:send"
 
+def build_fcm_message(token, title, body, device_type="web", data=None):
+    """HTTP v1 message payload for one device token."""
     message = {
         "message": {
             "token": token,
@@ -70,51 +214,140 @@ def send_fcm_message(token, title, body, device_type="web", data=None):
             }
         }
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json; UTF-8",
-    }
+    return message
+
+
+# Process-wide client, created on first use
+_client = None
+_client_lock = threading.Lock()
 
-    response = requests.post(url, headers=headers, json=message)
 
-    if response.status_code != 200:
-        logger.error(f"FCM error: {response.text}")
-        return response.json()
+def get_fcm_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FCMClient()
+    return _client
 
-    return response.json()
+
+def get_access_token():
+    return get_fcm_client().get_access_token()
+
+
+def fcm_metrics():
+    """Send counts and timings of the process-wide FCM client."""
+    return get_fcm_client().metrics()
 
 
 # --------------------------------------------------
-# USER LEVEL SEND (USED BY create_notification)
+# LOW LEVEL SEND
 # --------------------------------------------------
-def send_push_notification_to_user(user, title, body, data=None):
-    tokens = FCMToken.objects.filter(user=user, is_active=True)
-
-    if not tokens.exists():
-        logger.debug(f"No active FCM tokens for user: {user}")
-        return
-
-    for token in tokens:
-        result = send_fcm_message(
-            token.token,
-            title,
-            body,
-            device_type=token.device_type,
-            data=data,
-        )
+def send_fcm_message(token, title, body, device_type="web", data=None):
+    return get_fcm_client().send(token, title, body, device_type=device_type, data=data)
+
 
-        if "error" in result:
-            error_code = result["error"].get("details", [{}])[0].get("errorCode")
-            if error_code in ["UNREGISTERED", "INVALID_ARGUMENT", "SENDER_ID_MISMATCH"]:
-                token.deactivate()
-                continue
+# --------------------------------------------------
+# FAN-OUT
+# --------------------------------------------------
+# FCM error codes meaning the registration token will never work again
+DEAD_TOKEN_ERRORS = ["UNREGISTERED", "INVALID_ARGUMENT", "SENDER_ID_MISMATCH"]
 
-        token.mark_as_used()
+
+def _fcm_error_code(result):
+    details = result["error"].get("details") or [{}]
+    return details[0].get("errorCode")
+
+
+def _fan_out(user_ids, message_for, client=None):
+    """
+    Send one push per active token of `user_ids` (a list or a pk subquery).
+    `message_for(user_id)` returns (title, body, data).
+
+    Tokens are loaded in one query and sent through a bounded thread pool
+    sharing the client's keep-alive session; worker threads only do HTTP.
+    Dead tokens are deactivated, and last_used_at is set on the rest, with
+    one UPDATE each.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from django.utils import timezone
+
+    tokens = list(
+        FCMToken.objects.filter(user_id__in=user_ids, is_active=True)
+        .order_by()
+        .values_list("pk", "user_id", "token", "device_type")
+    )
+    report = {"tokens": len(tokens), "sent": 0, "failed": 0, "deactivated": 0}
+    if not tokens:
+        logger.debug("No active FCM tokens for push recipients")
+        return report
+
+    client = client or get_fcm_client()
+    messages = {user_id: message_for(user_id) for user_id in {row[1] for row in tokens}}
+
+    def send(row):
+        pk, user_id, token, device_type = row
+        title, body, data = messages[user_id]
+        try:
+            return pk, client.send(token, title, body, device_type=device_type, data=data)
+        except Exception as e:
+            logger.error(f"FCM send failed for token {pk}: {str(e)}")
+            return pk, None
+
+    workers = min(settings.FCM_MAX_WORKERS, len(tokens))
+    if workers <= 1:
+        results = [send(row) for row in tokens]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fcm-push") as pool:
+            results = list(pool.map(send, tokens))
+
+    dead, used = [], []
+    for pk, result in results:
+        if result is None:
+            report["failed"] += 1
+        elif "error" in result:
+            report["failed"] += 1
+            if _fcm_error_code(result) in DEAD_TOKEN_ERRORS:
+                dead.append(pk)
+            else:
+                used.append(pk)
+        else:
+            report["sent"] += 1
+            used.append(pk)
+
+    if dead:
+        report["deactivated"] = FCMToken.objects.filter(pk__in=dead).update(is_active=False)
+    if used:
+        FCMToken.objects.filter(pk__in=used).update(last_used_at=timezone.now())
+    return report
+
+
+def _user_ids(users):
+    from django.db.models import QuerySet
+
+    if isinstance(users, QuerySet):
+        # Resolved inside the token query, the users are never loaded
+        return users.order_by().values("pk")
+    return [getattr(user, "pk", user) for user in users]
+
+
+# --------------------------------------------------
+# USER LEVEL SEND (USED BY create_notification)
+# --------------------------------------------------
+def send_push_notification_to_user(user, title, body, data=None, client=None):
+    return send_push_notification_to_users([user], title, body, data, client=client)
 
 
 # --------------------------------------------------
 # MULTI USER SEND (USED BY bulk notifications)
 # --------------------------------------------------
-def send_push_notification_to_users(users, title, body, data=None):
-    for user in users:
-        send_push_notification_to_user(user, title, body, data)
+def send_push_notification_to_users(users, title, body, data=None, client=None):
+    """Send the same push to every active device of `users` (users, ids or a User queryset)."""
+    return _fan_out(_user_ids(users), lambda user_id: (title, body, data), client=client)
+
+
+def send_push_messages(messages, client=None):
+    """Send a different push per user: `messages` is {user_id: (title, body, data)}."""
+    if not messages:
+        return {"tokens": 0, "sent": 0, "failed": 0, "deactivated": 0}
+    return _fan_out(list(messages), messages.__getitem__, client=client)
@@ -0,0 +1,485 @@
+"""
+Semantic intent engine for the TwiML WhatsApp webhook (views.whatsapp_webhook).
+
+views.py used to import faiss and sentence_transformers at module level,
+and RAGIntentEngine loaded the model and embedded every RequestType the
+first time a webhook reached a worker. Every gunicorn worker paid the
+import (torch included) whether or not it ever served WhatsApp traffic.
+Now:
+
+- nothing heavy is imported until the engine is first used;
+- get_intent_engine() returns one engine per process, loaded on first
+  detect() under a lock;
+- with INTENT_ENGINE_PRELOAD on, config/wsgi.py loads it while the app is
+  imported. Under gunicorn --preload that happens once in the master, so
+  the workers share the model's memory pages copy-on-write;
+- request type embeddings are kept in INTENT_ENGINE_CACHE_DIR keyed by the
+  model and a hash of each text, so a restart only encodes the types that
+  changed;
+- the index is an ID-mapped faiss index keyed by request_type_id. RequestType
+  saves and deletes bump a version in the shared cache; each worker then
+  compares the table with the text hash it holds per type and only
+  removes, adds or re-embeds the types that changed, instead of
+  rebuilding;
+- message embeddings are kept in an LRU keyed on normalize_message(), so a
+  repeated phrase ("need towels") skips the model;
+- while one encode is running, further detect() calls from other threads
+  wait up to INTENT_BATCH_WINDOW_MS and are encoded together in one model
+  call. A message that arrives alone is encoded at once;
+- INTENT_ENGINE_BACKEND picks the inference path: 'torch' (float32, the
+  default), 'int8' (the model's Linear layers dynamically quantized to
+  int8) or 'onnx' (an exported ONNX model run by onnxruntime, which needs
+  optimum[onnxruntime]). `manage.py benchmark_intent_backends` compares
+  their accuracy and latency on labelled guest messages.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from .cache_versions import get_version, invalidate_version
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = 'intent_engine:version'
+
+INTENT_BACKENDS = ('torch', 'int8', 'onnx')
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+# =========================================================
+# NORMALIZATION
+# =========================================================
+def normalize_message(text: str) -> str:
+    text = text.lower().strip()
+    text = "".join(
+        ch for ch in text
+        if unicodedata.category(ch)[0] not in ("S", "C")
+    )
+    text = re.sub(r"[^\w\s]", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+def request_type_text(request_type):
+    """The text embedded for a request type."""
+    return f"{request_type.name}. {request_type.description or ''}"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# =========================================================
+# ON-DISK EMBEDDING CACHE
+# =========================================================
+class EmbeddingCache:
+    """
+    {text hash: embedding} for one model, stored as one .npz file. Writes go
+    to a temporary file that replaces the old one, so a reader never sees a
+    partial file.
+    """
+
+    def __init__(self, directory, model_name):
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.path = Path(directory) / f'{slug}.npz'
+
+    def load(self):
+        import numpy as np
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                return dict(zip(data['hashes'].tolist(), data['embeddings']))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f'Ignoring unreadable intent embedding cache {self.path}: {str(e)}')
+            return {}
+
+    def save(self, embeddings):
+        import numpy as np
+
+        if not embeddings:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            hashes = sorted(embeddings)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix='.npz.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, hashes=np.array(hashes), embeddings=np.stack([embeddings[h] for h in hashes]))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f'Could not write intent embedding cache {self.path}: {str(e)}')
+
+
+# =========================================================
+# MESSAGE EMBEDDINGS: LRU AND MICRO-BATCHING
+# =========================================================
+class MessageEmbeddingCache:
+    """Thread-safe LRU of {normalized message: embedding}."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BatchingEncoder:
+    """
+    Groups texts from concurrent callers into one `encode(texts)` call.
+
+    The first caller of a batch leads it. If no other batch is being
+    encoded it encodes straight away; otherwise it waits up to `window`
+    seconds (or until `max_batch` texts are queued) so callers arriving in
+    the meantime share its call. Every caller gets its own row back.
+    """
+
+    def __init__(self, encode, window=0.005, max_batch=32):
+        self.encode = encode
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+        self._encoding = 0
+        self.calls = 0
+
+    def __call__(self, text):
+        future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+            busy = self._encoding > 0
+        if leader:
+            if busy and self.window > 0:
+                self._full.wait(self.window)
+            self._run_batch()
+        return future.result()
+
+    def _run_batch(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._full.clear()
+            self._encoding += 1
+        try:
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            self.calls += 1
+            rows = dict(zip(texts, self.encode(texts)))
+            for text, future in batch:
+                future.set_result(rows[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                self._encoding -= 1
+
+
+# =========================================================
+# RAG INTENT ENGINE (NO LISTS, NO RULES)
+# =========================================================
+class SentenceTransformerEncoder:
+    """
+    Encodes texts with a sentence-transformers model, loaded on first use
+    with the given backend (see INTENT_BACKENDS).
+    """
+
+    def __init__(self, model_name, backend='torch', onnx_file_name=''):
+        if backend not in INTENT_BACKENDS:
+            raise ImproperlyConfigured(
+                f"Unknown intent engine backend '{backend}', expected one of {', '.join(INTENT_BACKENDS)}"
+            )
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_file_name = onnx_file_name
+        self._model = None
+
+    def load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == 'onnx':
+            import importlib.util
+
+            if not (importlib.util.find_spec('onnxruntime') and importlib.util.find_spec('optimum')):
+                raise ImproperlyConfigured(
+                    "The 'onnx' intent engine backend needs optimum[onnxruntime] installed"
+                )
+            model_kwargs = {'file_name': self.onnx_file_name} if self.onnx_file_name else None
+            return SentenceTransformer(self.model_name, backend='onnx', model_kwargs=model_kwargs)
+
+        if self.backend == 'int8':
+            # Dynamic quantization runs on CPU only
+            return quantize_linear_layers(SentenceTransformer(self.model_name, device='cpu'))
+        return SentenceTransformer(self.model_name)
+
+    def load(self):
+        """The model, loaded now if it is not yet."""
+        if self._model is None:
+            self._model = self.load_model()
+        return self._model
+
+    def __call__(self, texts):
+        return self.load().encode(texts, normalize_embeddings=True)
+
+
+def quantize_linear_layers(model):
+    """
+    int8 dynamic quantization of a torch model's Linear layers: weights are
+    stored as int8 and activations are quantized per batch at run time.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    model.eval()
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class RAGIntentEngine:
+    """
+    Nearest request type for a message by cosine similarity of sentence
+    embeddings. `encoder(texts)` must return L2-normalized vectors; by
+    default it is the INTENT_MODEL_NAME sentence-transformers model.
+    """
+
+    def __init__(self, model_name=None, encoder=None, cache_dir=None,
+                 message_cache_size=None, batch_window_ms=None, batch_max_size=None,
+                 backend=None, fixed_request_types=None):
+        """
+        `fixed_request_types`: index these instead of the active RequestType
+        rows, and never re-sync (used by benchmark_intent_backends).
+        """
+        self.model_name = model_name or settings.INTENT_MODEL_NAME
+        self.backend = backend or settings.INTENT_ENGINE_BACKEND
+        onnx_file_name = settings.INTENT_ONNX_FILE_NAME if self.backend == 'onnx' else ''
+        self.encoder = encoder or SentenceTransformerEncoder(self.model_name, self.backend, onnx_file_name)
+        if cache_dir is None:
+            cache_dir = settings.INTENT_ENGINE_CACHE_DIR
+        # Each backend produces slightly different vectors, so each has its own file
+        cache_name = self.model_name
+        if self.backend != 'torch':
+            cache_name = '-'.join(filter(None, (self.model_name, self.backend, onnx_file_name)))
+        self.cache = EmbeddingCache(cache_dir, cache_name) if cache_dir else None
+        self.fixed_request_types = fixed_request_types
+        if message_cache_size is None:
+            message_cache_size = settings.INTENT_MESSAGE_CACHE_SIZE
+        self.message_cache = MessageEmbeddingCache(message_cache_size)
+        if batch_window_ms is None:
+            batch_window_ms = settings.INTENT_BATCH_WINDOW_MS
+        self.batcher = BatchingEncoder(
+            self.encode,
+            window=batch_window_ms / 1000,
+            max_batch=batch_max_size or settings.INTENT_BATCH_MAX_SIZE,
+        )
+        self.index = None
+        self.request_types = {}
+        # request_type_id -> hash of the text whose embedding is in the index
+        self._hashes = {}
+        self._version = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.last_sync = {'added': 0, 'updated': 0, 'removed': 0}
+
+    def encode(self, texts):
+        import numpy as np
+
+        return np.asarray(self.encoder(texts), dtype='float32')
+
+    def load(self):
+        """Bring the index up to date with the active request types."""
+        if self.fixed_request_types is not None:
+            version = 'fixed'
+        else:
+            try:
+                version = get_version(_VERSION_KEY)
+            except Exception as e:
+                logger.error(f'Error reading intent index version: {str(e)}')
+                version = None
+        if self._loaded and version is not None and version == self._version:
+            return self
+        with self._lock:
+            if not (self._loaded and version is not None and version == self._version):
+                request_types = self.fixed_request_types
+                if request_types is None:
+                    from .models import RequestType
+
+                    request_types = list(RequestType.objects.filter(active=True))
+                self._sync(request_types)
+                self._version = version
+                self._loaded = True
+        return self
+
+    def _embed_request_types(self, request_types, keep):
+        """
+        Embeddings for `request_types`, encoding only texts missing from the
+        disk cache. The cache file keeps the hashes in `keep`.
+        """
+        import numpy as np
+
+        texts = [request_type_text(rt) for rt in request_types]
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.load() if self.cache else {}
+
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        if missing:
+            encoded = self.encode([texts[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                cached[hashes[i]] = embedding
+            if self.cache:
+                # Only current texts are kept, so edited types do not pile up
+                self.cache.save({h: cached[h] for h in keep if h in cached})
+        return np.stack([cached[h] for h in hashes]).astype('float32')
+
+    def _sync(self, request_types):
+        """Apply the differences between the index and `request_types`; caller holds the lock."""
+        import faiss
+        import numpy as np
+
+        current = {rt.pk: (rt, text_hash(request_type_text(rt))) for rt in request_types}
+        stale = [pk for pk, h in self._hashes.items() if pk not in current or current[pk][1] != h]
+        new = [pk for pk, (_, h) in current.items() if self._hashes.get(pk) != h]
+
+        if stale and self.index is not None:
+            self.index.remove_ids(np.array(stale, dtype='int64'))
+        for pk in stale:
+            del self._hashes[pk]
+        if new:
+            embeddings = self._embed_request_types(
+                [current[pk][0] for pk in new], keep={h for _, h in current.values()},
+            )
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+            self.index.add_with_ids(embeddings, np.array(new, dtype='int64'))
+            for pk in new:
+                self._hashes[pk] = current[pk][1]
+
+        # Fresh instances even for unchanged texts (department, flags...)
+        self.request_types = {pk: rt for pk, (rt, _) in current.items()}
+        updated = len(set(stale) & set(new))
+        self.last_sync = {'added': len(new) - updated, 'updated': updated, 'removed': len(stale) - updated}
+
+    def embed_message(self, message):
+        """Embedding of normalize_message(message), from the LRU or a shared batch."""
+        key = normalize_message(message)
+        embedding = self.message_cache.get(key)
+        if embedding is None:
+            embedding = self.batcher(key)
+            self.message_cache.put(key, embedding)
+        return embedding
+
+    def detect(self, message: str):
+        self.load()
+        if not self.request_types:
+            return None, 0.0
+
+        emb = self.embed_message(message).reshape(1, -1)
+
+        with self._lock:
+            scores, ids = self.index.search(emb, 1)
+            rt = self.request_types.get(int(ids[0][0]))
+        if rt is None:
+            return None, 0.0
+        confidence = float(scores[0][0])
+
+        return rt, confidence
+
+
+def invalidate_intent_index():
+    """
+    Make every worker's engine re-check the request types on its next
+    detect(). Bumped now and again on commit, like the SLA policy cache.
+    """
+    invalidate_version(_VERSION_KEY)
+
+
+def get_intent_engine():
+    """The process-wide engine; the model is loaded on its first detect()."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RAGIntentEngine()
+    return _engine
+
+
+def reset_intent_engine(engine=None):
+    """Replace (or drop) the process-wide engine."""
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+@contextmanager
+def _single_threaded_torch():
+    # Forked workers cannot use an OpenMP thread pool started in the parent,
+    # so the preloading process encodes on one thread
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(threads)
+
+
+def preload_intent_engine():
+    """
+    Load the model and index now (INTENT_ENGINE_PRELOAD). Database
+    connections opened for it are closed, so forked workers do not share
+    them. Failures are logged and leave loading to the first request.
+    """
+    try:
+        with _single_threaded_torch():
+            engine = get_intent_engine().load()
+            # With a warm embedding cache load() encodes nothing, which would
+            # leave the model to be read by each worker on its first request
+            if hasattr(engine.encoder, 'load'):
+                engine.encoder.load()
+        logger.info('Intent engine preloaded')
+    except Exception as e:
+        logger.error(f'Intent engine preload failed: {str(e)}')
+    finally:
+        connections.close_all()
@@ -0,0 +1,243 @@
+"""
+KPI aggregation services for the main dashboard.
+
+Each function computes a group of dashboard figures with a single grouped or
+conditional-aggregate query (Count/Avg with filter=Q(...), TruncDate buckets),
+so the number of queries behind the dashboard stays the same no matter how
+many request types, departments or days are being reported on.
+"""
+import datetime
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Complaint, Department, GymMember, RequestType, Review, ServiceRequest, Voucher,
+)
+
+
+ACTIVE_TICKET_STATUSES = ['pending', 'accepted', 'in_progress']
+DONE_TICKET_STATUSES = ['completed', 'closed']
+SLA_BREACHED_Q = Q(sla_breached=True) | Q(response_sla_breached=True) | Q(resolution_sla_breached=True)
+
+
+def day_start(day):
+    """Timezone-aware datetime for the start of `day` in the current timezone."""
+    return timezone.make_aware(
+        datetime.datetime.combine(day, datetime.time.min),
+        timezone.get_current_timezone()
+    )
+
+
+def _response_delta():
+    return ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField())
+
+
+def _pct(part, whole):
+    return int(round(part / whole * 100)) if whole else 0
+
+
+def complaint_kpis(range_start, range_end):
+    """Complaint counts by status for complaints created in the range."""
+    rows = list(
+        Complaint.objects.filter(created_at__gte=range_start, created_at__lte=range_end)
+        .values('status')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    by_status = {row['status']: row['count'] for row in rows}
+    return {
+        'open': by_status.get('pending', 0) + by_status.get('in_progress', 0),
+        'resolved': by_status.get('resolved', 0),
+        'trends': rows,
+    }
+
+
+def voucher_kpis(range_start, range_end, today):
+    """Voucher issue/redeem/expiry counts, week-on-week redemptions and active guests."""
+    week_ago = day_start(today - datetime.timedelta(days=7))
+    two_weeks_ago = day_start(today - datetime.timedelta(days=14))
+    yesterday = today - datetime.timedelta(days=1)
+    in_range = Q(created_at__gte=range_start, created_at__lte=range_end)
+
+    return Voucher.objects.aggregate(
+        issued=Count('pk', filter=in_range),
+        redeemed=Count('pk', filter=Q(
+            redeemed=True, redeemed_at__gte=range_start, redeemed_at__lte=range_end
+        )),
+        expired=Count('pk', filter=in_range & Q(expiry_date__lt=today)),
+        redeemed_last_week=Count('pk', filter=Q(redeemed=True, redeemed_at__gte=week_ago)),
+        redeemed_prev_week=Count('pk', filter=Q(
+            redeemed=True, redeemed_at__gte=two_weeks_ago, redeemed_at__lt=week_ago
+        )),
+        active_guests=Count('pk', filter=Q(
+            check_in_date__lte=today, check_out_date__gt=today, location__isnull=False
+        )),
+        active_guests_yesterday=Count('pk', filter=Q(
+            check_in_date__lte=yesterday, check_out_date__gt=yesterday, location__isnull=False
+        )),
+    )
+
+
+def service_request_kpis(range_start, range_end, today):
+    """Ticket activity, SLA breach, response time and efficiency figures."""
+    now = timezone.now()
+    today_start = day_start(today)
+    tomorrow_start = day_start(today + datetime.timedelta(days=1))
+    yesterday_start = day_start(today - datetime.timedelta(days=1))
+    week_ago = day_start(today - datetime.timedelta(days=7))
+    since_30d = now - datetime.timedelta(days=30)
+    prev_since_30d = since_30d - datetime.timedelta(days=30)
+    since_7d = now - datetime.timedelta(days=7)
+    prev_since_7d = since_7d - datetime.timedelta(days=7)
+
+    in_range = Q(created_at__gte=range_start, created_at__lte=range_end)
+    accepted = Q(accepted_at__isnull=False)
+    met_sla = Q(resolution_sla_breached=False)
+    completed_in_range = Q(completed_at__gte=range_start, completed_at__lte=range_end)
+    completed_7d = Q(completed_at__gte=since_7d)
+    completed_prev_7d = Q(completed_at__gte=prev_since_7d, completed_at__lt=since_7d)
+
+    stats = ServiceRequest.objects.aggregate(
+        active_tickets=Count('pk', filter=in_range & Q(status__in=ACTIVE_TICKET_STATUSES)),
+        active_tickets_last_week=Count('pk', filter=Q(
+            status__in=ACTIVE_TICKET_STATUSES, created_at__lt=week_ago
+        )),
+        sla_breaches=Count('pk', filter=in_range & SLA_BREACHED_Q),
+        sla_breaches_today=Count('pk', filter=SLA_BREACHED_Q & Q(
+            created_at__gte=today_start, created_at__lt=tomorrow_start
+        )),
+        sla_breaches_yesterday=Count('pk', filter=SLA_BREACHED_Q & Q(
+            created_at__gte=yesterday_start, created_at__lt=today_start
+        )),
+        avg_response=Avg(_response_delta(), filter=accepted & in_range),
+        avg_response_30d=Avg(_response_delta(), filter=accepted & Q(created_at__gte=since_30d)),
+        avg_response_prev_30d=Avg(_response_delta(), filter=accepted & Q(
+            created_at__gte=prev_since_30d, created_at__lt=since_30d
+        )),
+        completed=Count('pk', filter=completed_in_range),
+        completed_met_sla=Count('pk', filter=completed_in_range & met_sla),
+        completed_7d=Count('pk', filter=completed_7d),
+        completed_7d_met_sla=Count('pk', filter=completed_7d & met_sla),
+        completed_prev_7d=Count('pk', filter=completed_prev_7d),
+        completed_prev_7d_met_sla=Count('pk', filter=completed_prev_7d & met_sla),
+    )
+    stats['staff_efficiency'] = _pct(stats['completed_met_sla'], stats['completed'])
+    stats['staff_efficiency_7d'] = _pct(stats['completed_7d_met_sla'], stats['completed_7d'])
+    stats['staff_efficiency_prev_7d'] = _pct(stats['completed_prev_7d_met_sla'], stats['completed_prev_7d'])
+    return stats
+
+
+def request_type_counts(range_start, range_end):
+    """Ticket counts per request type (all request types, zero-filled)."""
+    counts = dict(
+        ServiceRequest.objects.filter(created_at__gte=range_start, created_at__lte=range_end)
+        .values_list('request_type_id')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    request_types = list(RequestType.objects.values_list('pk', 'name'))
+    return {
+        'labels': [name for _, name in request_types],
+        'values': [counts.get(pk, 0) for pk, _ in request_types],
+    }
+
+
+def department_ticket_counts(limit=6):
+    """Total, open and done ticket counts for the busiest departments."""
+    counts = {
+        row['department_id']: row
+        for row in ServiceRequest.objects.filter(department__isnull=False)
+        .values('department_id')
+        .annotate(
+            total=Count('pk'),
+            completed=Count('pk', filter=Q(status__in=DONE_TICKET_STATUSES)),
+        )
+        .order_by()
+    }
+    dept_stats = []
+    for pk, name in Department.objects.values_list('pk', 'name'):
+        row = counts.get(pk, {'total': 0, 'completed': 0})
+        # assigned/open = everything not completed/closed
+        dept_stats.append((name, row['total'], row['total'] - row['completed'], row['completed']))
+    # Sort by total ticket count (desc), alphabetical on ties
+    return sorted(dept_stats, key=lambda x: (-x[1], x[0]))[:limit]
+
+
+def review_kpis(range_start, range_end, today):
+    """Average ratings, 30-day sentiment split and month-on-month averages."""
+    since_30d = timezone.now() - datetime.timedelta(days=30)
+    month_ago = day_start(today - datetime.timedelta(days=30))
+    two_months_ago = day_start(today - datetime.timedelta(days=60))
+    recent = Q(created_at__gte=since_30d)
+
+    return Review.objects.aggregate(
+        avg_rating=Avg('rating', filter=Q(created_at__gte=range_start, created_at__lte=range_end)),
+        positive_30d=Count('pk', filter=recent & Q(rating__gte=4)),
+        neutral_30d=Count('pk', filter=recent & Q(rating=3)),
+        negative_30d=Count('pk', filter=recent & Q(rating__lte=2)),
+        avg_rating_last_month=Avg('rating', filter=Q(
+            created_at__gte=month_ago, created_at__lt=day_start(today)
+        )),
+        avg_rating_prev_month=Avg('rating', filter=Q(
+            created_at__gte=two_months_ago, created_at__lt=month_ago
+        )),
+    )
+
+
+def gym_member_kpis(today):
+    """Active gym members now and one week ago."""
+    week_ago = today - datetime.timedelta(days=7)
+    active = Q(status='Active')
+    return GymMember.objects.aggregate(
+        active=Count('pk', filter=active & ~Q(expiry_date__lt=today)),
+        active_last_week=Count('pk', filter=active & ~Q(expiry_date__lt=week_ago)),
+    )
+
+
+def daily_ticket_counts(days, today):
+    """Tickets created per day for the last `days` days, oldest first."""
+    first_day = today - datetime.timedelta(days=days - 1)
+    from . import ticket_stats_services
+    if ticket_stats_services.use_rollup(days):
+        return [
+            (day, totals['created'])
+            for day, totals in ticket_stats_services.daily_totals(first_day, today).items()
+        ]
+    counts = dict(
+        ServiceRequest.objects.filter(created_at__gte=day_start(first_day))
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    return [
+        (day, counts.get(day, 0))
+        for day in (first_day + datetime.timedelta(days=i) for i in range(days))
+    ]
+
+
+def daily_review_counts(days, today):
+    """Reviews per day for the last `days` days split by sentiment, oldest first."""
+    first_day = today - datetime.timedelta(days=days - 1)
+    rows = {
+        row['day']: row
+        for row in Review.objects.filter(created_at__gte=day_start(first_day))
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(
+            total=Count('pk'),
+            positive=Count('pk', filter=Q(rating__gte=4)),
+            neutral=Count('pk', filter=Q(rating=3)),
+            negative=Count('pk', filter=Q(rating__lte=2)),
+        )
+        .order_by()
+    }
+    empty = {'total': 0, 'positive': 0, 'neutral': 0, 'negative': 0}
+    buckets = []
+    for i in range(days):
+        day = first_day + datetime.timedelta(days=i)
+        row = rows.get(day, empty)
+        buckets.append((day, {key: row[key] for key in empty}))
+    return buckets
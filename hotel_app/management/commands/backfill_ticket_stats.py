@@ -0,0 +1,50 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hotel_app.ticket_stats_services import rebuild_ticket_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyTicketStats rollup from service requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only rebuild the last N days (default: full history)',
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse_date(options['start_date'])
+            end_date = self._parse_date(options['end_date'])
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if options['days']:
+            today = timezone.localdate()
+            start_date = today - datetime.timedelta(days=options['days'] - 1)
+            end_date = end_date or today
+
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('--start-date must not be after --end-date')
+
+        period = f"{start_date or 'beginning'} to {end_date or 'today'}"
+        self.stdout.write(f'Rebuilding daily ticket stats from {period}...')
+        buckets = rebuild_ticket_stats(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {buckets} daily ticket stat buckets.'))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
@@ -0,0 +1,117 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.intent_engine import INTENT_BACKENDS, RAGIntentEngine, normalize_message
+from hotel_app.models import RequestType
+from hotel_app.views import CONFIDENCE_THRESHOLD
+
+DEFAULT_FIXTURE = Path(__file__).resolve().parents[2] / 'data' / 'intent_guest_messages.json'
+
+
+def load_fixture(path):
+    """(request_types, [(message, request type name)]) from a labelled fixture file."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    request_types = [
+        RequestType(request_type_id=pk, name=rt['name'], description=rt.get('description', ''), active=True)
+        for pk, rt in enumerate(data['request_types'], start=1)
+    ]
+    names = {rt.name for rt in request_types}
+    messages = [(item['message'], item['request_type']) for item in data['messages']]
+    unknown = sorted({label for _, label in messages if label not in names})
+    if unknown:
+        raise CommandError(f"Fixture labels without a request type: {', '.join(unknown)}")
+    return request_types, messages
+
+
+def evaluate(engine, messages, repeat=1):
+    """
+    Accuracy and per-message latency of `engine` on labelled messages.
+    Latency covers detect() after the engine is loaded and warmed up.
+    """
+    started = time.perf_counter()
+    engine.load()
+    engine.detect(messages[0][0])
+    load_ms = (time.perf_counter() - started) * 1000
+
+    predictions = []
+    timings = []
+    for iteration in range(repeat):
+        for message, _ in messages:
+            started = time.perf_counter()
+            request_type, confidence = engine.detect(normalize_message(message))
+            timings.append((time.perf_counter() - started) * 1000)
+            if iteration == 0:
+                predictions.append((request_type.name if request_type else None, confidence))
+
+    correct = [predicted == label for (predicted, _), (_, label) in zip(predictions, messages)]
+    accepted = [
+        ok and confidence >= CONFIDENCE_THRESHOLD for ok, (_, confidence) in zip(correct, predictions)
+    ]
+    timings.sort()
+    return {
+        'load_ms': load_ms,
+        'predictions': predictions,
+        'accuracy': sum(correct) / len(messages),
+        'accepted': sum(accepted) / len(messages),
+        'mean_ms': statistics.mean(timings),
+        'p95_ms': timings[max(int(len(timings) * 0.95) - 1, 0)],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare accuracy and latency of the intent engine backends on labelled guest messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', default=','.join(INTENT_BACKENDS),
+            help=f"Comma-separated backends, the first is the baseline (default: {','.join(INTENT_BACKENDS)})",
+        )
+        parser.add_argument('--fixture', default=str(DEFAULT_FIXTURE), help='Labelled messages (JSON)')
+        parser.add_argument('--model', default=None, help='Model name (default: INTENT_MODEL_NAME)')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the messages (default: 3)')
+
+    def handle(self, *args, **options):
+        request_types, messages = load_fixture(options['fixture'])
+        backends = [backend.strip() for backend in options['backends'].split(',') if backend.strip()]
+        self.stdout.write(
+            f"{len(messages)} messages, {len(request_types)} request types, "
+            f"accepted = correct and confidence >= {CONFIDENCE_THRESHOLD}"
+        )
+
+        baseline = None
+        for backend in backends:
+            # No caches or batching, so every detect() runs the model
+            try:
+                engine = RAGIntentEngine(
+                    model_name=options['model'], backend=backend, cache_dir='', message_cache_size=0,
+                    batch_window_ms=0, fixed_request_types=request_types,
+                )
+                result = evaluate(engine, messages, options['repeat'])
+            except (ImproperlyConfigured, ImportError, OSError) as e:
+                self.stdout.write(f"{backend:>6}: skipped ({str(e)})")
+                continue
+
+            line = (
+                f"{backend:>6}: accuracy {result['accuracy']:.1%}, accepted {result['accepted']:.1%}, "
+                f"{result['mean_ms']:.2f} ms/message mean, {result['p95_ms']:.2f} ms p95, "
+                f"load {result['load_ms']:.0f} ms"
+            )
+            if baseline is None:
+                baseline = (backend, result)
+            else:
+                base_name, base = baseline
+                pairs = list(zip(base['predictions'], result['predictions']))
+                agreement = sum(a[0] == b[0] for a, b in pairs) / len(pairs)
+                drift = statistics.mean(abs(a[1] - b[1]) for a, b in pairs)
+                speedup = base['mean_ms'] / result['mean_ms'] if result['mean_ms'] else 0
+                line += (
+                    f"; vs {base_name}: {agreement:.1%} same prediction, "
+                    f"confidence drift {drift:.3f}, {speedup:.2f}x speed"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotel_app.models import RequestType
+from hotel_app.request_matcher import NAME_SCORE, TOKEN_RE, TOKEN_SCORE, RequestMatcher
+
+WORDS = [
+    'towel', 'pillow', 'blanket', 'water', 'coffee', 'tea', 'iron', 'charger', 'shampoo', 'soap',
+    'laundry', 'cleaning', 'ac', 'heater', 'light', 'bulb', 'tv', 'remote', 'wifi', 'minibar',
+    'breakfast', 'dinner', 'taxi', 'luggage', 'checkout', 'late', 'extra', 'bed', 'crib', 'door',
+    'key', 'card', 'safe', 'leak', 'shower', 'toilet', 'noise', 'window', 'curtain', 'fan',
+]
+
+
+def _time_per_message(function, messages):
+    timings = []
+    for message in messages:
+        started = time.perf_counter()
+        function(message)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+class Command(BaseCommand):
+    help = 'Time request-type detection with the compiled matcher against the old per-keyword loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keywords', type=int, default=5000, help='Synthetic keywords (default: 5000)')
+        parser.add_argument('--request-types', type=int, default=200, help='Synthetic request types (default: 200)')
+        parser.add_argument('--messages', type=int, default=1000, help='Messages to detect (default: 1000)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        request_types = [
+            RequestType(
+                request_type_id=pk,
+                name=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {pk}',
+                description=' '.join(rng.sample(WORDS, 4)),
+                active=True,
+            )
+            for pk in range(1, options['request_types'] + 1)
+        ]
+        keywords = sorted({
+            f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index}': None for index in range(options['keywords'])
+        })
+        keywords = [(keyword, rng.randint(1, options['request_types']), rng.randint(1, 3)) for keyword in keywords]
+        messages = []
+        for _ in range(options['messages']):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 16))]
+            if rng.random() < 0.5:
+                words.insert(rng.randint(0, len(words)), rng.choice(keywords)[0])
+            messages.append('Hi, ' + ' '.join(words) + ' please!')
+
+        started = time.perf_counter()
+        matcher = RequestMatcher(keywords, request_types)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        def substring_loop(message):
+            # The previous detection, minus its database queries
+            normalized = message.lower()
+            tokens = set(TOKEN_RE.findall(normalized))
+            scores = {}
+            for keyword, request_type_id, weight in keywords:
+                if keyword.lower() in normalized:
+                    score, matches = scores.get(request_type_id, (0, []))
+                    scores[request_type_id] = (score + weight, matches + [keyword])
+            if not scores:
+                for rt in request_types:
+                    score = NAME_SCORE if rt.name.lower() in normalized else 0
+                    potential = set(TOKEN_RE.findall(rt.name.lower())) | set(TOKEN_RE.findall(rt.description.lower()))
+                    score += TOKEN_SCORE * len([t for t in potential if t in tokens])
+                    if score:
+                        scores[rt.pk] = (score, [])
+            return scores
+
+        compiled_mean, compiled_p95 = _time_per_message(matcher.match, messages)
+        loop_mean, loop_p95 = _time_per_message(substring_loop, messages)
+
+        self.stdout.write(
+            f"{len(keywords)} keywords, {len(request_types)} request types, {len(messages)} messages"
+        )
+        self.stdout.write(f"Build:            {build_ms:.1f} ms")
+        self.stdout.write(f"Compiled matcher: {compiled_mean:.1f} us/message mean, {compiled_p95:.1f} us p95")
+        self.stdout.write(
+            f"Per-keyword loop: {loop_mean:.1f} us/message mean, {loop_p95:.1f} us p95 "
+            f"(excluding its queries)"
+        )
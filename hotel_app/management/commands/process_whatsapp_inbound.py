@@ -0,0 +1,44 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from hotel_app.whatsapp_inbound import recover_inbound
+
+
+class Command(BaseCommand):
+    help = 'Process WhatsApp webhook messages left pending by a web process that stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-seconds',
+            type=int,
+            help='Only pick up rows older than this (default: WHATSAPP_INBOUND_STALE_SECONDS)',
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            help='Keep running, repeating every this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def _stop(signum, frame):
+            self.stdout.write('Stopping WhatsApp inbound recovery...')
+            stop.set()
+
+        if options['every']:
+            signal.signal(signal.SIGTERM, _stop)
+            signal.signal(signal.SIGINT, _stop)
+
+        while True:
+            report = recover_inbound(stale_seconds=options['stale_seconds'])
+            if report['processed'] or report['interrupted'] or not options['every']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {report['processed']} pending messages; "
+                    f"marked {report['interrupted']} interrupted ones failed."
+                ))
+
+            if not options['every'] or stop.wait(options['every']):
+                return
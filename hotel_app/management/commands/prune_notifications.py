@@ -0,0 +1,84 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from hotel_app.notification_retention import run_retention
+
+
+def _format_size(size):
+    if size['bytes'] is None:
+        return f"{size['rows']} rows"
+    return f"{size['rows']} rows, {size['bytes'] / (1024 * 1024):.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive old read notifications, compact old unread ones into per-user digests '
+        'and delete old broadcasts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--read-days',
+            type=int,
+            help='Remove read notifications older than this (default: NOTIFICATION_RETENTION_READ_DAYS)',
+        )
+        parser.add_argument(
+            '--unread-days',
+            type=int,
+            help=(
+                'Compact unread notifications and delete broadcasts older than this '
+                '(default: NOTIFICATION_RETENTION_UNREAD_DAYS)'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per transaction (default: NOTIFICATION_RETENTION_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete instead of copying to the archive table',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be removed',
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            help='Keep running, repeating every this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def _stop(signum, frame):
+            self.stdout.write('Stopping notification retention...')
+            stop.set()
+
+        if options['every']:
+            signal.signal(signal.SIGTERM, _stop)
+            signal.signal(signal.SIGINT, _stop)
+
+        while True:
+            report = run_retention(
+                read_days=options['read_days'],
+                unread_days=options['unread_days'],
+                batch_size=options['batch_size'],
+                archive=False if options['no_archive'] else None,
+                dry_run=options['dry_run'],
+            )
+            verb = 'Would remove' if options['dry_run'] else 'Removed'
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {report['read_removed']} read notifications, compacted "
+                f"{report['unread_compacted']} unread ones and removed {report['broadcasts_removed']} broadcasts."
+            ))
+            self.stdout.write(f"Before: {_format_size(report['before'])}")
+            self.stdout.write(f"After:  {_format_size(report['after'])}")
+
+            if not options['every'] or stop.wait(options['every']):
+                return
@@ -0,0 +1,65 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hotel_app.outbox import OutboxWorker, outbox_stats
+
+
+class Command(BaseCommand):
+    help = 'Send queued push, WhatsApp and email notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Rows claimed per channel per pass (default: 100)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Seconds to wait when the outbox is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send one batch per channel and exit',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print row counts per channel and status and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for (channel, status), count in sorted(outbox_stats().items()):
+                self.stdout.write(f'{channel:10} {status:10} {count}')
+            return
+
+        if not settings.NOTIFICATION_OUTBOX_ENABLED:
+            self.stdout.write(self.style.WARNING(
+                'NOTIFICATION_OUTBOX_ENABLED is off: notifications are sent inline and '
+                'only rows queued earlier will be drained.'
+            ))
+
+        worker = OutboxWorker(batch_size=options['batch_size'], poll_interval=options['poll_interval'])
+
+        if options['once']:
+            report = worker.drain_once()
+            self.stdout.write(self.style.SUCCESS(
+                f"Sent {report['sent']}, retrying {report['retried']}, failed {report['failed']}."
+            ))
+            return
+
+        def _stop(signum, frame):
+            self.stdout.write('Stopping outbox worker...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        self.stdout.write(self.style.SUCCESS('Outbox worker running.'))
+        worker.run_forever()
@@ -0,0 +1,57 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hotel_app.sla_scheduler import SLADeadlineScheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the SLA deadline scheduler (marks breaches and notifies as deadlines pass)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds between change-feed polls (default: 5)',
+        )
+        parser.add_argument(
+            '--reseed-interval',
+            type=float,
+            default=3600,
+            help='Seconds between full reloads of open tickets (default: 3600)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Seed, fire deadlines that have already passed, and exit',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SLA_SCHEDULER_ENABLED:
+            self.stdout.write(self.style.WARNING(
+                'SLA_SCHEDULER_ENABLED is off: ticket changes will not reach the scheduler '
+                'until the next reseed.'
+            ))
+
+        scheduler = SLADeadlineScheduler(poll_interval=options['poll_interval'])
+
+        if options['once']:
+            queued = scheduler.seed()
+            report = scheduler.fire_due()
+            flipped = report['flipped'] if report else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'Queued {queued} SLA deadlines; {flipped} tickets newly breached.'
+            ))
+            return
+
+        def _stop(signum, frame):
+            self.stdout.write('Stopping SLA scheduler...')
+            scheduler.stop()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        self.stdout.write(self.style.SUCCESS('SLA scheduler running.'))
+        scheduler.run_forever(reseed_interval=options['reseed_interval'])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from hotel_app.section_permissions import (
+    get_section_permission_cache_stats,
+    reset_section_permission_cache_stats,
+)
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters for the shared section permission cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after displaying them',
+        )
+
+    def handle(self, *args, **options):
+        stats = get_section_permission_cache_stats()['shared']
+        hits = stats.get('hits') or 0
+        misses = stats.get('misses') or 0
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total else 0
+
+        self.stdout.write(self.style.SUCCESS('\nSection Permission Cache:'))
+        self.stdout.write('=' * 40)
+        self.stdout.write(f"{'Hits':<12} {hits}")
+        self.stdout.write(f"{'Misses':<12} {misses}")
+        self.stdout.write(f"{'Hit rate':<12} {hit_rate:.1f}%")
+        self.stdout.write('=' * 40)
+
+        if total == 0:
+            self.stdout.write(
+                self.style.WARNING('No lookups recorded. Check that CACHE_BACKEND is a shared backend.')
+            )
+
+        if options['reset']:
+            reset_section_permission_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
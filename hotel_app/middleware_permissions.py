@@ -4,6 +4,8 @@ Middleware to check user permissions after login and redirect users without prop
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+from hotel_app.section_permissions import get_section_permission_snapshot
 
 
 class UserPermissionCheckMiddleware:
@@ -29,6 +31,12 @@ class UserPermissionCheckMiddleware:
         self.get_response = get_response
     
     def __call__(self, request):
+        # Attach the user's section permission snapshot so the context processor
+        # and view decorators reuse it instead of re-querying
+        request.section_permissions = SimpleLazyObject(
+            lambda: get_section_permission_snapshot(request.user)
+        )
+        
         # Check if user needs permission verification
         if self.should_check_permissions(request):
             if not self.user_has_access(request.user):
@@ -91,14 +99,9 @@ class UserPermissionCheckMiddleware:
         
         # Check if user has access to any section
         try:
-            from hotel_app.section_permissions import user_has_section_permission
-            from hotel_app.models import Section
-            
             # Check if user has view permission for any active section
-            sections = Section.objects.filter(is_active=True)
-            for section in sections:
-                if user_has_section_permission(user, section.name, 'view'):
-                    return True
+            if get_section_permission_snapshot(user).has_any('view'):
+                return True
         except Exception:
             pass
         
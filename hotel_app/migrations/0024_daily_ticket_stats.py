@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0023_alter_gymmember_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTicketStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('priority', models.CharField(blank=True, default='', max_length=20)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('breached_count', models.PositiveIntegerField(default=0)),
+                ('response_count', models.PositiveIntegerField(default=0, help_text='Tickets with an accepted_at timestamp')),
+                ('response_seconds', models.FloatField(default=0, help_text='Total seconds from creation to acceptance')),
+                ('resolution_count', models.PositiveIntegerField(default=0, help_text='Completed tickets with a completed_at timestamp')),
+                ('resolution_seconds', models.FloatField(default=0, help_text='Total seconds from creation to completion')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotel_app.department')),
+                ('request_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotel_app.requesttype')),
+            ],
+            options={
+                'db_table': 'daily_ticket_stats',
+                'indexes': [models.Index(fields=['department', 'date'], name='daily_ticke_departm_35e646_idx')],
+                'unique_together': {('date', 'department', 'request_type', 'priority')},
+            },
+        ),
+    ]
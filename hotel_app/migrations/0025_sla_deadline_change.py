@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0024_daily_ticket_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLADeadlineChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sla_deadline_change',
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hotel_app', '0028_notification_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('all', 'All users'), ('group', 'User group'), ('department', 'Department')], default='all', max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('info', 'Information'), ('warning', 'Warning'), ('error', 'Error'), ('success', 'Success'), ('request', 'Service Request'), ('voucher', 'Voucher'), ('system', 'System')], default='info', max_length=20)),
+                ('related_object_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('related_object_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='hotel_app.department')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='hotel_app.usergroup')),
+            ],
+            options={
+                'db_table': 'broadcast_notification',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('dismissed', models.BooleanField(default=False)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='hotel_app.broadcastnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'broadcast_receipt',
+                'unique_together': {('broadcast', 'user')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['audience', 'created_at'], name='broadcast_n_audienc_c50741_idx'),
+        ),
+    ]
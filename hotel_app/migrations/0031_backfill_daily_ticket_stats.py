@@ -0,0 +1,78 @@
+from django.db import migrations
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_ticket_stats(apps, schema_editor):
+    # Long-range analytics read DailyTicketStats as soon as it exists, so fill
+    # it from the existing tickets rather than leaving it to a manual backfill.
+    # Same buckets as ticket_stats_services.rebuild_ticket_stats, written
+    # against the historical models so later changes there cannot break it.
+    ServiceRequest = apps.get_model('hotel_app', 'ServiceRequest')
+    DailyTicketStats = apps.get_model('hotel_app', 'DailyTicketStats')
+
+    accepted = Q(accepted_at__isnull=False)
+    resolved = Q(status='completed', completed_at__isnull=False)
+    breached = Q(sla_breached=True) | Q(response_sla_breached=True) | Q(resolution_sla_breached=True)
+    grouped = (
+        ServiceRequest.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'department_id', 'request_type_id', 'priority')
+        .annotate(
+            created_count=Count('pk'),
+            completed_count=Count('pk', filter=Q(status='completed')),
+            breached_count=Count('pk', filter=breached),
+            response_count=Count('pk', filter=accepted),
+            response_total=Sum(
+                ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField()),
+                filter=accepted,
+            ),
+            resolution_count=Count('pk', filter=resolved),
+            resolution_total=Sum(
+                ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField()),
+                filter=resolved,
+            ),
+        )
+        .order_by()
+    )
+
+    # NULL and '' priorities share a bucket
+    buckets = {}
+    for row in grouped:
+        key = (row['day'], row['department_id'], row['request_type_id'], row['priority'] or '')
+        values = {
+            'created_count': row['created_count'],
+            'completed_count': row['completed_count'],
+            'breached_count': row['breached_count'],
+            'response_count': row['response_count'],
+            'response_seconds': row['response_total'].total_seconds() if row['response_total'] else 0,
+            'resolution_count': row['resolution_count'],
+            'resolution_seconds': row['resolution_total'].total_seconds() if row['resolution_total'] else 0,
+        }
+        if key in buckets:
+            for field, value in values.items():
+                buckets[key][field] += value
+        else:
+            buckets[key] = values
+
+    DailyTicketStats.objects.all().delete()
+    DailyTicketStats.objects.bulk_create(
+        [
+            DailyTicketStats(
+                date=day, department_id=department_id,
+                request_type_id=request_type_id, priority=priority, **values
+            )
+            for (day, department_id, request_type_id, priority), values in buckets.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0030_inbound_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_ticket_stats, migrations.RunPython.noop),
+    ]
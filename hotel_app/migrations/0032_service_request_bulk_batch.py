@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0031_backfill_daily_ticket_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='bulk_batch',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hotel_app', '0032_service_request_bulk_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sync_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notification_tombstones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notification_tombstone',
+                'indexes': [models.Index(fields=['user', 'deleted_at'], name='notificatio_user_id_0d3b07_idx'), models.Index(fields=['deleted_at'], name='notificatio_deleted_d2827d_idx')],
+            },
+        ),
+    ]
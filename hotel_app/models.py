@@ -154,11 +154,20 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES, default='info')
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    # For delta sync; queryset .update() calls must set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
     related_object_id = models.CharField(max_length=100, blank=True, null=True)
     related_object_type = models.CharField(max_length=100, blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'created_at']),
+            models.Index(fields=['recipient', 'created_at']),
+            models.Index(fields=['recipient', 'updated_at']),
+            # Retention job: old read / unread rows across all recipients
+            models.Index(fields=['is_read', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.recipient.username}"
@@ -608,6 +617,9 @@ class ServiceRequest(models.Model):
     resolution_sla_breached = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
     resolution_notes = models.TextField(blank=True, null=True)
+    # Set by bulk_create_tickets so the ids of a batch can be read back on
+    # backends whose bulk INSERT returns no primary keys (MySQL)
+    bulk_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return f'Request #{self.pk}'
@@ -638,48 +650,12 @@ class ServiceRequest(models.Model):
 
     def set_sla_times(self):
         """Set SLA times based on priority and configuration."""
-        try:
-            # First, try to get department/request-specific SLA configuration
-            if self.department and self.request_type:
-                from .models import DepartmentRequestSLA
-                config = DepartmentRequestSLA.objects.get(
-                    department=self.department,
-                    request_type=self.request_type,
-                    priority=self.priority
-                )
-                # Convert minutes to hours for the existing fields
-                self.response_sla_hours = config.response_time_minutes / 60.0
-                self.sla_hours = config.resolution_time_minutes / 60.0
-                return
-        except DepartmentRequestSLA.DoesNotExist:
-            # If no department/request-specific config, continue to general config
-            pass
-        
-        try:
-            from .models import SLAConfiguration
-            config = SLAConfiguration.objects.get(priority=self.priority)
-            
-            # Convert minutes to hours for the existing fields
-            self.response_sla_hours = config.response_time_minutes / 60.0
-            self.sla_hours = config.resolution_time_minutes / 60.0
-        except SLAConfiguration.DoesNotExist:
-            # Use default values if no configuration found
-            if self.priority == 'critical':
-                self.response_sla_hours = 5 / 60.0  # 5 minutes
-                self.sla_hours = 5 / 60.0  # 5 minutes
-            elif self.priority == 'high':
-                self.response_sla_hours = 10 / 60.0  # 10 minutes
-                self.sla_hours = 10 / 60.0  # 10 minutes
-            elif self.priority == 'normal':
-                self.response_sla_hours = 15 / 60.0  # 15 minutes
-                self.sla_hours = 15 / 60.0  # 15 minutes
-            elif self.priority == 'low':
-                self.response_sla_hours = 20 / 60.0  # 20 minutes
-                self.sla_hours = 20 / 60.0  # 20 minutes
-            else:
-                # Default values
-                self.response_sla_hours = 1  # 1 hour
-                self.sla_hours = 24  # 24 hours
+        # Department/request-specific config, then general config for the
+        # priority, then hard-coded defaults (see sla_policy; cached in-process)
+        from .sla_policy import resolve_sla_hours
+        self.response_sla_hours, self.sla_hours = resolve_sla_hours(
+            self.department_id, self.request_type_id, self.priority
+        )
 
     def assign_to_user(self, user):
         """Assign the ticket to a user and automatically accept it."""
@@ -935,6 +911,56 @@ class ServiceRequestChecklist(models.Model):
         db_table='service_request_checklist'
 
 
+class DailyTicketStats(models.Model):
+    """
+    Daily rollup of service requests, one row per (created date, department,
+    request type, priority) bucket.
+
+    Tickets are bucketed by the local date they were created on; a bucket is
+    recomputed whenever one of its tickets is saved or deleted (see
+    ticket_stats_services). Averages are stored as totals + counts so buckets
+    can be summed over any date range.
+    """
+    date = models.DateField(db_index=True)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    request_type = models.ForeignKey(RequestType, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    priority = models.CharField(max_length=20, blank=True, default='')
+    created_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    breached_count = models.PositiveIntegerField(default=0)
+    response_count = models.PositiveIntegerField(default=0, help_text='Tickets with an accepted_at timestamp')
+    response_seconds = models.FloatField(default=0, help_text='Total seconds from creation to acceptance')
+    resolution_count = models.PositiveIntegerField(default=0, help_text='Completed tickets with a completed_at timestamp')
+    resolution_seconds = models.FloatField(default=0, help_text='Total seconds from creation to completion')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_ticket_stats'
+        unique_together = ('date', 'department', 'request_type', 'priority')
+        indexes = [
+            models.Index(fields=['department', 'date']),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.department_id}/{self.request_type_id}/{self.priority}: {self.created_count}'
+
+
+class SLADeadlineChange(models.Model):
+    """
+    Change feed for the SLA deadline scheduler (run_sla_scheduler): one row
+    per ticket save that can move its response/resolution deadlines. Rows are
+    deleted once the scheduler has consumed them.
+    """
+    ticket_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sla_deadline_change'
+
+    def __str__(self):
+        return f'SLA change #{self.pk}: ticket {self.ticket_id}'
+
+
 class TicketComment(models.Model):
     """Internal comments on tickets that staff can add and view."""
     ticket = models.ForeignKey(
@@ -2461,16 +2487,13 @@ class LostAndFound(models.Model):
     
     def broadcast_to_all(self):
         """Broadcast notification to all users about this lost item."""
-        from .utils import create_bulk_notifications
+        from .utils import create_broadcast
         
         if not self.is_broadcast:
             self.is_broadcast = True
             self.broadcast_at = timezone.now()
             self.save(update_fields=['is_broadcast', 'broadcast_at'])
             
-            # Get all active users
-            all_users = User.objects.filter(is_active=True)
-            
             if self.item_type == 'guest_lost':
                 title = f"🔍 Lost Item Alert: {self.item_name}"
                 message = f"A guest has reported a lost item: {self.item_name}. "
@@ -2484,11 +2507,12 @@ class LostAndFound(models.Model):
                 message += f"Location: {self.found_location_description}. "
             message += "Please check if you can help locate/return this item."
             
-            create_bulk_notifications(
-                recipients=all_users,
+            # One row for all active users instead of one per user
+            create_broadcast(
                 title=title,
                 message=message,
                 notification_type='info',
+                audience='all',
                 related_object=self
             )
 
@@ -2540,3 +2564,202 @@ class FCMToken(models.Model):
         """Deactivate this token"""
         self.is_active = False
         self.save(update_fields=['is_active'])
+
+
+class OutboundMessage(models.Model):
+    """
+    Outbox for third-party notification deliveries (FCM push, Twilio
+    WhatsApp, email). Views and signals only insert a row; the
+    run_outbox_worker command sends it with retries and per-channel rate
+    limits (see hotel_app/outbox.py).
+
+    `next_attempt_at` doubles as the worker's lease: a claimed row is pushed
+    forward by the lease time, so a row whose worker died is retried once the
+    lease runs out.
+    """
+    CHANNEL_FCM = 'fcm'
+    CHANNEL_WHATSAPP = 'whatsapp'
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_CHOICES = [
+        (CHANNEL_FCM, 'Push (FCM)'),
+        (CHANNEL_WHATSAPP, 'WhatsApp (Twilio)'),
+        (CHANNEL_EMAIL, 'Email'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbound_message'
+        indexes = [
+            models.Index(fields=['status', 'channel', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.channel} message #{self.pk} ({self.status})'
+
+
+class InboundMessage(models.Model):
+    """
+    Twilio WhatsApp webhook payload, stored before it is processed so the
+    webhook can answer immediately (see hotel_app/whatsapp_inbound.py).
+
+    `message_sid` is unique: a retried webhook finds its row and is
+    acknowledged without being processed a second time.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    message_sid = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    from_number = models.CharField(max_length=64, blank=True, default='')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'inbound_message'
+        indexes = [
+            models.Index(fields=['status', 'from_number', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f'inbound message {self.message_sid or self.pk} ({self.status})'
+
+
+class NotificationArchive(models.Model):
+    """
+    Notifications moved out of the live table by the retention job
+    (hotel_app/notification_retention.py), kept for audit. Nothing on the
+    dashboards reads this table.
+    """
+    original_id = models.BigIntegerField()
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_notifications'
+    )
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    related_object_id = models.CharField(max_length=100, blank=True, null=True)
+    related_object_type = models.CharField(max_length=100, blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'notification_archive'
+        indexes = [
+            models.Index(fields=['recipient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'Archived notification #{self.original_id} - {self.title}'
+
+
+class BroadcastNotification(models.Model):
+    """
+    One notification for a whole audience (everyone, a user group or a
+    department), stored once and merged into each member's notification list
+    at read time. Per-user read state lives in BroadcastReceipt.
+
+    Only users who joined before the broadcast see it, as if they had been
+    sent their own row at that time.
+    """
+    AUDIENCE_ALL = 'all'
+    AUDIENCE_GROUP = 'group'
+    AUDIENCE_DEPARTMENT = 'department'
+    AUDIENCE_CHOICES = [
+        (AUDIENCE_ALL, 'All users'),
+        (AUDIENCE_GROUP, 'User group'),
+        (AUDIENCE_DEPARTMENT, 'Department'),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default=AUDIENCE_ALL)
+    group = models.ForeignKey(UserGroup, on_delete=models.CASCADE, null=True, blank=True)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='info')
+    related_object_id = models.CharField(max_length=100, blank=True, null=True)
+    related_object_type = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'broadcast_notification'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['audience', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.title} ({self.get_audience_display()})'
+
+
+class BroadcastReceipt(models.Model):
+    """A user's read (and optionally dismissed) state for one broadcast."""
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(default=timezone.now)
+    dismissed = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'broadcast_receipt'
+        unique_together = ('broadcast', 'user')
+
+    def __str__(self):
+        return f'{self.user} read {self.broadcast_id}'
+
+
+class NotificationTombstone(models.Model):
+    """
+    A notification or broadcast removed from a user's list (deleted,
+    dismissed, compacted or pruned by retention), so delta sync can tell
+    clients to drop their copy. Broadcasts deleted for their whole audience
+    have no user.
+
+    Kept for NOTIFICATION_RETENTION_TOMBSTONE_DAYS; sync cursors older than
+    that must start again from the first page.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='notification_tombstones',
+    )
+    # Notification id, or the negated BroadcastNotification id, as in sync cursors
+    sync_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'notification_tombstone'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f'Removed notification {self.sync_id} for {self.user_id}'
@@ -0,0 +1,266 @@
+"""
+Notification retention.
+
+Every SLA breach, lost-and-found broadcast and voucher scan writes one
+Notification row per recipient, and nothing removed them. The
+prune_notifications command (run daily by the notification_retention
+service) now:
+
+- moves read notifications older than NOTIFICATION_RETENTION_READ_DAYS to
+  NotificationArchive (or deletes them when NOTIFICATION_RETENTION_ARCHIVE
+  is off);
+- compacts unread notifications older than
+  NOTIFICATION_RETENTION_UNREAD_DAYS: they are archived the same way and
+  each recipient gets one unread "Older notifications" digest carrying the
+  running count instead;
+- deletes broadcasts (BroadcastNotification) older than the unread horizon
+  together with their BroadcastReceipt rows. A broadcast's read state is
+  per user, so it is kept as long as an unread notification would be; it
+  has no recipient, so it is not archived;
+- deletes NotificationTombstone rows older than
+  NOTIFICATION_RETENTION_TOMBSTONE_DAYS;
+- reports the table's row count and size before and after.
+
+Every notification and broadcast removed leaves a tombstone in the same
+transaction, so delta sync clients drop their copy.
+
+Rows are handled in batches of NOTIFICATION_RETENTION_BATCH_SIZE, one short
+transaction each with a pause in between, so MySQL never holds locks on a
+large range or builds a long undo log. Deleted space is reused by InnoDB
+for new rows; the file only shrinks with OPTIMIZE TABLE, which rebuilds the
+table and is deliberately not run here.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    BroadcastNotification, BroadcastReceipt, Notification, NotificationArchive, NotificationTombstone,
+)
+from .notification_services import tombstone_broadcasts, tombstone_notifications
+
+logger = logging.getLogger(__name__)
+
+# related_object_type of the per-recipient digest left by compaction
+DIGEST_OBJECT_TYPE = 'notification_digest'
+# The digest's message; the running count is read back from it
+DIGEST_MESSAGE = '{count} unread notifications older than {days} days were archived.'
+DIGEST_COUNT_RE = re.compile(r'^(\d+) ')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def notification_table_size():
+    """
+    {'rows': n, 'bytes': n}; bytes (data + indexes) is only known on MySQL
+    and None elsewhere.
+    """
+    size = None
+    if connection.vendor == 'mysql':
+        table = Notification._meta.db_table
+        with connection.cursor() as cursor:
+            # information_schema sizes are cached; refresh the statistics first
+            cursor.execute(f'ANALYZE TABLE `{table}`')
+            cursor.fetchall()
+            cursor.execute(
+                'SELECT data_length + index_length FROM information_schema.TABLES '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+            size = int(row[0]) if row and row[0] is not None else None
+    return {'rows': Notification.objects.count(), 'bytes': size}
+
+
+def _archive_rows(notifications):
+    now = timezone.now()
+    NotificationArchive.objects.bulk_create([
+        NotificationArchive(
+            original_id=n.pk,
+            recipient_id=n.recipient_id,
+            title=n.title,
+            message=n.message,
+            notification_type=n.notification_type,
+            is_read=n.is_read,
+            created_at=n.created_at,
+            related_object_id=n.related_object_id,
+            related_object_type=n.related_object_type,
+            archived_at=now,
+        )
+        for n in notifications
+    ])
+
+
+def _in_batches(queryset, batch_size, archive, pause, sleep, on_batch=None):
+    """
+    Archive (optionally) and delete `queryset` a batch at a time, oldest
+    first. `on_batch(rows)` runs inside each batch's transaction.
+    Returns the number of rows removed.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('created_at', 'pk')[:batch_size])
+            if not rows:
+                break
+            if archive:
+                _archive_rows(rows)
+            tombstone_notifications(rows)
+            Notification.objects.filter(pk__in=[n.pk for n in rows]).delete()
+            if on_batch:
+                on_batch(rows)
+        removed += len(rows)
+        if len(rows) < batch_size:
+            break
+        if pause:
+            sleep(pause)
+    return removed
+
+
+def _digest_count(digest):
+    match = DIGEST_COUNT_RE.match(digest.message)
+    return int(match.group(1)) if match else 0
+
+
+def _add_to_digests(rows, older_than_days):
+    """Fold compacted rows into one unread digest per recipient."""
+    counts = Counter(n.recipient_id for n in rows)
+
+    existing = {
+        digest.recipient_id: digest
+        for digest in Notification.objects.filter(
+            recipient_id__in=counts, is_read=False, related_object_type=DIGEST_OBJECT_TYPE,
+        )
+    }
+    new_digests = []
+    for recipient_id, count in counts.items():
+        digest = existing.get(recipient_id)
+        total = count + (_digest_count(digest) if digest else 0)
+        message = DIGEST_MESSAGE.format(count=total, days=older_than_days)
+        if digest:
+            digest.message = message
+            digest.save(update_fields=['message', 'updated_at'])
+        else:
+            new_digests.append(Notification(
+                recipient_id=recipient_id,
+                title='Older notifications',
+                message=message,
+                notification_type='system',
+                related_object_type=DIGEST_OBJECT_TYPE,
+                created_at=timezone.now(),
+            ))
+    Notification.objects.bulk_create(new_digests)
+
+
+def _delete_in_batches(queryset, batch_size, pause, sleep, on_batch=None):
+    """
+    Delete `queryset` a batch of ids at a time; returns the number of rows
+    removed. `on_batch(ids)` runs inside each batch's transaction.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            queryset.model.objects.filter(pk__in=ids).delete()
+            if on_batch:
+                on_batch(ids)
+        removed += len(ids)
+        if len(ids) < batch_size:
+            break
+        if pause:
+            sleep(pause)
+    return removed
+
+
+def purge_broadcasts(older_than_days, batch_size=1000, pause=0, sleep=time.sleep):
+    """
+    Delete broadcasts older than `older_than_days`; returns the count.
+    Their receipts go first, in batches of their own, so one transaction
+    never cascades over a whole audience.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    broadcasts = BroadcastNotification.objects.filter(created_at__lt=cutoff)
+    _delete_in_batches(BroadcastReceipt.objects.filter(broadcast__in=broadcasts), batch_size, pause, sleep)
+    return _delete_in_batches(broadcasts, batch_size, pause, sleep, on_batch=tombstone_broadcasts)
+
+
+def purge_tombstones(older_than_days, batch_size=1000, pause=0, sleep=time.sleep):
+    """Delete tombstones older than `older_than_days`; returns the count."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return _delete_in_batches(
+        NotificationTombstone.objects.filter(deleted_at__lt=cutoff), batch_size, pause, sleep,
+    )
+
+
+def purge_read_notifications(older_than_days, batch_size=1000, archive=True, pause=0, sleep=time.sleep):
+    """Archive/delete read notifications older than `older_than_days`; returns the count."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    queryset = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+    return _in_batches(queryset, batch_size, archive, pause, sleep)
+
+
+def compact_unread_notifications(older_than_days, batch_size=1000, archive=True, pause=0, sleep=time.sleep):
+    """Replace unread notifications older than `older_than_days` by digests; returns the count."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    queryset = Notification.objects.filter(is_read=False, created_at__lt=cutoff).exclude(
+        related_object_type=DIGEST_OBJECT_TYPE,
+    )
+    return _in_batches(
+        queryset, batch_size, archive, pause, sleep,
+        on_batch=lambda rows: _add_to_digests(rows, older_than_days),
+    )
+
+
+def run_retention(read_days=None, unread_days=None, batch_size=None, archive=None, pause=None,
+                  dry_run=False, sleep=time.sleep):
+    """
+    Run every pass with the NOTIFICATION_RETENTION_* settings unless
+    overridden. Returns {'before', 'after', 'read_removed', 'unread_compacted',
+    'broadcasts_removed', 'tombstones_removed'}; with dry_run only counts
+    what would be removed.
+    """
+    tombstone_days = _setting('NOTIFICATION_RETENTION_TOMBSTONE_DAYS', 30)
+    read_days = read_days if read_days is not None else _setting('NOTIFICATION_RETENTION_READ_DAYS', 30)
+    unread_days = unread_days if unread_days is not None else _setting('NOTIFICATION_RETENTION_UNREAD_DAYS', 90)
+    batch_size = batch_size or _setting('NOTIFICATION_RETENTION_BATCH_SIZE', 1000)
+    archive = archive if archive is not None else _setting('NOTIFICATION_RETENTION_ARCHIVE', True)
+    pause = pause if pause is not None else _setting('NOTIFICATION_RETENTION_PAUSE_SECONDS', 0.1)
+
+    report = {'before': notification_table_size()}
+    if dry_run:
+        now = timezone.now()
+        report['read_removed'] = Notification.objects.filter(
+            is_read=True, created_at__lt=now - timedelta(days=read_days),
+        ).count()
+        report['unread_compacted'] = Notification.objects.filter(
+            is_read=False, created_at__lt=now - timedelta(days=unread_days),
+        ).exclude(related_object_type=DIGEST_OBJECT_TYPE).count()
+        report['broadcasts_removed'] = BroadcastNotification.objects.filter(
+            created_at__lt=now - timedelta(days=unread_days),
+        ).count()
+        report['tombstones_removed'] = NotificationTombstone.objects.filter(
+            deleted_at__lt=now - timedelta(days=tombstone_days),
+        ).count()
+        report['after'] = report['before']
+        return report
+
+    report['read_removed'] = purge_read_notifications(read_days, batch_size, archive, pause, sleep)
+    report['unread_compacted'] = compact_unread_notifications(unread_days, batch_size, archive, pause, sleep)
+    report['broadcasts_removed'] = purge_broadcasts(unread_days, batch_size, pause, sleep)
+    report['tombstones_removed'] = purge_tombstones(tombstone_days, batch_size, pause, sleep)
+    report['after'] = notification_table_size()
+    logger.info(
+        f"Notification retention: removed {report['read_removed']} read, compacted "
+        f"{report['unread_compacted']} unread, {report['broadcasts_removed']} broadcasts; rows {report['before']['rows']} -> {report['after']['rows']}"
+    )
+    return report
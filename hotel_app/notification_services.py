@@ -0,0 +1,286 @@
+"""
+Notification listing helpers.
+
+`notification_page` pages a user's notifications newest first by keyset on
+(created_at, id), so a page costs the same however long the history is.
+
+`notification_changes` is the delta mode: rows created or changed after a
+sync cursor on (updated_at, id), oldest change first, so a client keeps a
+local copy current without downloading its history again. Rows removed
+from the list (deleted, dismissed or cleared by retention) leave a
+NotificationTombstone and are reported as `removed` ids.
+
+A row is stamped when it is saved but only visible once its transaction
+commits, so a row stamped just before a cursor can appear after the client
+read past it. Once a client has caught up its cursor is the read time, and
+the next read re-scans SYNC_LOOKBACK before it; clients upsert rows by id,
+so the repeats are harmless. Cursors older than the tombstones kept
+(NOTIFICATION_RETENTION_TOMBSTONE_DAYS) raise SyncExpired: the client has
+to start again from the first page.
+
+Cursors are opaque strings wrapping a (timestamp, id) pair.
+
+Broadcasts (BroadcastNotification) are stored once per audience;
+`visible_broadcasts` picks a user's and every listing above merges them in
+at read time. BroadcastReceipt rows record who read or dismissed them, and
+a receipt's read_at is the broadcast's change time for delta sync.
+Broadcasts are keyed by their negated id in cursors, so the two tables
+share one (timestamp, id) order.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    BroadcastNotification, BroadcastReceipt, Notification, NotificationTombstone, User, UserGroupMembership,
+    UserProfile,
+)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# How far before a caught-up sync cursor the next read starts again
+SYNC_LOOKBACK = timedelta(seconds=30)
+# Marks a caught-up sync cursor, as opposed to one in the middle of a page run
+_CAUGHT_UP = 'c'
+
+
+class SyncExpired(Exception):
+    """The sync cursor is older than the tombstones kept; sync from the first page."""
+
+
+def encode_cursor(timestamp, pk, caught_up=False):
+    raw = f'{timestamp.isoformat()}|{pk}' + (f'|{_CAUGHT_UP}' if caught_up else '')
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk, *flag = raw.split('|')
+        if flag not in ([], [_CAUGHT_UP]):
+            raise ValueError(raw)
+        timestamp = datetime.fromisoformat(timestamp)
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+        return timestamp, int(pk), bool(flag)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def decode_cursor(cursor):
+    """(timestamp, pk) from `encode_cursor` output; raises ValueError when malformed."""
+    timestamp, pk, _ = _decode(cursor)
+    return timestamp, pk
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        return max(1, min(MAX_PAGE_SIZE, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def unread_count(user):
+    return (
+        Notification.objects.filter(recipient=user, is_read=False).count()
+        + visible_broadcasts(user).filter(is_read=False).count()
+    )
+
+
+def _cursor_id(row):
+    return -row.pk if isinstance(row, BroadcastNotification) else row.pk
+
+
+def _page_key(row):
+    return row.created_at, _cursor_id(row)
+
+
+def _change_key(row):
+    if isinstance(row, BroadcastNotification):
+        return row.changed_at, -row.pk
+    if isinstance(row, NotificationTombstone):
+        return row.deleted_at, row.sync_id
+    return row.updated_at, row.pk
+
+
+def _removed_id(tombstone):
+    """The client-side id of a removed row, as serialize_notifications gives it."""
+    if tombstone.sync_id < 0:
+        return f'broadcast-{-tombstone.sync_id}'
+    return tombstone.sync_id
+
+
+def _broadcast_changes(user):
+    """visible_broadcasts annotated with `changed_at`: when `user` read it, else when it was sent."""
+    read_at = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user).values('read_at')[:1]
+    return visible_broadcasts(user).annotate(changed_at=Coalesce(Subquery(read_at), F('created_at')))
+
+
+def sync_cursor(user):
+    """
+    Cursor to start delta syncing from. Take it before reading the first
+    page: it is the current time, so changes made while paging are synced.
+    """
+    return encode_cursor(timezone.now(), 0, caught_up=True)
+
+
+def tombstone_notifications(notifications):
+    """Record Notification rows about to be removed, for delta sync."""
+    NotificationTombstone.objects.bulk_create([
+        NotificationTombstone(user_id=n.recipient_id, sync_id=n.pk) for n in notifications
+    ])
+
+
+def tombstone_broadcasts(broadcast_ids, user=None):
+    """Record broadcasts removed from `user`'s list, or from everyone's when `user` is None."""
+    NotificationTombstone.objects.bulk_create([
+        NotificationTombstone(user=user, sync_id=-pk) for pk in broadcast_ids
+    ])
+
+
+def notification_page(user, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of `user`'s notifications and broadcasts, newest first, after
+    `cursor`. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    notifications = Notification.objects.filter(recipient=user).order_by('-created_at', '-pk')
+    broadcasts = visible_broadcasts(user).order_by('-created_at', 'pk')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        notifications = notifications.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        broadcasts = broadcasts.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__gt=-pk))
+
+    rows = sorted(list(notifications[:limit + 1]) + list(broadcasts[:limit + 1]), key=_page_key, reverse=True)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*_page_key(rows[-1]))
+
+
+def notification_changes(user, since, limit=MAX_PAGE_SIZE):
+    """
+    Notifications and broadcasts of `user` created, read or changed after
+    the sync cursor `since`, and the ids of those removed since. Returns
+    (rows, removed, cursor, has_more); call again with `cursor` while
+    has_more is true. Raises SyncExpired when `since` is too old.
+    """
+    now = timezone.now()
+    timestamp, pk, caught_up = _decode(since)
+    tombstone_days = getattr(settings, 'NOTIFICATION_RETENTION_TOMBSTONE_DAYS', 30)
+    if timestamp < now - timedelta(days=tombstone_days):
+        raise SyncExpired(since)
+
+    notifications = Notification.objects.filter(recipient=user).order_by('updated_at', 'pk')
+    broadcasts = _broadcast_changes(user).order_by('changed_at', '-pk')
+    tombstones = NotificationTombstone.objects.filter(
+        Q(user=user) | Q(user__isnull=True),
+    ).order_by('deleted_at', 'sync_id')
+    if caught_up:
+        start = timestamp - SYNC_LOOKBACK
+        notifications = notifications.filter(updated_at__gte=start)
+        broadcasts = broadcasts.filter(changed_at__gte=start)
+        tombstones = tombstones.filter(deleted_at__gte=start)
+    else:
+        notifications = notifications.filter(Q(updated_at__gt=timestamp) | Q(updated_at=timestamp, pk__gt=pk))
+        broadcasts = broadcasts.filter(Q(changed_at__gt=timestamp) | Q(changed_at=timestamp, pk__lt=-pk))
+        tombstones = tombstones.filter(Q(deleted_at__gt=timestamp) | Q(deleted_at=timestamp, sync_id__gt=pk))
+
+    rows = sorted(
+        list(notifications[:limit + 1]) + list(broadcasts[:limit + 1]) + list(tombstones[:limit + 1]),
+        key=_change_key,
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        cursor = encode_cursor(*_change_key(rows[-1]))
+    else:
+        cursor = encode_cursor(now, 0, caught_up=True)
+    removed = [_removed_id(row) for row in rows if isinstance(row, NotificationTombstone)]
+    rows = [row for row in rows if not isinstance(row, NotificationTombstone)]
+    return rows, removed, cursor, has_more
+
+
+def serialize_notifications(rows):
+    """Serialize a mix of Notification rows and visible_broadcasts rows."""
+    from .serializers import BroadcastNotificationSerializer, NotificationSerializer
+
+    return [
+        (BroadcastNotificationSerializer if isinstance(row, BroadcastNotification) else NotificationSerializer)(row).data
+        for row in rows
+    ]
+
+
+# --------------------------------------------------
+# BROADCASTS
+# --------------------------------------------------
+def audience_users(broadcast):
+    """Active users a broadcast is shown to."""
+    users = User.objects.filter(is_active=True, date_joined__lte=broadcast.created_at)
+    if broadcast.audience == BroadcastNotification.AUDIENCE_GROUP:
+        return users.filter(usergroupmembership__group_id=broadcast.group_id)
+    if broadcast.audience == BroadcastNotification.AUDIENCE_DEPARTMENT:
+        return users.filter(userprofile__department_id=broadcast.department_id)
+    return users
+
+
+def visible_broadcasts(user):
+    """
+    Broadcasts addressed to `user` and not dismissed by them, annotated with
+    `is_read`.
+    """
+    audience = (
+        Q(audience=BroadcastNotification.AUDIENCE_ALL)
+        | Q(
+            audience=BroadcastNotification.AUDIENCE_GROUP,
+            group_id__in=UserGroupMembership.objects.filter(user=user).values('group_id'),
+        )
+        | Q(
+            audience=BroadcastNotification.AUDIENCE_DEPARTMENT,
+            department_id__in=UserProfile.objects.filter(user=user).values('department_id'),
+        )
+    )
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user)
+    return (
+        BroadcastNotification.objects.filter(audience, created_at__gte=user.date_joined)
+        .annotate(is_read=Exists(receipts), is_dismissed=Exists(receipts.filter(dismissed=True)))
+        .filter(is_dismissed=False)
+    )
+
+
+def unread_notifications(user):
+    """`user`'s unread notifications and broadcasts, serialized, newest first."""
+    rows = list(Notification.objects.filter(recipient=user, is_read=False).order_by('-created_at'))
+    rows += visible_broadcasts(user).filter(is_read=False)
+    rows.sort(key=lambda row: row.created_at, reverse=True)
+    return serialize_notifications(rows)
+
+
+def mark_broadcasts_read(user, broadcast_ids=None, dismiss=False):
+    """
+    Record `user` reading (or dismissing) the given visible broadcasts, or all
+    unread ones. Returns the number of broadcasts updated.
+    """
+    broadcasts = visible_broadcasts(user)
+    if broadcast_ids is not None:
+        broadcasts = broadcasts.filter(pk__in=broadcast_ids)
+    if not dismiss:
+        broadcasts = broadcasts.filter(is_read=False)
+    ids = list(broadcasts.values_list('pk', flat=True))
+    if not ids:
+        return 0
+
+    with transaction.atomic():
+        if dismiss:
+            BroadcastReceipt.objects.filter(user=user, broadcast_id__in=ids).update(dismissed=True)
+            tombstone_broadcasts(ids, user)
+        BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast_id=pk, user=user, dismissed=dismiss) for pk in ids],
+            ignore_conflicts=True,
+        )
+    return len(ids)
@@ -0,0 +1,389 @@
+"""
+Server-sent events stream of new notifications.
+
+The dashboards used to poll /api/notification/notifications/ every 30
+seconds per open tab. Under ASGI (config/asgi.py routes STREAM_PATH here)
+each tab instead keeps one EventSource connection open:
+
+- one NotificationHub per process polls for rows with a larger id than the
+  last one it saw (a primary-key range scan, however many tabs are open)
+  and hands them to the connected recipients' queues;
+- rows are written inside longer transactions (bulk notifications, ticket
+  creation), so a lower id can commit after a higher one. Each poll and
+  each replay therefore re-reads the LOOKBACK_IDS ids behind its cursor;
+  the hub remembers the ids it has seen in that window, and clients skip
+  ids they already have;
+- a client reconnecting with `?since=<id>` or the standard Last-Event-ID
+  header is first sent the rows it missed, so nothing is lost across
+  reconnects or hub polls;
+- broadcasts (BroadcastNotification) are pushed to the connected members
+  of their audience as they appear, without an event id. With
+  `?broadcast_since=<broadcast id>` the visible broadcasts after it are
+  replayed on every (re)connect; clients de-duplicate them by id;
+- each connection starts with a `ready` event carrying the newest
+  notification and broadcast ids, so a client can load its list once and
+  reconnect from those cursors afterwards;
+- when a backlog is longer than BACKLOG_LIMIT a `resync` event tells the
+  client to reload its list from the REST API instead;
+- comment lines are sent as heartbeats so proxies keep the connection.
+
+The REST endpoints stay as they are; the templates fall back to polling
+when the stream is unavailable (e.g. when served by a WSGI worker).
+"""
+import asyncio
+import json
+import logging
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/notification/stream/'
+
+# Rows replayed to a reconnecting client; older gaps are left to the REST API
+BACKLOG_LIMIT = 200
+# Rows read per hub poll query
+POLL_BATCH = 1000
+# Ids behind a cursor read again, for rows whose transaction committed late
+LOOKBACK_IDS = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# --------------------------------------------------
+# DATABASE ACCESS (sync, run through sync_to_async)
+# --------------------------------------------------
+def _serialize(notifications):
+    from .serializers import NotificationSerializer
+
+    return NotificationSerializer(notifications, many=True).data
+
+
+def _latest_ids():
+    """Newest Notification and BroadcastNotification ids."""
+    from .models import BroadcastNotification, Notification
+
+    return (
+        Notification.objects.order_by('-pk').values_list('pk', flat=True).first() or 0,
+        BroadcastNotification.objects.order_by('-pk').values_list('pk', flat=True).first() or 0,
+    )
+
+
+def _window_ids(model, after_id):
+    return set(model.objects.filter(pk__gt=max(after_id - LOOKBACK_IDS, 0)).values_list('pk', flat=True))
+
+
+def _start_window():
+    """
+    ((newest Notification id, ids in its lookback window), (the same for
+    BroadcastNotification)): where a hub starts, with every existing row seen.
+    """
+    from .models import BroadcastNotification, Notification
+
+    latest_id, latest_broadcast_id = _latest_ids()
+    return (
+        (latest_id, _window_ids(Notification, latest_id)),
+        (latest_broadcast_id, _window_ids(BroadcastNotification, latest_broadcast_id)),
+    )
+
+
+def _scan(model, after_id, seen):
+    """
+    Ids of `model` rows after `after_id`, or up to LOOKBACK_IDS behind it,
+    that are not in `seen`, and the id to poll from next. `seen` gets the
+    new ids and drops those that left the window.
+    """
+    start = max(after_id - LOOKBACK_IDS, 0)
+    fresh = []
+    while True:
+        batch = list(model.objects.filter(pk__gt=start).order_by('pk').values_list('pk', flat=True)[:POLL_BATCH])
+        if not batch:
+            break
+        start = batch[-1]
+        fresh.extend(pk for pk in batch if pk not in seen)
+        if len(batch) < POLL_BATCH:
+            break
+    after_id = max(after_id, start)
+    seen.update(fresh)
+    seen.difference_update([pk for pk in seen if pk <= after_id - LOOKBACK_IDS])
+    return fresh, after_id
+
+
+def _new_notifications(after_id, user_ids, seen):
+    """Unseen rows in the window of `after_id` for `user_ids`, and the id to poll from next."""
+    from .models import Notification
+
+    ids, after_id = _scan(Notification, after_id, seen)
+    if not ids:
+        return [], after_id
+    notifications = list(Notification.objects.filter(pk__in=ids, recipient_id__in=user_ids).order_by('pk'))
+    return [(n.recipient_id, data) for n, data in zip(notifications, _serialize(notifications))], after_id
+
+
+def _new_broadcasts(after_id, user_ids, seen):
+    """Unseen broadcasts in the window of `after_id` for whichever of `user_ids` are in their audience."""
+    from .models import BroadcastNotification
+    from .notification_services import audience_users
+    from .serializers import BroadcastNotificationSerializer
+
+    ids, after_id = _scan(BroadcastNotification, after_id, seen)
+    broadcasts = list(BroadcastNotification.objects.filter(pk__in=ids).order_by('pk')) if ids else []
+    rows = []
+    for broadcast in broadcasts:
+        broadcast.is_read = False
+        data = BroadcastNotificationSerializer(broadcast).data
+        recipients = audience_users(broadcast).filter(pk__in=user_ids).values_list('pk', flat=True)
+        rows.extend((user_id, data) for user_id in recipients)
+    return rows, after_id
+
+
+def _backlog(user_id, since):
+    from .models import Notification
+
+    notifications = list(
+        Notification.objects.filter(recipient_id=user_id, pk__gt=max(since - LOOKBACK_IDS, 0))
+        .order_by('pk')[:BACKLOG_LIMIT]
+    )
+    return list(_serialize(notifications))
+
+
+def _broadcast_backlog(user_id, since):
+    from django.contrib.auth.models import User
+
+    from .notification_services import visible_broadcasts
+    from .serializers import BroadcastNotificationSerializer
+
+    user = User.objects.get(pk=user_id)
+    broadcasts = list(
+        visible_broadcasts(user).filter(pk__gt=max(since - LOOKBACK_IDS, 0)).order_by('pk')[:BACKLOG_LIMIT]
+    )
+    return list(BroadcastNotificationSerializer(broadcasts, many=True).data)
+
+
+def _authenticate(headers):
+    """User id from the session cookie or an `Authorization: Token` header, else None."""
+    from django.contrib.auth import get_user
+
+    cookie_header = headers.get(b'cookie', b'').decode('latin-1')
+    session_key = None
+    if cookie_header:
+        morsel = SimpleCookie(cookie_header).get(settings.SESSION_COOKIE_NAME)
+        session_key = morsel.value if morsel else None
+    if session_key:
+        engine = import_module(settings.SESSION_ENGINE)
+        user = get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+        if user.is_authenticated:
+            return user.pk
+
+    authorization = headers.get(b'authorization', b'').decode('latin-1').split()
+    if len(authorization) == 2 and authorization[0].lower() == 'token':
+        from rest_framework.authtoken.models import Token
+
+        token = Token.objects.select_related('user').filter(key=authorization[1]).first()
+        if token and token.user.is_active:
+            return token.user_id
+    return None
+
+
+# --------------------------------------------------
+# HUB
+# --------------------------------------------------
+class _Subscription(asyncio.Queue):
+    overflowed = False
+
+
+class NotificationHub:
+    """Polls for new notifications once per process and fans them out to subscribers."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._task = None
+        self._last_id = None
+        self._last_broadcast_id = None
+        # Ids read within the lookback window of each cursor
+        self._seen = set()
+        self._seen_broadcasts = set()
+
+    def subscribe(self, user_id):
+        queue = _Subscription(maxsize=100)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # Resume from the newest row when the next subscriber arrives
+            self._last_id = self._last_broadcast_id = None
+
+    def publish(self, user_id, data):
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Slow client: its stream ends and it replays from its cursor
+                queue.overflowed = True
+
+    async def poll_once(self):
+        if self._last_id is None:
+            (
+                (self._last_id, self._seen), (self._last_broadcast_id, self._seen_broadcasts)
+            ) = await sync_to_async(_start_window)()
+        user_ids = set(self._subscribers)
+        rows, self._last_id = await sync_to_async(_new_notifications)(self._last_id, user_ids, self._seen)
+        broadcasts, self._last_broadcast_id = await sync_to_async(_new_broadcasts)(
+            self._last_broadcast_id, user_ids, self._seen_broadcasts
+        )
+        for user_id, data in rows + broadcasts:
+            self.publish(user_id, data)
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                await sync_to_async(close_old_connections)()
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Notification stream poll failed: {str(e)}')
+            await asyncio.sleep(_setting('NOTIFICATION_STREAM_POLL_SECONDS', 2))
+
+
+hub = NotificationHub()
+
+
+# --------------------------------------------------
+# ASGI APPLICATION
+# --------------------------------------------------
+def _event(data):
+    payload = f"event: notification\ndata: {json.dumps(data, default=str)}\n\n"
+    if data.get('is_broadcast'):
+        # Broadcast ids are not notification ids, so they do not move the cursor
+        return payload.encode()
+    return f"id: {data['id']}\n{payload}".encode()
+
+
+RESYNC_EVENT = b"event: resync\ndata: {}\n\n"
+
+
+def _ready_event(notification_id, broadcast_id):
+    data = json.dumps({'notification_id': notification_id, 'broadcast_id': broadcast_id})
+    return f"event: ready\ndata: {data}\n\n".encode()
+
+
+def _cursor(scope, headers):
+    values = parse_qs(scope.get('query_string', b'').decode()).get('since', [])
+    values.append(headers.get(b'last-event-id', b'').decode('latin-1'))
+    cursors = [int(value) for value in values if value.strip().isdigit()]
+    return max(cursors) if cursors else None
+
+
+def _broadcast_cursor(scope):
+    values = parse_qs(scope.get('query_string', b'').decode()).get('broadcast_since', [])
+    cursors = [int(value) for value in values if value.strip().isdigit()]
+    return max(cursors) if cursors else None
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app serving STREAM_PATH."""
+    if scope['method'] != 'GET':
+        await _respond(send, 405, b'Method not allowed')
+        return
+
+    headers = dict(scope.get('headers') or [])
+    await sync_to_async(close_old_connections)()
+    user_id = await sync_to_async(_authenticate)(headers)
+    if user_id is None:
+        await _respond(send, 403, b'Authentication required')
+        return
+
+    queue = hub.subscribe(user_id)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _setting('NOTIFICATION_STREAM_MAX_AGE_SECONDS', 3600)
+    heartbeat = _setting('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 15)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        latest = await sync_to_async(_latest_ids)()
+        await send({'type': 'http.response.body', 'body': _ready_event(*latest), 'more_body': True})
+
+        # Subscribed before reading the backlog, so nothing falls in between;
+        # ids already sent are skipped below
+        sent = set()
+        truncated = False
+        since = _cursor(scope, headers)
+        if since:
+            backlog = await sync_to_async(_backlog)(user_id, since)
+            truncated = len(backlog) >= BACKLOG_LIMIT
+            for data in backlog:
+                await send({'type': 'http.response.body', 'body': _event(data), 'more_body': True})
+                sent.add(data['id'])
+        broadcast_since = _broadcast_cursor(scope)
+        if broadcast_since is not None:
+            backlog = await sync_to_async(_broadcast_backlog)(user_id, broadcast_since)
+            truncated = truncated or len(backlog) >= BACKLOG_LIMIT
+            for data in backlog:
+                await send({'type': 'http.response.body', 'body': _event(data), 'more_body': True})
+                sent.add(data['id'])
+        if truncated:
+            await send({'type': 'http.response.body', 'body': RESYNC_EVENT, 'more_body': True})
+
+        while not disconnected.done() and not queue.overflowed and loop.time() < deadline:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+            data = getter.result()
+            if data['id'] in sent:
+                continue
+            await send({'type': 'http.response.body', 'body': _event(data), 'more_body': True})
+
+        if not disconnected.done():
+            # Max age reached or the client fell behind: let it reconnect from its cursor
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        hub.unsubscribe(user_id, queue)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
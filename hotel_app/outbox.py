@@ -0,0 +1,463 @@
+"""
+Outbound notification queue.
+
+Push notifications, WhatsApp messages and emails used to be sent inside
+whatever view or signal produced them, so ticket creation, assignment and
+escalation waited on Firebase, Twilio and SMTP. Producers now call the
+queue_* helpers below, which only insert an OutboundMessage row (in the
+caller's transaction, so nothing is sent for a rolled-back change). The
+run_outbox_worker command drains the table:
+
+- rows are claimed in batches per channel with SELECT ... FOR UPDATE SKIP
+  LOCKED, so several workers can run side by side;
+- a claimed row's next_attempt_at is pushed forward by a lease, so a row
+  whose worker dies is picked up again once the lease runs out;
+- failures are retried with exponential backoff until
+  NOTIFICATION_OUTBOX_MAX_ATTEMPTS, then marked failed;
+- each channel has a token bucket (NOTIFICATION_OUTBOX_RATE_LIMITS, sends
+  per second) so a broadcast cannot exceed the provider's quota;
+- pushes are coalesced: rows queued within the same
+  NOTIFICATION_PUSH_COALESCE_SECONDS window fall due together, and the
+  worker sends at most one push per recipient and notification type for
+  them ("5 new alerts" instead of five pushes). In-app rows are unaffected;
+- claimed WhatsApp rows are sent as one batch over the pooled Twilio
+  transport, concurrently across recipients.
+
+With NOTIFICATION_OUTBOX_ENABLED off (the default; only
+docker-compose.prod.yml, which runs the worker, turns it on) the helpers
+deliver immediately, as before.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = [OutboundMessage.CHANNEL_FCM, OutboundMessage.CHANNEL_WHATSAPP, OutboundMessage.CHANNEL_EMAIL]
+
+# How long a claimed row stays invisible to other workers
+LEASE_SECONDS = 300
+
+
+class OutboxDeliveryError(Exception):
+    """Delivery failed and should be retried."""
+
+
+def outbox_enabled():
+    return getattr(settings, 'NOTIFICATION_OUTBOX_ENABLED', False)
+
+
+# --------------------------------------------------
+# PRODUCERS
+# --------------------------------------------------
+def coalesce_window():
+    return getattr(settings, 'NOTIFICATION_PUSH_COALESCE_SECONDS', 0)
+
+
+def _window_end(now, window):
+    """End of the fixed `window`-second slot containing `now`."""
+    timestamp = now.timestamp()
+    return now + timedelta(seconds=(window - timestamp % window) if timestamp % window else 0)
+
+
+def enqueue(channel, payload):
+    """Queue one delivery, or deliver it now when the outbox is disabled."""
+    if not outbox_enabled():
+        try:
+            deliver(channel, payload)
+        except Exception as e:
+            logger.error(f'Immediate {channel} delivery failed: {str(e)}')
+        return None
+
+    message = OutboundMessage(channel=channel, payload=payload)
+    window = coalesce_window()
+    if channel == OutboundMessage.CHANNEL_FCM and window > 0:
+        # Pushes queued in the same window are claimed and coalesced together
+        message.next_attempt_at = _window_end(timezone.now(), window)
+    message.save()
+    return message
+
+
+def queue_push(user_ids, title, body, data=None):
+    """Queue the same push notification for every user in `user_ids`."""
+    user_ids = [getattr(user, 'pk', user) for user in user_ids]
+    if not user_ids:
+        return None
+    return enqueue(OutboundMessage.CHANNEL_FCM, {
+        'user_ids': user_ids, 'title': title, 'body': body, 'data': data or {},
+    })
+
+
+def queue_push_messages(messages):
+    """Queue a different push per user: `messages` is {user_id: (title, body, data)}."""
+    if not messages:
+        return None
+    return enqueue(OutboundMessage.CHANNEL_FCM, {
+        'messages': {str(user_id): list(message) for user_id, message in messages.items()},
+    })
+
+
+def queue_whatsapp(to_number, body=None, content_sid=None, content_variables=None):
+    """Queue a WhatsApp message through the shared Twilio service."""
+    payload = {'to_number': to_number, 'body': body}
+    if content_sid:
+        payload['content_sid'] = content_sid
+        payload['content_variables'] = content_variables
+    return enqueue(OutboundMessage.CHANNEL_WHATSAPP, payload)
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """Queue one email (one SMTP send for all of `recipient_list`)."""
+    recipient_list = [address for address in recipient_list if address]
+    if not recipient_list:
+        return None
+    return enqueue(OutboundMessage.CHANNEL_EMAIL, {
+        'subject': subject,
+        'message': message,
+        'recipient_list': recipient_list,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+    })
+
+
+# --------------------------------------------------
+# DELIVERY
+# --------------------------------------------------
+def message_cost(channel, payload):
+    """Rate-limit cost of a row: one per push recipient, one per message otherwise."""
+    if channel == OutboundMessage.CHANNEL_FCM:
+        return max(1, len(payload.get('user_ids') or payload.get('messages') or ()))
+    return 1
+
+
+def _deliver_push(payload):
+    from .fcm_utils import send_push_messages, send_push_notification_to_users
+
+    if 'messages' in payload:
+        report = send_push_messages({
+            int(user_id): tuple(message) for user_id, message in payload['messages'].items()
+        })
+    else:
+        report = send_push_notification_to_users(
+            payload['user_ids'], payload['title'], payload['body'], payload.get('data') or None,
+        )
+    # Nothing went out and not because the tokens are dead: FCM or the network
+    # is down. Partial failures are not retried, that would duplicate pushes.
+    if report['tokens'] and not report['sent'] and report['failed'] > report['deactivated']:
+        raise OutboxDeliveryError(f"All {report['failed']} push sends failed")
+    return report
+
+
+# Summary wording per Notification.notification_type
+PUSH_SUMMARY_LABELS = {
+    'warning': 'alerts',
+    'error': 'errors',
+    'request': 'ticket updates',
+    'voucher': 'voucher updates',
+    'system': 'system messages',
+}
+
+
+def _push_items(payload):
+    """(user_id, title, body, data) for each recipient of one push payload."""
+    if 'messages' in payload:
+        for user_id, (title, body, data) in payload['messages'].items():
+            yield int(user_id), title, body, data or {}
+    else:
+        for user_id in payload['user_ids']:
+            yield int(user_id), payload['title'], payload['body'], payload.get('data') or {}
+
+
+def coalesce_pushes(payloads):
+    """
+    Merge push payloads into one push per recipient and notification type.
+    Returns {user_id: [(title, body, data), ...]}. A push whose data has
+    `count` stands for that many notifications.
+    """
+    groups = {}
+    for payload in payloads:
+        for user_id, title, body, data in _push_items(payload):
+            groups.setdefault((user_id, data.get('type') or 'info'), []).append((title, body, data))
+
+    messages = {}
+    for (user_id, notification_type), items in groups.items():
+        if len(items) == 1:
+            message = items[0]
+        else:
+            count = sum(int(data.get('count') or 1) for _, _, data in items)
+            label = PUSH_SUMMARY_LABELS.get(notification_type, 'notifications')
+            titles = [title for title, _, _ in items]
+            body = ' • '.join(titles[:3])
+            if len(titles) > 3:
+                body += f' and {len(titles) - 3} more'
+            message = (
+                f'{count} new {label}',
+                body,
+                {'type': notification_type, 'count': str(count), 'coalesced': 'true'},
+            )
+        messages.setdefault(user_id, []).append(message)
+    return messages
+
+
+def _deliver_push_batch(payloads):
+    """Send the coalesced pushes for several payloads; raises like _deliver_push."""
+    from .fcm_utils import send_push_messages
+
+    per_user = coalesce_pushes(payloads)
+    report = {'tokens': 0, 'sent': 0, 'failed': 0, 'deactivated': 0}
+    # One fan-out per round; a user only gets a second round for a second type
+    for index in range(max((len(messages) for messages in per_user.values()), default=0)):
+        round_report = send_push_messages({
+            user_id: messages[index] for user_id, messages in per_user.items() if len(messages) > index
+        })
+        for key in report:
+            report[key] += round_report[key]
+    if report['tokens'] and not report['sent'] and report['failed'] > report['deactivated']:
+        raise OutboxDeliveryError(f"All {report['failed']} push sends failed")
+    return report
+
+
+def _deliver_whatsapp(payload):
+    from .twilio_service import twilio_service
+
+    result = twilio_service.send_whatsapp_message(
+        to_number=payload['to_number'],
+        body=payload.get('body'),
+        content_sid=payload.get('content_sid'),
+        content_variables=payload.get('content_variables'),
+    )
+    if not result.get('success'):
+        raise OutboxDeliveryError(result.get('error') or 'WhatsApp send failed')
+    return result
+
+
+def _deliver_whatsapp_batch(payloads):
+    """Send several WhatsApp payloads concurrently; returns one result dict per payload."""
+    from .twilio_service import twilio_service
+
+    return twilio_service.send_whatsapp_batch([
+        {
+            'to_number': payload['to_number'],
+            'body': payload.get('body'),
+            'content_sid': payload.get('content_sid'),
+            'content_variables': payload.get('content_variables'),
+        }
+        for payload in payloads
+    ])
+
+
+def _deliver_email(payload):
+    from django.core.mail import send_mail
+
+    return send_mail(
+        subject=payload['subject'],
+        message=payload['message'],
+        from_email=payload.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+        recipient_list=payload['recipient_list'],
+        fail_silently=False,
+    )
+
+
+_DELIVERY = {
+    OutboundMessage.CHANNEL_FCM: _deliver_push,
+    OutboundMessage.CHANNEL_WHATSAPP: _deliver_whatsapp,
+    OutboundMessage.CHANNEL_EMAIL: _deliver_email,
+}
+
+
+def deliver(channel, payload):
+    """Send one payload now; raises on failure."""
+    return _DELIVERY[channel](payload)
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts."""
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_SECONDS', 30)
+    cap = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+# --------------------------------------------------
+# WORKER
+# --------------------------------------------------
+class RateLimiter:
+    """
+    Token bucket allowing `rate` sends per second with bursts of up to one
+    second's worth. A large batch may overdraw the bucket; the next take()
+    then waits until it is paid back.
+    """
+
+    def __init__(self, rate, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+    def take(self, cost=1):
+        """Consume `cost`; returns the seconds to wait before sending."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        wait = 0.0 if self.tokens > 0 else -self.tokens / self.rate + 1.0 / self.rate
+        self.tokens -= cost
+        return wait
+
+
+class OutboxWorker:
+    """Drains OutboundMessage rows; see the module docstring."""
+
+    def __init__(self, batch_size=100, poll_interval=2, sleep=time.sleep):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._sleep = sleep
+        self._stop = threading.Event()
+        limits = getattr(settings, 'NOTIFICATION_OUTBOX_RATE_LIMITS', {})
+        self.limiters = {
+            channel: RateLimiter(limits[channel]) for channel in CHANNELS if limits.get(channel)
+        }
+
+    def claim(self, channel, limit, now=None):
+        """Lease up to `limit` due rows of `channel`; returns them."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            pks = list(
+                OutboundMessage.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboundMessage.STATUS_PENDING, channel=channel, next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'pk')
+                .values_list('pk', flat=True)[:limit]
+            )
+            if not pks:
+                return []
+            OutboundMessage.objects.filter(pk__in=pks).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+            )
+        return list(OutboundMessage.objects.filter(pk__in=pks).order_by('next_attempt_at', 'pk'))
+
+    def _throttle(self, channel, cost):
+        limiter = self.limiters.get(channel)
+        if limiter:
+            wait = limiter.take(cost)
+            if wait > 0:
+                self._sleep(wait)
+
+    def _process(self, message):
+        self._throttle(message.channel, message_cost(message.channel, message.payload))
+        try:
+            deliver(message.channel, message.payload)
+        except Exception as e:
+            return self._failed(message, e)
+        return self._sent(message)
+
+    def _process_pushes(self, messages):
+        """Deliver claimed push rows together, coalesced per recipient and type."""
+        self._throttle(
+            OutboundMessage.CHANNEL_FCM,
+            sum(len(pushes) for pushes in coalesce_pushes([m.payload for m in messages]).values()),
+        )
+        try:
+            _deliver_push_batch([m.payload for m in messages])
+        except Exception as e:
+            return [self._failed(message, e) for message in messages]
+        return [self._sent(message) for message in messages]
+
+    def _process_whatsapp(self, messages):
+        """Deliver claimed WhatsApp rows as one concurrent batch."""
+        self._throttle(OutboundMessage.CHANNEL_WHATSAPP, len(messages))
+        try:
+            results = _deliver_whatsapp_batch([m.payload for m in messages])
+        except Exception as e:
+            return [self._failed(message, e) for message in messages]
+        return [
+            self._sent(message) if result.get('success')
+            else self._failed(message, OutboxDeliveryError(result.get('error') or 'WhatsApp send failed'))
+            for message, result in zip(messages, results)
+        ]
+
+    def _failed(self, message, e):
+        max_attempts = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 6)
+        error = str(e)[:2000]
+        if message.attempts >= max_attempts:
+            logger.error(f'Giving up on {message} after {message.attempts} attempts: {error}')
+            OutboundMessage.objects.filter(pk=message.pk).update(
+                status=OutboundMessage.STATUS_FAILED, last_error=error,
+            )
+            return 'failed'
+        logger.warning(f'Retrying {message} (attempt {message.attempts}): {error}')
+        OutboundMessage.objects.filter(pk=message.pk).update(
+            next_attempt_at=timezone.now() + retry_delay(message.attempts), last_error=error,
+        )
+        return 'retried'
+
+    def _sent(self, message):
+        OutboundMessage.objects.filter(pk=message.pk).update(
+            status=OutboundMessage.STATUS_SENT, sent_at=timezone.now(), last_error='',
+        )
+        return 'sent'
+
+    def drain_once(self, now=None):
+        """
+        Claim and deliver one batch per channel. Returns
+        {'sent': n, 'retried': n, 'failed': n}.
+        """
+        report = {'sent': 0, 'retried': 0, 'failed': 0}
+        for channel in CHANNELS:
+            limit = self.batch_size
+            limiter = self.limiters.get(channel)
+            if limiter:
+                # Do not lease more than the bucket can send soon
+                limit = max(1, min(limit, int(limiter.available()) or 1))
+            messages = self.claim(channel, limit, now=now)
+            if channel == OutboundMessage.CHANNEL_FCM and len(messages) > 1 and coalesce_window() > 0:
+                for result in self._process_pushes(messages):
+                    report[result] += 1
+                continue
+            if channel == OutboundMessage.CHANNEL_WHATSAPP and len(messages) > 1:
+                for result in self._process_whatsapp(messages):
+                    report[result] += 1
+                continue
+            for message in messages:
+                report[self._process(message)] += 1
+                if self._stop.is_set():
+                    return report
+        return report
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                report = self.drain_once()
+            except Exception as e:
+                logger.error(f'Outbox worker error: {str(e)}', exc_info=True)
+                report = None
+            if not report or not any(report.values()):
+                self._stop.wait(self.poll_interval)
+
+
+def outbox_stats():
+    """Row counts per (channel, status), for monitoring."""
+    from django.db.models import Count
+
+    return {
+        (row['channel'], row['status']): row['count']
+        for row in OutboundMessage.objects.values('channel', 'status').annotate(count=Count('pk')).order_by()
+    }
@@ -0,0 +1,203 @@
+"""
+Compiled request-type matcher for inbound WhatsApp messages.
+
+WhatsAppWorkflow._detect_request_type used to load every RequestKeyword
+for each message and test each one as a substring, then re-tokenize every
+active RequestType name and description when nothing matched. This module
+compiles both into one in-memory structure per worker process:
+
+- an Aho-Corasick automaton over the lowercased keywords, so one pass over
+  the message finds every keyword it contains (overlapping ones and ones
+  inside longer words included, as the substring test did);
+- for the fallback, a second automaton over the active request type names
+  and an inverted index from name/description tokens to request types.
+
+Detection then runs without queries. The matcher is rebuilt when its
+version changes; the version lives in the shared cache and is bumped by
+the RequestKeyword/RequestType signals, so an edit made in one gunicorn
+worker reaches every worker.
+"""
+import copy
+import logging
+import re
+from collections import deque
+
+from .cache_versions import get_version, invalidate_version
+from .models import RequestKeyword, RequestType
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = 'request_matcher:version'
+
+# Fallback scores, as before: a full request type name in the message
+# outweighs single name/description tokens
+NAME_SCORE = 5
+TOKEN_SCORE = 1
+
+TOKEN_RE = re.compile(r"[a-zA-Z0-9']+")
+
+# In-process matcher and the shared version it was built under
+_matcher = None
+_matcher_version = None
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton. `find(text)` returns the indexes of all
+    patterns occurring in `text`, in one pass over it.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, pattern in enumerate(patterns):
+            if pattern:
+                self._add(pattern, index)
+        self._link()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(index)
+
+    def _link(self):
+        # Breadth-first, so a state's failure link is final before its children's
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Patterns ending at the failure state end here too
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class RequestMatcher:
+    """Keyword and fallback lookups for one snapshot of RequestKeyword/RequestType."""
+
+    def __init__(self, keywords, request_types):
+        """
+        `keywords`: (keyword, request_type_id, weight) in RequestKeyword order.
+        `request_types`: every RequestType; only active ones take part in the fallback.
+        """
+        self._keywords = [(keyword.lower(), request_type_id, weight) for keyword, request_type_id, weight in keywords]
+        self._keyword_automaton = KeywordAutomaton([keyword for keyword, _, _ in self._keywords])
+        self._request_types = {rt.pk: rt for rt in request_types}
+
+        # Fallback, in the order the active request types were listed
+        self._fallback_order = {}
+        self._fallback_names = []
+        self._token_index = {}
+        for rt in request_types:
+            if not rt.active:
+                continue
+            self._fallback_order[rt.pk] = len(self._fallback_order)
+            self._fallback_names.append(((rt.name or '').strip().lower(), rt.pk))
+            tokens = set(TOKEN_RE.findall(rt.name.lower())) if rt.name else set()
+            if rt.description:
+                tokens |= set(TOKEN_RE.findall(rt.description.lower()))
+            for token in tokens:
+                self._token_index.setdefault(token, []).append(rt.pk)
+        self._name_automaton = KeywordAutomaton([name for name, _ in self._fallback_names])
+
+    def request_type(self, request_type_id):
+        """A private copy of the cached RequestType, safe to hand to callers."""
+        request_type = self._request_types.get(request_type_id)
+        return copy.copy(request_type) if request_type else None
+
+    def match(self, message):
+        """
+        (request_type_id, score, matched_keywords) for the best match, or None.
+        Ties go to the request type matched first, as in the old loop.
+        """
+        normalized = message.lower()
+        tokens = set(TOKEN_RE.findall(normalized))
+        if not tokens:
+            return None
+
+        scores = {}
+        for index in sorted(self._keyword_automaton.find(normalized)):
+            keyword, request_type_id, weight = self._keywords[index]
+            entry = scores.setdefault(request_type_id, [0, []])
+            entry[0] += weight
+            entry[1].append(keyword)
+
+        # Fallback: request type names and name/description tokens
+        if not scores:
+            candidates = {}
+            for index in self._name_automaton.find(normalized):
+                name, request_type_id = self._fallback_names[index]
+                entry = candidates.setdefault(request_type_id, [0, []])
+                entry[0] += NAME_SCORE
+                entry[1].append(name)
+            for token in sorted(tokens):
+                for request_type_id in self._token_index.get(token, ()):
+                    entry = candidates.setdefault(request_type_id, [0, []])
+                    entry[0] += TOKEN_SCORE
+                    entry[1].append(token)
+            for request_type_id in sorted(candidates, key=self._fallback_order.get):
+                scores[request_type_id] = candidates[request_type_id]
+
+        if not scores:
+            return None
+        best_id = max(scores, key=lambda key: scores[key][0])
+        score, matches = scores[best_id]
+        return best_id, score, matches
+
+
+def invalidate_request_matcher():
+    """
+    Drop the compiled matcher in this process and every other worker.
+
+    Bumped now and again on commit, so a worker that rebuilds from
+    uncommitted state in between does not keep the old matcher.
+    """
+    global _matcher
+    _matcher = None
+    invalidate_version(_VERSION_KEY)
+
+
+def build_request_matcher():
+    """Compile a matcher from the current RequestKeyword and RequestType rows."""
+    keywords = RequestKeyword.objects.values_list('keyword', 'request_type_id', 'weight')
+    request_types = list(RequestType.objects.order_by('pk'))
+    return RequestMatcher(list(keywords), request_types)
+
+
+def get_request_matcher():
+    """Return the in-process matcher, rebuilding it if the shared version moved."""
+    global _matcher, _matcher_version
+    try:
+        version = get_version(_VERSION_KEY)
+    except Exception as e:
+        logger.error(f'Error reading request matcher version: {str(e)}')
+        version = None
+
+    if _matcher is None or version is None or version != _matcher_version:
+        _matcher = build_request_matcher()
+        _matcher_version = version
+    return _matcher
@@ -4,14 +4,256 @@ Section-based permission decorators and mixins for views.
 This module provides decorators for function-based views and mixins for
 class-based views to check section-based permissions.
 """
+import logging
+import time
 from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.mixins import AccessMixin
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Permission
+from django.db.models import Q
+from hotel_app.cache_versions import get_version, invalidate_version
 from hotel_app.models import Section
 
+logger = logging.getLogger(__name__)
+
+
+# Actions every section exposes a permission for
+SECTION_ACTIONS = ('view', 'add', 'change', 'delete')
+
+# Bumped whenever group/user permissions, group membership or sections change.
+# Snapshots built under an older version are rebuilt on next use.
+_snapshot_version = 0
+
+# Shared cache keys. Resolved matrices are stored per user under the current
+# shared version, so bumping the version orphans every cached matrix at once.
+SECTION_PERMISSION_CACHE_PREFIX = 'section_perms'
+_VERSION_KEY = f'{SECTION_PERMISSION_CACHE_PREFIX}:version'
+_STATS_KEYS = {
+    'hits': f'{SECTION_PERMISSION_CACHE_PREFIX}:stats:hits',
+    'misses': f'{SECTION_PERMISSION_CACHE_PREFIX}:stats:misses',
+}
+
+# Hit/miss counters for this worker process
+_cache_stats = {'hits': 0, 'misses': 0}
+# Counts not yet added to the shared totals. They are added at most once
+# per _STATS_FLUSH_SECONDS rather than with a cache write per lookup.
+_unflushed_stats = {'hits': 0, 'misses': 0}
+_STATS_FLUSH_SECONDS = 60
+_last_stats_flush = time.monotonic()
+
+
+def invalidate_section_permission_snapshots():
+    """
+    Mark every section permission snapshot as stale, in this process and in
+    the shared cache.
+
+    The shared version is bumped immediately and again once the surrounding
+    transaction commits, so a worker that rebuilds a matrix from uncommitted
+    state in between cannot leave a stale grant cached.
+    """
+    global _snapshot_version
+    _snapshot_version += 1
+    invalidate_version(_VERSION_KEY)
+
+
+def _record_cache_result(hit):
+    name = 'hits' if hit else 'misses'
+    _cache_stats[name] += 1
+    _unflushed_stats[name] += 1
+    if time.monotonic() - _last_stats_flush >= _STATS_FLUSH_SECONDS:
+        _flush_cache_stats()
+
+
+def _flush_cache_stats():
+    """Add this process's counts since the last flush to the shared totals."""
+    global _last_stats_flush
+    _last_stats_flush = time.monotonic()
+    for name, key in _STATS_KEYS.items():
+        count, _unflushed_stats[name] = _unflushed_stats[name], 0
+        if not count:
+            continue
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, count, timeout=None)
+        except Exception:
+            pass
+
+
+def get_section_permission_cache_stats():
+    """
+    Return section permission cache hit/miss counters.
+
+    'process' holds this worker's counters, 'shared' the totals across all
+    workers using the same cache backend. Other workers' counts reach the
+    shared totals up to _STATS_FLUSH_SECONDS late.
+    """
+    _flush_cache_stats()
+    shared = {}
+    for name, key in _STATS_KEYS.items():
+        try:
+            shared[name] = cache.get(key, 0)
+        except Exception:
+            shared[name] = None
+    return {'process': dict(_cache_stats), 'shared': shared}
+
+
+def reset_section_permission_cache_stats():
+    """Reset the process and shared hit/miss counters."""
+    global _last_stats_flush
+    _last_stats_flush = time.monotonic()
+    for name, key in _STATS_KEYS.items():
+        _cache_stats[name] = 0
+        _unflushed_stats[name] = 0
+        try:
+            cache.delete(key)
+        except Exception:
+            pass
+
+
+class SectionPermissionSnapshot:
+    """
+    Resolved section permissions for a single user.
+
+    Holds the set of (section_name, action) pairs the user is granted plus the
+    names of the active sections, so the middleware, the nav context processor
+    and the view decorators can answer permission checks without hitting the
+    database again.
+    """
+
+    def __init__(self, pairs=frozenset(), active_sections=(), is_superuser=False, version=0):
+        self.pairs = frozenset(pairs)
+        self.active_sections = tuple(active_sections)
+        self.is_superuser = is_superuser
+        self.version = version
+
+    def __contains__(self, item):
+        section_name, action = item
+        return self.has(section_name, action)
+
+    def has(self, section_name, action):
+        """Return True if the user holds `action` on `section_name`."""
+        if self.is_superuser:
+            return True
+        return (section_name, action) in self.pairs
+
+    def has_any(self, action='view'):
+        """Return True if the user holds `action` on at least one active section."""
+        return any(self.has(name, action) for name in self.active_sections)
+
+    def as_nav_dict(self):
+        """Per-section permission flags in the shape the sidebar templates expect."""
+        section_permissions = {}
+        for name in self.active_sections:
+            can_view = self.has(name, 'view')
+            can_add = self.has(name, 'add')
+            can_change = self.has(name, 'change')
+            can_delete = self.has(name, 'delete')
+            section_permissions[name] = {
+                'view': can_view,
+                'add': can_add,
+                'change': can_change,
+                'delete': can_delete,
+                'edit': can_add or can_change or can_delete,
+            }
+        return section_permissions
+
+
+def _resolve_section_permissions(user):
+    """
+    Load (section, action) grants and active section names from the database.
+
+    Uses one query for the section permissions granted through the user's
+    groups or directly, and one for the active section names.
+    """
+    active_sections = list(
+        Section.objects.filter(is_active=True).values_list('name', flat=True)
+    )
+    if user.is_superuser:
+        return set(), active_sections
+
+    section_content_type = ContentType.objects.get_for_model(Section)
+    codenames = (
+        Permission.objects.filter(content_type=section_content_type)
+        .filter(Q(group__user=user) | Q(user=user))
+        .values_list('codename', flat=True)
+        .distinct()
+    )
+    pairs = set()
+    for codename in codenames:
+        # Codenames are '<action>_<section>' (see Section.get_permission_codename)
+        action, _, section_name = codename.partition('_')
+        if action in SECTION_ACTIONS and section_name:
+            pairs.add((section_name, action))
+    return pairs, active_sections
+
+
+def build_section_permission_snapshot(user):
+    """
+    Build a SectionPermissionSnapshot for `user`.
+
+    The resolved matrix is read from the shared cache when another request or
+    worker has already built it under the current permission version, and
+    resolved from the database and stored otherwise.
+    """
+    version = _snapshot_version
+    if not user or not user.is_authenticated:
+        return SectionPermissionSnapshot(version=version)
+
+    cache_key = None
+    try:
+        cache_key = f'{SECTION_PERMISSION_CACHE_PREFIX}:user:{user.pk}:v{get_version(_VERSION_KEY)}'
+        cached = cache.get(cache_key)
+    except Exception as e:
+        logger.error(f'Error reading section permission cache: {str(e)}')
+        cached = None
+
+    if cached is not None:
+        _record_cache_result(hit=True)
+        pairs, active_sections = cached
+    else:
+        _record_cache_result(hit=False)
+        pairs, active_sections = _resolve_section_permissions(user)
+        if cache_key:
+            try:
+                cache.set(
+                    cache_key,
+                    (tuple(pairs), tuple(active_sections)),
+                    getattr(settings, 'SECTION_PERMISSION_CACHE_TIMEOUT', 3600),
+                )
+            except Exception as e:
+                logger.error(f'Error writing section permission cache: {str(e)}')
+
+    return SectionPermissionSnapshot(
+        pairs=pairs,
+        active_sections=active_sections,
+        is_superuser=user.is_superuser,
+        version=version,
+    )
+
+
+def get_section_permission_snapshot(user):
+    """
+    Return the section permission snapshot for `user`, building it on first use.
+
+    The snapshot is memoised on the user object. Django creates a fresh
+    request.user for every request, so this is effectively per-request and is
+    shared by everything that receives that user.
+    """
+    snapshot = getattr(user, '_section_permission_snapshot', None)
+    if snapshot is not None and snapshot.version == _snapshot_version:
+        return snapshot
+    snapshot = build_section_permission_snapshot(user)
+    try:
+        user._section_permission_snapshot = snapshot
+    except AttributeError:
+        pass
+    return snapshot
+
 
 def get_section_permission(section_name, action):
     """
@@ -51,59 +293,11 @@ def user_has_section_permission(user, section_name, action):
     if user.is_superuser:
         return True
     
-    # Get permission codename
-    codename = get_section_permission(section_name, action)
-    
-    # Get ContentType for Section model
     try:
-        section_content_type = ContentType.objects.get_for_model(Section)
-        
-        # Try to get the permission object
-        try:
-            permission = Permission.objects.get(
-                codename=codename,
-                content_type=section_content_type
-            )
-        except Permission.DoesNotExist:
-            # Permission doesn't exist - return False
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f'Permission {codename} does not exist for section {section_name}')
-            return False
-        
-        # Check directly via groups (more reliable than has_perm which can be cached)
-        # Refresh user groups to ensure we have the latest data
-        # Use select_related and prefetch_related for optimal query performance
-        user_groups = user.groups.select_related().prefetch_related('permissions')
-        for group in user_groups:
-            # Check if this group has the permission by checking permission IDs
-            # This is more reliable than checking codenames
-            if group.permissions.filter(id=permission.id).exists():
-                return True
-        
-        # Also check if user has permission directly assigned (not via group)
-        if user.user_permissions.filter(id=permission.id).exists():
-            return True
-        
-        # Fallback: Use Django's has_perm (may be cached, but should work)
-        # Note: Django caches permissions per request, so this might not reflect
-        # recent changes until the user's session is refreshed
-        try:
-            has_perm = user.has_perm(f'hotel_app.{codename}')
-            if has_perm:
-                return True
-        except Exception:
-            # If has_perm fails for any reason, we've already checked groups above
-            pass
-        
-        return False
-        
-    except (ContentType.DoesNotExist, Exception) as e:
-        # If permission doesn't exist or table doesn't exist, deny access
-        # This handles cases where migrations haven't been run yet
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f'Error checking permission {codename} for section {section_name}: {str(e)}')
+        return get_section_permission_snapshot(user).has(section_name, action)
+    except Exception as e:
+        # If the permission tables don't exist yet (migrations not run), deny access
+        logger.error(f'Error checking permission {action}_{section_name} for section {section_name}: {str(e)}')
         return False
 
 
@@ -3,7 +3,7 @@ from rest_framework import serializers
 from .models import (
     Building, Department, Floor, LocationFamily, LocationType, UserGroup, UserGroupMembership, 
     Location, ServiceRequest, Voucher, GuestComment,
-    Notification
+    Notification, BroadcastNotification
 )
 
 User = get_user_model()
@@ -71,7 +71,31 @@ class GuestCommentSerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'title', 'message', 'notification_type', 'is_read', 'created_at']
+        fields = ['id', 'title', 'message', 'notification_type', 'is_read', 'created_at', 'updated_at']
+
+
+class BroadcastNotificationSerializer(serializers.ModelSerializer):
+    """
+    A broadcast shaped like NotificationSerializer output for one user.
+    Expects the `is_read` annotation from notification_services.visible_broadcasts.
+    """
+    id = serializers.SerializerMethodField()
+    broadcast_id = serializers.IntegerField(source='pk', read_only=True)
+    is_read = serializers.BooleanField(read_only=True)
+    is_broadcast = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BroadcastNotification
+        fields = [
+            'id', 'broadcast_id', 'title', 'message', 'notification_type', 'is_read', 'created_at', 'is_broadcast',
+        ]
+
+    def get_id(self, obj):
+        # Kept apart from Notification ids, which share the client's list
+        return f'broadcast-{obj.pk}'
+
+    def get_is_broadcast(self, obj):
+        return True
 
 
 # class BreakfastVoucherSerializer(serializers.ModelSerializer):
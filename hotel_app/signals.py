@@ -115,6 +115,70 @@ def sync_user_groups_to_profile(sender, instance, action, pk_set, **kwargs):
         set_syncing(False)
 
 
+# Section permission snapshot invalidation
+from django.contrib.auth.models import Permission
+from django.db.models.signals import post_delete
+from .models import Section
+from .section_permissions import invalidate_section_permission_snapshots
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def section_permissions_m2m_changed(sender, action, **kwargs):
+    """Drop cached section permission snapshots when grants or memberships change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_section_permission_snapshots()
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def section_permissions_rows_changed(sender, **kwargs):
+    """Drop cached section permission snapshots when sections, groups or permissions change."""
+    invalidate_section_permission_snapshots()
+
+
+# SLA policy cache invalidation
+from .models import SLAConfiguration, DepartmentRequestSLA
+from .sla_policy import invalidate_sla_policy
+
+
+@receiver(post_save, sender=SLAConfiguration)
+@receiver(post_delete, sender=SLAConfiguration)
+@receiver(post_save, sender=DepartmentRequestSLA)
+@receiver(post_delete, sender=DepartmentRequestSLA)
+def sla_policy_rows_changed(sender, **kwargs):
+    """Reload the cached SLA policy after admin/command edits to SLA rows."""
+    invalidate_sla_policy()
+
+
+# WhatsApp request matcher invalidation
+from .models import RequestKeyword, RequestType
+from .request_matcher import invalidate_request_matcher
+
+
+@receiver(post_save, sender=RequestKeyword)
+@receiver(post_delete, sender=RequestKeyword)
+@receiver(post_save, sender=RequestType)
+@receiver(post_delete, sender=RequestType)
+def request_matcher_rows_changed(sender, **kwargs):
+    """Recompile the request-type matcher after keyword or request type edits."""
+    invalidate_request_matcher()
+
+
+# Intent index: workers re-embed only the request types whose text changed
+from .intent_engine import invalidate_intent_index
+
+
+@receiver(post_save, sender=RequestType)
+@receiver(post_delete, sender=RequestType)
+def intent_index_rows_changed(sender, **kwargs):
+    """Sync the request type embedding index after request type edits."""
+    invalidate_intent_index()
+
+
 # Audit logging for create/update/delete
 from django.db.models.signals import post_delete, post_save
 from django.apps import apps
@@ -302,9 +366,15 @@ def guest_post_save(sender, instance, created, **kwargs):
         logger.error(f'Error sending WhatsApp message for guest {instance.pk}: {str(e)}', exc_info=True)
 
 
+from .sla_scheduler import publish_ticket_change as publish_sla_ticket_change
+
+
 @receiver(post_save, sender=ServiceRequest)
 def service_request_post_save(sender, instance, created, **kwargs):
     """Send notifications when a service request is created or updated."""
+    # Feed the SLA deadline scheduler (no-op unless SLA_SCHEDULER_ENABLED)
+    publish_sla_ticket_change(instance, created)
+
     try:
         # Only send notifications for newly created requests
         if created:
@@ -376,6 +446,8 @@ def service_request_post_save(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=ServiceRequest)
 def service_request_pre_save(sender, instance, **kwargs):
     """Capture previous state before save to detect status changes."""
+    instance._pre_save_stats_bucket = None
+    instance._pre_save_assignee_id = None
     try:
         if not instance.pk:
             instance._pre_save_status = None
@@ -383,11 +455,60 @@ def service_request_pre_save(sender, instance, **kwargs):
         previous = ServiceRequest.objects.filter(pk=instance.pk).first()
         if previous:
             instance._pre_save_status = previous.status
+            instance._pre_save_assignee_id = previous.assignee_user_id
+            instance._pre_save_stats_bucket = ticket_bucket(previous)
         else:
             instance._pre_save_status = None
     except Exception:
         instance._pre_save_status = None
 
+
+# ---- Daily ticket stats rollup maintenance ----
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from .models import Department, RequestType, DailyTicketStats
+from .ticket_stats_services import (
+    rebuild_ticket_stats,
+    schedule_ticket_stats_refresh,
+    ticket_bucket,
+)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def service_request_stats_post_save(sender, instance, **kwargs):
+    """Recompute the rollup bucket(s) the ticket moved out of and into."""
+    schedule_ticket_stats_refresh(
+        getattr(instance, '_pre_save_stats_bucket', None),
+        ticket_bucket(instance),
+    )
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def service_request_stats_post_delete(sender, instance, **kwargs):
+    schedule_ticket_stats_refresh(ticket_bucket(instance))
+
+
+@receiver(pre_delete, sender=Department)
+@receiver(pre_delete, sender=RequestType)
+def ticket_stats_dimension_pre_delete(sender, instance, **kwargs):
+    """Remember which days referenced a department/request type being deleted."""
+    field = 'department' if sender is Department else 'request_type'
+    instance._ticket_stats_dates = list(
+        DailyTicketStats.objects.filter(**{field: instance}).values_list('date', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=RequestType)
+def ticket_stats_dimension_post_delete(sender, instance, **kwargs):
+    """
+    Tickets are moved to NULL with a bulk UPDATE (SET_NULL) that skips
+    ServiceRequest signals, so rebuild the affected days instead.
+    """
+    dates = getattr(instance, '_ticket_stats_dates', None)
+    if dates:
+        transaction.on_commit(lambda: rebuild_ticket_stats(min(dates), max(dates)))
+
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 from django.db import transaction
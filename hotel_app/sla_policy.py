@@ -0,0 +1,114 @@
+"""
+Cached SLA policy resolver.
+
+ServiceRequest.set_sla_times() used to query DepartmentRequestSLA and then
+SLAConfiguration for every new ticket. This module loads both tables once
+into an in-memory (department, request_type, priority) lookup per worker
+process and resolves SLA hours from it.
+
+The table is reloaded when its version changes. The version lives in the
+shared cache, so an edit made in one gunicorn worker (the SLA configuration
+API, the admin, init_sla_config...) is picked up by every worker.
+"""
+import logging
+
+from .cache_versions import get_version, invalidate_version
+from .models import DepartmentRequestSLA, SLAConfiguration
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = 'sla_policy:version'
+
+# Fallback SLA (minutes, for both response and resolution) when no
+# configuration row matches the priority
+DEFAULT_SLA_MINUTES = {
+    'critical': 5,
+    'high': 10,
+    'normal': 15,
+    'low': 20,
+}
+# Used when the priority is missing or unknown: 1 hour response, 24 hours resolution
+DEFAULT_SLA_HOURS = (1, 24)
+
+# In-process policy table and the shared version it was loaded under
+_policy = None
+_policy_version = None
+
+
+def invalidate_sla_policy():
+    """
+    Drop the cached SLA policy in this process and every other worker.
+
+    Bumped now and again on commit, so a worker that reloads the table from
+    uncommitted state in between does not keep the old policy.
+    """
+    global _policy
+    _policy = None
+    invalidate_version(_VERSION_KEY)
+
+
+def _load_policy():
+    """Read both SLA tables into {key: (response_hours, resolution_hours)} dicts."""
+    department_policy = {
+        (department_id, request_type_id, priority): (response / 60.0, resolution / 60.0)
+        for department_id, request_type_id, priority, response, resolution in
+        DepartmentRequestSLA.objects.values_list(
+            'department_id', 'request_type_id', 'priority',
+            'response_time_minutes', 'resolution_time_minutes',
+        )
+    }
+    priority_policy = {
+        priority: (response / 60.0, resolution / 60.0)
+        for priority, response, resolution in SLAConfiguration.objects.values_list(
+            'priority', 'response_time_minutes', 'resolution_time_minutes'
+        )
+    }
+    return {'department': department_policy, 'priority': priority_policy}
+
+
+def get_sla_policy():
+    """Return the in-process policy table, reloading it if the shared version moved."""
+    global _policy, _policy_version
+    try:
+        version = get_version(_VERSION_KEY)
+    except Exception as e:
+        logger.error(f'Error reading SLA policy version: {str(e)}')
+        version = None
+
+    if _policy is None or version is None or version != _policy_version:
+        _policy = _load_policy()
+        _policy_version = version
+    return _policy
+
+
+def _resolve(policy, department_id, request_type_id, priority):
+    # Department/request-specific configuration first
+    if department_id and request_type_id:
+        hours = policy['department'].get((department_id, request_type_id, priority))
+        if hours is not None:
+            return hours
+
+    # Then the general configuration for the priority
+    hours = policy['priority'].get(priority)
+    if hours is not None:
+        return hours
+
+    # Use default values if no configuration found
+    if priority in DEFAULT_SLA_MINUTES:
+        minutes = DEFAULT_SLA_MINUTES[priority]
+        return minutes / 60.0, minutes / 60.0
+    return DEFAULT_SLA_HOURS
+
+
+def resolve_sla_hours(department_id, request_type_id, priority):
+    """(response_sla_hours, sla_hours) for a department, request type and priority."""
+    return _resolve(get_sla_policy(), department_id, request_type_id, priority)
+
+
+def resolve_many(keys):
+    """
+    Resolve SLA hours for many (department_id, request_type_id, priority)
+    keys at once, e.g. for batch ticket creation. Returns {key: (response_sla_hours, sla_hours)}.
+    """
+    policy = get_sla_policy()
+    return {key: _resolve(policy, *key) for key in set(keys)}
@@ -0,0 +1,229 @@
+"""
+SLA deadline scheduler.
+
+Keeps a heap of upcoming response/resolution deadlines for open service
+requests and sleeps until the earliest one passes, instead of polling every
+open ticket on a cron schedule. Due tickets are handed to
+tasks.check_sla_breaches(ticket_ids=...), so breach rules and notifications
+are the same as the periodic sweep.
+
+The heap is seeded from the database at startup. Ticket saves that can move a
+deadline (creation, status or assignee change) append an SLADeadlineChange
+row from service_request_post_save; the scheduler consumes that feed every
+few seconds and reschedules the affected tickets. Consumed rows are deleted
+by id, so every row still in the table is pending and the feed needs no id
+cursor: a row whose transaction committed after one with a higher id (bulk
+ticket creation) is still read. Outdated heap entries are skipped lazily
+using a per-ticket generation number.
+"""
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ServiceRequest, SLADeadlineChange
+from .tasks import (
+    RESOLUTION_SLA_OPEN_STATUSES,
+    RESPONSE_SLA_OPEN_STATUSES,
+    SLA_CLOSED_STATUSES,
+    check_sla_breaches,
+)
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_FIELDS = [
+    'id', 'status', 'created_at', 'accepted_at', 'completed_at',
+    'response_sla_hours', 'sla_hours', 'response_sla_breached', 'resolution_sla_breached',
+]
+
+
+def publish_ticket_change(ticket, created):
+    """Append a ticket to the scheduler's change feed once the save commits."""
+    if not getattr(settings, 'SLA_SCHEDULER_ENABLED', False):
+        return
+    if not created and (
+        getattr(ticket, '_pre_save_status', None) == ticket.status
+        and getattr(ticket, '_pre_save_assignee_id', None) == ticket.assignee_user_id
+    ):
+        return
+
+    ticket_id = ticket.pk
+
+    def _publish():
+        try:
+            SLADeadlineChange.objects.create(ticket_id=ticket_id)
+        except Exception as e:
+            logger.error(f'Error publishing SLA change for ticket {ticket_id}: {str(e)}', exc_info=True)
+
+    transaction.on_commit(_publish)
+
+
+def ticket_deadlines(ticket):
+    """
+    (deadline, kind) pairs still to be checked for a ticket, following the
+    rules of ServiceRequest.check_sla_breaches(). A ticket that is not in a
+    status where the SLA runs gets no deadline; its next status change will
+    reschedule it.
+    """
+    if not ticket.created_at or ticket.status in SLA_CLOSED_STATUSES:
+        return []
+
+    deadlines = []
+    if not ticket.response_sla_breached and ticket.response_sla_hours is not None:
+        deadline = ticket.created_at + timedelta(hours=ticket.response_sla_hours)
+        if ticket.accepted_at:
+            if ticket.accepted_at > deadline:
+                deadlines.append((deadline, 'response'))
+        elif ticket.status in RESPONSE_SLA_OPEN_STATUSES:
+            deadlines.append((deadline, 'response'))
+
+    if not ticket.resolution_sla_breached and ticket.sla_hours is not None:
+        deadline = ticket.created_at + timedelta(hours=ticket.sla_hours)
+        if ticket.completed_at:
+            if ticket.completed_at > deadline:
+                deadlines.append((deadline, 'resolution'))
+        elif ticket.status in RESOLUTION_SLA_OPEN_STATUSES:
+            deadlines.append((deadline, 'resolution'))
+    return deadlines
+
+
+class SLADeadlineScheduler:
+    """Heap of SLA deadlines with a change-feed consumer."""
+
+    def __init__(self, poll_interval=5, feed_batch_size=1000):
+        self.poll_interval = poll_interval
+        self.feed_batch_size = feed_batch_size
+        self._heap = []
+        self._generation = {}
+        self._sequence = 0
+        self._wakeup = threading.Event()
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _schedule(self, ticket):
+        self._sequence += 1
+        deadlines = ticket_deadlines(ticket)
+        if not deadlines:
+            # Any queued entries for this ticket are now stale
+            self._generation.pop(ticket.pk, None)
+            return
+        self._generation[ticket.pk] = self._sequence
+        for deadline, kind in deadlines:
+            heapq.heappush(self._heap, (deadline, ticket.pk, self._sequence, kind))
+
+    def _open_tickets(self):
+        return ServiceRequest.objects.exclude(status__in=SLA_CLOSED_STATUSES).only(*DEADLINE_FIELDS)
+
+    def seed(self):
+        """(Re)build the heap from all open tickets. Returns the number of deadlines queued."""
+        # Feed rows committed by now are covered by the snapshot below; rows
+        # committed later, whatever their id, are left for poll_changes
+        consumed = list(SLADeadlineChange.objects.order_by('id').values_list('id', flat=True))
+        self._heap = []
+        self._generation = {}
+        for ticket in self._open_tickets().iterator():
+            self._schedule(ticket)
+        self._delete_changes(consumed)
+        return len(self._heap)
+
+    def _delete_changes(self, ids):
+        for start in range(0, len(ids), self.feed_batch_size):
+            SLADeadlineChange.objects.filter(id__in=ids[start:start + self.feed_batch_size]).delete()
+
+    def poll_changes(self):
+        """Reschedule tickets from the change feed. Returns the number of tickets refreshed."""
+        rows = list(
+            SLADeadlineChange.objects.order_by('id').values_list('id', 'ticket_id')[:self.feed_batch_size]
+        )
+        if not rows:
+            return 0
+
+        ticket_ids = {ticket_id for _, ticket_id in rows}
+        tickets = {
+            ticket.pk: ticket
+            for ticket in ServiceRequest.objects.filter(pk__in=ticket_ids).only(*DEADLINE_FIELDS)
+        }
+        for ticket_id in ticket_ids:
+            if ticket_id in tickets:
+                self._schedule(tickets[ticket_id])
+            else:
+                # Deleted ticket
+                self._generation.pop(ticket_id, None)
+
+        self._delete_changes([row_id for row_id, _ in rows])
+        return len(ticket_ids)
+
+    def next_deadline(self):
+        """Earliest live deadline, discarding stale heap entries."""
+        while self._heap:
+            deadline, ticket_id, generation, _ = self._heap[0]
+            if self._generation.get(ticket_id) == generation:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def fire_due(self, now=None):
+        """Check tickets whose deadline has passed. Returns the sweep report (or None)."""
+        now = now or timezone.now()
+        due = set()
+        popped = []
+        while self._heap and self._heap[0][0] < now:
+            entry = heapq.heappop(self._heap)
+            _, ticket_id, generation, _ = entry
+            if self._generation.get(ticket_id) == generation:
+                due.add(ticket_id)
+                popped.append(entry)
+        if not due:
+            return None
+
+        try:
+            report = check_sla_breaches(ticket_ids=due)
+        except Exception:
+            # Requeue, so the next iteration retries them instead of the hourly reseed
+            for entry in popped:
+                heapq.heappush(self._heap, entry)
+            raise
+        logger.info(
+            f"SLA scheduler checked {len(due)} due tickets; "
+            f"{report['flipped']} newly breached, {report['notifications']} notifications"
+        )
+        return report
+
+    def seconds_until_next_wakeup(self, now=None):
+        """Sleep until the next deadline, but at least re-poll the change feed every poll_interval."""
+        now = now or timezone.now()
+        deadline = self.next_deadline()
+        if deadline is None:
+            return self.poll_interval
+        return max(0, min(self.poll_interval, (deadline - now).total_seconds()))
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def run_forever(self, reseed_interval=3600):
+        """Seed, then loop: consume the feed, fire due deadlines, sleep."""
+        logger.info(f'SLA scheduler seeded with {self.seed()} deadlines')
+        last_seed = timezone.now()
+        while not self._stopped:
+            close_old_connections()
+            failed = False
+            try:
+                if (timezone.now() - last_seed).total_seconds() >= reseed_interval:
+                    # Pick up edits that bypass the feed (bulk UPDATEs, admin SLA hour changes)
+                    self.seed()
+                    last_seed = timezone.now()
+                self.poll_changes()
+                self.fire_due()
+            except Exception as e:
+                logger.error(f'SLA scheduler iteration failed: {str(e)}', exc_info=True)
+                failed = True
+            # Requeued deadlines are already due, so back off rather than spin
+            self._wakeup.wait(self.poll_interval if failed else self.seconds_until_next_wakeup())
+            self._wakeup.clear()
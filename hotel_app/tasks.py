@@ -2,7 +2,6 @@
 Synchronous task implementations (replaces Celery tasks)
 """
 
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
@@ -69,15 +68,14 @@ def notify_step_assignment(request_id, step_id):
             if service_request.assignee_user:
                 recipients = [service_request.assignee_user]
 
-        # Send email notifications
+        # Queue email notifications (sent by the outbox worker)
+        from .outbox import queue_email
         for user in recipients:
             if user and user.email:
-                send_mail(
+                queue_email(
                     subject=f"New Task: {service_request.request_type.name}",
                     message=f'You have been assigned a new task: "{step.name}"',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[user.email],
-                    fail_silently=False,
                 )
 
     except ObjectDoesNotExist:
@@ -132,87 +130,199 @@ def notify_stale_request(step_id):
                 pass
 
         if recipients:
-            send_mail(
+            from .outbox import queue_email
+            queue_email(
                 subject=f"Service Request Step Pending: {service_request.request_type.name}",
                 message=f'The step "{step.step.name}" has been pending for over 24 hours.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=recipients,
-                fail_silently=False,
             )
 
     except ObjectDoesNotExist:
         return
 
 
-def check_sla_breaches():
+# Statuses mirroring ServiceRequest.check_sla_breaches(): response SLA is only
+# measured against "now" once work has been accepted, resolution SLA once the
+# ticket is assigned or being worked on.
+SLA_CLOSED_STATUSES = ['completed', 'closed']
+RESPONSE_SLA_OPEN_STATUSES = ['accepted', 'in_progress']
+RESOLUTION_SLA_OPEN_STATUSES = ['in_progress', 'accepted', 'assigned']
+
+
+def _sla_breach_q(hours_field, hours_values, done_field, open_statuses, now):
+    """
+    Q matching tickets whose SLA window (`hours_field` hours from created_at)
+    has elapsed, either at `done_field` or, while still open, at `now`.
+
+    SLA hours are per-ticket floats, so the window is expanded per distinct
+    value (a handful: one per priority/department policy) rather than doing
+    float->interval arithmetic in SQL.
+    """
+    from django.db.models import F, Q
+
+    breached = Q(pk__in=[])
+    for hours in hours_values:
+        window = timedelta(hours=hours)
+        breached |= Q(**{hours_field: hours}) & (
+            Q(**{f'{done_field}__isnull': False, f'{done_field}__gt': F('created_at') + window})
+            | Q(**{f'{done_field}__isnull': True, 'status__in': open_statuses, 'created_at__lt': now - window})
+        )
+    return breached
+
+
+def _flag_sla_breaches(open_requests, flag, breach_q):
+    """Flip `flag` (and sla_breached) on matching tickets with one UPDATE. Returns the pks."""
+    candidates = open_requests.filter(**{flag: False}).filter(breach_q)
+    pks = list(candidates.select_for_update().values_list('pk', flat=True))
+    if pks:
+        open_requests.model.objects.filter(pk__in=pks).update(**{flag: True, 'sla_breached': True})
+    return pks
+
+
+def check_sla_breaches(ticket_ids=None):
     """
     Periodic task to check for SLA breaches in service requests (synchronous version)
+
+    Set-based sweep: one UPDATE per breach type flips the newly breached
+    tickets, then notifications are built per department and bulk-created.
+    Returns a report dict with the number of open tickets examined and the
+    tickets flipped. `ticket_ids` limits the sweep to those tickets (used by
+    the SLA deadline scheduler).
     """
+    import logging
     from django.contrib.auth import get_user_model
-    from .utils import create_notification, create_bulk_notifications
-    
+    from django.db import transaction
+    from django.db.models import F, Q
+    from .models import Notification
+    from .ticket_stats_services import schedule_ticket_stats_refresh, ticket_bucket
+
+    logger = logging.getLogger(__name__)
+
     # Get models dynamically to avoid import issues
     ServiceRequest = apps.get_model('hotel_app', 'ServiceRequest')
-    
     User = get_user_model()
-    
-    # Get all open service requests (not closed or completed)
+    now = timezone.now()
+
+    # Open service requests (not closed or completed) not yet fully breached
     open_requests = ServiceRequest.objects.exclude(
-        status__in=['completed', 'closed']
-    ).select_related('requester_user', 'assignee_user', 'department', 'request_type')
-    
-    breach_count = 0
-    for request in open_requests:
-        # Store previous SLA status
-        previous_response_breach = request.response_sla_breached
-        previous_resolution_breach = request.resolution_sla_breached
-        
-        # Check SLA breaches
-        request.check_sla_breaches()
-        
-        # Check if this is a new breach
-        new_response_breach = request.response_sla_breached and not previous_response_breach
-        new_resolution_breach = request.resolution_sla_breached and not previous_resolution_breach
-        
-        # If SLA was newly breached, send notifications
-        if new_response_breach or new_resolution_breach:
-            # Notify assignee if exists
+        status__in=SLA_CLOSED_STATUSES
+    ).filter(Q(response_sla_breached=False) | Q(resolution_sla_breached=False))
+    if ticket_ids is not None:
+        open_requests = open_requests.filter(pk__in=list(ticket_ids))
+
+    examined = open_requests.count()
+    windows = set(open_requests.values_list('response_sla_hours', 'sla_hours').distinct())
+    response_hours = {response for response, _ in windows if response is not None}
+    resolution_hours = {resolution for _, resolution in windows if resolution is not None}
+
+    with transaction.atomic():
+        response_pks = _flag_sla_breaches(
+            open_requests, 'response_sla_breached',
+            _sla_breach_q('response_sla_hours', response_hours, 'accepted_at', RESPONSE_SLA_OPEN_STATUSES, now),
+        )
+        resolution_pks = _flag_sla_breaches(
+            open_requests, 'resolution_sla_breached',
+            _sla_breach_q('sla_hours', resolution_hours, 'completed_at', RESOLUTION_SLA_OPEN_STATUSES, now),
+        )
+
+        breached = list(
+            ServiceRequest.objects.filter(pk__in=set(response_pks) | set(resolution_pks))
+            .select_related('requester_user', 'assignee_user', 'department', 'request_type')
+        )
+        # The UPDATEs bypass post_save, so refresh the daily rollup explicitly
+        schedule_ticket_stats_refresh(*[ticket_bucket(request) for request in breached])
+
+    # Department staff for every affected department in one query
+    department_ids = {request.department_id for request in breached if request.department_id}
+    department_staff = {}
+    for user in User.objects.filter(userprofile__department_id__in=department_ids).annotate(
+        staff_department_id=F('userprofile__department_id')
+    ):
+        department_staff.setdefault(user.staff_department_id, []).append(user)
+
+    # One batch of notifications per department
+    by_department = {}
+    for request in breached:
+        by_department.setdefault(request.department_id, []).append(request)
+
+    response_pks = set(response_pks)
+    created_notifications = []
+    for department_id, requests in by_department.items():
+        notifications = []
+        for request in requests:
+            breach_type = "Response" if request.pk in response_pks else "Resolution"
+            request_type_name = request.request_type.name if request.request_type else 'Service Request'
+            alert = {
+                'title': f"SLA Breach Alert: Ticket #{request.id}",
+                'message': f"{breach_type} SLA has been breached for ticket #{request.id}: {request_type_name}. Please take immediate action.",
+                'notification_type': 'warning',
+                'related_object_id': request.id,
+                'related_object_type': request.__class__.__name__,
+            }
+            # Notify assignee and department staff
+            staff = department_staff.get(department_id, []) if department_id else []
+            recipients = {user.pk: user for user in staff}
             if request.assignee_user:
-                breach_type = "Response" if new_response_breach else "Resolution"
-                create_notification(
-                    recipient=request.assignee_user,
-                    title=f"SLA Breach Alert: Ticket #{request.id}",
-                    message=f"{breach_type} SLA has been breached for ticket #{request.id}: {request.request_type.name}. Please take immediate action.",
-                    notification_type='warning',
-                    related_object=request
-                )
-            
-            # Notify department staff if department exists
-            if request.department:
-                department_users = User.objects.filter(userprofile__department=request.department)
-                if department_users.exists():
-                    breach_type = "Response" if new_response_breach else "Resolution"
-                    create_bulk_notifications(
-                        recipients=department_users,
-                        title=f"SLA Breach Alert: Ticket #{request.id}",
-                        message=f"{breach_type} SLA has been breached for ticket #{request.id}: {request.request_type.name}. Please take immediate action.",
-                        notification_type='warning',
-                        related_object=request
-                    )
-            
+                recipients.setdefault(request.assignee_user.pk, request.assignee_user)
+            notifications.extend(Notification(recipient=user, **alert) for user in recipients.values())
+
             # Notify requester
             if request.requester_user:
-                create_notification(
+                notifications.append(Notification(
                     recipient=request.requester_user,
                     title=f"SLA Breach: Ticket #{request.id}",
                     message=f"Your ticket #{request.id} is experiencing delays. We're working to resolve it as quickly as possible.",
                     notification_type='warning',
-                    related_object=request
-                )
-            
-            breach_count += 1
-        
-        # Save the updated SLA status
-        request.save()
-    
-    return f"Checked {open_requests.count()} open requests. Found {breach_count} new SLA breaches."
\ No newline at end of file
+                    related_object_id=request.id,
+                    related_object_type=request.__class__.__name__,
+                ))
+        created_notifications.extend(Notification.objects.bulk_create(notifications, batch_size=500))
+
+    _push_sla_breach_notifications(created_notifications, logger)
+
+    return {
+        'examined': examined,
+        'response_breaches': len(response_pks),
+        'resolution_breaches': len(resolution_pks),
+        'flipped': len(breached),
+        'notifications': len(created_notifications),
+    }
+
+
+def _push_sla_breach_notifications(notifications, logger):
+    """Send one push per recipient summarising their new SLA breach notifications."""
+    if not notifications:
+        return
+    try:
+        from .outbox import queue_push_messages
+    except Exception as e:
+        logger.debug(f"Could not queue Firebase push notifications: {e}")
+        return
+
+    by_recipient = {}
+    for notification in notifications:
+        by_recipient.setdefault(notification.recipient_id, []).append(notification)
+
+    messages = {}
+    for recipient_id, recipient_notifications in by_recipient.items():
+        first = recipient_notifications[0]
+        if len(recipient_notifications) == 1:
+            title, body = first.title, first.message
+        else:
+            count = len(recipient_notifications)
+            title = f"SLA Breach Alert: {count} tickets"
+            body = f"{count} tickets have breached their SLA. Please take immediate action."
+        messages[recipient_id] = (
+            title, body, {
+                'type': 'warning',
+                'related_object_type': first.related_object_type,
+                # Lets the outbox count these when coalescing with other pushes
+                'count': len(recipient_notifications),
+            },
+        )
+
+    # All recipients in one outbox row, fanned out by the worker
+    try:
+        queue_push_messages(messages)
+    except Exception as e:
+        logger.debug(f"Could not queue Firebase push notifications: {e}")
@@ -34,16 +34,9 @@ def has_section_permission(user, permission_string):
     
     try:
         section_name, action = permission_string.split('.')
-        # Refresh user from database to get latest groups and permissions
-        # This ensures we're not using cached data
-        from django.contrib.auth.models import User
-        try:
-            # Get fresh user object with groups and permissions
-            fresh_user = User.objects.prefetch_related('groups__permissions', 'user_permissions').get(pk=user.pk)
-            return user_has_section_permission(fresh_user, section_name, action)
-        except User.DoesNotExist:
-            # If user doesn't exist, fallback to original user object
-            return user_has_section_permission(user, section_name, action)
+        # The request's permission snapshot is rebuilt whenever groups or
+        # permissions change, so there is no need to refetch the user here
+        return user_has_section_permission(user, section_name, action)
     except (ValueError, AttributeError, Exception) as e:
         # Return False if there's any error (e.g., Section table doesn't exist)
         import logging
@@ -48,10 +48,12 @@ class BaseTestCase(TestCase):
 def print_status(url, resp):
     print(f"\n[URL] {url}")
     print(f"[STATUS] {resp.status_code}")
+    # getvalue() also works for streamed (export) responses
+    body = resp.getvalue()
     try:
-        print("[JSON]", json.loads(resp.content.decode()))
+        print("[JSON]", json.loads(body.decode()))
     except:
-        print("[RAW]", resp.content[:200])
+        print("[RAW]", body[:200])
 
 
 class FullFunctionalityTests(BaseTestCase):
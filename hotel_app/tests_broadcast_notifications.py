@@ -0,0 +1,112 @@
+"""
+Tests for fan-out-on-read broadcast notifications.
+
+Tests cover:
+- A lost-and-found broadcast writes one row and one queued push
+- Broadcasts merge into each audience member's unread list
+- Group and department audiences, and users who joined later
+- Per-user read receipts, dismissal and mark-all-read
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_app.models import (
+    BroadcastNotification, BroadcastReceipt, Department, LostAndFound, Notification, OutboundMessage,
+    UserGroup, UserGroupMembership, UserProfile,
+)
+from hotel_app.notification_services import unread_count, visible_broadcasts
+from hotel_app.utils import create_broadcast
+
+URL = '/api/notification/notifications/'
+
+
+class BroadcastNotificationTestCase(TestCase):
+    """Test broadcast storage, audiences and read state."""
+
+    def setUp(self):
+        """Set up staff in a department and a user group."""
+        self.users = [User.objects.create_user(username=f'staff{i}', password='x') for i in range(4)]
+        past = timezone.now() - datetime.timedelta(days=1)
+        User.objects.filter(pk__in=[u.pk for u in self.users]).update(date_joined=past)
+        for user in self.users:
+            user.refresh_from_db()
+
+        self.department = Department.objects.create(name='Housekeeping')
+        UserProfile.objects.filter(user=self.users[0]).update(department=self.department)
+        self.group = UserGroup.objects.create(name='Night shift')
+        UserGroupMembership.objects.create(user=self.users[1], group=self.group)
+        self.client.force_login(self.users[0])
+
+    @override_settings(NOTIFICATION_OUTBOX_ENABLED=True)
+    def test_lost_and_found_broadcast_is_one_row(self):
+        """Test broadcast_to_all stores one row and queues one push for everyone."""
+        item = LostAndFound.objects.create(item_name='Blue umbrella', item_type='found', reported_by=self.users[0])
+        item.broadcast_to_all()
+
+        self.assertFalse(Notification.objects.exists())
+        broadcast = BroadcastNotification.objects.get()
+        self.assertEqual(broadcast.audience, 'all')
+        self.assertEqual(broadcast.related_object_id, str(item.pk))
+        push = OutboundMessage.objects.get()
+        self.assertEqual(sorted(push.payload['user_ids']), sorted(u.pk for u in self.users))
+
+        # Staff see it like any other notification
+        data = self.client.get(URL).json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['id'], f'broadcast-{broadcast.pk}')
+        self.assertIn('Blue umbrella', data[0]['title'])
+        self.assertFalse(data[0]['is_read'])
+
+    def test_merged_with_personal_notifications(self):
+        """Test broadcasts and personal rows come back newest first."""
+        old = Notification.objects.create(
+            recipient=self.users[0], title='Older', message='m',
+            created_at=timezone.now() - datetime.timedelta(hours=2),
+        )
+        broadcast = create_broadcast('Fire drill', 'At 3 PM')
+        new = Notification.objects.create(recipient=self.users[0], title='Newer', message='m')
+
+        data = self.client.get(URL).json()
+        self.assertEqual([n['id'] for n in data], [new.pk, f'broadcast-{broadcast.pk}', old.pk])
+        self.assertEqual(unread_count(self.users[0]), 3)
+
+    def test_audiences(self):
+        """Test group and department broadcasts reach members only, not later joiners."""
+        create_broadcast('Housekeeping', 'm', audience='department', department=self.department)
+        create_broadcast('Night shift', 'm', audience='group', group=self.group)
+        create_broadcast('Everyone', 'm')
+        newcomer = User.objects.create_user(username='newcomer', password='x')
+
+        def titles(user):
+            return sorted(visible_broadcasts(user).values_list('title', flat=True))
+
+        self.assertEqual(titles(self.users[0]), ['Everyone', 'Housekeeping'])
+        self.assertEqual(titles(self.users[1]), ['Everyone', 'Night shift'])
+        self.assertEqual(titles(self.users[2]), ['Everyone'])
+        self.assertEqual(titles(newcomer), [])
+
+    def test_read_receipts_and_dismissal(self):
+        """Test read state is per user, and mark-all-read covers broadcasts."""
+        first = create_broadcast('First', 'm')
+        second = create_broadcast('Second', 'm')
+
+        response = self.client.post(f'/api/notification/broadcasts/{first.pk}/read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([n['title'] for n in self.client.get(URL).json()], ['Second'])
+        # Nobody else's state changed
+        self.assertEqual(visible_broadcasts(self.users[1]).filter(is_read=False).count(), 2)
+
+        self.client.post('/api/notification/notifications/read-all/')
+        self.assertEqual(self.client.get(URL).json(), [])
+        self.assertEqual(BroadcastReceipt.objects.filter(user=self.users[0]).count(), 2)
+
+        response = self.client.delete(f'/api/notification/broadcasts/{second.pk}/delete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(visible_broadcasts(self.users[0])), [first])
+
+        department_only = create_broadcast('Other dept', 'm', audience='department', department=Department.objects.create(name='Spa'))
+        response = self.client.post(f'/api/notification/broadcasts/{department_only.pk}/read/')
+        self.assertEqual(response.status_code, 404)
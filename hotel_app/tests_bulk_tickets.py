@@ -0,0 +1,142 @@
+"""
+Tests for the bulk ticket creation API.
+
+Tests cover:
+- Creating many tickets with SLA times and department routing
+- Whole-batch validation (nothing created on any error)
+- One grouped notification per department
+- Ticket ids on backends whose bulk INSERT returns no primary keys (MySQL)
+- Case-insensitive room matching
+"""
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from hotel_app.models import (
+    AuditLog, Department, Location, Notification, RequestType, ServiceRequest, SLAConfiguration,
+    SLADeadlineChange, UserProfile,
+)
+from hotel_app.sla_policy import invalidate_sla_policy
+
+
+class BulkTicketAPITestCase(TestCase):
+    """Test the bulk ticket creation endpoint."""
+
+    url = '/dashboard/api/tickets/bulk-create/'
+
+    def setUp(self):
+        """Set up departments, staff and an admin user."""
+        self.addCleanup(invalidate_sla_policy)
+        self.housekeeping = Department.objects.create(name='Housekeeping')
+        self.engineering = Department.objects.create(name='Engineering')
+        RequestType.objects.create(name='AC Repair', default_department=self.engineering)
+        SLAConfiguration.objects.create(priority='high', response_time_minutes=30, resolution_time_minutes=120)
+
+        self.staff = []
+        for department in (self.housekeeping, self.housekeeping, self.engineering):
+            user = User.objects.create_user(username=f'staff{len(self.staff)}', password='testpass123')
+            UserProfile.objects.update_or_create(
+                user=user, defaults={'full_name': user.username, 'department': department}
+            )
+            self.staff.append(user)
+
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.client.force_login(self.admin)
+
+    def _post(self, tickets):
+        return self.client.post(self.url, data=json.dumps({'tickets': tickets}), content_type='application/json')
+
+    def test_bulk_create_routes_and_sets_sla(self):
+        """Test tickets are created with routing, SLA and one notification per department."""
+        tickets = [
+            {'room_number': f'10{i}', 'department': 'Housekeeping', 'category': 'Towels',
+             'priority': 'High', 'description': 'Floor sweep'}
+            for i in range(5)
+        ] + [{'room_number': '201', 'category': 'AC Repair', 'priority': 'Low', 'description': 'Noisy AC'}]
+
+        response = self._post(tickets)
+        self.assertEqual(response.status_code, 200)
+        ticket_ids = response.json()['ticket_ids']
+        self.assertEqual(len(ticket_ids), 6)
+
+        created = {t.pk: t for t in ServiceRequest.objects.filter(pk__in=ticket_ids)}
+        first, last = created[ticket_ids[0]], created[ticket_ids[-1]]
+        self.assertEqual(first.room_no, '100')
+        self.assertEqual(first.department, self.housekeeping)
+        self.assertEqual((first.response_sla_hours, first.sla_hours), (0.5, 2.0))
+        self.assertIsNotNone(first.due_at)
+        self.assertEqual(last.department, self.engineering)
+        self.assertTrue(RequestType.objects.filter(name='Towels').exists())
+        self.assertEqual(AuditLog.objects.filter(model_name='ServiceRequest', action='create').count(), 6)
+
+        # Housekeeping staff get one grouped notification, engineering one single-ticket notification
+        self.assertEqual(Notification.objects.filter(recipient=self.staff[0]).count(), 1)
+        self.assertEqual(Notification.objects.get(recipient=self.staff[0]).title, '5 New Tickets Assigned')
+        self.assertEqual(
+            Notification.objects.get(recipient=self.staff[2]).related_object_id, str(last.pk)
+        )
+
+    def test_invalid_row_rejects_whole_batch(self):
+        """Test that one invalid ticket creates nothing and reports every error."""
+        response = self._post([
+            {'room_number': '101', 'department': 'Housekeeping', 'category': 'Towels', 'priority': 'High'},
+            {'room_number': '102', 'department': 'Spa', 'category': 'Towels', 'priority': 'High'},
+            {'department': 'Housekeeping', 'category': 'Towels'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [2])
+        self.assertFalse(ServiceRequest.objects.exists())
+
+        response = self._post([
+            {'room_number': '102', 'department': 'Spa', 'category': 'Towels', 'priority': 'High'},
+            {'room_number': '103', 'category': 'Towels', 'priority': 'High'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [0, 1])
+        self.assertFalse(ServiceRequest.objects.exists())
+
+    @override_settings(SLA_SCHEDULER_ENABLED=True)
+    def test_ids_without_returning_bulk_insert(self):
+        """Test ids are read back by batch when bulk_create returns no primary keys."""
+        # An earlier ticket from the same requester must not be picked up
+        earlier = ServiceRequest.objects.create(requester_user=self.admin, room_no='999')
+        tickets = [
+            {'room_number': f'30{i}', 'department': 'Housekeeping', 'category': 'Towels', 'priority': 'High'}
+            for i in range(3)
+        ]
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._post(tickets)
+        self.assertEqual(response.status_code, 200)
+        ticket_ids = response.json()['ticket_ids']
+        self.assertNotIn(None, ticket_ids)
+        self.assertEqual(
+            list(ServiceRequest.objects.filter(pk__in=ticket_ids).order_by('pk').values_list('room_no', flat=True)),
+            ['300', '301', '302'],
+        )
+        self.assertEqual(
+            set(
+                AuditLog.objects.filter(model_name='ServiceRequest', action='create')
+                .exclude(object_pk=str(earlier.pk)).values_list('object_pk', flat=True)
+            ),
+            {str(pk) for pk in ticket_ids},
+        )
+        self.assertEqual(
+            set(SLADeadlineChange.objects.values_list('ticket_id', flat=True)), set(ticket_ids),
+        )
+
+    def test_room_matching_ignores_case(self):
+        """Test rooms match locations by room number or name regardless of case."""
+        suite = Location.objects.create(name='Garden Suite', room_no='GS1')
+        response = self._post([
+            {'room_number': 'gs1', 'department': 'Housekeeping', 'category': 'Towels', 'priority': 'High'},
+            {'room_number': 'GARDEN SUITE', 'department': 'Housekeeping', 'category': 'Towels', 'priority': 'High'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(ServiceRequest.objects.values_list('location_id', flat=True)), {suite.pk},
+        )
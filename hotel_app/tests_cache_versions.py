@@ -0,0 +1,38 @@
+"""
+Tests for the shared cache version helper.
+
+Tests cover:
+- Versions are created on first read and survive eviction moving forward
+- invalidate_version() bumps immediately and again on commit
+"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from hotel_app.cache_versions import bump_version, get_version, invalidate_version
+
+KEY = 'tests:version'
+
+
+class CacheVersionTestCase(TestCase):
+    """Test reading, bumping and invalidating shared versions."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_creates_version(self):
+        version = get_version(KEY)
+        self.assertIsNotNone(version)
+        self.assertEqual(get_version(KEY), version)
+
+    def test_bump_after_eviction_moves_forward(self):
+        version = get_version(KEY)
+        cache.delete(KEY)
+        bump_version(KEY)
+        self.assertGreater(get_version(KEY), version)
+
+    def test_invalidate_bumps_now_and_on_commit(self):
+        version = get_version(KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_version(KEY)
+            self.assertEqual(get_version(KEY), version + 1)
+        self.assertEqual(get_version(KEY), version + 2)
@@ -0,0 +1,181 @@
+"""
+Tests for the FCM push client.
+
+Tests run against a local stand-in for the FCM HTTP v1 endpoint.
+
+Tests cover:
+- One cached access token across sends, refreshed near expiry
+- Keep-alive connection reuse through the pooled session
+- Error responses, token retry on 401 and send metrics
+- Fan-out to many users with bulk token deactivation and last-used updates
+"""
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from hotel_app.fcm_utils import FCMClient, send_push_messages, send_push_notification_to_users
+from hotel_app.models import FCMToken
+
+
+class _FakeFCMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests.append({
+                'path': self.path,
+                'authorization': self.headers['Authorization'],
+                'client_port': self.client_address[1],
+                'token': body['message']['token'],
+            })
+
+        if self.headers['Authorization'] in server.rejected_auth:
+            status, payload = 401, {'error': {'code': 401, 'status': 'UNAUTHENTICATED'}}
+        elif body['message']['token'] == 'dead-token':
+            status, payload = 404, {'error': {
+                'code': 404, 'status': 'NOT_FOUND',
+                'details': [{'errorCode': 'UNREGISTERED'}],
+            }}
+        else:
+            status, payload = 200, {'name': f"projects/test/messages/{len(server.requests)}"}
+
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeFCMServerMixin:
+    """Run the stand-in FCM server and build clients pointing at it."""
+
+    def start_fake_fcm(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeFCMHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.rejected_auth = set()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.issued = []
+        self.expires_in = datetime.timedelta(hours=1)
+
+    def setUp(self):
+        """Start the stand-in FCM server."""
+        self.start_fake_fcm()
+
+    def _token_provider(self):
+        token = f'token-{len(self.issued) + 1}'
+        self.issued.append(token)
+        return token, datetime.datetime.utcnow() + self.expires_in
+
+    def _client(self):
+        client = FCMClient(
+            project_id='test', base_url=f'http://127.0.0.1:{self.server.server_port}',
+            token_provider=self._token_provider, refresh_margin=300, timeout=5,
+        )
+        self.addCleanup(client.session.close)
+        return client
+
+
+class FCMClientTestCase(FakeFCMServerMixin, SimpleTestCase):
+    """Test token caching, connection reuse and metrics."""
+
+    def test_token_cached_and_connection_reused(self):
+        """Test many sends share one token and one keep-alive connection."""
+        client = self._client()
+        for index in range(20):
+            result = client.send(f'device-{index}', 'Title', 'Body', data={'n': index})
+            self.assertIn('name', result)
+
+        self.assertEqual(self.issued, ['token-1'])
+        self.assertEqual({r['authorization'] for r in self.server.requests}, {'Bearer token-1'})
+        self.assertEqual(len({r['client_port'] for r in self.server.requests}), 1)
+        self.assertEqual(self.server.requests[0]['path'], '/v1/projects/test/messages:send')
+
+        metrics = client.metrics()
+        self.assertEqual((metrics['sent'], metrics['failed'], metrics['token_refreshes']), (20, 0, 1))
+        self.assertGreater(metrics['avg_seconds'], 0)
+
+    def test_token_refreshed_near_expiry(self):
+        """Test a token inside the refresh margin is replaced before sending."""
+        self.expires_in = datetime.timedelta(seconds=60)  # already inside the 300s margin
+        client = self._client()
+        client.send('device-1', 'Title', 'Body')
+        client.send('device-2', 'Title', 'Body')
+        self.assertEqual(self.issued, ['token-1', 'token-2'])
+
+        self.expires_in = datetime.timedelta(hours=1)
+        client.send('device-3', 'Title', 'Body')
+        client.send('device-4', 'Title', 'Body')
+        self.assertEqual(self.issued, ['token-1', 'token-2', 'token-3'])
+
+    def test_errors_and_unauthenticated_retry(self):
+        """Test FCM error payloads are returned and a rejected token is refreshed once."""
+        client = self._client()
+        result = client.send('dead-token', 'Title', 'Body')
+        self.assertEqual(result['error']['details'][0]['errorCode'], 'UNREGISTERED')
+
+        self.server.rejected_auth.add('Bearer token-1')
+        result = client.send('device-1', 'Title', 'Body')
+        self.assertIn('name', result)
+        self.assertEqual(self.issued, ['token-1', 'token-2'])
+
+        metrics = client.metrics()
+        self.assertEqual((metrics['sent'], metrics['failed']), (1, 1))
+
+
+@override_settings(FCM_MAX_WORKERS=4)
+class PushFanOutTestCase(FakeFCMServerMixin, TestCase):
+    """Test the concurrent fan-out to many users."""
+
+    def setUp(self):
+        """Set up users with live and dead tokens."""
+        super().setUp()
+        self.users = [User.objects.create_user(username=f'staff{i}', password='x') for i in range(12)]
+        for user in self.users:
+            FCMToken.objects.create(user=user, token=f'device-{user.pk}')
+        FCMToken.objects.create(user=self.users[0], token='dead-token', device_type='android')
+        FCMToken.objects.create(user=self.users[1], token='old-device', is_active=False)
+
+    def test_broadcast_to_queryset(self):
+        """Test one token query, concurrent sends and bulk token updates."""
+        client = self._client()
+        # Token SELECT, deactivate UPDATE, last_used UPDATE
+        with self.assertNumQueries(3):
+            report = send_push_notification_to_users(
+                User.objects.filter(username__startswith='staff'), 'Lost item', 'Blue umbrella', client=client,
+            )
+        self.assertEqual(report, {'tokens': 13, 'sent': 12, 'failed': 1, 'deactivated': 1})
+        self.assertEqual(len(self.server.requests), 13)
+        self.assertNotIn('old-device', {r['token'] for r in self.server.requests})
+
+        self.assertFalse(FCMToken.objects.get(token='dead-token').is_active)
+        self.assertEqual(FCMToken.objects.filter(is_active=True, last_used_at__isnull=False).count(), 12)
+        # Connections come from the shared pool, not one per message
+        self.assertLessEqual(len({r['client_port'] for r in self.server.requests}), 4)
+
+    def test_per_user_messages(self):
+        """Test different messages per recipient in one fan-out."""
+        client = self._client()
+        report = send_push_messages({
+            self.users[2].pk: ('One breach', 'Ticket #1', {'type': 'warning'}),
+            self.users[3].pk: ('2 breaches', 'Tickets #2, #3', None),
+        }, client=client)
+        self.assertEqual(report['sent'], 2)
+        self.assertEqual(
+            {r['token'] for r in self.server.requests},
+            {f'device-{self.users[2].pk}', f'device-{self.users[3].pk}'},
+        )
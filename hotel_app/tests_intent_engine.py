@@ -0,0 +1,314 @@
+"""
+Tests for the lazily loaded intent engine.
+
+The sentence-transformers model is replaced by a small bag-of-words
+encoder, so the tests need no model download.
+
+Tests cover:
+- Importing the views does not import faiss, numpy models or torch
+- The engine loads on first use, once, and detects the nearest request type
+- Request type embeddings are reused from the disk cache across restarts
+- Request type saves and deletes update the index in place, re-embedding
+  only changed texts
+- Repeated messages reuse their embedding, and concurrent messages share
+  one encode call
+- The int8 backend's quantization and the backend comparison harness
+- Preloading loads the shared engine and its model, also with a warm
+  cache, and closes its database connections
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+import torch
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase
+
+from hotel_app.intent_engine import (
+    BatchingEncoder, EmbeddingCache, MessageEmbeddingCache, RAGIntentEngine, SentenceTransformerEncoder,
+    get_intent_engine, preload_intent_engine, quantize_linear_layers, reset_intent_engine,
+)
+from hotel_app.management.commands.benchmark_intent_backends import DEFAULT_FIXTURE, evaluate, load_fixture
+from hotel_app.models import RequestType
+
+DIMENSIONS = 64
+
+
+class BagOfWordsEncoder:
+    """Hashes words into a normalized vector and records what it encoded."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), DIMENSIONS), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in text.lower().replace('.', ' ').split():
+                vectors[row, zlib.crc32(word.encode()) % DIMENSIONS] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class IntentEngineTestCase(TestCase):
+    """Test lazy loading, detection and the embedding cache."""
+
+    def setUp(self):
+        """Set up request types and an empty cache directory."""
+        self.towels = RequestType.objects.create(name='Towels', description='fresh towels bath towel')
+        self.ac = RequestType.objects.create(name='AC Repair', description='air conditioning not working')
+        RequestType.objects.create(name='Old Type', active=False)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def _engine(self, encoder):
+        return RAGIntentEngine(model_name='test/model', encoder=encoder, cache_dir=self.cache_dir.name)
+
+    def test_views_import_is_light(self):
+        """Test importing the views leaves the model libraries unloaded."""
+        code = (
+            'import sys, django; django.setup(); import hotel_app.views; '
+            'print(sorted(m for m in ("faiss", "sentence_transformers", "torch") if m in sys.modules))'
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]', result.stderr)
+
+    def test_lazy_load_and_detect(self):
+        """Test nothing is encoded until the first detect, and the index is built once."""
+        encoder = BagOfWordsEncoder()
+        engine = self._engine(encoder)
+        self.assertEqual(encoder.encoded, [])
+
+        request_type, confidence = engine.detect('need fresh towels')
+        self.assertEqual(request_type, self.towels)
+        self.assertGreater(confidence, 0.5)
+        self.assertEqual(engine.detect('the air conditioning is not working')[0], self.ac)
+        # Two request type texts, then one per message
+        self.assertEqual(len(encoder.encoded), 4)
+
+    def test_embeddings_reused_from_disk(self):
+        """Test a restarted engine only encodes request types whose text changed."""
+        self._engine(BagOfWordsEncoder()).load()
+        self.assertEqual(len(EmbeddingCache(self.cache_dir.name, 'test/model').load()), 2)
+
+        self.ac.description = 'air conditioner too warm'
+        self.ac.save()
+        encoder = BagOfWordsEncoder()
+        engine = self._engine(encoder).load()
+        self.assertEqual(encoder.encoded, ['AC Repair. air conditioner too warm'])
+        self.assertEqual(engine.detect('air conditioner too warm')[0], self.ac)
+        # The stale embedding was dropped from the file
+        self.assertEqual(len(EmbeddingCache(self.cache_dir.name, 'test/model').load()), 2)
+
+    def test_incremental_sync(self):
+        """Test request type edits add, re-embed or remove only the affected entries."""
+        encoder = BagOfWordsEncoder()
+        engine = self._engine(encoder).load()
+        index = engine.index
+        encoder.encoded.clear()
+
+        # A save that leaves the text alone re-embeds nothing
+        self.towels.default_department = None
+        self.towels.save()
+        engine.load()
+        self.assertEqual(encoder.encoded, [])
+        self.assertEqual(engine.last_sync, {'added': 0, 'updated': 0, 'removed': 0})
+
+        self.ac.description = 'air conditioner too warm'
+        self.ac.save()
+        laundry = RequestType.objects.create(name='Laundry', description='wash and iron clothes')
+        self.assertEqual(engine.detect('iron my clothes')[0], laundry)
+        self.assertEqual(engine.last_sync, {'added': 1, 'updated': 1, 'removed': 0})
+        self.assertEqual(
+            encoder.encoded[:2], ['AC Repair. air conditioner too warm', 'Laundry. wash and iron clothes'],
+        )
+        self.assertEqual(engine.detect('too warm')[0], self.ac)
+
+        self.towels.delete()
+        laundry.active = False
+        laundry.save()
+        encoder.encoded.clear()
+        self.assertEqual(engine.detect('fresh towels and clothes')[0], self.ac)
+        self.assertEqual(engine.last_sync, {'added': 0, 'updated': 0, 'removed': 2})
+        self.assertEqual(encoder.encoded, ['fresh towels and clothes'])
+        # Same index, updated in place
+        self.assertIs(engine.index, index)
+        self.assertEqual(engine.index.ntotal, 1)
+
+    def test_no_request_types(self):
+        """Test an engine without active request types detects nothing."""
+        RequestType.objects.update(active=False)
+        self.assertEqual(self._engine(BagOfWordsEncoder()).detect('towels'), (None, 0.0))
+
+
+class MessageEmbeddingTestCase(TestCase):
+    """Test the message embedding LRU and the micro-batching encoder."""
+
+    def test_repeated_messages_use_the_cache(self):
+        """Test messages normalizing to the same text are encoded once."""
+        RequestType.objects.create(name='Towels', description='fresh towels')
+        encoder = BagOfWordsEncoder()
+        engine = RAGIntentEngine(model_name='test/model', encoder=encoder, cache_dir='', message_cache_size=2)
+
+        engine.detect('Need towels!!')
+        engine.detect('  need   TOWELS ')
+        self.assertEqual(encoder.encoded, ['Towels. fresh towels', 'need towels'])
+        self.assertEqual((engine.message_cache.hits, engine.message_cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """Test the least recently used message is dropped first."""
+        lru = MessageEmbeddingCache(2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')
+        lru.put('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertEqual(len(lru), 2)
+
+    def test_concurrent_messages_share_one_encode(self):
+        """Test messages arriving while an encode runs are encoded together."""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def encode(texts):
+            calls.append(list(texts))
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+            return BagOfWordsEncoder()(texts)
+
+        # max_batch ends the wait as soon as the burst is queued
+        batcher = BatchingEncoder(encode, window=5, max_batch=5)
+        results = {}
+
+        def call(text):
+            results.setdefault(text, []).append(batcher(text))
+
+        first = threading.Thread(target=call, args=('first',))
+        first.start()
+        self.assertTrue(started.wait(5))
+        burst = [threading.Thread(target=call, args=(text,)) for text in ['b', 'c', 'd', 'b', 'e']]
+        for thread in burst:
+            thread.start()
+        for thread in burst:
+            thread.join(5)
+        release.set()
+        first.join(5)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(calls[1]), ['b', 'c', 'd', 'e'])
+        np.testing.assert_array_equal(results['b'][0], results['b'][1])
+        np.testing.assert_array_equal(results['c'][0], BagOfWordsEncoder()(['c'])[0])
+
+    def test_encode_errors_reach_every_caller(self):
+        """Test a failed batch raises in the calling thread."""
+        def encode(texts):
+            raise RuntimeError('model unavailable')
+
+        with self.assertRaisesMessage(RuntimeError, 'model unavailable'):
+            BatchingEncoder(encode)('towels')
+
+
+class IntentBackendTestCase(TestCase):
+    """Test backend selection, int8 quantization and the comparison harness."""
+
+    def test_unknown_backend(self):
+        """Test a misspelt backend fails at construction, not on the first message."""
+        with self.assertRaises(ImproperlyConfigured):
+            SentenceTransformerEncoder('test/model', backend='int4')
+
+    def test_embedding_cache_per_backend(self):
+        """Test each backend keeps its request type embeddings in its own file."""
+        torch_engine = RAGIntentEngine(model_name='test/model', encoder=BagOfWordsEncoder(), cache_dir='/tmp/x')
+        int8_engine = RAGIntentEngine(
+            model_name='test/model', encoder=BagOfWordsEncoder(), cache_dir='/tmp/x', backend='int8',
+        )
+        self.assertEqual(torch_engine.cache.path.name, 'test_model.npz')
+        self.assertEqual(int8_engine.cache.path.name, 'test_model-int8.npz')
+
+    def test_quantize_linear_layers(self):
+        """Test Linear layers are swapped for int8 ones that give close outputs."""
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(32, 16), torch.nn.ReLU(), torch.nn.Linear(16, 8))
+        inputs = torch.randn(4, 32)
+        expected = model(inputs)
+
+        quantized = quantize_linear_layers(model)
+        self.assertNotIsInstance(quantized[0], torch.nn.Linear)
+        self.assertTrue(torch.allclose(quantized(inputs), expected, atol=0.05))
+
+    def test_harness_on_fixture(self):
+        """Test the harness scores an engine on the fixture without touching the database."""
+        request_types, messages = load_fixture(DEFAULT_FIXTURE)
+        self.assertGreaterEqual(len(messages), 50)
+        engine = RAGIntentEngine(
+            model_name='test/model', encoder=BagOfWordsEncoder(), cache_dir='', message_cache_size=0,
+            batch_window_ms=0, fixed_request_types=request_types,
+        )
+
+        with self.assertNumQueries(0):
+            result = evaluate(engine, messages)
+        self.assertEqual(len(result['predictions']), len(messages))
+        self.assertEqual(result['predictions'][0][0], 'Towels')
+        self.assertGreater(result['accuracy'], 0.3)
+        self.assertLessEqual(result['accepted'], result['accuracy'])
+
+
+class IntentEnginePreloadTestCase(TransactionTestCase):
+    """Test the startup warm-up."""
+
+    def test_preload(self):
+        """Test preloading loads the process-wide engine."""
+        towels = RequestType.objects.create(name='Towels', description='fresh towels')
+        encoder = BagOfWordsEncoder()
+        reset_intent_engine(RAGIntentEngine(model_name='test/model', encoder=encoder, cache_dir=''))
+        self.addCleanup(reset_intent_engine)
+
+        preload_intent_engine()
+        self.assertEqual(encoder.encoded, ['Towels. fresh towels'])
+        self.assertEqual(get_intent_engine().detect('towels')[0], towels)
+
+    def test_wsgi_import_closes_connections(self):
+        """Test loading config.wsgi leaves no database connection for forked workers to share."""
+        # A spy rather than checking the connection: in-memory SQLite never closes
+        code = (
+            'from unittest import mock; from django.db import connections; '
+            'spy = mock.patch.object(connections, "close_all", wraps=connections.close_all).start(); '
+            'import config.wsgi; print(spy.called)'
+        )
+        env = dict(
+            os.environ, INTENT_ENGINE_PRELOAD='False',
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'True', result.stderr)
+
+    def test_preload_with_warm_cache_loads_model(self):
+        """Test preloading loads the model even when every embedding comes from the cache."""
+        class LazyEncoder(BagOfWordsEncoder):
+            loaded = False
+
+            def load(self):
+                self.loaded = True
+
+        RequestType.objects.create(name='Towels', description='fresh towels')
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        RAGIntentEngine(model_name='test/model', encoder=BagOfWordsEncoder(), cache_dir=cache_dir.name).load()
+        encoder = LazyEncoder()
+        reset_intent_engine(RAGIntentEngine(model_name='test/model', encoder=encoder, cache_dir=cache_dir.name))
+        self.addCleanup(reset_intent_engine)
+
+        preload_intent_engine()
+        self.assertEqual(encoder.encoded, [])
+        self.assertTrue(encoder.loaded)
@@ -0,0 +1,106 @@
+"""
+Tests for the dashboard KPI aggregation layer.
+
+Tests cover:
+- Aggregated ticket, voucher and review figures
+- Per-request-type and per-day buckets
+- Dashboard query count independent of request types and trend period
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hotel_app import kpi_services
+from hotel_app.models import Department, RequestType, Review, ServiceRequest
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class DashboardKPITestCase(TestCase):
+    """Test KPI figures and the dashboard's query budget."""
+
+    def setUp(self):
+        """Set up request types, tickets and reviews."""
+        self.today = timezone.localdate()
+        self.range_start = kpi_services.day_start(self.today - datetime.timedelta(days=30))
+        self.range_end = kpi_services.day_start(self.today + datetime.timedelta(days=1))
+
+        self.housekeeping = Department.objects.create(name='Housekeeping')
+        self.towels = RequestType.objects.create(name='Towels')
+        self.repair = RequestType.objects.create(name='Repair')
+
+        ServiceRequest.objects.create(request_type=self.towels, status='pending')
+        ServiceRequest.objects.create(request_type=self.towels, status='in_progress', sla_breached=True)
+        ServiceRequest.objects.create(
+            request_type=self.repair, department=self.housekeeping, status='completed',
+            completed_at=timezone.now(),
+        )
+        Review.objects.create(rating=5)
+        Review.objects.create(rating=3)
+        Review.objects.create(rating=1)
+
+        self.user = User.objects.create_superuser(
+            username='admin', email='admin@test.com', password='testpass123'
+        )
+
+    def test_service_request_kpis(self):
+        """Test ticket activity and SLA breach figures."""
+        stats = kpi_services.service_request_kpis(self.range_start, self.range_end, self.today)
+        self.assertEqual(stats['active_tickets'], 2)
+        self.assertEqual(stats['sla_breaches'], 1)
+        self.assertEqual(stats['sla_breaches_today'], 1)
+        self.assertEqual(stats['sla_breaches_yesterday'], 0)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['staff_efficiency'], 100)
+
+    def test_request_type_and_department_counts(self):
+        """Test zero-filled per-request-type and per-department counts."""
+        RequestType.objects.create(name='Unused')
+        counts = kpi_services.request_type_counts(self.range_start, self.range_end)
+        self.assertEqual(
+            dict(zip(counts['labels'], counts['values'])),
+            {'Towels': 2, 'Repair': 1, 'Unused': 0},
+        )
+        self.assertEqual(
+            kpi_services.department_ticket_counts(),
+            [('Housekeeping', 1, 0, 1)],
+        )
+
+    def test_review_buckets(self):
+        """Test daily review buckets and the 30-day sentiment split."""
+        days = kpi_services.daily_review_counts(7, self.today)
+        self.assertEqual(len(days), 7)
+        self.assertEqual(days[-1], (self.today, {'total': 3, 'positive': 1, 'neutral': 1, 'negative': 1}))
+        self.assertEqual(days[0][1]['total'], 0)
+
+        stats = kpi_services.review_kpis(self.range_start, self.range_end, self.today)
+        self.assertEqual(
+            (stats['positive_30d'], stats['neutral_30d'], stats['negative_30d']), (1, 1, 1)
+        )
+        self.assertEqual(stats['avg_rating'], 3)
+
+        tickets = kpi_services.daily_ticket_counts(30, self.today)
+        self.assertEqual(len(tickets), 30)
+        self.assertEqual(tickets[-1], (self.today, 3))
+
+    def _dashboard_query_count(self, trend_period):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/dashboard/', {'trend_period': trend_period})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_dashboard_query_count_is_flat(self):
+        """Test that more request types and longer trends add no queries."""
+        # Warm the section permission cache so both measured requests hit it
+        self._dashboard_query_count(7)
+        baseline = self._dashboard_query_count(7)
+        for i in range(10):
+            RequestType.objects.create(name=f'Extra {i}')
+            Department.objects.create(name=f'Dept {i}')
+        self.assertEqual(self._dashboard_query_count(90), baseline)
@@ -0,0 +1,139 @@
+"""
+Tests for the notification retention job.
+
+Tests cover:
+- Old read notifications are archived in bounded batches
+- Old unread notifications are compacted into one digest per recipient
+- Old broadcasts are deleted with their receipts
+- Removed rows leave tombstones, which expire in turn
+- Recent notifications are kept; dry runs change nothing
+- The management command reports table size
+"""
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_app.models import (
+    BroadcastNotification, BroadcastReceipt, Notification, NotificationArchive, NotificationTombstone,
+)
+from hotel_app.notification_retention import (
+    DIGEST_OBJECT_TYPE, compact_unread_notifications, purge_broadcasts, purge_read_notifications,
+    purge_tombstones, run_retention,
+)
+
+
+class NotificationRetentionTestCase(TestCase):
+    """Test purging, compaction and the report."""
+
+    def setUp(self):
+        """Set up old and recent notifications for two users."""
+        self.alice = User.objects.create_user(username='alice', password='x')
+        self.bob = User.objects.create_user(username='bob', password='x')
+        self.old = timezone.now() - datetime.timedelta(days=120)
+        self.recent = timezone.now() - datetime.timedelta(days=1)
+
+    def _notify(self, user, count, created_at, is_read):
+        Notification.objects.bulk_create([
+            Notification(recipient=user, title=f'N{i}', message='m', is_read=is_read, created_at=created_at)
+            for i in range(count)
+        ])
+
+    def test_purge_read_in_batches(self):
+        """Test old read rows move to the archive, a batch per transaction."""
+        self._notify(self.alice, 7, self.old, is_read=True)
+        self._notify(self.alice, 2, self.recent, is_read=True)
+        self._notify(self.bob, 3, self.old, is_read=False)
+
+        pauses = []
+        removed = purge_read_notifications(30, batch_size=3, pause=0.5, sleep=pauses.append)
+        self.assertEqual(removed, 7)
+        # Batches of 3, 3 and 1, pausing between full batches
+        self.assertEqual(pauses, [0.5, 0.5])
+        self.assertEqual(NotificationArchive.objects.count(), 7)
+        self.assertEqual(Notification.objects.filter(is_read=True).count(), 2)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 3)
+
+        archived = NotificationArchive.objects.first()
+        self.assertEqual((archived.recipient, archived.created_at), (self.alice, self.old))
+
+    def test_compact_unread_into_digests(self):
+        """Test old unread rows collapse into one digest per user, accumulating across runs."""
+        self._notify(self.alice, 4, self.old, is_read=False)
+        self._notify(self.bob, 2, self.old, is_read=False)
+        self._notify(self.bob, 1, self.recent, is_read=False)
+
+        self.assertEqual(compact_unread_notifications(90, batch_size=4, archive=False), 6)
+        self.assertFalse(NotificationArchive.objects.exists())
+        digests = Notification.objects.filter(related_object_type=DIGEST_OBJECT_TYPE)
+        self.assertEqual(digests.count(), 2)
+        digest = digests.get(recipient=self.alice)
+        self.assertIn('4 unread notifications', digest.message)
+        self.assertIsNone(digest.related_object_id)
+        # Dated when it was written, so it lists as new rather than 120 days back
+        self.assertGreater(digest.created_at, self.recent)
+        self.assertEqual(Notification.objects.filter(recipient=self.bob).count(), 2)
+
+        # Digests are not compacted themselves; later rows are added to them
+        self._notify(self.alice, 2, self.old, is_read=False)
+        self.assertEqual(compact_unread_notifications(90, archive=False), 2)
+        digest = digests.get(recipient=self.alice)
+        self.assertIn('6 unread notifications', digest.message)
+        self.assertFalse(digest.is_read)
+
+    def test_dry_run_and_command_report(self):
+        """Test dry runs leave rows alone and the command prints sizes."""
+        self._notify(self.alice, 3, self.old, is_read=True)
+        self._notify(self.bob, 2, self.old, is_read=False)
+
+        report = run_retention(dry_run=True)
+        self.assertEqual((report['read_removed'], report['unread_compacted']), (3, 2))
+        self.assertEqual(Notification.objects.count(), 5)
+
+        out = StringIO()
+        call_command('prune_notifications', stdout=out)
+        self.assertIn('Removed 3 read notifications, compacted 2 unread ones and removed 0 broadcasts', out.getvalue())
+        self.assertIn('Before: 5 rows', out.getvalue())
+        # Bob's two unread rows became one digest
+        self.assertIn('After:  1 rows', out.getvalue())
+
+    def test_purge_broadcasts_with_receipts(self):
+        """Test broadcasts past the unread horizon go, receipts first; recent ones stay."""
+        old = [
+            BroadcastNotification.objects.create(title=f'Old {i}', message='m', created_at=self.old)
+            for i in range(3)
+        ]
+        recent = BroadcastNotification.objects.create(title='Recent', message='m', created_at=self.recent)
+        BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast=b, user=u) for b in old + [recent] for u in (self.alice, self.bob)]
+        )
+
+        pauses = []
+        removed = purge_broadcasts(90, batch_size=2, pause=0.5, sleep=pauses.append)
+        self.assertEqual(removed, 3)
+        # Receipts in batches of 2, 2, 2, then broadcasts in 2 and 1
+        self.assertEqual(pauses, [0.5, 0.5, 0.5, 0.5])
+        self.assertEqual(list(BroadcastNotification.objects.all()), [recent])
+        self.assertEqual(BroadcastReceipt.objects.filter(broadcast=recent).count(), 2)
+        self.assertEqual(BroadcastReceipt.objects.count(), 2)
+
+    def test_tombstones_for_removed_rows(self):
+        """Test purged notifications and broadcasts leave tombstones until they expire."""
+        self._notify(self.alice, 2, self.old, is_read=True)
+        ids = list(Notification.objects.values_list('pk', flat=True))
+        broadcast = BroadcastNotification.objects.create(title='Old', message='m', created_at=self.old)
+
+        purge_read_notifications(30)
+        purge_broadcasts(90)
+        tombstones = NotificationTombstone.objects.order_by('sync_id')
+        self.assertEqual(
+            [(t.user_id, t.sync_id) for t in tombstones],
+            [(None, -broadcast.pk)] + [(self.alice.pk, pk) for pk in ids],
+        )
+
+        self.assertEqual(purge_tombstones(30), 0)
+        tombstones.update(deleted_at=self.old)
+        self.assertEqual(purge_tombstones(30), 3)
@@ -0,0 +1,237 @@
+"""
+Tests for the server-sent notification stream.
+
+Tests drive the ASGI application directly. They run in a
+TransactionTestCase: the stream closes stale database connections at its
+boundaries, as Django's own handlers do, which would end a TestCase's
+wrapping transaction.
+
+Tests cover:
+- Unauthenticated connections are rejected
+- Missed notifications are replayed from the `since` cursor
+- New notifications are pushed to their recipient only
+- Broadcasts are pushed to members of their audience
+- Connections start with the newest ids as `ready` cursors
+- Missed broadcasts are replayed from the `broadcast_since` cursor
+- A backlog too long to replay asks the client to `resync`
+- Rows whose transaction committed after a higher id are still delivered
+- Other paths are still served by Django
+"""
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+
+from config.asgi import application
+from hotel_app.models import Notification
+from hotel_app.notification_stream import STREAM_PATH
+from hotel_app.utils import create_broadcast
+
+
+class _Connection:
+    """One in-flight ASGI request against the application."""
+
+    def __init__(self, path=STREAM_PATH, query='', cookie=None, headers=()):
+        headers = list(headers)
+        if cookie:
+            headers.append((b'cookie', f'{settings.SESSION_COOKIE_NAME}={cookie}'.encode()))
+        self.scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+            'headers': headers, 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1),
+            'root_path': '', 'http_version': '1.1', 'asgi': {'version': '3.0'},
+        }
+        self.inbox = asyncio.Queue()
+        self.inbox.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+        self.messages = []
+        self.received = asyncio.Event()
+        self.task = asyncio.ensure_future(application(self.scope, self.inbox.get, self._send))
+
+    async def _send(self, message):
+        self.messages.append(message)
+        self.received.set()
+
+    @property
+    def status(self):
+        return next(m['status'] for m in self.messages if m['type'] == 'http.response.start')
+
+    @property
+    def body(self):
+        return b''.join(m.get('body', b'') for m in self.messages if m['type'] == 'http.response.body').decode()
+
+    def events(self, kind='notification'):
+        events = []
+        for block in self.body.split('\n\n'):
+            lines = block.splitlines()
+            if f'event: {kind}' in lines:
+                events.extend(json.loads(line[len('data: '):]) for line in lines if line.startswith('data: '))
+        return events
+
+    async def wait_for(self, predicate, timeout=5):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not predicate():
+            self.received.clear()
+            await asyncio.wait_for(self.received.wait(), deadline - loop.time())
+
+    async def close(self):
+        await self.inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 5)
+
+
+@override_settings(NOTIFICATION_STREAM_POLL_SECONDS=0.05, NOTIFICATION_STREAM_HEARTBEAT_SECONDS=5)
+class NotificationStreamTestCase(TransactionTestCase):
+    """Test the SSE endpoint served by config.asgi."""
+
+    def setUp(self):
+        """Set up a logged-in user and another recipient."""
+        self.user = User.objects.create_user(username='staff', password='x')
+        self.other = User.objects.create_user(username='other', password='x')
+        self.client.force_login(self.user)
+        self.session_key = self.client.session.session_key
+
+    def _notify(self, user, title, **kwargs):
+        return Notification.objects.create(recipient=user, title=title, message=title, **kwargs)
+
+    def test_requires_authentication(self):
+        """Test connections without a session or token get 403."""
+        async def run():
+            connection = _Connection(cookie='not-a-session')
+            await asyncio.wait_for(connection.task, 5)
+            return connection
+
+        connection = async_to_sync(run)()
+        self.assertEqual(connection.status, 403)
+
+    # Cursor tests replay exactly what follows the cursor, without the lookback
+    @mock.patch('hotel_app.notification_stream.LOOKBACK_IDS', 0)
+    def test_replay_then_live_events(self):
+        """Test rows after `since` are replayed and new rows are pushed to the recipient."""
+        seen = self._notify(self.user, 'Seen')
+        missed = self._notify(self.user, 'Missed')
+        self._notify(self.other, 'Not yours')
+
+        async def run():
+            connection = _Connection(query=f'since={seen.pk}', cookie=self.session_key)
+            await connection.wait_for(lambda: len(connection.events()) == 1)
+
+            await sync_to_async(self._notify)(self.other, 'Still not yours')
+            await sync_to_async(self._notify)(self.user, 'Live')
+            await connection.wait_for(lambda: len(connection.events()) == 2)
+            await connection.close()
+            return connection
+
+        connection = async_to_sync(run)()
+        self.assertEqual(connection.status, 200)
+        self.assertIn('retry: ', connection.body)
+        events = connection.events()
+        self.assertEqual([e['title'] for e in events], ['Missed', 'Live'])
+        self.assertEqual(events[0]['id'], missed.pk)
+        self.assertIn(f"id: {events[1]['id']}\nevent: notification\n", connection.body)
+
+    def test_other_paths_served_by_django(self):
+        """Test the ASGI router hands everything else to Django."""
+        async def run():
+            connection = _Connection(path='/api/notification/notifications/', cookie=self.session_key)
+            await asyncio.wait_for(connection.task, 5)
+            return connection
+
+        self._notify(self.user, 'Unread')
+        connection = async_to_sync(run)()
+        self.assertEqual(connection.status, 200)
+        self.assertEqual([n['title'] for n in json.loads(connection.body)], ['Unread'])
+
+    def test_broadcasts_pushed_to_audience(self):
+        """Test a new broadcast reaches a connected member without moving the cursor."""
+        async def run():
+            connection = _Connection(cookie=self.session_key)
+            await connection.wait_for(lambda: 'retry: ' in connection.body)
+            # Let the hub take its starting ids before the broadcast is written
+            await asyncio.sleep(0.2)
+            await sync_to_async(create_broadcast)('Fire drill', 'At 3 PM')
+            await connection.wait_for(lambda: len(connection.events()) == 1)
+            await connection.close()
+            return connection
+
+        connection = async_to_sync(run)()
+        event = connection.events()[0]
+        self.assertEqual((event['title'], event['is_broadcast']), ('Fire drill', True))
+        self.assertNotIn('\nid: ', '\n' + connection.body)
+
+    def test_ready_carries_newest_ids(self):
+        """Test each connection starts with the newest notification and broadcast ids."""
+        notification = self._notify(self.other, 'Newest')
+        broadcast = create_broadcast('Pool closed', 'Until 6 PM')
+
+        async def run():
+            connection = _Connection(cookie=self.session_key)
+            await connection.wait_for(lambda: connection.events('ready'))
+            await connection.close()
+            return connection
+
+        connection = async_to_sync(run)()
+        self.assertEqual(
+            connection.events('ready'), [{'notification_id': notification.pk, 'broadcast_id': broadcast.pk}]
+        )
+        self.assertEqual(connection.events(), [])
+
+    @mock.patch('hotel_app.notification_stream.LOOKBACK_IDS', 0)
+    def test_broadcast_replay(self):
+        """Test broadcasts after `broadcast_since` are replayed on reconnect."""
+        seen = create_broadcast('Seen', 'Seen')
+        create_broadcast('Missed', 'Missed')
+
+        async def run():
+            connection = _Connection(query=f'broadcast_since={seen.pk}', cookie=self.session_key)
+            await connection.wait_for(lambda: len(connection.events()) == 1)
+            await connection.close()
+            return connection
+
+        connection = async_to_sync(run)()
+        self.assertEqual([e['title'] for e in connection.events()], ['Missed'])
+        self.assertEqual(connection.events('resync'), [])
+
+    @mock.patch('hotel_app.notification_stream.LOOKBACK_IDS', 0)
+    def test_resync_when_backlog_truncated(self):
+        """Test a backlog longer than BACKLOG_LIMIT ends with a `resync` event."""
+        seen = self._notify(self.user, 'Seen')
+        for i in range(3):
+            self._notify(self.user, f'Missed {i}')
+
+        async def run():
+            connection = _Connection(query=f'since={seen.pk}', cookie=self.session_key)
+            await connection.wait_for(lambda: connection.events('resync'))
+            await connection.close()
+            return connection
+
+        with mock.patch('hotel_app.notification_stream.BACKLOG_LIMIT', 2):
+            connection = async_to_sync(run)()
+        self.assertEqual([e['title'] for e in connection.events()], ['Missed 0', 'Missed 1'])
+
+    def test_late_commits_within_lookback(self):
+        """Test a row with a lower id than ones already sent is still pushed and replayed."""
+        first = self._notify(self.user, 'First')
+
+        async def run():
+            connection = _Connection(cookie=self.session_key)
+            await connection.wait_for(lambda: connection.events('ready'))
+            await asyncio.sleep(0.2)
+            await sync_to_async(self._notify)(self.user, 'Higher', pk=first.pk + 10)
+            await connection.wait_for(lambda: len(connection.events()) == 1)
+            # Committed later than 'Higher' although its id is lower
+            await sync_to_async(self._notify)(self.user, 'Lower', pk=first.pk + 5)
+            await connection.wait_for(lambda: len(connection.events()) == 2)
+            await asyncio.sleep(0.2)
+            await connection.close()
+
+            replay = _Connection(query=f'since={first.pk + 10}', cookie=self.session_key)
+            await replay.wait_for(lambda: len(replay.events()) == 3)
+            await replay.close()
+            return connection, replay
+
+        connection, replay = async_to_sync(run)()
+        self.assertEqual([e['title'] for e in connection.events()], ['Higher', 'Lower'])
+        self.assertEqual([e['title'] for e in replay.events()], ['First', 'Lower', 'Higher'])
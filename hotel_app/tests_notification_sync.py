@@ -0,0 +1,205 @@
+"""
+Tests for the paginated, delta-sync notification list API.
+
+Tests cover:
+- Keyset pages on (created_at, id) visit every row once, including ties
+- Delta sync returns only new or changed rows and the unread count
+- Bulk mark-as-read is picked up by delta sync
+- Broadcasts are merged into pages and delta sync, reads included
+- Rows stamped before a caught-up cursor but committed after it are synced
+- Deleted, dismissed and compacted rows are reported as removed
+- Malformed cursors are rejected and expired ones ask for a resync
+"""
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_app.models import BroadcastNotification, Notification
+from hotel_app.notification_retention import compact_unread_notifications
+from hotel_app.notification_services import encode_cursor
+
+URL = '/api/notification/notifications/all/'
+
+
+@mock.patch('hotel_app.notification_services.SYNC_LOOKBACK', datetime.timedelta(0))
+class NotificationSyncTestCase(TestCase):
+    """Test get_all_notifications pagination and delta mode."""
+
+    def setUp(self):
+        """Set up a user with notifications sharing timestamps."""
+        self.user = User.objects.create_user(username='staff', password='x')
+        self.other = User.objects.create_user(username='other', password='x')
+        base = timezone.now() - datetime.timedelta(hours=1)
+        self.notifications = []
+        for index in range(7):
+            notification = Notification.objects.create(
+                recipient=self.user, title=f'N{index}', message='m',
+                created_at=base + datetime.timedelta(minutes=index // 2),
+            )
+            self.notifications.append(notification)
+        Notification.objects.create(recipient=self.other, title='Other', message='m')
+        self.client.force_login(self.user)
+
+    def test_pages_cover_history_once(self):
+        """Test following next_cursor returns every row newest first."""
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(URL, params).json()
+            pages += 1
+            if pages == 1:
+                self.assertIn('sync_cursor', data)
+                self.assertEqual(data['unread_count'], 7)
+            ids.extend(n['id'] for n in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(
+            Notification.objects.filter(recipient=self.user)
+            .order_by('-created_at', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, expected)
+
+    def test_delta_returns_new_and_changed_rows(self):
+        """Test `since` returns only rows changed after the sync cursor."""
+        sync_cursor = self.client.get(URL, {'limit': 1}).json()['sync_cursor']
+        data = self.client.get(URL, {'since': sync_cursor}).json()
+        self.assertEqual((data['results'], data['removed'], data['has_more']), ([], [], False))
+
+        self.notifications[0].mark_as_read()
+        new = Notification.objects.create(recipient=self.user, title='New', message='m')
+        Notification.objects.create(recipient=self.other, title='Not yours', message='m')
+
+        data = self.client.get(URL, {'since': sync_cursor}).json()
+        self.assertEqual([n['id'] for n in data['results']], [self.notifications[0].pk, new.pk])
+        self.assertTrue(data['results'][0]['is_read'])
+        self.assertEqual(data['unread_count'], 7)
+
+        # Nothing left after the returned cursor
+        again = self.client.get(URL, {'since': data['sync_cursor']}).json()
+        self.assertEqual(again['results'], [])
+
+    def test_delta_pages_and_mark_all_read(self):
+        """Test bulk mark-as-read shows up in delta sync, paged by `limit`."""
+        sync_cursor = self.client.get(URL).json()['sync_cursor']
+        self.assertEqual(self.client.post('/api/notification/notifications/read-all/').status_code, 200)
+
+        seen = []
+        while True:
+            data = self.client.get(URL, {'since': sync_cursor, 'limit': 4}).json()
+            seen.extend(n['id'] for n in data['results'])
+            sync_cursor = data['sync_cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(n.pk for n in self.notifications))
+        self.assertEqual(data['unread_count'], 0)
+
+    def test_late_commit_within_lookback(self):
+        """Test a row stamped before a caught-up cursor is returned by the next read."""
+        Notification.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        sync_cursor = self.client.get(URL).json()['sync_cursor']
+        # Saved before the cursor was taken, committed after it
+        Notification.objects.filter(pk=self.notifications[0].pk).update(
+            is_read=True, updated_at=timezone.now() - datetime.timedelta(seconds=5),
+        )
+        data = self.client.get(URL, {'since': sync_cursor}).json()
+        self.assertEqual(data['results'], [])
+
+        with mock.patch('hotel_app.notification_services.SYNC_LOOKBACK', datetime.timedelta(seconds=30)):
+            data = self.client.get(URL, {'since': sync_cursor}).json()
+        self.assertEqual([n['id'] for n in data['results']], [self.notifications[0].pk])
+        self.assertTrue(data['results'][0]['is_read'])
+
+    def test_removed_rows_are_reported(self):
+        """Test deleted, dismissed and compacted rows come back as `removed` ids."""
+        self.user.date_joined = self.notifications[0].created_at
+        self.user.save(update_fields=['date_joined'])
+        broadcast = BroadcastNotification.objects.create(title='B', message='m')
+        old = Notification.objects.create(
+            recipient=self.user, title='Old', message='m',
+            created_at=timezone.now() - datetime.timedelta(days=100),
+        )
+        sync_cursor = self.client.get(URL).json()['sync_cursor']
+
+        deleted = self.notifications[3]
+        self.assertEqual(self.client.delete(f'/api/notification/notifications/{deleted.pk}/delete/').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/notification/broadcasts/{broadcast.pk}/delete/').status_code, 200)
+        self.assertEqual(compact_unread_notifications(90), 1)
+
+        data = self.client.get(URL, {'since': sync_cursor}).json()
+        self.assertEqual(data['removed'], [deleted.pk, f'broadcast-{broadcast.pk}', old.pk])
+        self.assertEqual([n['title'] for n in data['results']], ['Older notifications'])
+        self.assertEqual(data['unread_count'], 7)
+
+        again = self.client.get(URL, {'since': data['sync_cursor']}).json()
+        self.assertEqual((again['results'], again['removed']), ([], []))
+
+    def test_removed_rows_are_paged(self):
+        """Test removals share the `limit` and cursor with changed rows."""
+        sync_cursor = self.client.get(URL).json()['sync_cursor']
+        for notification in self.notifications:
+            self.client.delete(f'/api/notification/notifications/{notification.pk}/delete/')
+
+        removed = []
+        while True:
+            data = self.client.get(URL, {'since': sync_cursor, 'limit': 3}).json()
+            removed.extend(data['removed'])
+            sync_cursor = data['sync_cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(removed, [n.pk for n in self.notifications])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor gets a 400."""
+        self.assertEqual(self.client.get(URL, {'cursor': 'bogus!'}).status_code, 400)
+        self.assertEqual(self.client.get(URL, {'since': 'bm90LWEtY3Vyc29y'}).status_code, 400)
+
+    def test_expired_cursor_asks_for_resync(self):
+        """Test a cursor older than the kept tombstones gets a 410."""
+        cursor = encode_cursor(timezone.now() - datetime.timedelta(days=31), 0, caught_up=True)
+        response = self.client.get(URL, {'since': cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['resync'])
+
+    def test_broadcasts_in_pages_and_delta(self):
+        """Test visible broadcasts are paged with notifications and their reads are synced."""
+        self.user.date_joined = self.notifications[0].created_at
+        self.user.save(update_fields=['date_joined'])
+        tied = BroadcastNotification.objects.create(
+            title='Tied', message='m', created_at=self.notifications[2].created_at,
+        )
+        BroadcastNotification.objects.create(
+            title='Before joining', message='m', created_at=self.user.date_joined - datetime.timedelta(days=1),
+        )
+
+        titles, cursor = [], None
+        while True:
+            params = {'limit': 2, 'cursor': cursor} if cursor else {'limit': 2}
+            data = self.client.get(URL, params).json()
+            titles.extend(n['title'] for n in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(titles, ['N6', 'N5', 'N4', 'N3', 'N2', 'Tied', 'N1', 'N0'])
+        self.assertEqual(data['unread_count'], 8)
+
+        sync_cursor = self.client.get(URL).json()['sync_cursor']
+        new = BroadcastNotification.objects.create(title='New', message='m')
+        self.client.post('/api/notification/notifications/read-all/')
+
+        data = self.client.get(URL, {'since': sync_cursor}).json()
+        results = {n['id']: n for n in data['results']}
+        self.assertEqual(len(results), 9)
+        self.assertTrue(all(n['is_read'] for n in results.values()))
+        self.assertIn(f'broadcast-{new.pk}', results)
+        self.assertIn(f'broadcast-{tied.pk}', results)
+        self.assertEqual(data['unread_count'], 0)
+        again = self.client.get(URL, {'since': data['sync_cursor']}).json()
+        self.assertEqual(again['results'], [])
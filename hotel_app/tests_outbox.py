@@ -0,0 +1,177 @@
+"""
+Tests for the outbound notification queue.
+
+Tests cover:
+- Notification creation only queues push rows
+- Worker delivery, retry with backoff and giving up after max attempts
+- Per-channel rate limiting
+- Inline delivery when the outbox is disabled
+- Push coalescing per recipient and type within a window
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_app import fcm_utils
+from hotel_app.models import FCMToken, Notification, OutboundMessage
+from hotel_app.outbox import (
+    OutboxWorker, RateLimiter, coalesce_pushes, queue_email, queue_push_messages, queue_whatsapp, retry_delay,
+)
+from hotel_app.tests_fcm_client import FakeFCMServerMixin
+from hotel_app.utils import create_bulk_notifications, create_notification
+
+
+@override_settings(
+    NOTIFICATION_OUTBOX_ENABLED=True,
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS=3,
+    NOTIFICATION_OUTBOX_BACKOFF_SECONDS=30,
+    NOTIFICATION_OUTBOX_RATE_LIMITS={},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OutboxTestCase(TestCase):
+    """Test queueing and the outbox worker."""
+
+    def setUp(self):
+        """Set up a few staff users."""
+        self.users = [User.objects.create_user(username=f'staff{i}', password='x') for i in range(3)]
+        self.sleeps = []
+        self.worker = OutboxWorker(batch_size=10, sleep=self.sleeps.append)
+
+    def test_notifications_only_queue_pushes(self):
+        """Test in-app notifications are created and pushes are queued, not sent."""
+        create_notification(self.users[0], 'Ticket assigned', 'Ticket #1', notification_type='request')
+        create_bulk_notifications(self.users, 'Lost item', 'Blue umbrella')
+
+        self.assertEqual(Notification.objects.count(), 4)
+        single, bulk = OutboundMessage.objects.order_by('pk')
+        self.assertEqual(single.channel, OutboundMessage.CHANNEL_FCM)
+        self.assertEqual(single.payload['user_ids'], [self.users[0].pk])
+        self.assertEqual(single.payload['data']['type'], 'request')
+        self.assertEqual(bulk.payload['user_ids'], [user.pk for user in self.users])
+        self.assertEqual(bulk.status, OutboundMessage.STATUS_PENDING)
+
+    def test_worker_sends_email(self):
+        """Test the worker delivers due rows and marks them sent."""
+        queue_email('New Task: Towels', 'You have been assigned a new task', ['a@test.com', ''])
+        self.assertEqual(len(mail.outbox), 0)
+
+        report = self.worker.drain_once()
+        self.assertEqual(report, {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(mail.outbox[0].to, ['a@test.com'])
+        message = OutboundMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), (OutboundMessage.STATUS_SENT, 1))
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(self.worker.drain_once(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_retry_backoff_then_give_up(self):
+        """Test failed deliveries back off exponentially and fail after max attempts."""
+        # Twilio is not configured in tests, so every WhatsApp send fails
+        queue_whatsapp('+15550001111', body='Your ticket is being handled')
+
+        report = self.worker.drain_once()
+        self.assertEqual(report['retried'], 1)
+        message = OutboundMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('configured', message.last_error)
+        self.assertGreater(message.next_attempt_at, timezone.now() + datetime.timedelta(seconds=25))
+
+        # Not due yet
+        self.assertEqual(self.worker.drain_once()['retried'], 0)
+
+        later = timezone.now() + datetime.timedelta(hours=1)
+        self.assertEqual(self.worker.drain_once(now=later)['retried'], 1)
+        self.assertEqual(self.worker.drain_once(now=later + datetime.timedelta(hours=1))['failed'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundMessage.STATUS_FAILED, 3))
+        self.assertEqual(retry_delay(2), datetime.timedelta(seconds=60))
+
+    def test_rate_limit_per_channel(self):
+        """Test the channel's token bucket spaces out sends."""
+        clock = [0.0]
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            clock[0] += seconds
+
+        self.worker = OutboxWorker(batch_size=10, sleep=sleep)
+        self.worker.limiters['email'] = RateLimiter(2, clock=lambda: clock[0])
+        for index in range(5):
+            queue_email(f'Subject {index}', 'Body', [f'user{index}@test.com'])
+
+        sent = 0
+        while sent < 5:
+            sent += self.worker.drain_once()['sent']
+        self.assertEqual(len(mail.outbox), 5)
+        # 2 per second with a burst of 2: the last three sends waited ~1.5s in total
+        self.assertAlmostEqual(sum(self.sleeps), 1.5, places=5)
+
+    @override_settings(NOTIFICATION_OUTBOX_ENABLED=False)
+    def test_disabled_outbox_sends_inline(self):
+        """Test helpers deliver immediately when the outbox is off."""
+        self.assertIsNone(queue_email('Subject', 'Body', ['a@test.com']))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboundMessage.objects.exists())
+
+
+@override_settings(
+    NOTIFICATION_OUTBOX_ENABLED=True,
+    NOTIFICATION_OUTBOX_RATE_LIMITS={},
+    NOTIFICATION_PUSH_COALESCE_SECONDS=30,
+)
+class PushCoalescingTestCase(FakeFCMServerMixin, TestCase):
+    """Test pushes queued in one window go out as one per recipient and type."""
+
+    def setUp(self):
+        """Point the process-wide FCM client at the stand-in server."""
+        super().setUp()
+        fcm_utils._client = self._client()
+        self.addCleanup(setattr, fcm_utils, '_client', None)
+        self.alice = User.objects.create_user(username='alice', password='x')
+        self.bob = User.objects.create_user(username='bob', password='x')
+        for user in (self.alice, self.bob):
+            FCMToken.objects.create(user=user, token=f'device-{user.username}')
+
+    def test_window_coalesces_pushes(self):
+        """Test a burst becomes one summary push per type while every in-app row is kept."""
+        for ticket in ('A', 'B', 'C'):
+            create_notification(self.alice, f'SLA Breach Alert: Ticket {ticket}', 'Breached', notification_type='warning')
+        create_notification(self.alice, 'Ticket #7 Assigned', 'Towels', notification_type='request')
+        create_notification(self.bob, 'SLA Breach Alert: Ticket D', 'Breached', notification_type='warning')
+        self.assertEqual(Notification.objects.count(), 5)
+
+        # All five rows fall due together at the end of the window
+        due = set(OutboundMessage.objects.values_list('next_attempt_at', flat=True))
+        self.assertEqual(len(due), 1)
+        self.assertGreater(due.pop(), timezone.now())
+        worker = OutboxWorker(batch_size=50)
+        self.assertEqual(worker.drain_once()['sent'], 0)
+
+        report = worker.drain_once(now=timezone.now() + datetime.timedelta(seconds=31))
+        self.assertEqual(report, {'sent': 5, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(
+            sorted(r['token'] for r in self.server.requests),
+            ['device-alice', 'device-alice', 'device-bob'],
+        )
+
+    def test_summary_text_and_counts(self):
+        """Test the summary counts pre-summarised pushes and lists the first titles."""
+        queue_push_messages({self.alice.pk: ('SLA Breach Alert: 4 tickets', '4 breached', {'type': 'warning', 'count': 4})})
+        payloads = list(OutboundMessage.objects.values_list('payload', flat=True))
+        payloads.append({'user_ids': [self.alice.pk], 'title': 'SLA Breach Alert: Ticket E', 'body': 'b', 'data': {'type': 'warning'}})
+
+        (title, body, data), = coalesce_pushes(payloads)[self.alice.pk]
+        self.assertEqual(title, '5 new alerts')
+        self.assertEqual(body, 'SLA Breach Alert: 4 tickets • SLA Breach Alert: Ticket E')
+        self.assertEqual(data, {'type': 'warning', 'count': '5', 'coalesced': 'true'})
+
+    @override_settings(NOTIFICATION_PUSH_COALESCE_SECONDS=0)
+    def test_coalescing_disabled(self):
+        """Test a zero window sends each push as queued."""
+        create_notification(self.alice, 'One', 'm', notification_type='warning')
+        create_notification(self.alice, 'Two', 'm', notification_type='warning')
+        self.assertEqual(OutboxWorker(batch_size=50).drain_once()['sent'], 2)
+        self.assertEqual(len(self.server.requests), 2)
@@ -0,0 +1,119 @@
+"""
+Tests for the per-request section permission snapshot.
+
+Tests cover:
+- Snapshot contents for group and direct grants
+- Query reuse across repeated permission checks
+- Invalidation when group permissions or sections change
+- Shared cache hits, misses and version bumps; lookups do not write the
+  shared counters
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth.models import User, Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from hotel_app.models import Section
+from hotel_app.section_permissions import (
+    SECTION_PERMISSION_CACHE_PREFIX,
+    get_section_permission_cache_stats,
+    get_section_permission_snapshot,
+    reset_section_permission_cache_stats,
+    user_has_section_permission,
+)
+
+
+class SectionPermissionSnapshotTestCase(TestCase):
+    """Test building, reusing and invalidating section permission snapshots."""
+
+    def setUp(self):
+        """Set up sections, permissions and a staff user."""
+        cache.clear()
+        reset_section_permission_cache_stats()
+        self.sections = Section.get_or_create_sections()
+        section_content_type = ContentType.objects.get_for_model(Section)
+        for section in self.sections:
+            for action in ['view', 'add', 'change', 'delete']:
+                Permission.objects.get_or_create(
+                    codename=section.get_permission_codename(action),
+                    content_type=section_content_type,
+                    defaults={'name': f'Can {action} {section.display_name}'}
+                )
+
+        self.group = Group.objects.create(name='Front Desk')
+        self.user = User.objects.create_user(username='staff', password='testpass123')
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self._perm('view_tickets'), self._perm('change_tickets'))
+        self.user.user_permissions.add(self._perm('view_my_tickets'))
+
+    def _perm(self, codename):
+        return Permission.objects.get(
+            codename=codename,
+            content_type=ContentType.objects.get_for_model(Section)
+        )
+
+    def _fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_snapshot_contains_group_and_direct_grants(self):
+        """Test that the snapshot resolves group and direct permissions."""
+        snapshot = get_section_permission_snapshot(self._fresh_user())
+        self.assertTrue(snapshot.has('tickets', 'view'))
+        self.assertTrue(snapshot.has('tickets', 'change'))
+        self.assertTrue(snapshot.has('my_tickets', 'view'))
+        self.assertFalse(snapshot.has('tickets', 'delete'))
+        self.assertFalse(snapshot.has('users', 'view'))
+        self.assertTrue(snapshot.has_any('view'))
+
+        nav = snapshot.as_nav_dict()
+        self.assertEqual(set(nav), {s.name for s in self.sections})
+        self.assertTrue(nav['tickets']['edit'])
+        self.assertFalse(nav['users']['view'])
+
+    def test_repeated_checks_reuse_snapshot(self):
+        """Test that checks after the first one run no queries."""
+        user = self._fresh_user()
+        with self.assertNumQueries(2):
+            user_has_section_permission(user, 'tickets', 'view')
+        with self.assertNumQueries(0):
+            for section in self.sections:
+                for action in ['view', 'add', 'change', 'delete']:
+                    user_has_section_permission(user, section.name, action)
+
+    def test_group_permission_change_invalidates_snapshot(self):
+        """Test that granting a permission to a group is visible immediately."""
+        user = self._fresh_user()
+        self.assertFalse(user_has_section_permission(user, 'users', 'view'))
+        self.group.permissions.add(self._perm('view_users'))
+        self.assertTrue(user_has_section_permission(user, 'users', 'view'))
+        self.group.permissions.remove(self._perm('view_tickets'))
+        self.assertFalse(user_has_section_permission(user, 'tickets', 'view'))
+
+    def test_section_change_invalidates_snapshot(self):
+        """Test that deactivating a section drops it from the nav permissions."""
+        user = self._fresh_user()
+        self.assertIn('tickets', get_section_permission_snapshot(user).as_nav_dict())
+        Section.objects.get(name='tickets').delete()
+        self.assertNotIn('tickets', get_section_permission_snapshot(user).as_nav_dict())
+
+    def test_cached_matrix_shared_across_requests(self):
+        """Test that a second request for the same user is served from the cache."""
+        get_section_permission_snapshot(self._fresh_user())
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            snapshot = get_section_permission_snapshot(user)
+        self.assertTrue(snapshot.has('tickets', 'view'))
+
+        # Lookups only count in-process; the shared totals are written later
+        self.assertIsNone(cache.get(f'{SECTION_PERMISSION_CACHE_PREFIX}:stats:hits'))
+        stats = get_section_permission_cache_stats()
+        self.assertEqual(stats['process'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['shared'], {'hits': 1, 'misses': 1})
+
+    def test_permission_edit_bumps_cache_version(self):
+        """Test that a cached matrix is not reused after a permission edit."""
+        get_section_permission_snapshot(self._fresh_user())
+        self.group.permissions.add(self._perm('view_users'))
+
+        snapshot = get_section_permission_snapshot(self._fresh_user())
+        self.assertTrue(snapshot.has('users', 'view'))
+        self.assertEqual(get_section_permission_cache_stats()['process']['misses'], 2)
@@ -0,0 +1,90 @@
+"""
+Tests for the compiled WhatsApp request-type matcher.
+
+Tests cover:
+- Keyword matches: overlapping keywords, keywords inside words, weights and ties
+- The name/description fallback for active request types
+- Detection without queries, and rebuilding after keyword/request type edits
+- The benchmark command
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from hotel_app.models import RequestKeyword, RequestType
+from hotel_app.request_matcher import KeywordAutomaton, get_request_matcher, invalidate_request_matcher
+from hotel_app.whatsapp_workflow import WhatsAppWorkflow
+
+
+class RequestMatcherTestCase(TestCase):
+    """Test matching and invalidation."""
+
+    def setUp(self):
+        """Set up request types with keywords."""
+        invalidate_request_matcher()
+        self.addCleanup(invalidate_request_matcher)
+        self.bedding = RequestType.objects.create(name='Extra Bedding', description='Pillows and blankets')
+        self.cleaning = RequestType.objects.create(name='Room Cleaning', description='Housekeeping visit')
+        self.minibar = RequestType.objects.create(name='Minibar Refill', active=False)
+        RequestKeyword.objects.create(keyword='extra bed', request_type=self.bedding, weight=2)
+        RequestKeyword.objects.create(keyword='bed', request_type=self.bedding)
+        RequestKeyword.objects.create(keyword='clean', request_type=self.cleaning, weight=3)
+        RequestKeyword.objects.create(keyword='snack', request_type=self.minibar)
+        self.workflow = WhatsAppWorkflow()
+
+    def test_automaton_finds_overlapping_patterns(self):
+        """Test every pattern is found, including overlapping ones and ones inside words."""
+        automaton = KeywordAutomaton(['he', 'she', 'his', 'hers', ''])
+        self.assertEqual(automaton.find('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.find('this'), {2})
+        self.assertEqual(automaton.find(''), set())
+
+    def test_keyword_scores(self):
+        """Test weights add up per request type and the highest score wins."""
+        detected = self.workflow._detect_request_type('Need an EXTRA BED and cleaning')
+        # extra bed (2) + bed (1) against clean (3): the first matched type wins the tie
+        self.assertEqual(detected.request_type, self.bedding)
+        self.assertEqual((detected.score, detected.matched_keywords), (3, ['bed', 'extra bed']))
+
+        # Substring matches count, and keywords of inactive types still apply
+        self.assertEqual(self.workflow._detect_request_type('please unclean this').request_type, self.cleaning)
+        self.assertEqual(self.workflow._detect_request_type('snacks?').request_type, self.minibar)
+        self.assertIsNone(self.workflow._detect_request_type('!!!'))
+
+    def test_fallback_to_names_and_descriptions(self):
+        """Test unmatched messages fall back to active request type names and tokens."""
+        detected = self.workflow._detect_request_type('Can someone do room cleaning')
+        self.assertEqual(detected.request_type, self.cleaning)
+        # The keyword "clean" matched before the fallback was needed
+        self.assertEqual(detected.matched_keywords, ['clean'])
+
+        detected = self.workflow._detect_request_type('more pillows please')
+        self.assertEqual((detected.request_type, detected.score), (self.bedding, 1))
+        # Inactive request types are not fallback candidates
+        self.assertIsNone(self.workflow._detect_request_type('minibar refill'))
+
+    def test_no_queries_and_rebuild_on_change(self):
+        """Test detection runs from memory until keywords or request types change."""
+        get_request_matcher()
+        with self.assertNumQueries(0):
+            detected = self.workflow._detect_request_type('extra bed')
+            detected.request_type.name = 'Changed locally'
+        self.assertEqual(get_request_matcher().request_type(self.bedding.pk).name, 'Extra Bedding')
+
+        RequestKeyword.objects.create(keyword='towel', request_type=self.cleaning)
+        self.assertEqual(self.workflow._detect_request_type('towels').request_type, self.cleaning)
+
+        self.bedding.active = False
+        self.bedding.save()
+        self.assertIsNone(self.workflow._detect_request_type('pillows'))
+
+        RequestKeyword.objects.filter(keyword='clean').get().delete()
+        self.assertIsNone(self.workflow._detect_request_type('please unclean this'))
+
+    def test_benchmark_command(self):
+        """Test the benchmark reports both timings."""
+        out = StringIO()
+        call_command('benchmark_request_matcher', keywords=200, request_types=20, messages=20, stdout=out)
+        self.assertIn('200 keywords', out.getvalue())
+        self.assertIn('Compiled matcher:', out.getvalue())
@@ -0,0 +1,80 @@
+"""
+Tests for the cached SLA policy resolver.
+
+Tests cover:
+- Resolution order: department/request-specific, general, defaults
+- No policy queries for tickets after the table is loaded
+- Invalidation when the SLA configuration API saves
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from hotel_app.models import (
+    Department, DepartmentRequestSLA, RequestType, ServiceRequest, SLAConfiguration,
+)
+from hotel_app.sla_policy import get_sla_policy, invalidate_sla_policy, resolve_many
+
+
+class SLAPolicyResolverTestCase(TestCase):
+    """Test resolving SLA hours from the cached policy table."""
+
+    def setUp(self):
+        """Set up general and department-specific SLA rows."""
+        cache.clear()
+        invalidate_sla_policy()
+        self.addCleanup(invalidate_sla_policy)
+
+        self.department = Department.objects.create(name='Housekeeping')
+        self.towels = RequestType.objects.create(name='Towels')
+        self.repair = RequestType.objects.create(name='Repair')
+        SLAConfiguration.objects.create(priority='high', response_time_minutes=30, resolution_time_minutes=120)
+        DepartmentRequestSLA.objects.create(
+            department=self.department, request_type=self.towels, priority='high',
+            response_time_minutes=6, resolution_time_minutes=60,
+        )
+
+    def test_resolution_order(self):
+        """Test department config, then general config, then defaults."""
+        resolved = resolve_many([
+            (self.department.pk, self.towels.pk, 'high'),
+            (self.department.pk, self.repair.pk, 'high'),
+            (None, None, 'low'),
+            (None, None, None),
+        ])
+        self.assertEqual(resolved[(self.department.pk, self.towels.pk, 'high')], (0.1, 1.0))
+        self.assertEqual(resolved[(self.department.pk, self.repair.pk, 'high')], (0.5, 2.0))
+        self.assertEqual(resolved[(None, None, 'low')], (20 / 60.0, 20 / 60.0))
+        self.assertEqual(resolved[(None, None, None)], (1, 24))
+
+        ticket = ServiceRequest(department=self.department, request_type=self.towels, priority='high')
+        ticket.set_sla_times()
+        self.assertEqual((ticket.response_sla_hours, ticket.sla_hours), (0.1, 1.0))
+
+    def test_loaded_policy_needs_no_queries(self):
+        """Test that set_sla_times() runs no queries once the table is loaded."""
+        get_sla_policy()
+        with self.assertNumQueries(0):
+            for request_type in [self.towels, self.repair]:
+                ServiceRequest(
+                    department=self.department, request_type=request_type, priority='high'
+                ).set_sla_times()
+
+    def test_configuration_api_invalidates_policy(self):
+        """Test that saving through the SLA configuration API is visible immediately."""
+        get_sla_policy()
+        user = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.client.force_login(user)
+        response = self.client.post(
+            '/dashboard/api/sla-configuration/update/',
+            data=json.dumps({'general_configs': [
+                {'priority': 'high', 'response_time_minutes': 15, 'resolution_time_minutes': 90},
+            ]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            resolve_many([(None, None, 'high')])[(None, None, 'high')], (0.25, 1.5)
+        )
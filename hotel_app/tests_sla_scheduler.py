@@ -0,0 +1,139 @@
+"""
+Tests for the SLA deadline scheduler.
+
+Tests cover:
+- Seeding deadlines from open tickets
+- Firing due deadlines through the set-based breach sweep
+- Keeping due deadlines queued when the breach check fails
+- Rescheduling from the change feed fed by ticket saves
+- Feed rows that commit after a higher id are still consumed
+"""
+import datetime
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_app.models import RequestType, ServiceRequest, SLADeadlineChange
+from hotel_app.sla_scheduler import SLADeadlineScheduler, ticket_deadlines
+
+
+@override_settings(SLA_SCHEDULER_ENABLED=True)
+class SLADeadlineSchedulerTestCase(TestCase):
+    """Test the deadline heap and its change feed."""
+
+    def setUp(self):
+        """Set up one overdue and one fresh in-progress ticket."""
+        self.request_type = RequestType.objects.create(name='Towels')
+        self.overdue = self._ticket('in_progress', hours_ago=30)
+        self.fresh = self._ticket('in_progress', hours_ago=0)
+        self.scheduler = SLADeadlineScheduler(poll_interval=5)
+
+    def _ticket(self, status, hours_ago):
+        ticket = ServiceRequest.objects.create(
+            request_type=self.request_type, status=status, notes='Need towels',
+        )
+        ServiceRequest.objects.filter(pk=ticket.pk).update(
+            created_at=timezone.now() - datetime.timedelta(hours=hours_ago),
+            response_sla_hours=1, sla_hours=24,
+        )
+        return ServiceRequest.objects.get(pk=ticket.pk)
+
+    def test_ticket_deadlines_follow_sla_rules(self):
+        """Test which deadlines are queued for a ticket's status."""
+        self.assertEqual(
+            [kind for _, kind in ticket_deadlines(self.fresh)], ['response', 'resolution']
+        )
+        pending = self._ticket('pending', hours_ago=0)
+        self.assertEqual(ticket_deadlines(pending), [])
+        self.fresh.status = 'completed'
+        self.assertEqual(ticket_deadlines(self.fresh), [])
+
+    def test_seed_and_fire_due(self):
+        """Test that only tickets past their deadline are flagged."""
+        self.assertEqual(self.scheduler.seed(), 4)
+        self.assertEqual(self.scheduler.next_deadline(), self.overdue.created_at + datetime.timedelta(hours=1))
+        self.assertEqual(self.scheduler.seconds_until_next_wakeup(), 0)
+
+        report = self.scheduler.fire_due()
+        self.assertEqual(report['flipped'], 1)
+        self.overdue.refresh_from_db()
+        self.assertTrue(self.overdue.response_sla_breached)
+        self.assertTrue(self.overdue.resolution_sla_breached)
+        self.assertFalse(ServiceRequest.objects.get(pk=self.fresh.pk).sla_breached)
+
+        # Next wake-up is the fresh ticket's response deadline, capped by the feed poll
+        self.assertEqual(len(self.scheduler), 2)
+        self.assertEqual(self.scheduler.seconds_until_next_wakeup(), 5)
+        self.assertIsNone(self.scheduler.fire_due())
+
+    def test_failed_check_keeps_due_tickets(self):
+        """Test that due tickets stay queued when the breach check raises."""
+        self.scheduler.seed()
+        with mock.patch('hotel_app.sla_scheduler.check_sla_breaches', side_effect=OperationalError('gone away')):
+            with self.assertRaises(OperationalError):
+                self.scheduler.fire_due()
+        self.assertEqual(len(self.scheduler), 4)
+
+        report = self.scheduler.fire_due()
+        self.assertEqual(report['flipped'], 1)
+        self.assertTrue(ServiceRequest.objects.get(pk=self.overdue.pk).response_sla_breached)
+
+    def test_change_feed_reschedules_tickets(self):
+        """Test that new and closed tickets reach the scheduler through the feed."""
+        self.scheduler.seed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.overdue.status = 'completed'
+            self.overdue.completed_at = self.overdue.created_at + datetime.timedelta(minutes=30)
+            self.overdue.save()
+            new_ticket = ServiceRequest.objects.create(
+                request_type=self.request_type, status='accepted', notes='Extra pillow',
+            )
+        self.assertEqual(SLADeadlineChange.objects.count(), 2)
+
+        self.assertEqual(self.scheduler.poll_changes(), 2)
+        self.assertFalse(SLADeadlineChange.objects.exists())
+
+        # The completed ticket was resolved within SLA, so nothing fires for it
+        self.assertIsNone(self.scheduler.fire_due())
+        self.overdue.refresh_from_db()
+        self.assertFalse(self.overdue.resolution_sla_breached)
+
+        # The new ticket's response deadline is live
+        later = timezone.now() + datetime.timedelta(hours=2)
+        ServiceRequest.objects.filter(pk=new_ticket.pk).update(
+            created_at=timezone.now() - datetime.timedelta(hours=2)
+        )
+        self.scheduler.poll_changes()
+        report = self.scheduler.fire_due(now=later)
+        self.assertGreaterEqual(report['flipped'], 1)
+        self.assertTrue(ServiceRequest.objects.get(pk=new_ticket.pk).response_sla_breached)
+
+    def test_late_committed_change_is_consumed(self):
+        """Test a feed row with a lower id than one already read is still picked up."""
+        self.scheduler.seed()
+        closed = self._ticket('completed', hours_ago=1)
+        SLADeadlineChange.objects.create(id=100, ticket_id=closed.pk)
+        self.assertEqual(self.scheduler.poll_changes(), 1)
+
+        # Its transaction committed after row 100 was consumed
+        late = self._ticket('accepted', hours_ago=2)
+        SLADeadlineChange.objects.create(id=50, ticket_id=late.pk)
+        self.assertEqual(self.scheduler.poll_changes(), 1)
+        self.assertFalse(SLADeadlineChange.objects.exists())
+        self.assertIn(late.pk, {ticket_id for _, ticket_id, _, _ in self.scheduler._heap})
+
+    def test_seed_keeps_rows_committed_after_it(self):
+        """Test seeding only deletes the feed rows it read."""
+        SLADeadlineChange.objects.create(id=10, ticket_id=self.overdue.pk)
+        open_tickets = self.scheduler._open_tickets
+
+        def commit_during_snapshot():
+            SLADeadlineChange.objects.create(id=5, ticket_id=self.fresh.pk)
+            return open_tickets()
+
+        with mock.patch.object(self.scheduler, '_open_tickets', commit_during_snapshot):
+            self.scheduler.seed()
+        self.assertEqual(list(SLADeadlineChange.objects.values_list('id', flat=True)), [5])
@@ -0,0 +1,87 @@
+"""
+Tests for the set-based SLA breach sweep (tasks.check_sla_breaches).
+
+Tests cover:
+- Flags flipped match ServiceRequest.check_sla_breaches()
+- Per-department notification batches and the sweep report
+- Already-breached tickets are not notified again
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_app.models import Department, Notification, RequestType, ServiceRequest, UserProfile
+from hotel_app.tasks import check_sla_breaches
+
+
+class SLABreachSweepTestCase(TestCase):
+    """Test flagging SLA breaches and notifying in batches."""
+
+    def setUp(self):
+        """Set up a department with staff and tickets of various ages."""
+        self.department = Department.objects.create(name='Housekeeping')
+        self.request_type = RequestType.objects.create(name='Towels')
+        self.staff = []
+        for i in range(2):
+            user = User.objects.create_user(username=f'staff{i}', password='testpass123')
+            UserProfile.objects.update_or_create(
+                user=user, defaults={'full_name': user.username, 'department': self.department}
+            )
+            self.staff.append(user)
+        self.requester = User.objects.create_user(username='requester', password='testpass123')
+
+        self.response_late = self._ticket('accepted', hours_ago=2)
+        self.resolution_late = self._ticket('in_progress', hours_ago=30)
+        self.pending_old = self._ticket('pending', hours_ago=30)
+        self.fresh = self._ticket('in_progress', hours_ago=0.1)
+        self.completed = self._ticket('completed', hours_ago=30)
+        Notification.objects.all().delete()
+
+    def _ticket(self, status, hours_ago):
+        ticket = ServiceRequest.objects.create(
+            request_type=self.request_type, department=self.department,
+            requester_user=self.requester, status=status, notes='Need fresh towels',
+        )
+        ServiceRequest.objects.filter(pk=ticket.pk).update(
+            created_at=timezone.now() - datetime.timedelta(hours=hours_ago),
+            response_sla_hours=1, sla_hours=24,
+        )
+        return ticket
+
+    def _flags(self, ticket):
+        ticket = ServiceRequest.objects.get(pk=ticket.pk)
+        return ticket.response_sla_breached, ticket.resolution_sla_breached, ticket.sla_breached
+
+    def test_sweep_matches_per_ticket_check(self):
+        """Test that the sweep flags the same tickets as check_sla_breaches()."""
+        open_tickets = [self.response_late, self.resolution_late, self.pending_old, self.fresh]
+        expected = {}
+        for ticket in open_tickets:
+            ticket = ServiceRequest.objects.get(pk=ticket.pk)
+            ticket.check_sla_breaches()
+            expected[ticket.pk] = (ticket.response_sla_breached, ticket.resolution_sla_breached, ticket.sla_breached)
+
+        report = check_sla_breaches()
+
+        for ticket in open_tickets:
+            self.assertEqual(self._flags(ticket), expected[ticket.pk], ticket.pk)
+        self.assertEqual(self._flags(self.completed), (False, False, False))
+        self.assertEqual(report['examined'], 4)
+        self.assertEqual((report['response_breaches'], report['resolution_breaches']), (2, 1))
+        self.assertEqual(report['flipped'], 2)
+
+    def test_notifications_batched_and_not_repeated(self):
+        """Test that staff and requesters are notified once per breached ticket."""
+        report = check_sla_breaches()
+        for user in self.staff:
+            self.assertEqual(
+                Notification.objects.filter(recipient=user, title__startswith='SLA Breach Alert').count(), 2
+            )
+        self.assertEqual(Notification.objects.filter(recipient=self.requester).count(), 2)
+        self.assertEqual(report['notifications'], Notification.objects.count())
+
+        report = check_sla_breaches()
+        self.assertEqual((report['flipped'], report['notifications']), (0, 0))
+        self.assertEqual(report['examined'], 3)
@@ -0,0 +1,135 @@
+"""
+Tests for the DailyTicketStats rollup.
+
+Tests cover:
+- Incremental bucket maintenance from ServiceRequest saves and deletes
+- Backfill producing the same buckets as incremental maintenance, including
+  the migration that fills the table on deploy
+- Retrying a bucket refresh that lost an insert race
+- Long-range analytics reading the rollup with the same figures as live queries
+"""
+import datetime
+import importlib
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_app import ticket_stats_services
+from hotel_app.models import DailyTicketStats, Department, RequestType, ServiceRequest
+
+
+def _bucket_values():
+    return sorted(
+        DailyTicketStats.objects.values_list(
+            'date', 'department_id', 'request_type_id', 'priority',
+            'created_count', 'completed_count', 'breached_count',
+            'response_count', 'resolution_count',
+        )
+    )
+
+
+class DailyTicketStatsTestCase(TestCase):
+    """Test maintaining and reading the daily ticket rollup."""
+
+    def setUp(self):
+        """Set up departments, request types and tickets."""
+        self.today = timezone.localdate()
+        self.housekeeping = Department.objects.create(name='Housekeeping')
+        self.engineering = Department.objects.create(name='Engineering')
+        self.towels = RequestType.objects.create(name='Towels')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending = ServiceRequest.objects.create(
+                request_type=self.towels, department=self.housekeeping, priority='high',
+            )
+            self.done = ServiceRequest.objects.create(
+                request_type=self.towels, department=self.housekeeping, priority='high',
+            )
+            now = timezone.now()
+            self.done.status = 'completed'
+            self.done.accepted_at = now + datetime.timedelta(minutes=10)
+            self.done.completed_at = now + datetime.timedelta(hours=2)
+            self.done.resolution_sla_breached = True
+            self.done.save()
+
+    def test_saves_maintain_bucket(self):
+        """Test that creating and completing tickets updates their bucket."""
+        row = DailyTicketStats.objects.get()
+        self.assertEqual((row.date, row.department_id, row.priority), (self.today, self.housekeeping.pk, 'high'))
+        self.assertEqual((row.created_count, row.completed_count, row.breached_count), (2, 1, 1))
+        self.assertEqual((row.response_count, row.resolution_count), (1, 1))
+        self.assertAlmostEqual(row.response_seconds, 600, delta=1)
+
+    def test_moving_and_deleting_ticket_updates_both_buckets(self):
+        """Test that a ticket leaves its old bucket when its department changes."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.department = self.engineering
+            self.pending.save()
+        counts = dict(DailyTicketStats.objects.values_list('department_id', 'created_count'))
+        self.assertEqual(counts, {self.housekeeping.pk: 1, self.engineering.pk: 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.delete()
+        self.assertFalse(DailyTicketStats.objects.filter(department=self.engineering).exists())
+
+    def test_backfill_matches_incremental(self):
+        """Test that the backfill command rebuilds identical buckets."""
+        incremental = _bucket_values()
+        DailyTicketStats.objects.all().delete()
+        call_command('backfill_ticket_stats', days=7, stdout=StringIO())
+        self.assertEqual(_bucket_values(), incremental)
+
+    def test_migration_backfills_existing_tickets(self):
+        """Test that the data migration fills the rollup from existing tickets."""
+        incremental = _bucket_values()
+        DailyTicketStats.objects.all().delete()
+        migration = importlib.import_module('hotel_app.migrations.0031_backfill_daily_ticket_stats')
+        state = MigrationLoader(connection).project_state(('hotel_app', '0031_backfill_daily_ticket_stats'))
+        migration.backfill_daily_ticket_stats(state.apps, None)
+        self.assertEqual(_bucket_values(), incremental)
+
+    def test_refresh_retries_after_insert_race(self):
+        """Test that a refresh losing an insert race recomputes the bucket instead of leaving it stale."""
+        bucket = ticket_stats_services.ticket_bucket(self.pending)
+        create = DailyTicketStats.objects.create
+
+        def racing_create(**kwargs):
+            if racing_create.calls == 0:
+                racing_create.calls += 1
+                raise IntegrityError('Duplicate entry')
+            return create(**kwargs)
+
+        racing_create.calls = 0
+        with mock.patch.object(DailyTicketStats.objects, 'create', side_effect=racing_create):
+            ticket_stats_services.refresh_ticket_stats([bucket])
+        self.assertEqual(DailyTicketStats.objects.get().created_count, 2)
+
+    def test_department_analytics_reads_rollup(self):
+        """Test that long ranges return the same figures from the rollup."""
+        user = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.client.force_login(user)
+        params = {
+            'department_id': self.housekeeping.pk,
+            'start_date': (self.today - datetime.timedelta(days=120)).isoformat(),
+            'end_date': self.today.isoformat(),
+        }
+
+        with override_settings(TICKET_STATS_ROLLUP_MIN_DAYS=10000):
+            live = self.client.get('/dashboard/api/department-analytics/', params).json()
+        with override_settings(TICKET_STATS_ROLLUP_MIN_DAYS=90):
+            rolled_up = self.client.get('/dashboard/api/department-analytics/', params).json()
+
+        self.assertTrue(rolled_up['success'])
+        for key in ['total_tickets', 'completed_tickets', 'sla_breaches', 'avg_response_time']:
+            self.assertEqual(rolled_up['analytics'][key], live['analytics'][key], key)
+        self.assertEqual(rolled_up['analytics']['total_tickets'], 2)
+
+        totals = ticket_stats_services.daily_totals(self.today - datetime.timedelta(days=89), self.today)
+        self.assertEqual(len(totals), 90)
+        self.assertEqual(totals[self.today]['created'], 2)
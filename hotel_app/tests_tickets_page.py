@@ -0,0 +1,114 @@
+"""
+Tests for the Tickets page list and department cards.
+
+Tests cover:
+- Department cards from one grouped query
+- Keyset pagination forwards and backwards on -id
+- Query count independent of the number of tickets and departments
+- The filtered COUNT runs on the first page only
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hotel_app.models import Department, RequestType, ServiceRequest
+from hotel_app.ticket_services import department_ticket_summary, keyset_page
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class TicketsPageTestCase(TestCase):
+    """Test the Tickets page summary and pagination."""
+
+    def setUp(self):
+        """Set up two departments with a mix of tickets."""
+        self.housekeeping = Department.objects.create(name='Housekeeping')
+        self.engineering = Department.objects.create(name='Engineering')
+        self.request_type = RequestType.objects.create(name='Towels')
+        statuses = ['pending', 'in_progress', 'completed', 'closed', None]
+        self.tickets = []
+        for index in range(25):
+            department = self.housekeeping if index % 2 else self.engineering
+            ticket = ServiceRequest.objects.create(
+                request_type=self.request_type, department=department, notes=f'Ticket {index}',
+            )
+            self.tickets.append(ticket)
+        # Statuses and breaches set directly to keep notifications out of the way
+        for index, ticket in enumerate(self.tickets):
+            ServiceRequest.objects.filter(pk=ticket.pk).update(
+                status=statuses[index % len(statuses)], sla_breached=index % 3 == 0,
+            )
+
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.client.force_login(self.admin)
+
+    def test_department_summary(self):
+        """Test active, total and breached counts per department."""
+        summary = department_ticket_summary()
+        for department in (self.housekeeping, self.engineering):
+            tickets = ServiceRequest.objects.filter(department=department)
+            self.assertEqual(summary[department.pk], {
+                'active': tickets.exclude(status__in=['completed', 'closed']).count(),
+                'total': tickets.count(),
+                'breached': tickets.filter(sla_breached=True).count(),
+            })
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        """Test next/previous cursors cover every ticket exactly once, newest first."""
+        queryset = ServiceRequest.objects.all()
+        expected = sorted((t.pk for t in self.tickets), reverse=True)
+
+        first = keyset_page(queryset, per_page=10, count=25)
+        second = keyset_page(queryset, after=first.next_cursor, start=first.next_start, per_page=10)
+        third = keyset_page(queryset, after=second.next_cursor, start=second.next_start, per_page=10)
+        self.assertEqual(
+            [t.pk for t in first] + [t.pk for t in second] + [t.pk for t in third], expected
+        )
+        self.assertFalse(first.has_previous)
+        self.assertTrue(second.has_previous and second.has_next)
+        self.assertFalse(third.has_next)
+        self.assertEqual((third.start_index, third.end_index), (21, 25))
+
+        back = keyset_page(queryset, before=third.previous_cursor, start=third.previous_start, per_page=10)
+        self.assertEqual([t.pk for t in back], [t.pk for t in second])
+        self.assertEqual(back.start_index, 11)
+        back = keyset_page(queryset, before=back.previous_cursor, start=back.previous_start, per_page=10)
+        self.assertEqual([t.pk for t in back], [t.pk for t in first])
+        self.assertFalse(back.has_previous)
+
+    def _page_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/dashboard/tickets/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_page_queries_do_not_grow(self):
+        """Test the page renders the current page only with a fixed query budget."""
+        self._page_queries()  # warm the per-user caches
+        response, baseline = self._page_queries()
+        self.assertEqual(len(response.context['tickets']), 10)
+        self.assertEqual(response.context['page_obj'].count, 25)
+
+        for index in range(10):
+            department = Department.objects.create(name=f'Department {index}')
+            ServiceRequest.objects.create(request_type=self.request_type, department=department, notes='More')
+        response, queries = self._page_queries({'after': self.tickets[10].pk, 'start': 11})
+        self.assertEqual(queries, baseline)
+        self.assertEqual(
+            [t.pk for t in response.context['tickets']],
+            sorted((t.pk for t in self.tickets[:10]), reverse=True),
+        )
+
+    def test_count_carried_from_first_page(self):
+        """Test later pages take the total from the page links instead of counting again."""
+        self._page_queries()  # warm the per-user caches
+        response, _ = self._page_queries()
+        self.assertIn(b'total=25', response.content)
+
+        params = {'after': self.tickets[10].pk, 'start': 11}
+        _, counted = self._page_queries(params)
+        response, carried = self._page_queries(dict(params, total=25))
+        self.assertEqual(carried, counted - 1)
+        self.assertEqual(response.context['page_obj'].count, 25)
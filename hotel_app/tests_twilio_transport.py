@@ -0,0 +1,214 @@
+"""
+Tests for the pooled Twilio WhatsApp transport.
+
+Tests run against a local stand-in for the Twilio Messages REST API.
+
+Tests cover:
+- Message parameters, basic auth and API error handling
+- Concurrent batches across recipients, in order per recipient, over reused connections
+- Workflow replies sent as one batch and logged with one insert, audit
+  log rows included
+- Outbox WhatsApp rows delivered as one batch
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from hotel_app import twilio_service as twilio_module
+from hotel_app import whatsapp_workflow
+from hotel_app.models import AuditLog, OutboundMessage, WhatsAppConversation, WhatsAppMessage
+from hotel_app.outbox import OutboxWorker, queue_whatsapp
+from hotel_app.twilio_service import TwilioService
+from hotel_app.whatsapp_workflow import WhatsAppWorkflow
+
+INVALID_NUMBER = 'whatsapp:+15550009999'
+
+
+class _FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        form = {key: values[0] for key, values in parse_qs(
+            self.rfile.read(int(self.headers['Content-Length'])).decode()
+        ).items()}
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+            server.requests.append({
+                'path': self.path,
+                'authorization': self.headers['Authorization'],
+                'client_port': self.client_address[1],
+                'form': form,
+            })
+            sid = f"SM{len(server.requests):032d}"
+
+        if form.get('To') == INVALID_NUMBER:
+            status, payload = 400, {'code': 21211, 'message': f"The 'To' number {form['To']} is not valid", 'status': 400}
+        else:
+            status, payload = 201, {'sid': sid, 'status': 'queued', 'to': form.get('To'), 'from': form.get('From')}
+
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTwilioServerMixin:
+    """Run the stand-in Twilio server and a TwilioService pointing at it."""
+
+    def setUp(self):
+        """Start the stand-in Twilio server."""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeTwilioHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.delay = 0
+        self.server.in_flight = self.server.max_in_flight = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings_override = override_settings(
+            TWILIO_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}',
+            TWILIO_ACCOUNT_SID='AC123',
+            TWILIO_AUTH_TOKEN='secret',
+            TWILIO_WHATSAPP_FROM='whatsapp:+15550000000',
+            TWILIO_MAX_WORKERS=4,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.service = TwilioService()
+        self.addCleanup(self.service.client.http_client.session.close)
+
+    def sent(self, to_number):
+        return [r['form'].get('Body') for r in self.server.requests if r['form']['To'] == to_number]
+
+
+class TwilioTransportTestCase(FakeTwilioServerMixin, TestCase):
+    """Test the pooled REST transport."""
+
+    def test_send_and_errors(self):
+        """Test a send posts the form fields with basic auth, and API errors are returned."""
+        result = self.service.send_text_message('+15551230000', 'Hello')
+        self.assertTrue(result['success'])
+        self.assertEqual((result['status'], result['to']), ('queued', 'whatsapp:+15551230000'))
+
+        request = self.server.requests[0]
+        self.assertEqual(request['path'], '/2010-04-01/Accounts/AC123/Messages.json')
+        self.assertTrue(request['authorization'].startswith('Basic '))
+        self.assertEqual(request['form'], {
+            'From': 'whatsapp:+15550000000', 'To': 'whatsapp:+15551230000', 'Body': 'Hello',
+        })
+
+        self.service.send_template_message('+15551230000', 'HX1', {'1': 'Ada'})
+        self.assertEqual(self.server.requests[1]['form']['ContentVariables'], '{"1": "Ada"}')
+
+        result = self.service.send_text_message(INVALID_NUMBER, 'Hello')
+        self.assertFalse(result['success'])
+        self.assertIn('is not valid', result['error'])
+
+    def test_batch_is_concurrent_and_ordered_per_recipient(self):
+        """Test recipients are sent to in parallel, each in order, over reused connections."""
+        self.server.delay = 0.05
+        recipients = [f'+1555100000{i}' for i in range(4)]
+        messages = [
+            {'to_number': number, 'body': f'{number} #{n}'}
+            for n in range(3) for number in recipients
+        ]
+        messages.append({'to_number': INVALID_NUMBER, 'body': 'lost'})
+
+        results = self.service.send_whatsapp_batch(messages)
+
+        self.assertEqual([r['success'] for r in results], [True] * 12 + [False])
+        self.assertEqual(results[0]['to'], 'whatsapp:+15551000000')
+        self.assertGreater(self.server.max_in_flight, 1)
+        for number in recipients:
+            self.assertEqual(self.sent(f'whatsapp:{number}'), [f'{number} #{n}' for n in range(3)])
+        # One keep-alive connection per worker thread at most
+        self.assertLessEqual(len({r['client_port'] for r in self.server.requests}), 4)
+
+
+class WorkflowBatchTestCase(FakeTwilioServerMixin, TestCase):
+    """Test workflow replies and outbox rows go through the batch transport."""
+
+    def test_replies_sent_in_order_and_logged_in_one_insert(self):
+        """Test a reply batch costs one insert, its audit rows and one conversation update."""
+        patcher = mock.patch.object(whatsapp_workflow, 'twilio_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        conversation = WhatsAppConversation.objects.create(phone_number='+15552220000')
+        workflow = WhatsAppWorkflow()
+
+        # Bulk insert, its audit log rows, conversation update and the update's audit log row
+        with self.assertNumQueries(4):
+            workflow.send_outbound_messages(conversation, [
+                'Welcome!',
+                {'type': 'text', 'body': 'We are on it.'},
+                {'type': 'menu_buttons', 'body': 'Menu', 'buttons': [{'title': 'Raise a Request'}], 'fallback': '1. Raise a Request'},
+            ])
+
+        self.assertEqual(
+            self.sent('whatsapp:+15552220000'), ['Welcome!', 'We are on it.', '1. Raise a Request'],
+        )
+        logged = list(WhatsAppMessage.objects.order_by('pk').values_list('body', 'status', 'message_sid'))
+        self.assertEqual([row[0] for row in logged], ['Welcome!', 'We are on it.', '1. Raise a Request'])
+        self.assertTrue(all(row[1] == 'queued' and row[2].startswith('SM') for row in logged))
+        self.assertEqual(
+            sorted(AuditLog.objects.filter(model_name='WhatsAppMessage', action='create').values_list('object_pk', flat=True)),
+            sorted(str(pk) for pk in WhatsAppMessage.objects.values_list('pk', flat=True)),
+        )
+        conversation.refresh_from_db()
+        self.assertIsNotNone(conversation.last_system_message_at)
+
+    def test_reply_audit_rows_without_returning_bulk_insert(self):
+        """Test reply ids are read back for the audit log when bulk_create returns no primary keys."""
+        patcher = mock.patch.object(whatsapp_workflow, 'twilio_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        conversation = WhatsAppConversation.objects.create(phone_number='+15552220001')
+        # An earlier message in the same conversation must not be picked up
+        earlier = WhatsAppMessage.objects.create(conversation=conversation, body='Earlier')
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            WhatsAppWorkflow().send_outbound_messages(conversation, ['One', 'Two'])
+
+        replies = WhatsAppMessage.objects.exclude(pk=earlier.pk)
+        self.assertEqual(
+            set(
+                AuditLog.objects.filter(model_name='WhatsAppMessage', action='create')
+                .exclude(object_pk=str(earlier.pk)).values_list('object_pk', flat=True)
+            ),
+            {str(pk) for pk in replies.values_list('pk', flat=True)},
+        )
+
+    @override_settings(NOTIFICATION_OUTBOX_ENABLED=True, NOTIFICATION_OUTBOX_RATE_LIMITS={})
+    def test_outbox_rows_sent_as_one_batch(self):
+        """Test claimed WhatsApp rows are delivered together and failures retried individually."""
+        patcher = mock.patch.object(twilio_module, 'twilio_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for i in range(3):
+            queue_whatsapp(f'+1555300000{i}', body=f'Update {i}')
+        queue_whatsapp(INVALID_NUMBER, body='Update x')
+
+        report = OutboxWorker(batch_size=10, sleep=lambda seconds: None).drain_once()
+
+        self.assertEqual((report['sent'], report['retried']), (3, 1))
+        self.assertEqual(len(self.server.requests), 4)
+        failed = OutboundMessage.objects.get(status=OutboundMessage.STATUS_PENDING)
+        self.assertIn('is not valid', failed.last_error)
@@ -0,0 +1,150 @@
+"""
+Tests for fast acknowledgement of WhatsApp webhooks.
+
+Tests cover:
+- The webhook stores the payload and answers before the workflow runs
+- A retried MessageSid is acknowledged without being processed again
+- Messages from one sender are processed oldest first
+- A sender's rows wait while another worker is processing one of them
+- Signature validation, the synchronous mode and the legacy TwiML webhook
+- Recovery of rows left pending or interrupted
+"""
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from twilio.request_validator import RequestValidator
+
+from hotel_app.models import InboundMessage, WhatsAppConversation, WhatsAppMessage
+from hotel_app.twilio_service import twilio_service
+from hotel_app.whatsapp_inbound import process_sender, recover_inbound
+
+URL = '/api/whatsapp/webhook/'
+SENDER = 'whatsapp:+15550001111'
+
+
+@override_settings(WHATSAPP_WEBHOOK_FAST_ACK=True, WHATSAPP_WEBHOOK_WORKERS=0,
+                   WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE=False)
+class WhatsAppWebhookTestCase(TestCase):
+    """Test the fast-ack webhook and its processing."""
+
+    def _payload(self, sid, body='hi'):
+        return {'MessageSid': sid, 'From': SENDER, 'Body': body}
+
+    def test_ack_before_processing(self):
+        """Test the response comes back with the row pending, and it is processed after commit."""
+        response = self.client.post(URL, self._payload('SM1'))
+        self.assertEqual(response.status_code, 200)
+        message = InboundMessage.objects.get()
+        self.assertEqual((message.status, message.from_number), (InboundMessage.STATUS_PENDING, SENDER))
+        self.assertFalse(WhatsAppConversation.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URL, self._payload('SM2'))
+        self.assertEqual(
+            list(InboundMessage.objects.order_by('pk').values_list('status', flat=True)),
+            [InboundMessage.STATUS_DONE] * 2,
+        )
+        self.assertEqual(WhatsAppConversation.objects.get().phone_number, '+15550001111')
+
+    def test_retried_message_sid_is_not_processed_again(self):
+        """Test a Twilio retry of a handled message changes nothing."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URL, self._payload('SM1'))
+        logged = WhatsAppMessage.objects.count()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(URL, self._payload('SM1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(InboundMessage.objects.count(), 1)
+        self.assertEqual(WhatsAppMessage.objects.count(), logged)
+
+    def test_sender_processed_oldest_first(self):
+        """Test one sender's pending rows run in the order received."""
+        now = timezone.now()
+        for sid, seconds in [('SM2', 2), ('SM1', 1)]:
+            InboundMessage.objects.create(
+                message_sid=sid, from_number=SENDER, payload=self._payload(sid),
+                received_at=now + datetime.timedelta(seconds=seconds),
+            )
+
+        self.assertEqual(process_sender(SENDER), 2)
+        started = list(InboundMessage.objects.order_by('started_at').values_list('message_sid', flat=True))
+        self.assertEqual(started, ['SM1', 'SM2'])
+
+    def test_sender_busy_on_another_worker(self):
+        """Test pending rows are left alone while the same sender has a row processing."""
+        InboundMessage.objects.create(
+            message_sid='SM1', from_number=SENDER, payload=self._payload('SM1'),
+            status=InboundMessage.STATUS_PROCESSING, started_at=timezone.now(),
+        )
+        InboundMessage.objects.create(message_sid='SM2', from_number=SENDER, payload=self._payload('SM2'))
+        other = 'whatsapp:+15550002222'
+        InboundMessage.objects.create(
+            message_sid='SM3', from_number=other, payload={'MessageSid': 'SM3', 'From': other, 'Body': 'hi'},
+        )
+
+        self.assertEqual(process_sender(SENDER), 0)
+        self.assertEqual(InboundMessage.objects.get(message_sid='SM2').status, InboundMessage.STATUS_PENDING)
+        self.assertEqual(process_sender(other), 1)
+
+        # Once the other worker finishes, the next row is claimed
+        InboundMessage.objects.filter(message_sid='SM1').update(status=InboundMessage.STATUS_DONE)
+        self.assertEqual(process_sender(SENDER), 1)
+        self.assertEqual(InboundMessage.objects.get(message_sid='SM2').status, InboundMessage.STATUS_DONE)
+
+    @override_settings(WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE=True)
+    def test_signature_validation(self):
+        """Test unsigned requests are rejected and signed ones accepted."""
+        payload = self._payload('SM1')
+        with mock.patch.object(twilio_service, 'auth_token', 'secret'):
+            self.assertEqual(self.client.post(URL, payload).status_code, 403)
+            signature = RequestValidator('secret').compute_signature(f'http://testserver{URL}', payload)
+            response = self.client.post(URL, payload, HTTP_X_TWILIO_SIGNATURE=signature)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(InboundMessage.objects.count(), 1)
+
+    @override_settings(WHATSAPP_WEBHOOK_FAST_ACK=False)
+    def test_synchronous_mode(self):
+        """Test with fast-ack off the message is handled before the response, once."""
+        self.client.post(URL, self._payload('SM1'))
+        self.assertEqual(InboundMessage.objects.get().status, InboundMessage.STATUS_DONE)
+        self.assertTrue(WhatsAppConversation.objects.exists())
+        logged = WhatsAppMessage.objects.count()
+
+        self.client.post(URL, self._payload('SM1'))
+        self.assertEqual(WhatsAppMessage.objects.count(), logged)
+
+    def test_twiml_webhook_deduplicates(self):
+        """Test the TwiML webhook replies once per MessageSid."""
+        first = self.client.post('/whatsapp/webhook/', self._payload('SM1', body=''))
+        self.assertIn(b'<Message>', first.content)
+        retry = self.client.post('/whatsapp/webhook/', self._payload('SM1', body=''))
+        self.assertNotIn(b'<Message>', retry.content)
+        self.assertEqual(InboundMessage.objects.get().status, InboundMessage.STATUS_DONE)
+
+    def test_recovery(self):
+        """Test stale pending rows are processed and stale processing rows failed."""
+        old = timezone.now() - datetime.timedelta(minutes=10)
+        InboundMessage.objects.create(message_sid='SM1', from_number=SENDER, payload=self._payload('SM1'), received_at=old)
+        InboundMessage.objects.create(message_sid='SM2', from_number=SENDER, payload=self._payload('SM2'))
+        InboundMessage.objects.create(
+            message_sid='SM3', from_number=SENDER, payload=self._payload('SM3'), received_at=old,
+            status=InboundMessage.STATUS_PROCESSING, started_at=old,
+        )
+
+        self.assertEqual(recover_inbound(stale_seconds=60), {'processed': 2, 'interrupted': 1})
+        statuses = dict(InboundMessage.objects.values_list('message_sid', 'status'))
+        self.assertEqual(statuses, {
+            'SM1': InboundMessage.STATUS_DONE,
+            'SM2': InboundMessage.STATUS_DONE,
+            'SM3': InboundMessage.STATUS_FAILED,
+        })
+
+        out = StringIO()
+        call_command('process_whatsapp_inbound', stdout=out)
+        self.assertIn('Processed 0 pending messages', out.getvalue())
@@ -0,0 +1,364 @@
+"""
+Ticket creation and listing helpers.
+
+`bulk_create_tickets` validates a batch of ticket payloads together, looks up
+departments, request types, locations and SLA policy with one query per
+table, inserts every ServiceRequest in a single transaction with
+bulk_create, and then replaces the per-ticket post_save side effects
+(department notifications, audit log rows, rollup/scheduler updates) with
+batched equivalents.
+
+`department_ticket_summary` and `keyset_page` back the Tickets page: one
+grouped query for the department cards and keyset pagination on -id so only
+the rows of the current page are read, however deep the page is.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import (
+    AuditLog, Department, Location, RequestType, ServiceRequest, SLADeadlineChange, User,
+)
+from .intent_engine import invalidate_intent_index
+from .request_matcher import invalidate_request_matcher
+from .sla_policy import resolve_many
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_TICKETS = 500
+
+# Same mapping as create_ticket_api
+PRIORITY_MAPPING = {
+    'Critical': 'critical',
+    'High': 'high',
+    'Medium': 'normal',
+    'Normal': 'normal',
+    'Low': 'low',
+}
+
+
+class BulkTicketError(Exception):
+    """Raised when a bulk ticket payload fails validation; `errors` lists per-row problems."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid tickets')
+        self.errors = errors
+
+
+def _clean(value):
+    return (value or '').strip() if isinstance(value, str) else value
+
+
+def _validate(rows):
+    """Normalise payload rows and collect every validation error at once."""
+    if not isinstance(rows, list) or not rows:
+        raise BulkTicketError([{'index': None, 'error': 'tickets must be a non-empty list'}])
+    if len(rows) > MAX_BULK_TICKETS:
+        raise BulkTicketError([{'index': None, 'error': f'At most {MAX_BULK_TICKETS} tickets per request'}])
+
+    cleaned, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'error': 'Ticket must be an object'})
+            continue
+        ticket = {
+            'room_number': _clean(row.get('room_number')),
+            'department': _clean(row.get('department')),
+            'category': _clean(row.get('category')),
+            'priority': _clean(row.get('priority')),
+            'description': row.get('description') or '',
+            'guest_name': _clean(row.get('guest_name')),
+            'phone_number': _clean(row.get('phone_number')),
+        }
+        missing = [field for field in ('room_number', 'category', 'priority') if not ticket[field]]
+        if missing:
+            errors.append({'index': index, 'error': f"Missing required fields: {', '.join(missing)}"})
+        cleaned.append(ticket)
+    if errors:
+        raise BulkTicketError(errors)
+    return cleaned
+
+
+def _locations_by_room(rooms):
+    """{lowercased room: Location} matching room_no or name, first match wins."""
+    locations = {}
+    if not rooms:
+        return locations
+    # Case-insensitive like the single-ticket iexact lookup, whatever the collation
+    rooms = {str(room).lower() for room in rooms}
+    candidates = (
+        Location.objects.annotate(room_key=Lower('room_no'), name_key=Lower('name'))
+        .filter(Q(room_key__in=rooms) | Q(name_key__in=rooms))
+        .order_by('pk')
+    )
+    for location in candidates:
+        for key in (location.room_no, location.name):
+            if key:
+                locations.setdefault(str(key).lower(), location)
+    return locations
+
+
+def bulk_create_tickets(rows, requester):
+    """
+    Create a batch of tickets. Returns the created ServiceRequests in payload
+    order; raises BulkTicketError (nothing is created) if any row is invalid.
+
+    Department routing: the named department, else the request type's
+    default department.
+    """
+    tickets = _validate(rows)
+
+    departments = {
+        department.name: department
+        for department in Department.objects.filter(name__in={t['department'] for t in tickets if t['department']})
+    }
+
+    categories = {t['category'] for t in tickets}
+    request_types = {rt.name: rt for rt in RequestType.objects.filter(name__in=categories)}
+
+    errors = []
+    for index, ticket in enumerate(tickets):
+        if ticket['department'] and ticket['department'] not in departments:
+            errors.append({'index': index, 'error': f"Department not found: {ticket['department']}"})
+        elif not ticket['department']:
+            request_type = request_types.get(ticket['category'])
+            if not request_type or not request_type.default_department_id:
+                errors.append({'index': index, 'error': 'Department is required for this category'})
+    if errors:
+        raise BulkTicketError(errors)
+
+    locations = _locations_by_room({t['room_number'] for t in tickets})
+    now = timezone.now()
+    batch = uuid.uuid4()
+
+    with transaction.atomic():
+        # Request types are created on demand, as in create_ticket_api
+        missing_types = categories - set(request_types)
+        if missing_types:
+            RequestType.objects.bulk_create(
+                [RequestType(name=name) for name in missing_types], ignore_conflicts=True
+            )
+            # bulk_create sends no post_save
+            invalidate_request_matcher()
+            invalidate_intent_index()
+            request_types.update(
+                {rt.name: rt for rt in RequestType.objects.filter(name__in=missing_types)}
+            )
+
+        objects = []
+        for ticket in tickets:
+            request_type = request_types[ticket['category']]
+            department = departments.get(ticket['department'])
+            objects.append(ServiceRequest(
+                request_type=request_type,
+                department_id=department.pk if department else request_type.default_department_id,
+                location=locations.get(ticket['room_number'].lower()),
+                requester_user=requester,
+                room_no=ticket['room_number'],
+                guest_name=ticket['guest_name'] or None,
+                phone_number=ticket['phone_number'] or None,
+                priority=PRIORITY_MAPPING.get(ticket['priority'], 'normal'),
+                status='pending',
+                notes=ticket['description'],
+                # Overwritten by auto_now_add on insert; due_at is computed from it first
+                created_at=now,
+                bulk_batch=batch,
+            ))
+
+        # SLA policy for every distinct (department, request type, priority) at once
+        sla = resolve_many(
+            (obj.department_id, obj.request_type_id, obj.priority) for obj in objects
+        )
+        for obj in objects:
+            obj.response_sla_hours, obj.sla_hours = sla[(obj.department_id, obj.request_type_id, obj.priority)]
+            obj.due_at = obj.compute_due_at()
+
+        created = ServiceRequest.objects.bulk_create(objects, batch_size=200)
+        if any(obj.pk is None for obj in created):
+            # Backends without INSERT ... RETURNING (MySQL): auto-increment ids
+            # increase in insertion order, so the batch's ids sorted match `created`
+            pks = list(
+                ServiceRequest.objects.filter(bulk_batch=batch).order_by('pk').values_list('pk', flat=True)
+            )
+            if len(pks) != len(created):
+                raise RuntimeError(f'Read back {len(pks)} of {len(created)} bulk-created tickets')
+            for obj, pk in zip(created, pks):
+                obj.pk = pk
+
+        AuditLog.objects.bulk_create([
+            AuditLog(actor=requester, action='create', model_name='ServiceRequest', object_pk=str(obj.pk), changes={})
+            for obj in created
+        ])
+        _queue_ticket_side_effects(created)
+
+    _notify_departments(created)
+    return created
+
+
+def _queue_ticket_side_effects(tickets):
+    """post_save work that bulk_create skips: daily rollup and SLA scheduler feed."""
+    from django.conf import settings
+    from .ticket_stats_services import schedule_ticket_stats_refresh, ticket_bucket
+
+    schedule_ticket_stats_refresh(*[ticket_bucket(ticket) for ticket in tickets])
+    if getattr(settings, 'SLA_SCHEDULER_ENABLED', False):
+        ids = [ticket.pk for ticket in tickets]
+        transaction.on_commit(
+            lambda: SLADeadlineChange.objects.bulk_create([SLADeadlineChange(ticket_id=pk) for pk in ids])
+        )
+
+
+def _notify_departments(tickets):
+    """One grouped notification per department instead of one per ticket."""
+    from .utils import create_bulk_notifications
+
+    by_department = {}
+    for ticket in tickets:
+        if ticket.department_id:
+            by_department.setdefault(ticket.department_id, []).append(ticket)
+    if not by_department:
+        return
+
+    staff = {}
+    for user in User.objects.filter(userprofile__department_id__in=by_department).select_related('userprofile'):
+        staff.setdefault(user.userprofile.department_id, []).append(user)
+
+    for department_id, department_tickets in by_department.items():
+        recipients = staff.get(department_id)
+        if not recipients:
+            continue
+        try:
+            if len(department_tickets) == 1:
+                ticket = department_tickets[0]
+                create_bulk_notifications(
+                    recipients=recipients,
+                    title=f"New Ticket #{ticket.pk} Assigned: {ticket.request_type.name}",
+                    message=f"A new ticket #{ticket.pk} has been assigned to your department: {(ticket.notes or '')[:100]}...",
+                    notification_type='request',
+                    related_object=ticket,
+                )
+            else:
+                ids = ', '.join(f'#{ticket.pk}' for ticket in department_tickets[:20])
+                more = len(department_tickets) - 20
+                create_bulk_notifications(
+                    recipients=recipients,
+                    title=f"{len(department_tickets)} New Tickets Assigned",
+                    message=f"{len(department_tickets)} new tickets have been assigned to your department: {ids}"
+                            + (f" and {more} more" if more > 0 else ''),
+                    notification_type='request',
+                )
+        except Exception as e:
+            logger.error(f'Error notifying department {department_id} about bulk tickets: {str(e)}', exc_info=True)
+
+
+# Statuses that no longer count as active on the department cards
+CLOSED_TICKET_STATUSES = ['completed', 'closed']
+
+
+def department_ticket_summary():
+    """
+    {department_id: {'active': n, 'total': n, 'breached': n}} for every
+    department with tickets, from one grouped query.
+    """
+    rows = (
+        ServiceRequest.objects.filter(department__isnull=False)
+        .values('department_id')
+        .annotate(
+            total=Count('pk'),
+            # NULL status is still an open ticket
+            active=Count('pk', filter=Q(status__isnull=True) | ~Q(status__in=CLOSED_TICKET_STATUSES)),
+            breached=Count('pk', filter=Q(sla_breached=True)),
+        )
+        .order_by()
+    )
+    return {
+        row['department_id']: {'active': row['active'], 'total': row['total'], 'breached': row['breached']}
+        for row in rows
+    }
+
+
+class KeysetPage:
+    """
+    One page of a queryset ordered by -pk.
+
+    `after` / `before` are the cursors for the next and previous page: the
+    pk of the last / first row shown. `start_index` and `count` are carried
+    in the URL rather than counted, so a page after the first never costs
+    more than per_page + 1 rows.
+    """
+
+    def __init__(self, object_list, has_previous, has_next, start_index, count, per_page):
+        self.object_list = object_list
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.start_index = start_index if object_list else 0
+        self.end_index = start_index + len(object_list) - 1 if object_list else 0
+        self.count = count
+        self.next_cursor = object_list[-1].pk if object_list else None
+        self.previous_cursor = object_list[0].pk if object_list else None
+        self.next_start = self.end_index + 1
+        self.previous_start = max(1, start_index - per_page)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _parse_int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, after=None, before=None, start=None, per_page=10, count=None, total=None):
+    """
+    Return a KeysetPage of `queryset` in -pk order.
+
+    `after=<pk>` moves forward (rows with a smaller pk), `before=<pk>` moves
+    back (rows with a larger pk); neither gives the first page. Both are
+    range scans on the primary key, unlike OFFSET, which reads and discards
+    every earlier row.
+
+    `count` (a number, or a callable such as queryset.count) is only used on
+    the first page, or when `total`, the count carried from the first page,
+    is missing.
+    """
+    after, before, start, total = _parse_int(after), _parse_int(before), _parse_int(start), _parse_int(total)
+    if total is None or (after is None and before is None):
+        total = count() if callable(count) else count
+    queryset = queryset.order_by('-pk')
+
+    if before is not None:
+        rows = list(queryset.filter(pk__gt=before).order_by('pk')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        object_list = list(reversed(rows[:per_page]))
+        has_next = True
+        if not has_previous:
+            # Walked back to the first page
+            start = 1
+    else:
+        if after is not None:
+            queryset = queryset.filter(pk__lt=after)
+        rows = list(queryset[:per_page + 1])
+        has_next = len(rows) > per_page
+        object_list = rows[:per_page]
+        has_previous = after is not None
+        if after is None:
+            start = 1
+
+    return KeysetPage(
+        object_list,
+        has_previous=has_previous,
+        has_next=has_next,
+        start_index=max(1, start or 1),
+        count=total,
+        per_page=per_page,
+    )
@@ -0,0 +1,254 @@
+"""
+Daily ticket statistics rollup (DailyTicketStats).
+
+Each row summarises the tickets created on one local date for one
+(department, request type, priority) bucket. Buckets are recomputed from
+service_request after every ticket save/delete (see signals.py), and
+`rebuild_ticket_stats` regenerates a whole date range for backfills or after
+bulk UPDATEs that bypass signals.
+
+Dashboards reporting on long ranges (TICKET_STATS_ROLLUP_MIN_DAYS, 90 days by
+default) read these rows instead of scanning service_request with
+created_at__date filters.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .kpi_services import SLA_BREACHED_Q, day_start
+from .models import DailyTicketStats, ServiceRequest
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = [
+    'created_count', 'completed_count', 'breached_count',
+    'response_count', 'response_seconds', 'resolution_count', 'resolution_seconds',
+]
+
+
+def use_rollup(days):
+    """Whether a report spanning `days` days should read the rollup table."""
+    return days >= getattr(settings, 'TICKET_STATS_ROLLUP_MIN_DAYS', 90)
+
+
+def ticket_bucket(ticket):
+    """Rollup key (date, department_id, request_type_id, priority) for a ticket."""
+    if not ticket.created_at:
+        return None
+    return (
+        timezone.localtime(ticket.created_at).date(),
+        ticket.department_id,
+        ticket.request_type_id,
+        ticket.priority or '',
+    )
+
+
+def _ticket_aggregates():
+    accepted = Q(accepted_at__isnull=False)
+    resolved = Q(status='completed', completed_at__isnull=False)
+    return {
+        'created_count': Count('pk'),
+        'completed_count': Count('pk', filter=Q(status='completed')),
+        'breached_count': Count('pk', filter=SLA_BREACHED_Q),
+        'response_count': Count('pk', filter=accepted),
+        'response_total': Sum(
+            ExpressionWrapper(F('accepted_at') - F('created_at'), output_field=DurationField()),
+            filter=accepted,
+        ),
+        'resolution_count': Count('pk', filter=resolved),
+        'resolution_total': Sum(
+            ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField()),
+            filter=resolved,
+        ),
+    }
+
+
+def _stat_values(row):
+    """Model field values from a _ticket_aggregates() row."""
+    return {
+        'created_count': row['created_count'],
+        'completed_count': row['completed_count'],
+        'breached_count': row['breached_count'],
+        'response_count': row['response_count'],
+        'response_seconds': row['response_total'].total_seconds() if row['response_total'] else 0,
+        'resolution_count': row['resolution_count'],
+        'resolution_seconds': row['resolution_total'].total_seconds() if row['resolution_total'] else 0,
+    }
+
+
+def _bucket_filter(day, department_id, request_type_id, priority):
+    bucket = Q(department_id=department_id, request_type_id=request_type_id)
+    if priority:
+        bucket &= Q(priority=priority)
+    else:
+        bucket &= Q(priority__isnull=True) | Q(priority='')
+    return bucket & Q(
+        created_at__gte=day_start(day),
+        created_at__lt=day_start(day + datetime.timedelta(days=1)),
+    )
+
+
+def refresh_ticket_stats(buckets, attempts=3):
+    """Recompute the given rollup buckets from service_request."""
+    for key in set(b for b in buckets if b):
+        for attempt in range(attempts):
+            try:
+                _refresh_bucket(*key)
+                break
+            except IntegrityError:
+                # Another refresh or a rebuild inserted the row first; recompute
+                if attempt == attempts - 1:
+                    raise
+
+
+def _refresh_bucket(day, department_id, request_type_id, priority):
+    with transaction.atomic():
+        tickets = ServiceRequest.objects.filter(
+            _bucket_filter(day, department_id, request_type_id, priority)
+        )
+        # Locking the bucket's tickets serializes concurrent refreshes of the
+        # same bucket; NULL department/request type keys get no protection
+        # from the unique index.
+        list(tickets.select_for_update().order_by('pk').values_list('pk', flat=True))
+        row = tickets.aggregate(**_ticket_aggregates())
+
+        # NULL department/request type never collide in the unique index,
+        # so delete + insert rather than update_or_create.
+        DailyTicketStats.objects.filter(
+            date=day, department_id=department_id,
+            request_type_id=request_type_id, priority=priority,
+        ).delete()
+        if row['created_count']:
+            DailyTicketStats.objects.create(
+                date=day, department_id=department_id,
+                request_type_id=request_type_id, priority=priority,
+                **_stat_values(row)
+            )
+
+
+def schedule_ticket_stats_refresh(*buckets):
+    """Refresh buckets once the current transaction commits."""
+    buckets = [b for b in buckets if b]
+    if not buckets:
+        return
+
+    def _refresh():
+        try:
+            refresh_ticket_stats(buckets)
+        except Exception as e:
+            logger.error(f'Error refreshing daily ticket stats {buckets}: {str(e)}', exc_info=True)
+
+    transaction.on_commit(_refresh)
+
+
+def rebuild_ticket_stats(start_date=None, end_date=None, batch_size=500):
+    """
+    Regenerate the rollup for tickets created between start_date and end_date
+    (inclusive, either bound optional). Returns the number of buckets written.
+    """
+    tickets = ServiceRequest.objects.all()
+    rows = DailyTicketStats.objects.all()
+    if start_date:
+        tickets = tickets.filter(created_at__gte=day_start(start_date))
+        rows = rows.filter(date__gte=start_date)
+    if end_date:
+        tickets = tickets.filter(created_at__lt=day_start(end_date + datetime.timedelta(days=1)))
+        rows = rows.filter(date__lte=end_date)
+
+    grouped = (
+        tickets.annotate(day=TruncDate('created_at'))
+        .values('day', 'department_id', 'request_type_id', 'priority')
+        .annotate(**_ticket_aggregates())
+        .order_by()
+    )
+
+    # NULL and '' priorities share a bucket
+    buckets = {}
+    for row in grouped:
+        key = (row['day'], row['department_id'], row['request_type_id'], row['priority'] or '')
+        values = _stat_values(row)
+        if key in buckets:
+            for field in STAT_FIELDS:
+                buckets[key][field] += values[field]
+        else:
+            buckets[key] = values
+
+    with transaction.atomic():
+        rows.delete()
+        DailyTicketStats.objects.bulk_create(
+            [
+                DailyTicketStats(
+                    date=day, department_id=department_id,
+                    request_type_id=request_type_id, priority=priority, **values
+                )
+                for (day, department_id, request_type_id, priority), values in buckets.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(buckets)
+
+
+# ---- Readers ----
+
+def _sums():
+    return {f'total_{field}': Sum(field) for field in STAT_FIELDS}
+
+
+def _totals(row):
+    """Counts and average response/resolution timedeltas from summed rollup rows."""
+    row = {field: row.get(f'total_{field}') or 0 for field in STAT_FIELDS}
+    return {
+        'created': row['created_count'],
+        'completed': row['completed_count'],
+        'breached': row['breached_count'],
+        'avg_response': (
+            datetime.timedelta(seconds=row['response_seconds'] / row['response_count'])
+            if row['response_count'] else None
+        ),
+        'avg_resolution': (
+            datetime.timedelta(seconds=row['resolution_seconds'] / row['resolution_count'])
+            if row['resolution_count'] else None
+        ),
+    }
+
+
+def _in_range(start_date, end_date, department=None):
+    rows = DailyTicketStats.objects.filter(date__gte=start_date, date__lte=end_date)
+    if department is not None:
+        rows = rows.filter(department=department)
+    return rows
+
+
+def ticket_totals(start_date, end_date, department=None):
+    """Totals for tickets created between start_date and end_date (inclusive)."""
+    return _totals(_in_range(start_date, end_date, department).aggregate(**_sums()))
+
+
+def daily_totals(start_date, end_date, department=None):
+    """{date: totals} for each day in the range, zero-filled, oldest first."""
+    rows = {
+        row['date']: row
+        for row in _in_range(start_date, end_date, department)
+        .values('date').annotate(**_sums()).order_by()
+    }
+    return {
+        day: _totals(rows.get(day, {}))
+        for day in (
+            start_date + datetime.timedelta(days=i)
+            for i in range((end_date - start_date).days + 1)
+        )
+    }
+
+
+def department_totals(start_date, end_date):
+    """{department_id: totals} for departments with tickets in the range."""
+    return {
+        row['department_id']: _totals(row)
+        for row in _in_range(start_date, end_date)
+        .values('department_id').annotate(**_sums()).order_by()
+    }
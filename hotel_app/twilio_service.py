@@ -2,18 +2,38 @@
 Twilio WhatsApp Service for Hotel Messaging System
 """
 
+import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.db import OperationalError, ProgrammingError
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
 logger = logging.getLogger(__name__)
 
 
+def _pooled_client(username, password, account_sid=None):
+    """
+    SDK client whose HTTP transport keeps one keep-alive pool sized by
+    TWILIO_POOL_SIZE, so a batch sent on TWILIO_MAX_WORKERS threads reuses a
+    few warm connections instead of handshaking per message. The API host
+    comes from TWILIO_API_BASE_URL, which tests point at a local server.
+    """
+    http_client = TwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_REQUEST_TIMEOUT)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=settings.TWILIO_POOL_SIZE)
+    http_client.session.mount('https://', adapter)
+    http_client.session.mount('http://', adapter)
+    client = Client(username, password, account_sid=account_sid, http_client=http_client)
+    client.api.base_url = settings.TWILIO_API_BASE_URL.rstrip('/')
+    return client
+
+
 class TwilioService:
     """Twilio WhatsApp integration service"""
 
@@ -80,16 +100,18 @@ class TwilioService:
 
     def _initialize_client(self):
         """Initialise the Twilio client with the current credentials."""
+        if self.client:
+            self.client.http_client.session.close()
         if self.account_sid and self.auth_token:
             try:
-                self.client = Client(self.account_sid, self.auth_token)
+                self.client = _pooled_client(self.account_sid, self.auth_token)
             except Exception as exc:  # Twilio raises generic Exception on auth issues
                 logger.error("Failed to initialize Twilio client: %s", exc)
                 self.client = None
                 return exc
         elif self.account_sid and self.api_key_sid and self.api_key_secret:
             try:
-                self.client = Client(self.api_key_sid, self.api_key_secret, account_sid=self.account_sid)
+                self.client = _pooled_client(self.api_key_sid, self.api_key_secret, account_sid=self.account_sid)
             except Exception as exc:
                 logger.error("Failed to initialize Twilio client with API key: %s", exc)
                 self.client = None
@@ -235,6 +257,14 @@ class TwilioService:
             
         return f'whatsapp:{number}'
     
+    def _formatted_from(self):
+        """The configured sender as a WhatsApp address."""
+        if not self.whatsapp_from:
+            return self.whatsapp_from
+        # Remove 'whatsapp:' prefix if present and re-add it
+        from_number = self.whatsapp_from.replace('whatsapp:', '') if self.whatsapp_from.startswith('whatsapp:') else self.whatsapp_from
+        return self._format_whatsapp_number(from_number)
+
     def send_whatsapp_message(self, to_number, body=None, content_sid=None, content_variables=None):
         """
         Send a WhatsApp message using Twilio
@@ -259,17 +289,9 @@ class TwilioService:
             # Format the numbers
             formatted_to = self._format_whatsapp_number(to_number)
 
-            # Handle the from number
-            if self.whatsapp_from:
-                # Remove 'whatsapp:' prefix if present and re-add it
-                from_number = self.whatsapp_from.replace('whatsapp:', '') if self.whatsapp_from.startswith('whatsapp:') else self.whatsapp_from
-                formatted_from = self._format_whatsapp_number(from_number)
-            else:
-                formatted_from = self.whatsapp_from
-
             # Prepare message parameters
             message_params = {
-                'from_': formatted_from,
+                'from_': self._formatted_from(),
                 'to': formatted_to
             }
             
@@ -277,6 +299,8 @@ class TwilioService:
             if content_sid:
                 message_params['content_sid'] = content_sid
                 if content_variables:
+                    if not isinstance(content_variables, str):
+                        content_variables = json.dumps(content_variables)
                     message_params['content_variables'] = content_variables
             elif body:
                 message_params['body'] = body
@@ -307,6 +331,52 @@ class TwilioService:
                 'success': False,
                 'error': str(e)
             }
+
+    def send_whatsapp_batch(self, messages, max_workers=None):
+        """
+        Send several WhatsApp messages concurrently over the pooled connections.
+
+        Args:
+            messages (list[dict]): send_whatsapp_message keyword arguments
+                (to_number, body, content_sid, content_variables); an item
+                with 'buttons' is sent through send_button_message instead
+                (to_number, body_text, buttons, fallback_text)
+            max_workers (int, optional): Thread count, TWILIO_MAX_WORKERS by default
+
+        Returns:
+            list[dict]: One result per message, in the order given
+
+        Messages to different recipients go out in parallel; messages to the
+        same recipient are sent one after another by a single thread, so a
+        guest still receives them in order.
+        """
+        results = [None] * len(messages)
+        by_recipient = {}
+        for index, message in enumerate(messages):
+            recipient = self._format_whatsapp_number(message['to_number'])
+            by_recipient.setdefault(recipient, []).append(index)
+
+        def send(indexes):
+            for index in indexes:
+                message = dict(messages[index])
+                try:
+                    if 'buttons' in message:
+                        results[index] = self.send_button_message(**message)
+                    else:
+                        results[index] = self.send_whatsapp_message(**message)
+                except Exception as e:
+                    logger.error(f"Failed to send WhatsApp message to {message.get('to_number')}: {str(e)}")
+                    results[index] = {'success': False, 'error': str(e)}
+
+        groups = list(by_recipient.values())
+        workers = min(max_workers or settings.TWILIO_MAX_WORKERS, len(groups))
+        if workers <= 1:
+            for indexes in groups:
+                send(indexes)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="twilio-send") as pool:
+                list(pool.map(send, groups))
+        return results
     
     def send_template_message(self, to_number, content_sid, content_variables=None):
         """
@@ -341,23 +411,17 @@ class TwilioService:
     
     def send_button_message(self, to_number, body_text, buttons, fallback_text=None):
         """
-        Send an interactive button message. Falls back to plain text if interactive
-        messages are not supported or fail.
+        Send a menu with reply buttons.
+
+        The Messages API has no inline interactive parameter (buttons need
+        an approved Content template), so when Twilio is configured the
+        fallback text is sent as a plain message. Without credentials the
+        buttons are mocked for development.
         """
-        if not buttons:
+        if not buttons or self.is_configured():
             return self.send_text_message(to_number, fallback_text or body_text)
         
         formatted_to = self._format_whatsapp_number(to_number)
-        if self.whatsapp_from:
-            from_number = (
-                self.whatsapp_from.replace('whatsapp:', '')
-                if self.whatsapp_from.startswith('whatsapp:')
-                else self.whatsapp_from
-            )
-            formatted_from = self._format_whatsapp_number(from_number)
-        else:
-            formatted_from = self.whatsapp_from
-        
         interactive_buttons = []
         for idx, button in enumerate(buttons):
             reply_id = str(
@@ -376,41 +440,6 @@ class TwilioService:
                 }
             )
         
-        interactive_payload = {
-            "type": "button",
-            "body": {"text": body_text},
-            "action": {"buttons": interactive_buttons},
-        }
-        
-        try:
-            client = self._ensure_client()
-            if client and self.is_configured():
-                message = client.messages.create(
-                    from_=formatted_from,
-                    to=formatted_to,
-                    interactive=interactive_payload,
-                    body=fallback_text or body_text,
-                )
-                logger.info(
-                    "Interactive WhatsApp message sent to %s (SID: %s)",
-                    formatted_to,
-                    message.sid,
-                )
-                return {
-                    "success": True,
-                    "message_id": message.sid,
-                    "status": message.status,
-                    "to": message.to,
-                    "from": message.from_,
-                }
-        except Exception as exc:
-            logger.error(
-                "Failed to send interactive WhatsApp message to %s: %s",
-                formatted_to,
-                exc,
-            )
-            return {"success": False, "error": str(exc)}
-        
         return self._mock_send_buttons(formatted_to, body_text, interactive_buttons)
     
     def is_configured(self):
@@ -5,6 +5,7 @@ from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.models import Group
 from django.conf import settings
+from django.utils import timezone
 from django.shortcuts import redirect
 from django.contrib import messages
 from .models import Notification
@@ -90,7 +91,7 @@ def generate_guest_details_qr_base64(guest, size='xxlarge'):
 # Notification utility functions
 def create_notification(recipient, title, message, notification_type='info', related_object=None):
     """
-    Create a notification for a user AND send Firebase push notification
+    Create a notification for a user AND queue a Firebase push notification
     
     Args:
         recipient: User object to receive the notification
@@ -113,9 +114,9 @@ def create_notification(recipient, title, message, notification_type='info', rel
     # Create in-app notification
     notification = Notification.objects.create(**notification_data)
     
-    # Try to send Firebase push notification
+    # Queue the Firebase push notification; the outbox worker sends it
     try:
-        from .fcm_utils import send_push_notification_to_user
+        from .outbox import queue_push
         
         # Prepare data for Firebase
         fcm_data = {
@@ -127,24 +128,18 @@ def create_notification(recipient, title, message, notification_type='info', rel
             fcm_data['related_object_id'] = str(related_object.id)
             fcm_data['related_object_type'] = related_object.__class__.__name__
         
-        # Send Firebase push notification
-        send_push_notification_to_user(
-            user=recipient,
-            title=title,
-            body=message,
-            data=fcm_data
-        )
+        queue_push([recipient], title=title, body=message, data=fcm_data)
     except Exception as e:
         # If Firebase fails, log it but don't fail the notification creation
         import logging
         logger = logging.getLogger(__name__)
-        logger.debug(f"Could not send Firebase push notification: {e}")
+        logger.debug(f"Could not queue Firebase push notification: {e}")
     
     return notification
 
 def create_bulk_notifications(recipients, title, message, notification_type='info', related_object=None):
     """
-    Create notifications for multiple users AND send Firebase push notifications
+    Create notifications for multiple users AND queue Firebase push notifications
     
     Args:
         recipients: List or QuerySet of User objects
@@ -171,9 +166,9 @@ def create_bulk_notifications(recipients, title, message, notification_type='inf
     # Create all in-app notifications
     created_notifications = Notification.objects.bulk_create(notifications)
     
-    # Try to send Firebase push notifications
+    # Queue one Firebase push for all recipients; the outbox worker fans it out
     try:
-        from .fcm_utils import send_push_notification_to_users
+        from .outbox import queue_push
         
         # Prepare data for Firebase
         fcm_data = {
@@ -184,9 +179,8 @@ def create_bulk_notifications(recipients, title, message, notification_type='inf
             fcm_data['related_object_id'] = str(related_object.id)
             fcm_data['related_object_type'] = related_object.__class__.__name__
         
-        # Send Firebase push notifications to all recipients
-        send_push_notification_to_users(
-            users=recipients,
+        queue_push(
+            [notification.recipient_id for notification in created_notifications],
             title=title,
             body=message,
             data=fcm_data
@@ -195,10 +189,64 @@ def create_bulk_notifications(recipients, title, message, notification_type='inf
         # If Firebase fails, log it but don't fail the notification creation
         import logging
         logger = logging.getLogger(__name__)
-        logger.debug(f"Could not send Firebase push notifications: {e}")
+        logger.debug(f"Could not queue Firebase push notifications: {e}")
     
     return created_notifications
 
+def create_broadcast(title, message, notification_type='info', audience='all', group=None, department=None,
+                     related_object=None):
+    """
+    Create one notification for a whole audience AND queue Firebase push notifications
+
+    Unlike create_bulk_notifications this writes a single BroadcastNotification
+    row, merged into each member's list when it is read.
+
+    Args:
+        title: Title of the notification
+        message: Message content of the notification
+        notification_type: Type of notification
+        audience: 'all', 'group' (with `group`, a UserGroup) or 'department' (with `department`)
+        related_object: Optional related object
+    """
+    from .models import BroadcastNotification
+    from .notification_services import audience_users
+
+    broadcast = BroadcastNotification.objects.create(
+        audience=audience,
+        group=group,
+        department=department,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        related_object_id=related_object.id if related_object else None,
+        related_object_type=related_object.__class__.__name__ if related_object else None,
+    )
+
+    # Queue one Firebase push for the audience; the outbox worker fans it out
+    try:
+        from .outbox import queue_push
+
+        fcm_data = {
+            'broadcast_id': str(broadcast.id),
+            'type': notification_type,
+        }
+        if related_object:
+            fcm_data['related_object_id'] = str(related_object.id)
+            fcm_data['related_object_type'] = related_object.__class__.__name__
+
+        queue_push(
+            list(audience_users(broadcast).values_list('pk', flat=True)),
+            title=title,
+            body=message,
+            data=fcm_data
+        )
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.debug(f"Could not queue Firebase push notifications: {e}")
+
+    return broadcast
+
 def mark_notification_as_read(notification_id, user):
     """
     Mark a notification as read for a specific user
@@ -222,4 +270,7 @@ def mark_all_notifications_as_read(user):
     Args:
         user: User object
     """
-    return Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
\ No newline at end of file
+    from .notification_services import mark_broadcasts_read
+
+    mark_broadcasts_read(user)
+    return Notification.objects.filter(recipient=user, is_read=False).update(is_read=True, updated_at=timezone.now())
\ No newline at end of file
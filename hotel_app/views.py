@@ -2587,6 +2587,54 @@ def breakfast_voucher_report(request):
     elif to_date:
         vouchers = vouchers.filter(check_in_date__lte=to_date)
 
+    # ✅ ✅ ✅ EXPORT ONLY FILTERED RECORDS ✅ ✅ ✅
+    # Streamed through a write-only workbook in chunks, before the dashboard
+    # stats below (which read every voucher) are computed.
+    if request.GET.get("export") == "1":
+        from .export_services import iter_queryset, stream_xlsx
+
+        def voucher_row(v):
+            if v.valid_dates:
+                valid_dates_display = f"{v.valid_dates[0]} → {v.valid_dates[-1]}"
+            else:
+                valid_dates_display = "-"
+
+            # ✅ Format scan history
+            if v.scan_history:
+                scan_history_display = ", ".join([
+                    f"{s.get('date')} ({s.get('username', 'System')})"
+                    for s in v.scan_history
+                ])
+            else:
+                scan_history_display = "-"
+            return [
+                v.voucher_code,
+                v.guest_name,
+                v.phone_number,
+                v.room_no,
+                v.check_in_date,
+                v.check_out_date,
+                valid_dates_display,
+                scan_history_display,
+                "Yes" if v.include_breakfast else "No",
+                v.adults,
+                v.kids,
+                v.quantity,
+                v.scan_count,
+                v.remaining_scans(),
+                v.scanned_users_display(),
+                v.created_at,
+                v.redeemed_at.strftime("%Y-%m-%d %H:%M") if v.redeemed_at else "-",
+            ]
+
+        header = [
+            "Voucher Code", "Guest Name", "Phone Number", "Room No", "Check-in Date",
+            "Check-out Date", "Valid Dates", "Scan History", "Include Breakfast", "Adults",
+            "Kids", "Quantity", "Scan Count", "Remaining Scans", "Scanned By", "Created At",
+            "Redeemed At",
+        ]
+        return stream_xlsx("vouchers.xlsx", header, iter_queryset(vouchers), voucher_row)
+
     # ✅ Dashboard stats (FULL DATA - NOT FILTERED)
     today_total = sum(v.total_scans_today() for v in vouchers)
     today_redeemed = sum(v.redeemed_today() for v in vouchers)
@@ -2599,62 +2647,6 @@ def breakfast_voucher_report(request):
     if weekly_total > 0:
         weekly_redeemed_percent = round((weekly_redeemed / weekly_total) * 100, 2)
 
-    # ✅ ✅ ✅ EXPORT ONLY FILTERED RECORDS ✅ ✅ ✅
-    # ----------------------------------
-# EXPORT DATA PREPARATION
-# ----------------------------------
-    export_data = []
-
-    for v in vouchers:
-        if v.valid_dates:
-            valid_dates_display = f"{v.valid_dates[0]} → {v.valid_dates[-1]}"
-        else:
-            valid_dates_display = "-"
-
-    # ✅ Format scan history
-        if v.scan_history:
-            scan_history_display = ", ".join([
-            f"{s.get('date')} ({s.get('username', 'System')})"
-            for s in v.scan_history
-        ])
-        else:
-            scan_history_display = "-"
-        export_data.append({
-        "Voucher Code": v.voucher_code,
-        "Guest Name": v.guest_name,
-        "Phone Number": v.phone_number,
-        "Room No": v.room_no,
-        "Check-in Date": v.check_in_date,
-        "Check-out Date": v.check_out_date,
-    "Valid Dates": valid_dates_display,
-    "Scan History": scan_history_display,
-        "Include Breakfast": "Yes" if v.include_breakfast else "No",
-        "Adults": v.adults,
-        "Kids": v.kids,
-        "Quantity": v.quantity,
-        "Scan Count": v.scan_count,
-        "Remaining Scans": v.remaining_scans(),
-
-        "Scanned By": v.scanned_users_display(),
-        # "Status": "Expired" if v.is_expired() else "Active",
-        "Created At": v.created_at,
-         "Redeemed At": v.redeemed_at.strftime("%Y-%m-%d %H:%M") if v.redeemed_at else "-",
-    })
-
-    df = pd.DataFrame(export_data)
-
-
-    for col in df.select_dtypes(include=['datetimetz']).columns:
-        df[col] = df[col].dt.tz_localize(None)
-
-    if request.GET.get("export") == "1":
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = 'attachment; filename="vouchers.xlsx"'
-        df.to_excel(response, index=False)
-        return response
-
     return render(
         request,
         "breakfast_voucher_report.html",
@@ -3676,30 +3668,24 @@ def gym_report(request):
     # EXPORT LOGIC
     # -------------------
     if request.GET.get("export") == "1":
-        data = []
-        for visit in visits:
-            data.append({
-                "ID": visit.visit_id,
-                "Customer ID": visit.member.customer_code if visit.member else "-",
-                "Name": visit.member.full_name if visit.member else visit.visitor.full_name,
-                "Date & Time": visit.visit_at.strftime("%Y-%m-%d %I:%M %p"),
-                "Admin": visit.checked_by_user.username if visit.checked_by_user else "-",
-            })
-
-        df = pd.DataFrame(data)
-
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Gym Report")
-
-        output.seek(0)
-
-        response = HttpResponse(
-            output,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        from .export_services import iter_queryset, stream_xlsx
+
+        def visit_row(visit):
+            return [
+                visit.visit_id,
+                visit.member.customer_code if visit.member else "-",
+                visit.member.full_name if visit.member else visit.visitor.full_name,
+                visit.visit_at.strftime("%Y-%m-%d %I:%M %p"),
+                visit.checked_by_user.username if visit.checked_by_user else "-",
+            ]
+
+        return stream_xlsx(
+            "gym_report.xlsx",
+            ["ID", "Customer ID", "Name", "Date & Time", "Admin"],
+            iter_queryset(visits, order_field="visit_at"),
+            visit_row,
+            sheet_name="Gym Report",
         )
-        response["Content-Disposition"] = 'attachment; filename="gym_report.xlsx"'
-        return response
 
     # -------------------
     # PAGINATION
@@ -5003,16 +4989,13 @@ from .models import (
 #     return HttpResponse(str(resp))
 
 import re
-import unicodedata
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from datetime import timedelta
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse
 from twilio.twiml.messaging_response import MessagingResponse
 
+from .intent_engine import get_intent_engine, normalize_message
 from .models import Voucher, RequestType, DepartmentRequestSLA, TicketReview
 
 
@@ -5024,75 +5007,6 @@ CONFIDENCE_THRESHOLD = 0.70
 MIN_SEMANTIC_SIGNAL = 0.35   # below this = small talk / noise
 
 
-# =========================================================
-# NORMALIZATION
-# =========================================================
-def normalize_message(text: str) -> str:
-    text = text.lower().strip()
-    text = "".join(
-        ch for ch in text
-        if unicodedata.category(ch)[0] not in ("S", "C")
-    )
-    text = re.sub(r"[^\w\s]", "", text)
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-
-# =========================================================
-# RAG INTENT ENGINE (NO LISTS, NO RULES)
-# =========================================================
-class RAGIntentEngine:
-    _instance = None
-
-    def __new__(cls):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_engine()
-        return cls._instance
-
-    def _init_engine(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.index = None
-        self.request_map = []
-        self._build_index()
-
-    def _build_index(self):
-        texts = []
-        self.request_map = []
-
-        for rt in RequestType.objects.filter(active=True):
-            combined = f"{rt.name}. {rt.description or ''}"
-            texts.append(combined)
-            self.request_map.append(rt)
-
-        if not texts:
-            return
-
-        embeddings = self.model.encode(
-            texts,
-            normalize_embeddings=True
-        )
-
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(np.array(embeddings))
-
-    def detect(self, message: str):
-        if not self.index:
-            return None, 0.0
-
-        emb = self.model.encode(
-            [message],
-            normalize_embeddings=True
-        )
-
-        scores, indices = self.index.search(np.array(emb), 1)
-        confidence = float(scores[0][0])
-        rt = self.request_map[indices[0][0]]
-
-        return rt, confidence
-
-
 # =========================================================
 # DUPLICATE TICKET CHECK
 # =========================================================
@@ -5125,9 +5039,36 @@ def handle_non_request(resp, phone):
 # =========================================================
 @csrf_exempt
 def whatsapp_webhook(request):
+    """
+    Replies with TwiML, so the guest's message is handled before answering.
+    Each MessageSid is handled once: a Twilio retry of a slow request gets
+    an empty reply instead of a second ticket.
+    """
     if request.method != "POST":
         return JsonResponse({"error": "Invalid request"}, status=400)
 
+    from .models import InboundMessage
+    from .whatsapp_inbound import forget_inbound, record_inbound, valid_signature
+
+    if not valid_signature(request):
+        return HttpResponse("Invalid signature", status=403)
+
+    message, created = record_inbound(request.POST.dict(), status=InboundMessage.STATUS_PROCESSING)
+    if not created:
+        return HttpResponse(str(MessagingResponse()))
+    try:
+        response = _handle_whatsapp_webhook(request)
+    except Exception:
+        # Let Twilio's retry run it again
+        forget_inbound(message)
+        raise
+    InboundMessage.objects.filter(pk=message.pk).update(
+        status=InboundMessage.STATUS_DONE, processed_at=timezone.now(),
+    )
+    return response
+
+
+def _handle_whatsapp_webhook(request):
     from_number = request.POST.get("From", "")
     body = request.POST.get("Body", "")
     resp = MessagingResponse()
@@ -5159,8 +5100,7 @@ def whatsapp_webhook(request):
     # ----------------------------
     # RAG Intent Detection
     # ----------------------------
-    engine = RAGIntentEngine()
-    request_type, confidence = engine.detect(msg)
+    request_type, confidence = get_intent_engine().detect(msg)
 
     # ----------------------------
     # DECISION LOGIC (CORE FIX)
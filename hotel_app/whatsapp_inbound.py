@@ -0,0 +1,228 @@
+"""
+Fast acknowledgement of Twilio WhatsApp webhooks.
+
+The webhook used to run the whole workflow (guest lookup, intent
+detection, ticket creation, replies) before answering Twilio. Twilio
+retries slow webhooks, and each retry created the ticket again. Now:
+
+- the webhook checks the Twilio signature (WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE),
+  stores the payload as an InboundMessage and answers at once;
+- MessageSid is unique, so a retried webhook finds its row and is
+  acknowledged without being processed again;
+- once the row is committed, a thread pool of WHATSAPP_WEBHOOK_WORKERS runs
+  WhatsAppWorkflow.handle_incoming_message and sends the replies. Messages
+  from one sender are processed one at a time, oldest first, so the
+  conversation state sees them in order. This is enforced by the claim in
+  the database, so it holds across gunicorn workers too;
+- rows left pending by a process that died are picked up by the
+  process_whatsapp_inbound command.
+
+Fast-ack is opt-in (WHATSAPP_WEBHOOK_FAST_ACK) because it relies on the
+recovery command running. With it off, the default, the message is
+processed before the webhook answers, as before, but still only once per
+MessageSid.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InboundMessage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def fast_ack_enabled():
+    return getattr(settings, 'WHATSAPP_WEBHOOK_FAST_ACK', False)
+
+
+def valid_signature(request):
+    """
+    True when signature checks are off or X-Twilio-Signature matches the
+    request. Behind a proxy, SECURE_PROXY_SSL_HEADER must be set so the URL
+    Twilio signed (https) is the one rebuilt here.
+    """
+    if not getattr(settings, 'WHATSAPP_WEBHOOK_VALIDATE_SIGNATURE', False):
+        return True
+    from twilio.request_validator import RequestValidator
+    from .twilio_service import twilio_service
+
+    if not twilio_service.auth_token:
+        logger.error('WhatsApp webhook signature check is on but no Twilio auth token is configured')
+        return False
+    return RequestValidator(twilio_service.auth_token).validate(
+        request.build_absolute_uri(),
+        request.POST.dict(),
+        request.headers.get('X-Twilio-Signature', ''),
+    )
+
+
+def record_inbound(payload, status=InboundMessage.STATUS_PENDING):
+    """
+    Store a webhook payload; returns (message, created). `created` is False
+    when a row with the same MessageSid exists already (a Twilio retry).
+    """
+    message_sid = (payload.get('MessageSid') or payload.get('SmsMessageSid') or '').strip() or None
+    if message_sid:
+        existing = InboundMessage.objects.filter(message_sid=message_sid).first()
+        if existing:
+            return existing, False
+    try:
+        with transaction.atomic():
+            message = InboundMessage.objects.create(
+                message_sid=message_sid,
+                from_number=(payload.get('From') or payload.get('WaId') or '')[:64],
+                payload=payload,
+                status=status,
+                attempts=1 if status == InboundMessage.STATUS_PROCESSING else 0,
+                started_at=timezone.now() if status == InboundMessage.STATUS_PROCESSING else None,
+            )
+    except IntegrityError:
+        # The same MessageSid arrived on another worker in between
+        return InboundMessage.objects.get(message_sid=message_sid), False
+    return message, True
+
+
+def forget_inbound(message):
+    """Drop a row whose processing failed in the webhook, so Twilio's retry is handled."""
+    InboundMessage.objects.filter(pk=message.pk).delete()
+
+
+# --------------------------------------------------
+# PROCESSING
+# --------------------------------------------------
+def _claim(message):
+    """
+    Move a pending row to processing. False if another worker has it, if an
+    older row of the sender is still pending, or if one is processing: the
+    sender's open rows are locked while checking, so two processes cannot
+    both claim a row for the same guest.
+    """
+    with transaction.atomic():
+        open_rows = list(
+            InboundMessage.objects.select_for_update()
+            .filter(
+                from_number=message.from_number,
+                status__in=[InboundMessage.STATUS_PENDING, InboundMessage.STATUS_PROCESSING],
+            )
+            .order_by('received_at', 'pk')
+            .values_list('pk', 'status')
+        )
+        if not open_rows or open_rows[0] != (message.pk, InboundMessage.STATUS_PENDING):
+            return False
+        if any(status == InboundMessage.STATUS_PROCESSING for _, status in open_rows):
+            return False
+        return bool(
+            InboundMessage.objects.filter(pk=message.pk, status=InboundMessage.STATUS_PENDING).update(
+                status=InboundMessage.STATUS_PROCESSING,
+                attempts=F('attempts') + 1,
+                started_at=timezone.now(),
+            )
+        )
+
+
+def process_inbound(message):
+    """Run the workflow for one claimed row and send its replies."""
+    from .whatsapp_workflow import workflow_handler
+
+    try:
+        replies, conversation = workflow_handler.handle_incoming_message(message.payload)
+        if conversation:
+            workflow_handler.send_outbound_messages(conversation, replies)
+    except Exception as e:
+        logger.exception(f'Failed to process {message}')
+        InboundMessage.objects.filter(pk=message.pk).update(
+            status=InboundMessage.STATUS_FAILED, last_error=str(e)[:2000], processed_at=timezone.now(),
+        )
+        return False
+    InboundMessage.objects.filter(pk=message.pk).update(
+        status=InboundMessage.STATUS_DONE, last_error='', processed_at=timezone.now(),
+    )
+    return True
+
+
+def process_sender(from_number):
+    """
+    Process the pending rows of one sender, oldest first; returns how many
+    ran. Stops when another worker holds one of the sender's rows, since
+    that worker goes on to the rest.
+    """
+    processed = 0
+    while True:
+        message = (
+            InboundMessage.objects.filter(status=InboundMessage.STATUS_PENDING, from_number=from_number)
+            .order_by('received_at', 'pk')
+            .first()
+        )
+        if message is None or not _claim(message):
+            return processed
+        process_inbound(message)
+        processed += 1
+
+
+def _run_in_worker(from_number):
+    close_old_connections()
+    try:
+        process_sender(from_number)
+    except Exception:
+        logger.exception(f'WhatsApp inbound worker failed for {from_number}')
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.WHATSAPP_WEBHOOK_WORKERS, thread_name_prefix='whatsapp-inbound',
+            )
+        return _executor
+
+
+def dispatch(message):
+    """
+    Hand a recorded row to the worker pool once the surrounding transaction
+    commits. With WHATSAPP_WEBHOOK_WORKERS = 0 it runs inline instead.
+    """
+    from_number = message.from_number
+
+    def submit():
+        if settings.WHATSAPP_WEBHOOK_WORKERS <= 0:
+            process_sender(from_number)
+        else:
+            _get_executor().submit(_run_in_worker, from_number)
+
+    transaction.on_commit(submit)
+
+
+def recover_inbound(stale_seconds=None):
+    """
+    Pick up rows a dead process left behind: pending rows older than
+    `stale_seconds` are processed here; rows stuck in processing are marked
+    failed rather than run again, since their tickets may already exist.
+    Returns {'processed': n, 'interrupted': n}.
+    """
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, 'WHATSAPP_INBOUND_STALE_SECONDS', 120)
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+
+    interrupted = InboundMessage.objects.filter(
+        status=InboundMessage.STATUS_PROCESSING, started_at__lt=cutoff,
+    ).update(
+        status=InboundMessage.STATUS_FAILED, last_error='Interrupted before completion', processed_at=timezone.now(),
+    )
+    senders = (
+        InboundMessage.objects.filter(status=InboundMessage.STATUS_PENDING, received_at__lt=cutoff)
+        .order_by('from_number').values_list('from_number', flat=True).distinct()
+    )
+    processed = sum(process_sender(from_number) for from_number in list(senders))
+    return {'processed': processed, 'interrupted': interrupted}
@@ -14,19 +14,19 @@ from __future__ import annotations
 import logging
 import re
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
 from .models import (
+    AuditLog,
     Department,
     FeedbackQuestion,
     FeedbackResponse,
     FeedbackSession,
     Guest,
-    RequestKeyword,
     RequestType,
     ServiceRequest,
     UnmatchedRequest,
@@ -34,6 +34,7 @@ from .models import (
     WhatsAppConversation,
     WhatsAppMessage,
 )
+from .request_matcher import get_request_matcher
 from .twilio_service import twilio_service
 
 logger = logging.getLogger(__name__)
@@ -191,28 +192,6 @@ class WhatsAppWorkflow:
         except Exception:
             logger.exception("Failed to log inbound WhatsApp message.")
 
-    def _log_outbound_message(
-        self,
-        conversation: WhatsAppConversation,
-        body: str,
-        status: Optional[str] = None,
-        message_sid: Optional[str] = None,
-        error: Optional[str] = None,
-    ) -> None:
-        try:
-            WhatsAppMessage.objects.create(
-                conversation=conversation,
-                guest=conversation.guest,
-                direction=WhatsAppMessage.DIRECTION_OUTBOUND,
-                body=body,
-                status=status,
-                message_sid=message_sid,
-                error=error,
-                sent_at=timezone.now(),
-            )
-        except Exception:
-            logger.exception("Failed to log outbound WhatsApp message.")
-
     def _menu_message(self, guest_status: str):
         buttons = [
             {"id": "MENU_RAISE_REQUEST", "title": "Raise a Request", "payload": "1"},
@@ -294,58 +273,13 @@ class WhatsAppWorkflow:
         return [greeting]
 
     def _detect_request_type(self, message: str) -> Optional[DetectedRequest]:
-        normalized = message.lower()
-        tokens = set(re.findall(r"[a-zA-Z0-9']+", normalized))
-        if not tokens:
+        """Best RequestType for the message from the compiled matcher (no queries)."""
+        matcher = get_request_matcher()
+        match = matcher.match(message)
+        if not match:
             return None
-
-        keyword_map: Dict[int, Tuple[int, List[str]]] = {}
-        for keyword in RequestKeyword.objects.select_related("request_type").all():
-            kw_lower = keyword.keyword.lower()
-            matched = False
-            if kw_lower in normalized:
-                matched = True
-            elif kw_lower in tokens:
-                matched = True
-
-            if not matched:
-                continue
-
-            current_score, matches = keyword_map.get(
-                keyword.request_type_id, (0, [])
-            )
-            current_score += keyword.weight
-            matches = matches + [kw_lower]
-            keyword_map[keyword.request_type_id] = (current_score, matches)
-
-        # Fallback: use RequestType name/description tokens when no explicit keywords matched
-        if not keyword_map:
-            for rt in RequestType.objects.filter(active=True).only("request_type_id", "name", "description", "default_department_id"):
-                rt_id = rt.request_type_id
-                score, matches = keyword_map.get(rt_id, (0, []))
-
-                # Strong boost if full name appears in text
-                rt_name_norm = (rt.name or "").strip().lower()
-                if rt_name_norm and rt_name_norm in normalized:
-                    score += 5
-                    matches = matches + [rt_name_norm]
-
-                # Token-level soft matches for name + description
-                name_tokens = set(re.findall(r"[a-zA-Z0-9']+", rt.name.lower())) if rt.name else set()
-                desc_tokens = set(re.findall(r"[a-zA-Z0-9']+", rt.description.lower())) if rt.description else set()
-                potential_tokens = name_tokens.union(desc_tokens)
-
-                token_hits = [t for t in potential_tokens if t and t in tokens]
-                if token_hits:
-                    score += len(token_hits)  # 1 point per token hit
-                    matches = matches + token_hits
-
-                if score > 0:
-                    keyword_map[rt_id] = (score, matches)
-
-        best_type_id = max(keyword_map, key=lambda key: keyword_map[key][0])
-        score, matches = keyword_map[best_type_id]
-        request_type = RequestType.objects.filter(pk=best_type_id).first()
+        request_type_id, score, matches = match
+        request_type = matcher.request_type(request_type_id)
         if not request_type:
             return None
         return DetectedRequest(request_type=request_type, matched_keywords=matches, score=score)
@@ -731,76 +665,90 @@ class WhatsAppWorkflow:
         messages.append(self._menu_message(guest_status))
         return messages, conversation
 
+    def _outbound_request(self, phone_number: str, outgoing) -> Dict[str, Any]:
+        """send_whatsapp_batch item for one queued reply."""
+        if isinstance(outgoing, dict):
+            if outgoing.get("type") == "menu_buttons":
+                return {
+                    "to_number": phone_number,
+                    "body_text": outgoing.get("body") or "Please choose an option:",
+                    "buttons": outgoing.get("buttons") or [],
+                    "fallback_text": outgoing.get("fallback") or self.MENU_MESSAGE_PROMPT,
+                }
+            return {
+                "to_number": phone_number,
+                "body": outgoing.get("body") or outgoing.get("text") or self.MENU_MESSAGE_PROMPT,
+            }
+        return {"to_number": phone_number, "body": outgoing}
+
     def send_outbound_messages(
         self,
         conversation: WhatsAppConversation,
         messages: Iterable[str],
     ) -> None:
-        for outgoing in messages:
-            body_to_log = outgoing
-            status = None
-            sid = None
-            error = None
-            result = None
-            try:
-                if isinstance(outgoing, dict):
-                    if outgoing.get("type") == "menu_buttons":
-                        body_text = outgoing.get("body") or "Please choose an option:"
-                        buttons = outgoing.get("buttons") or []
-                        fallback_text = outgoing.get("fallback") or self.MENU_MESSAGE_PROMPT
-                        result = twilio_service.send_button_message(
-                            conversation.phone_number,
-                            body_text,
-                            buttons,
-                            fallback_text=fallback_text,
-                        )
-                        if not result or not result.get("success", False):
-                            result = twilio_service.send_text_message(
-                                conversation.phone_number, fallback_text
-                            )
-                            body_to_log = fallback_text
-                        else:
-                            body_to_log = f"{body_text} [buttons]"
-                    else:
-                        payload_text = (
-                            outgoing.get("body")
-                            or outgoing.get("text")
-                            or self.MENU_MESSAGE_PROMPT
-                        )
-                        result = twilio_service.send_text_message(
-                            conversation.phone_number, payload_text
-                        )
-                        body_to_log = payload_text
+        """
+        Send the replies as one batch over the pooled Twilio transport and
+        log them with a single insert, plus one for their audit log rows.
+        """
+        outbound = [
+            self._outbound_request(conversation.phone_number, outgoing)
+            for outgoing in messages
+        ]
+        try:
+            results = twilio_service.send_whatsapp_batch(outbound)
+        except Exception as exc:
+            logger.exception("Twilio send_whatsapp_batch failed.")
+            results = [{"success": False, "status": "failed", "error": str(exc)}] * len(outbound)
+
+        sent_at = timezone.now()
+        log_rows = []
+        for request, result in zip(outbound, results):
+            result = result if isinstance(result, dict) else {}
+            if "buttons" in request:
+                if result.get("type") == "interactive":
+                    body_to_log = f"{request['body_text']} [buttons]"
                 else:
-                    result = twilio_service.send_text_message(
-                        conversation.phone_number, outgoing
-                    )
-                    body_to_log = outgoing
-
-                status = result.get("status") if isinstance(result, dict) else None
-                sid = result.get("message_id") if isinstance(result, dict) else None
-                error = result.get("error") if isinstance(result, dict) else None
-                if not result or not result.get("success", True):
-                    logger.warning(
-                        "Failed to send WhatsApp message to %s: %s",
-                        conversation.phone_number,
-                        error,
-                    )
-                self._log_outbound_message(
-                    conversation,
-                    str(body_to_log),
-                    status=status,
-                    message_sid=sid,
+                    body_to_log = request["fallback_text"]
+            else:
+                body_to_log = request["body"]
+            error = result.get("error")
+            if not result.get("success", True):
+                logger.warning(
+                    "Failed to send WhatsApp message to %s: %s",
+                    conversation.phone_number,
+                    error,
+                )
+            log_rows.append(
+                WhatsAppMessage(
+                    conversation=conversation,
+                    guest=conversation.guest,
+                    direction=WhatsAppMessage.DIRECTION_OUTBOUND,
+                    body=str(body_to_log),
+                    status=result.get("status"),
+                    message_sid=result.get("message_id"),
                     error=error,
+                    sent_at=sent_at,
                 )
-            except Exception as exc:
-                logger.exception("Twilio send_text_message failed.")
-                self._log_outbound_message(
-                    conversation,
-                    str(body_to_log),
-                    status="failed",
-                    error=str(exc),
+            )
+        try:
+            created = WhatsAppMessage.objects.bulk_create(log_rows)
+            if any(row.pk is None for row in created):
+                # Backends without INSERT ... RETURNING (MySQL): the batch shares
+                # conversation and sent_at, and its ids increase in insertion order
+                pks = list(
+                    WhatsAppMessage.objects.filter(conversation=conversation, sent_at=sent_at)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)
                 )
+                for row, pk in zip(created, pks):
+                    row.pk = pk
+            # bulk_create skips the post_save audit log (signals.model_saved)
+            AuditLog.objects.bulk_create([
+                AuditLog(action="create", model_name="WhatsAppMessage", object_pk=str(row.pk), changes={})
+                for row in created
+            ])
+        except Exception:
+            logger.exception("Failed to log outbound WhatsApp messages.")
 
         conversation.last_system_message_at = timezone.now()
         conversation.save(update_fields=["last_system_message_at", "updated_at"])